@@ -8,16 +8,39 @@ QDataStream object to substantially increase performance.
 
 from time import time
 from socket import socket
-from hashlib import blake2b
+from select import select
+from weakref import WeakKeyDictionary
+from collections import deque
 
 from helmholtz_cage_toolkit import *
 import helmholtz_cage_toolkit.scc.scc4 as codec
+import helmholtz_cage_toolkit.scc.scc4b as codec_b
+from helmholtz_cage_toolkit.scc.framing import framer_for, packet_size_for
+from helmholtz_cage_toolkit.schedule_hash import (
+    hash_chunk_size, chunk_bounds, chunk_digest, chunk_digests, root_hash)
+from helmholtz_cage_toolkit.schedule_chunks import rechunk
+
+
+# Codecs that a connection can be switched to using set_codec()
+codecs = {
+    "scc4": codec,
+    "scc4b": codec_b,
+}
+
+# Codec negotiated for each socket. Sockets not in here use SCC4.
+_socket_codecs = WeakKeyDictionary()
+
+# PacketFramer holding the not yet processed received bytes of each socket
+_socket_framers = WeakKeyDictionary()
+
+# Queue of pushed telemetry for each socket with a telemetry subscription
+_socket_subscriptions = WeakKeyDictionary()
 
 
 def send_and_receive(packet,
                      socket_obj,
                      datastream: QDataStream = None,
-                     buffer_size: int = codec.packet_size,
+                     buffer_size: int = 4096,
                      timeout_ms: int = 1000):
     """Wrapper for sequentially sending and receiving a packet over TCP, with
     built-in support for the standard `socket` library backend, as well as the
@@ -35,42 +58,325 @@ def send_and_receive(packet,
     Superficial testing indicates that pre-specifying a re-usable datastream
     object cuts down a localhost packet exchange from ~500 us to <250 us.
     """
+    # Helpers that are run as part of a batch() get a _BatchSocket instead
+    if type(socket_obj) == _BatchSocket:
+        return socket_obj.exchange(packet)
 
-    # Implementation for socket.socket
-    if type(socket_obj) == socket:
+    if type(socket_obj) == QTcpSocket and not datastream:
+        datastream = QDataStream(socket_obj)
+
+    send_packet(packet, socket_obj, datastream=datastream)
+    return receive_packet(socket_obj, datastream=datastream,
+                          buffer_size=buffer_size, timeout_ms=timeout_ms)
+
+
+def send_packet(packet,
+                socket_obj,
+                datastream: QDataStream = None):
+    """Frames `packet` according to the codec in use on `socket_obj`, and
+    writes it to the socket. Does not wait for a response.
 
-        # Send package
-        socket_obj.sendall(packet)
+    `packet` may also be a list of packets, in which case they are all written
+    in a single write, which saves a system call per packet.
+    """
+    framer = get_framer(socket_obj)
+    if type(packet) == list:
+        data = b"".join([framer.frame(p) for p in packet])
+    else:
+        data = framer.frame(packet)
 
-        # Return package when received
-        return socket_obj.recv(buffer_size)
+    # Implementation for socket.socket
+    if type(socket_obj) == socket:
+        socket_obj.sendall(data)
 
     # Implementation for QTcpSocket
     elif type(socket_obj) == QTcpSocket:
-
         # If no QDataStream object was passed, create a new one. This decreases
         # performance, so ideally you want to pass one.
+        if not datastream:
+            datastream = QDataStream(socket_obj)
+        datastream.writeRawData(data)
+
+    # If something other than a supported socket was given
+    else:
+        raise AssertionError(f"Unsupported socket type given: `{type(socket_obj)}`")
+
+
+def receive_packet(socket_obj,
+                   datastream: QDataStream = None,
+                   buffer_size: int = 4096,
+                   timeout_ms: int = 1000):
+    """Returns the next complete packet received on `socket_obj`.
+
+    Received bytes go through the PacketFramer of the socket, so it does not
+    matter how TCP splits or coalesces the data: a packet that arrives in
+    several parts is assembled first, and when several packets arrive at
+    once, the remainder is kept for the next call. `buffer_size` is the
+    maximum number of bytes read from the socket at a time.
+
+    Returns b"" when the connection was closed by the server. For QTcpSocket,
+    returns None if nothing was received within `timeout_ms`.
+
+    On a socket with a telemetry subscription, pushed t-packets are not
+    returned, but put in the telemetry queue instead. See
+    subscribe_telemetry().
+    """
+    framer = get_framer(socket_obj)
+    packet_in = _next_packet(socket_obj, framer)
+
+    # Implementation for socket.socket
+    if type(socket_obj) == socket:
+        while packet_in is None:
+            data = socket_obj.recv(buffer_size)
+            if data == b"":
+                return data
+            framer.feed(data)
+            packet_in = _next_packet(socket_obj, framer)
+        return packet_in
+
+    # Implementation for QTcpSocket
+    elif type(socket_obj) == QTcpSocket:
         if not datastream:
             datastream = QDataStream(socket_obj)
 
-        # Write packet to TCP socket
-        datastream.writeRawData(packet)
-        # ts = time()  # [TIMING]
-        # Return the response
-        if socket_obj.waitForReadyRead(timeout_ms):
+        while packet_in is None:
+            # ts = time()  # [TIMING]
+            if socket_obj.bytesAvailable() == 0 \
+                    and not socket_obj.waitForReadyRead(timeout_ms):
+                # If no response was received within `timeout_ms`, call it
+                # a failure
+                print(f"No response received on socket {socket_obj}")
+                return None
             # tr = time()  # [TIMING]
-            # print(f"send_and_receive(): {int((tr-ts)*1E6)} \u03bcs")  # [TIMING]
-            return datastream.readRawData(buffer_size)
-        # If no response was received within `timeout_ms`, call it a failure
-        else:
-            print(f"No response received to packet {packet}")
-            return None
+            # print(f"receive_packet(): {int((tr-ts)*1E6)} \u03bcs")  # [TIMING]
+            framer.feed(datastream.readRawData(
+                min(socket_obj.bytesAvailable(), buffer_size)))
+            packet_in = _next_packet(socket_obj, framer)
+        return packet_in
 
     # If something other than a supported socket was given
     else:
         raise AssertionError(f"Unsupported socket type given: `{type(socket_obj)}`")
 
 
+def _next_packet(socket_obj, framer):
+    """Returns the next complete packet from `framer`, or None. On sockets
+    with a telemetry subscription, pushed t-packets are decoded into the
+    telemetry queue of the socket and skipped.
+    """
+    packet_in = framer.next_packet()
+
+    queue = _socket_subscriptions.get(socket_obj)
+    if queue is None:
+        return packet_in
+
+    socket_codec = get_codec(socket_obj)
+    while packet_in is not None and socket_codec.packet_type(packet_in) == "t":
+        queue.append(socket_codec.decode_tpacket(packet_in))
+        packet_in = framer.next_packet()
+    return packet_in
+
+
+# ==== CODEC ====
+
+def get_codec(socket_obj):
+    """Returns the codec module in use on `socket_obj`. This is SCC4, unless
+    a different codec was negotiated with set_codec().
+    """
+    if type(socket_obj) == _BatchSocket:
+        socket_obj = socket_obj.socket
+    return _socket_codecs.get(socket_obj, codec)
+
+
+def get_framer(socket_obj):
+    """Returns the PacketFramer of `socket_obj`, creating it if needed."""
+    framer = _socket_framers.get(socket_obj)
+    if framer is None:
+        framer = framer_for(get_codec(socket_obj))
+        _socket_framers[socket_obj] = framer
+    return framer
+
+
+def reset_socket_state(socket_obj):
+    """Discards the per-connection state kept for `socket_obj`: the codec
+    negotiated with set_codec(), its PacketFramer, with any partially received
+    packet in it, and its telemetry subscription queue. Call this whenever the connection is closed or before
+    it is reopened, because a socket object that is reused for a new
+    connection (such as the QTcpSocket of the connection window) would
+    otherwise carry this state over: a new connection always starts in SCC4,
+    and a partial packet left behind by a dropped connection would misalign
+    every packet of the next one.
+    """
+    _socket_codecs.pop(socket_obj, None)
+    _socket_framers.pop(socket_obj, None)
+    _socket_subscriptions.pop(socket_obj, None)
+
+
+def set_codec(socket,
+              codec_name: str,
+              datastream: QDataStream = None):
+    """Negotiates the codec used for all further packets on this connection.
+    Currently supported are 'scc4' (default) and 'scc4b' (binary).
+
+    The request is encoded with the codec currently in use, and the server
+    confirms with "1" before switching over. Servers that do not know the
+    requested codec reply "0", in which case the connection keeps using the
+    current codec. The server also replies "0" while the connection has a
+    telemetry subscription, so call unsubscribe_telemetry() first. Returns 1
+    if the switch was made, and 0 otherwise.
+
+    If implementing this function with QTcpSocket, you can specify a re-usable
+    QDataStream object to substantially increase performance.
+    """
+    if codec_name not in codecs:
+        raise ValueError(f"set_codec(): Unknown codec '{codec_name}'!")
+
+    packet_in = send_and_receive(
+        get_codec(socket).encode_xpacket("set_codec", codec_name),
+        socket,
+        datastream=datastream
+    )
+
+    # Servers predating codec negotiation drop the connection on unknown
+    # commands rather than replying, so an empty response is not an error.
+    if not packet_in:
+        return 0
+
+    confirm = int(get_codec(socket).decode_mpacket(packet_in))
+    if confirm == 1:
+        _socket_codecs[socket] = codecs[codec_name]
+        get_framer(socket).set_packet_size(
+            packet_size_for(codecs[codec_name]))
+
+    return confirm
+
+
+# ==== BATCHING ====
+
+class _BatchCaptured(Exception):
+    """Raised by _BatchSocket to stop a helper once its packet is captured."""
+    pass
+
+
+class _BatchSocket:
+    """Stand-in socket that batch helpers are run with. See Batch.
+
+    In "capture" mode, exchange() stores the packet the helper wants to send,
+    and then aborts the helper. In "replay" mode, exchange() hands the helper
+    the response that was received for that packet, so that it can decode it
+    as normal.
+    """
+    def __init__(self, socket_obj, mode, response=None):
+        self.socket = socket_obj
+        self.mode = mode
+        self.packet = None
+        self.response = response
+        self.n_exchanges = 0
+
+    def exchange(self, packet):
+        self.n_exchanges += 1
+        if self.n_exchanges > 1:
+            raise AssertionError(
+                "Helpers that send more than one packet cannot be batched!")
+
+        if self.mode == "capture":
+            self.packet = packet
+            raise _BatchCaptured
+        else:
+            return self.response
+
+
+class Batch:
+    """Pipelined request/response mode for the helpers in this module.
+
+    Rather than sending a packet and waiting for the reply before sending the
+    next, a Batch queues up helper calls, writes all their packets to the
+    socket at once, and then reads back the responses, which the server sends
+    in the same order. A batch of N requests therefore takes a single round
+    trip rather than N. Over localhost, a round trip costs only tens of
+    microseconds and the gain is small, but it grows with network latency.
+
+    Any helper that sends exactly one packet can be used as batch member, by
+    calling it on the Batch object without the socket argument. Calls can be
+    chained, and run() returns the results of all helpers in order:
+
+        play_info, schedule_info, telemetry = cf.batch(sock) \
+            .get_play_info().get_schedule_info().get_telemetry().run()
+
+    Under the hood, every helper is run twice against a stand-in socket:
+    first to capture the packet it sends, and after the exchange to decode
+    the response it receives. Helpers that send more than one packet (such as
+    ping_n() or transfer_schedule()) raise an AssertionError on run().
+
+    If implementing this with QTcpSocket, you can specify a re-usable
+    QDataStream object to substantially increase performance.
+    """
+    def __init__(self, socket_obj, datastream: QDataStream = None,
+                 timeout_ms: int = 1000):
+        self.socket = socket_obj
+        self.datastream = datastream
+        self.timeout_ms = timeout_ms
+        self.calls = []
+
+    def __getattr__(self, name):
+        if name in ("set_codec", "batch"):
+            raise AttributeError(f"'{name}' cannot be used in a batch!")
+        helper = globals().get(name)
+        if not callable(helper):
+            raise AttributeError(f"client_functions has no helper '{name}'!")
+
+        def queue(*args, **kwargs):
+            self.calls.append((helper, args, kwargs))
+            return self
+        return queue
+
+    def __len__(self):
+        return len(self.calls)
+
+    def run(self):
+        """Sends all queued requests in one write, collects the responses,
+        and returns the outputs of the helpers as a list, in order. The
+        queue is emptied afterwards, so the Batch can be reused.
+        """
+        if type(self.socket) == QTcpSocket and not self.datastream:
+            self.datastream = QDataStream(self.socket)
+
+        packets = []
+        for helper, args, kwargs in self.calls:
+            capture = _BatchSocket(self.socket, "capture")
+            try:
+                helper(capture, *args, **kwargs)
+            except _BatchCaptured:
+                pass
+            if capture.packet is None:
+                raise AssertionError(f"{helper.__name__}() did not send a packet!")
+            packets.append(capture.packet)
+
+        send_packet(packets, self.socket, datastream=self.datastream)
+
+        results = []
+        for helper, args, kwargs in self.calls:
+            response = receive_packet(self.socket, datastream=self.datastream,
+                                      timeout_ms=self.timeout_ms)
+            results.append(
+                helper(_BatchSocket(self.socket, "replay", response),
+                       *args, **kwargs)
+            )
+
+        self.calls = []
+        return results
+
+
+def batch(socket, datastream: QDataStream = None, timeout_ms: int = 1000):
+    """Returns a new Batch for `socket`, for sending several requests in a
+    single round trip. See Batch.
+
+    If implementing this function with QTcpSocket, you can specify a re-usable
+    QDataStream object to substantially increase performance.
+    """
+    return Batch(socket, datastream=datastream, timeout_ms=timeout_ms)
+
+
 # ==== UTILITY ====
 
 def ping(socket, datastream: QDataStream = None):
@@ -81,14 +387,14 @@ def ping(socket, datastream: QDataStream = None):
     QDataStream object to substantially increase performance.
     """
     # Assemble packet before starting timer
-    packet_out = codec.encode_epacket("")  # Packet will be 0x65 + n * 0x23
+    packet_out = get_codec(socket).encode_epacket("")  # Packet will be 0x65 + n * 0x23
 
     tstart = time()
     packet_in = send_and_receive(packet_out, socket, datastream=datastream)
     tend = time()
 
     # Verification
-    response = codec.decode_epacket(packet_in)
+    response = get_codec(socket).decode_epacket(packet_in)
     if response == "":
         return tend - tstart
     else:
@@ -105,14 +411,14 @@ def ping_n(socket, n=8, datastream: QDataStream = None):
     times = [0.]*n
 
     for i in range(n):
-        packet_out = codec.encode_epacket("")  # Packet will be 0x65 + n * 0x23
+        packet_out = get_codec(socket).encode_epacket("")  # Packet will be 0x65 + n * 0x23
 
         tstart = time()
         packet_in = send_and_receive(packet_out, socket, datastream=datastream)
         tend = time()
 
         # Verification
-        response = codec.decode_epacket(packet_in)
+        response = get_codec(socket).decode_epacket(packet_in)
         if response != "":
             return -1
         else:
@@ -130,9 +436,9 @@ def echo(socket,
     QDataStream object to substantially increase performance.
     """
 
-    response = codec.decode_epacket(
+    response = get_codec(socket).decode_epacket(
         send_and_receive(
-            codec.encode_epacket(str(msg)),
+            get_codec(socket).encode_epacket(str(msg)),
             socket,
             datastream=datastream
         )
@@ -178,9 +484,9 @@ def get_server_uptime(socket,
     If implementing this function with QTcpSocket, you can specify a re-usable
     QDataStream object to substantially increase performance.
     """
-    server_uptime = codec.decode_mpacket(
+    server_uptime = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("get_server_uptime"),
+            get_codec(socket).encode_xpacket("get_server_uptime"),
             socket,
             datastream=datastream
         )
@@ -227,9 +533,9 @@ def get_socket_info(socket,
     If implementing this function with QTcpSocket, you can specify a re-usable
     QDataStream object to substantially increase performance.
     """
-    uptime, address, port = codec.decode_mpacket(
+    uptime, address, port = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("get_socket_info"),
+            get_codec(socket).encode_xpacket("get_socket_info"),
             socket,
             datastream=datastream
         )
@@ -246,9 +552,9 @@ def message(socket,
     If implementing this function with QTcpSocket, you can specify a re-usable
     QDataStream object to substantially increase performance.
     """
-    confirm = codec.decode_mpacket(
+    confirm = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_mpacket(str(msg)),
+            get_codec(socket).encode_mpacket(str(msg)),
             socket,
             datastream=datastream
         )
@@ -256,6 +562,124 @@ def message(socket,
     return int(confirm)
 
 
+def list_commands(socket,
+                  datastream: QDataStream = None):
+    """Requests the list of x-packet commands that the server supports, and
+    returns it as a dict that maps every command name to a list of its
+    argument types. Every argument type is a string of the SCC type codes
+    ('f', 'i', 'b', 's') it accepts, separated by '|' if there are several.
+
+    The list may not fit in a single m-packet, so it is requested in parts.
+
+    If implementing this function with QTcpSocket, you can specify a re-usable
+    QDataStream object to substantially increase performance.
+    """
+    commands = {}
+    n_commands = 1
+    while len(commands) < n_commands:
+        n_string, *entries = get_codec(socket).decode_mpacket(
+            send_and_receive(
+                get_codec(socket).encode_xpacket("list_commands", len(commands)),
+                socket,
+                datastream=datastream
+            )
+        ).split(";")
+        n_commands = int(n_string)
+
+        for entry in entries:
+            name, arg_types = entry.split(":")
+            commands[name] = arg_types.split(",") if arg_types else []
+
+    return commands
+
+
+def get_command_stats(socket,
+                      name: str,
+                      datastream: QDataStream = None):
+    """Requests the call statistics of x-packet command `name` from the
+    server, which are the number of calls, and the mean and maximum time in
+    [s] the server took to handle it. Returns -1 if the command does not
+    exist.
+
+    If implementing this function with QTcpSocket, you can specify a re-usable
+    QDataStream object to substantially increase performance.
+    """
+    stats = get_codec(socket).decode_mpacket(
+        send_and_receive(
+            get_codec(socket).encode_xpacket("get_command_stats", name),
+            socket,
+            datastream=datastream
+        )
+    )
+    if stats == "-1":
+        return -1
+
+    n_calls, t_mean, t_max = stats.split(",")
+    return int(n_calls), float(t_mean), float(t_max)
+
+
+def get_loop_stats(socket,
+                   name: str,
+                   datastream: QDataStream = None):
+    """Requests the timing statistics of the loop of server thread `name`
+    ('control', 'read_ADC' or 'write_DAC'). Returns:
+        - n_iterations (int): number of loop iterations
+        - n_missed (int): number of iterations that overran their period
+        - period (float): the loop period in [s]
+        - iteration (tuple): (min, mean, p99, max) iteration time in [s]
+        - lateness (tuple): (min, mean, p99, max) lateness in [s]
+    in that order, where the iteration time and lateness are taken over a
+    rolling window of recent iterations. Returns -1 if there is no thread
+    loop called `name`.
+
+    If implementing this function with QTcpSocket, you can specify a re-usable
+    QDataStream object to substantially increase performance.
+    """
+    stats = get_codec(socket).decode_mpacket(
+        send_and_receive(
+            get_codec(socket).encode_xpacket("get_loop_stats", name),
+            socket,
+            datastream=datastream
+        )
+    )
+    if stats == "-1":
+        return -1
+
+    counts, iteration, lateness = stats.split(";")
+    n_iterations, n_missed, period = counts.split(",")
+    return int(n_iterations), int(n_missed), float(period), \
+        tuple([float(t) for t in iteration.split(",")]), \
+        tuple([float(t) for t in lateness.split(",")])
+
+
+def get_dac_write_stats(socket,
+                        datastream: QDataStream = None):
+    """Requests the channel write counters of the change-coalescing DAC writer
+    of the server (see server/dac_writer.py). Returns:
+        - n_requested (int): DAC channel writes requested by the write_DAC
+            thread
+        - n_written (int): DAC channel writes actually passed on to the
+            hardware
+        - n_saved (int): DAC channel writes skipped, because the channel was
+            already at the requested voltage
+        - n_bulk (int): number of bulk writes to the hardware
+    in that order. Returns -1 if the server has not started writing the DAC.
+
+    If implementing this function with QTcpSocket, you can specify a re-usable
+    QDataStream object to substantially increase performance.
+    """
+    stats = get_codec(socket).decode_mpacket(
+        send_and_receive(
+            get_codec(socket).encode_xpacket("get_dac_write_stats"),
+            socket,
+            datastream=datastream
+        )
+    )
+    if stats == "-1":
+        return -1
+    return tuple([int(n) for n in stats.split(",")])
+
+
 # ==== FIELD CONTROL ====
 # def get_control_vals(socket, # TODO EVALUATE
 #                      datastream: QDataStream = None,
@@ -303,9 +727,9 @@ def set_Bc(socket,
     if len(Bc) != 3:
         raise AssertionError(f"Bc must be an array of length 3 (given: {len(Bc)}!")
 
-    confirm = codec.decode_mpacket(
+    confirm = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_cpacket(Bc),
+            get_codec(socket).encode_cpacket(Bc),
             socket,
             datastream=datastream
         )
@@ -324,9 +748,9 @@ def get_Bc(socket,
     If implementing this function with QTcpSocket, you can specify a re-usable
     QDataStream object to substantially increase performance.
     """
-    Bc = codec.decode_cpacket(
+    Bc = get_codec(socket).decode_cpacket(
         send_and_receive(
-            codec.encode_xpacket("get_Bc"),
+            get_codec(socket).encode_xpacket("get_Bc"),
             socket,
             datastream=datastream
         )
@@ -359,9 +783,9 @@ def get_V_board(socket,
     QDataStream object to substantially increase performance.
     """
 
-    V_board = codec.decode_mpacket(
+    V_board = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("get_V_board"),
+            get_codec(socket).encode_xpacket("get_V_board"),
             socket,
             datastream=datastream
         )
@@ -377,9 +801,9 @@ def get_aux_adc(socket,
     QDataStream object to substantially increase performance.
     """
 
-    aux_adc = codec.decode_mpacket(
+    aux_adc = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("get_aux_adc"),
+            get_codec(socket).encode_xpacket("get_aux_adc"),
             socket,
             datastream=datastream
         )
@@ -395,9 +819,9 @@ def get_aux_dac(socket,
     QDataStream object to substantially increase performance.
     """
 
-    aux_dac = codec.decode_mpacket(
+    aux_dac = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("get_aux_dac"),
+            get_codec(socket).encode_xpacket("get_aux_dac"),
             socket,
             datastream=datastream
         )
@@ -419,9 +843,9 @@ def set_aux_dac(socket,
         raise AssertionError(f"dac_vals must be a list of length 6 (given: {len(dac_vals)}!")
 
     # [ch1, ch2, ch3, ch4, ch5, ch6] = dac_vals
-    confirm = codec.decode_mpacket(
+    confirm = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("set_aux_dac", *dac_vals),
+            get_codec(socket).encode_xpacket("set_aux_dac", *dac_vals),
             socket,
             datastream=datastream
         )
@@ -438,9 +862,9 @@ def get_output_enable(socket,
     QDataStream object to substantially increase performance.
     """
 
-    enable = codec.decode_mpacket(
+    enable = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("get_output_enable"),
+            get_codec(socket).encode_xpacket("get_output_enable"),
             socket,
             datastream=datastream
         )
@@ -458,9 +882,9 @@ def set_output_enable(socket,
     QDataStream object to substantially increase performance.
     """
 
-    confirm = codec.decode_mpacket(
+    confirm = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("set_output_enable", str(int(enable))),
+            get_codec(socket).encode_xpacket("set_output_enable", str(int(enable))),
             socket,
             datastream=datastream
         )
@@ -499,9 +923,9 @@ def set_params_VB(socket,
     """
 
     vals = [bx0, bx1, by0, by1, bz0, bz1]
-    confirm = codec.decode_mpacket(
+    confirm = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("set_params_VB", *vals),
+            get_codec(socket).encode_xpacket("set_params_VB", *vals),
             socket,
             datastream=datastream
         )
@@ -526,9 +950,9 @@ def get_params_VB(socket,
     QDataStream object to substantially increase performance.
     """
 
-    p = codec.decode_mpacket(
+    p = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("get_params_VB"),
+            get_codec(socket).encode_xpacket("get_params_VB"),
             socket,
             datastream=datastream
         )
@@ -556,9 +980,9 @@ def get_Bm(socket,
     If implementing this function with QTcpSocket, you can specify a re-usable
     QDataStream object to substantially increase performance.
     """
-    r = codec.decode_bpacket(
+    r = get_codec(socket).decode_bpacket(
         send_and_receive(
-            codec.encode_bpacket(0., [0.]*3),
+            get_codec(socket).encode_bpacket(0., [0.]*3),
             socket,
             datastream=datastream
         )
@@ -571,13 +995,19 @@ def get_telemetry(socket,
                   datastream: QDataStream = None):
     """Requests and returns a t-packet with telemetry from the server.
 
+    Not available on a socket with a telemetry subscription, as the response
+    would be taken for a pushed sample, so this raises an AssertionError
+    instead. Use receive_telemetry() there.
+
     If implementing this function with QTcpSocket, you can specify a re-usable
     QDataStream object to substantially increase performance.
     """
+    if socket in _socket_subscriptions:
+        raise AssertionError("get_telemetry(): Socket has a telemetry subscription, use receive_telemetry() instead!")
 
-    tm, i_step, Im, Bm, Bc = codec.decode_tpacket(
+    tm, i_step, Im, Bm, Bc = get_codec(socket).decode_tpacket(
         send_and_receive(
-            codec.encode_tpacket(0., 0, *[[0.]*3]*3),
+            get_codec(socket).encode_tpacket(0., 0, *[[0.]*3]*3),
             socket,
             datastream=datastream
         )
@@ -585,6 +1015,122 @@ def get_telemetry(socket,
     return tm, i_step, Im, Bm, Bc
 
 
+def subscribe_telemetry(socket,
+                        rate: float,
+                        decimation: int = 1,
+                        queue_size: int = 1024,
+                        datastream: QDataStream = None):
+    """Subscribes to telemetry that the server pushes at a fixed rate, rather
+    than requesting every sample with get_telemetry(). The server ticks at
+    `rate` Hz and pushes a t-packet every `decimation`-th tick. Calling this
+    again with a different rate replaces the subscription.
+
+    Pushed samples are collected in a queue of at most `queue_size` samples
+    (oldest are dropped first), which can be emptied with
+    receive_telemetry(). Other helpers can still be used on the socket as
+    normal, with the exception of get_telemetry(), which raises an
+    AssertionError until unsubscribe_telemetry() is called.
+
+    Returns 1 if the server accepted the subscription, and -1 otherwise.
+
+    If implementing this function with QTcpSocket, you can specify a re-usable
+    QDataStream object to substantially increase performance.
+    """
+    # Set up the queue first, as pushed samples may precede the confirmation
+    if socket not in _socket_subscriptions:
+        _socket_subscriptions[socket] = deque(maxlen=queue_size)
+
+    confirm = int(get_codec(socket).decode_mpacket(
+        send_and_receive(
+            get_codec(socket).encode_xpacket(
+                "subscribe_telemetry", float(rate), int(decimation)),
+            socket,
+            datastream=datastream
+        )
+    ))
+
+    if confirm != 1:
+        _socket_subscriptions.pop(socket, None)
+    return confirm
+
+
+def unsubscribe_telemetry(socket,
+                          datastream: QDataStream = None,
+                          notify_server: bool = True):
+    """Ends a telemetry subscription started with subscribe_telemetry(), and
+    returns any samples that were still in the queue.
+
+    Set `notify_server` to False when the connection is already down, to only
+    clean up the subscription locally.
+
+    If implementing this function with QTcpSocket, you can specify a re-usable
+    QDataStream object to substantially increase performance.
+    """
+    if notify_server:
+        # Samples pushed before the confirmation still end up in the queue
+        get_codec(socket).decode_mpacket(
+            send_and_receive(
+                get_codec(socket).encode_xpacket("unsubscribe_telemetry"),
+                socket,
+                datastream=datastream
+            )
+        )
+
+    queue = _socket_subscriptions.pop(socket, None)
+    if queue is None:
+        return []
+    return list(queue)
+
+
+def receive_telemetry(socket_obj,
+                      datastream: QDataStream = None,
+                      buffer_size: int = 65536):
+    """Reads all telemetry pushed by the server so far, without waiting, and
+    returns it as a list of (tm, i_step, Im, Bm, Bc) tuples, oldest first.
+    Returns an empty list if nothing new has arrived. The socket must have a
+    telemetry subscription (see subscribe_telemetry()).
+
+    If implementing this function with QTcpSocket, you can specify a re-usable
+    QDataStream object to substantially increase performance.
+    """
+    queue = _socket_subscriptions.get(socket_obj)
+    if queue is None:
+        raise AssertionError("receive_telemetry(): Socket has no telemetry subscription!")
+
+    framer = get_framer(socket_obj)
+
+    # Implementation for socket.socket
+    if type(socket_obj) == socket:
+        while select([socket_obj], [], [], 0)[0]:
+            data = socket_obj.recv(buffer_size)
+            if data == b"":
+                break
+            framer.feed(data)
+
+    # Implementation for QTcpSocket
+    elif type(socket_obj) == QTcpSocket:
+        if not datastream:
+            datastream = QDataStream(socket_obj)
+        if socket_obj.bytesAvailable() == 0:
+            socket_obj.waitForReadyRead(0)
+        while socket_obj.bytesAvailable() > 0:
+            framer.feed(datastream.readRawData(
+                min(socket_obj.bytesAvailable(), buffer_size)))
+
+    # If something other than a supported socket was given
+    else:
+        raise AssertionError(f"Unsupported socket type given: `{type(socket_obj)}`")
+
+    # Nothing but pushed telemetry should be arriving here
+    packet_in = _next_packet(socket_obj, framer)
+    if packet_in is not None:
+        print(f"[WARNING] receive_telemetry(): Discarded unexpected packet {packet_in}")
+
+    samples = list(queue)
+    queue.clear()
+    return samples
+
+
 # ==== SCHEDULE ====
 
 def print_schedule_info(
@@ -597,9 +1143,9 @@ def print_schedule_info(
     If implementing this function with QTcpSocket, you can specify a re-usable
     QDataStream object to substantially increase performance.
     """
-    confirm = codec.decode_mpacket(
+    confirm = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("print_schedule_info", max_entries),
+            get_codec(socket).encode_xpacket("print_schedule_info", max_entries),
             socket,
             datastream=datastream
         )
@@ -618,9 +1164,9 @@ def get_schedule_info(
     If implementing this function with QTcpSocket, you can specify a re-usable
     QDataStream object to substantially increase performance.
     """
-    info = codec.decode_mpacket(
+    info = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("get_schedule_info", str(int(generate_hash))),
+            get_codec(socket).encode_xpacket("get_schedule_info", str(int(generate_hash))),
             socket,
             datastream=datastream
         )
@@ -642,9 +1188,9 @@ def initialize_schedule(
     If implementing this function with QTcpSocket, you can specify a re-usable
     QDataStream object to substantially increase performance.
     """
-    confirm = codec.decode_mpacket(
+    confirm = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("initialize_schedule"),
+            get_codec(socket).encode_xpacket("initialize_schedule"),
             socket,
             datastream=datastream
         )
@@ -671,9 +1217,9 @@ def allocate_schedule(
     If implementing this function with QTcpSocket, you can specify a re-usable
     QDataStream object to substantially increase performance.
     """
-    confirm = codec.decode_mpacket(
+    confirm = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("allocate_schedule", name, n_seg, float(duration)),
+            get_codec(socket).encode_xpacket("allocate_schedule", name, n_seg, float(duration)),
             socket,
             datastream=datastream
         )
@@ -691,9 +1237,9 @@ def get_schedule_segment(
     If implementing this function with QTcpSocket, you can specify a re-usable
     QDataStream object to substantially increase performance.
     """
-    segment = codec.decode_spacket(
+    segment = get_codec(socket).decode_spacket(
         send_and_receive(
-            codec.encode_xpacket("get_schedule_segment", segment_id),
+            get_codec(socket).encode_xpacket("get_schedule_segment", segment_id),
             socket,
             datastream=datastream
         )
@@ -714,9 +1260,9 @@ def set_schedule_segment(
     If implementing this function with QTcpSocket, you can specify a re-usable
     QDataStream object to substantially increase performance.
     """
-    confirm = codec.decode_mpacket(
+    confirm = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_spacket(*segment),
+            get_codec(socket).encode_spacket(*segment),
             socket,
             datastream=datastream
         )
@@ -729,7 +1275,9 @@ def transfer_schedule(  # TODO Incorporate schedule validation tools
     socket,
     schedule,
     name: str = "schedule1",
-    datastream: QDataStream = None):
+    datastream: QDataStream = None,
+    bulk: bool = False,
+    chunk_size: int = 4096):
     """Sequentially transfers a schedule to the server.
 
     This function is meant to be a one-shot solution to transferring a
@@ -740,6 +1288,12 @@ def transfer_schedule(  # TODO Incorporate schedule validation tools
     The server sends a confirmation for each package received, which this
     function will also examine, raising an exception if something went wrong.
 
+    With `bulk` set to True, the schedule is instead sent in chunks of
+    `chunk_size` segments, using k-packets, and the server confirms once per
+    chunk. This cuts the number of round trips down by a factor `chunk_size`,
+    and is much faster for large schedules. Because k-packets only exist in
+    SCC4B, the connection is switched over to SCC4B first if needed.
+
     An optional schedule name can be specified.
 
     If implementing this function with QTcpSocket, you can specify a re-usable
@@ -770,6 +1324,10 @@ def transfer_schedule(  # TODO Incorporate schedule validation tools
     # elif type(socket) == QTcpSocket and not datastream:
     #     datastream = QDataStream(socket_obj)
 
+    if bulk and get_codec(socket) is not codec_b:
+        if set_codec(socket, "scc4b", datastream=datastream) != 1:
+            raise AssertionError("Server does not support bulk schedule transfer!")
+
     # First allocate schedule
     confirm = allocate_schedule(
         socket, name, len(schedule), schedule[-1][2], datastream=datastream
@@ -777,11 +1335,17 @@ def transfer_schedule(  # TODO Incorporate schedule validation tools
     if int(confirm) != 1:
         raise AssertionError(f"Failed to allocate schedule '{name}'!")
 
+    if bulk:
+        transfer_schedule_chunks(socket, schedule, name=name,
+                                 datastream=datastream, chunk_size=chunk_size)
+        tend = time()
+        return tend - tstart
+
     # Loop over segments and transfer one by one.
     for i, seg in enumerate(schedule):
-        confirm = codec.decode_mpacket(
+        confirm = get_codec(socket).decode_mpacket(
             send_and_receive(
-                codec.encode_spacket(*(schedule[i])),
+                get_codec(socket).encode_spacket(*(schedule[i])),
                 socket,
                 datastream=datastream
             )
@@ -797,6 +1361,144 @@ def transfer_schedule(  # TODO Incorporate schedule validation tools
     return tend - tstart
 
 
+def transfer_schedule_chunks(
+    socket,
+    schedule,
+    name: str = "schedule1",
+    datastream: QDataStream = None,
+    chunk_size: int = 4096,
+    window: int = 4,
+    chunks: list = None):
+    """Transfers the segments of a schedule in chunks of `chunk_size`
+    segments, using k-packets. The schedule must already have been allocated
+    on the server, and the connection must use SCC4B. Normally, you would use
+    transfer_schedule() with `bulk` set to True instead of calling this
+    directly.
+
+    By default, all chunks are sent. To send only some of them, pass their
+    indices as `chunks`, as repair_schedule() does.
+
+    Up to `window` chunks are sent ahead before waiting for the server to
+    confirm the oldest one, so that the connection does not sit idle whilst
+    the server is writing a chunk into its schedule. Every confirmation is
+    checked against the index of the chunk it belongs to.
+
+    If implementing this function with QTcpSocket, you can specify a re-usable
+    QDataStream object to substantially increase performance.
+    """
+    tB = array(schedule, dtype=float)[:, 2:6]
+    n_chunks = -(-len(tB) // chunk_size)
+
+    if chunks is None:
+        chunks = range(n_chunks)
+
+    _send_kpackets(
+        socket,
+        ((i_chunk, i_chunk*chunk_size, tB[i_chunk*chunk_size:(i_chunk+1)*chunk_size])
+         for i_chunk in chunks),
+        window=window,
+        name=name,
+        datastream=datastream
+    )
+
+
+def _send_kpackets(socket, kpackets, window: int, name: str,
+                   datastream: QDataStream = None):
+    """Sends the (i_chunk, i_first, tB) chunks of `kpackets` as k-packets,
+    with up to `window` of them sent ahead of the confirmations of the server,
+    and checks every confirmation against the index of its chunk. `kpackets`
+    may be any iterable, including a generator that makes the chunks as they
+    are needed.
+    """
+    def confirm_chunk(i_chunk):
+        confirm = codec_b.decode_mpacket(
+            receive_packet(socket, datastream=datastream))
+        if int(confirm) != i_chunk:
+            raise AssertionError(f"Failed to transfer chunk {i_chunk} of schedule '{name}'!")
+
+    unconfirmed = deque()
+    for i_chunk, i_first, tB in kpackets:
+        send_packet(
+            codec_b.encode_kpacket(i_chunk, i_first, tB),
+            socket,
+            datastream=datastream
+        )
+        unconfirmed.append(i_chunk)
+        if len(unconfirmed) >= window:
+            confirm_chunk(unconfirmed.popleft())
+
+    while unconfirmed:
+        confirm_chunk(unconfirmed.popleft())
+
+
+def transfer_schedule_stream(
+    socket,
+    chunks,
+    n_seg: int,
+    duration: float,
+    name: str = "schedule1",
+    datastream: QDataStream = None,
+    chunk_size: int = 4096,
+    window: int = 4):
+    """Transfers a schedule that arrives as a stream of (t, B) chunks, such
+    as those of generator_cyclics_chunks() or generator_orbital2_chunks(), to
+    the server, without ever holding the whole schedule. Because the schedule
+    is allocated on the server first, its length `n_seg` and `duration` must
+    be known beforehand (see generator_cyclics_extent() and
+    generator_orbital2_extent()).
+
+    The chunks are regrouped into k-packets of `chunk_size` segments, which
+    are sent as in transfer_schedule_chunks(), so the connection is switched
+    over to SCC4B first if needed.
+
+    Since there is no local copy of the schedule to pass to verify_schedule()
+    afterwards, the schedule hash is computed on the fly, from the segments
+    as they are sent. Returns the total transfer time in [s] and this hash,
+    which can be compared with the result of get_schedule_hash().
+
+    If implementing this function with QTcpSocket, you can specify a re-usable
+    QDataStream object to substantially increase performance.
+    """
+    tstart = time()
+
+    if get_codec(socket) is not codec_b:
+        if set_codec(socket, "scc4b", datastream=datastream) != 1:
+            raise AssertionError("Server does not support bulk schedule transfer!")
+
+    confirm = allocate_schedule(socket, name, n_seg, duration, datastream=datastream)
+    if int(confirm) != 1:
+        raise AssertionError(f"Failed to allocate schedule '{name}'!")
+
+    digests = []
+    unhashed = empty((0, 6))    # Segments sent, but not yet hashed
+    i_first = 0
+
+    def kpackets():
+        nonlocal unhashed, i_first
+        for i_chunk, (t, B) in enumerate(rechunk(chunks, chunk_size)):
+            if i_first + len(t) > n_seg:
+                raise AssertionError(f"Schedule '{name}' is longer than the {n_seg} segments allocated!")
+            tB = column_stack((t, B[0], B[1], B[2]))
+            yield i_chunk, i_first, tB
+
+            # Hash the segments as the server will store them
+            unhashed = concatenate((unhashed, column_stack((
+                arange(i_first, i_first + len(t)), n_seg*ones(len(t)), tB))))
+            while len(unhashed) >= hash_chunk_size:
+                digests.append(chunk_digest(unhashed[:hash_chunk_size]))
+                unhashed = unhashed[hash_chunk_size:]
+            i_first += len(t)
+
+    _send_kpackets(socket, kpackets(), window=window, name=name, datastream=datastream)
+
+    if i_first != n_seg:
+        raise AssertionError(f"Schedule '{name}' has {i_first} segments, but {n_seg} were allocated!")
+    if len(unhashed) > 0 or len(digests) == 0:
+        digests.append(chunk_digest(unhashed))
+
+    return time() - tstart, root_hash(digests)
+
+
 def get_schedule_hash(
     socket,
     datastream: QDataStream = None,
@@ -804,8 +1506,10 @@ def get_schedule_hash(
     """Requests the server to hash its schedule and send the result. It reuses
     the 'get_schedule_info' command and returns only the hash.
 
-    For large schedules (>1M segments), calculating the hash can take over one
-    second, which is the default timeout for the send_and_receive() call.
+    The server hashes the schedule while it is being uploaded, so normally the
+    hash is available right away. However, if parts of a large schedule were
+    not written in order, the server has to hash them first, which can take
+    over one second, the default timeout for the send_and_receive() call.
     Therefore, get_schedule_hash() allows you to raise this limit by specifying
     a value for `timeout_ms`, set to 10 seconds by default.
 
@@ -815,9 +1519,9 @@ def get_schedule_hash(
 
     generate_hash = True
 
-    (_, _, _, hash_string) = codec.decode_mpacket(
+    (_, _, _, hash_string) = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("get_schedule_info", generate_hash),
+            get_codec(socket).encode_xpacket("get_schedule_info", generate_hash),
             socket,
             datastream=datastream,
             timeout_ms=timeout_ms,
@@ -826,9 +1530,112 @@ def get_schedule_hash(
     return hash_string
 
 
+def get_schedule_digests(
+    socket,
+    datastream: QDataStream = None,
+    timeout_ms=10000):
+    """Requests the leaf digests of all hash chunks of the schedule on the
+    server, and returns them as a list of hex strings. See schedule_hash.py.
+
+    The list may not fit in a single m-packet, so it is requested in parts.
+
+    If implementing this function with QTcpSocket, you can specify a re-usable
+    QDataStream object to substantially increase performance.
+    """
+    digests = []
+    n_chunks = 1
+    while len(digests) < n_chunks:
+        n_string, *entries = get_codec(socket).decode_mpacket(
+            send_and_receive(
+                get_codec(socket).encode_xpacket("get_schedule_digests", len(digests)),
+                socket,
+                datastream=datastream,
+                timeout_ms=timeout_ms,
+            )
+        ).split(";")
+        n_chunks = int(n_string)
+        digests += entries
+
+    return digests
+
+
 def calculate_schedule_hash(schedule: list):
-    """Creates a schedule digest using the BLAKE2b algorithm"""
-    return blake2b(array(schedule).tobytes(), digest_size=8).hexdigest()
+    """Creates a schedule digest using the BLAKE2b algorithm, as the root hash
+    of the digests of its hash chunks. See schedule_hash.py."""
+    return root_hash(chunk_digests(array(schedule, dtype=float)))
+
+
+def find_schedule_mismatches(
+    socket,
+    schedule,
+    datastream: QDataStream = None):
+    """Compares the leaf digests of the schedule on the server with those of
+    the local copy, and returns the indices of the hash chunks that differ.
+    If the schedules differ in length, all chunks are considered to differ.
+
+    If implementing this function with QTcpSocket, you can specify a re-usable
+    QDataStream object to substantially increase performance.
+    """
+    digests_local = [digest.hex() for digest in
+                     chunk_digests(array(schedule, dtype=float))]
+    digests_server = get_schedule_digests(socket, datastream=datastream)
+
+    if len(digests_local) != len(digests_server):
+        return list(range(len(digests_local)))
+
+    return [i for i, (digest_local, digest_server)
+            in enumerate(zip(digests_local, digests_server))
+            if digest_local != digest_server]
+
+
+def repair_schedule(
+    socket,
+    schedule,
+    name: str = "schedule1",
+    datastream: QDataStream = None):
+    """Finds the hash chunks of the schedule on the server that differ from
+    the local copy, and resends only those, rather than transferring the
+    whole schedule again. Returns the indices of the resent chunks, which is
+    empty if the schedules already matched.
+
+    The schedule on the server must have the same length as the local copy,
+    otherwise it cannot be repaired, and an AssertionError is raised. Use
+    transfer_schedule() instead in that case.
+
+    If the connection uses SCC4B, every chunk is resent as a single k-packet,
+    and otherwise segment by segment.
+
+    If implementing this function with QTcpSocket, you can specify a re-usable
+    QDataStream object to substantially increase performance.
+    """
+    n_seg = get_schedule_info(socket, generate_hash=False, datastream=datastream)[1]
+    if n_seg != len(schedule):
+        raise AssertionError(
+            f"Cannot repair schedule '{name}': server has {n_seg} segments, local copy {len(schedule)}!")
+
+    mismatches = find_schedule_mismatches(socket, schedule, datastream=datastream)
+    if not mismatches:
+        return mismatches
+
+    if get_codec(socket) is codec_b:
+        transfer_schedule_chunks(socket, schedule, name=name,
+                                 datastream=datastream,
+                                 chunk_size=hash_chunk_size,
+                                 chunks=mismatches)
+        return mismatches
+
+    for i_chunk in mismatches:
+        for i in range(*chunk_bounds(i_chunk, len(schedule))):
+            confirm = get_codec(socket).decode_mpacket(
+                send_and_receive(
+                    get_codec(socket).encode_spacket(*(schedule[i])),
+                    socket,
+                    datastream=datastream
+                )
+            )
+            if int(confirm) != i:
+                raise AssertionError(f"Failed to transfer segment {i} of schedule '{name}'!")
+    return mismatches
 
 
 def verify_schedule(
@@ -839,30 +1646,18 @@ def verify_schedule(
     """Function to compare the integrity of a transferred schedule with the
     local copy.
 
-    It achieves this by casting the string into a bytearray by first casting
-    it to a Numpy array.
-    It does this by hashing the string of the complete schedule
-    locally, and requesting the server to send the hash from its side.
-    This function then outputs the boolean result of the comparison.
-
-    For large schedules (>1M segments), calculating the hash can take some
-    time, and for schedules of this size, verify_schedule() automatically
-    estimates some appropriate TCP interaction timeout, according to:
+    It does this by hashing the complete schedule locally, and requesting
+    the server to send the hash from its side. This function then outputs the
+    boolean result of the comparison, along with both hashes.
 
-    timeout_ms = 125% * ( computation_factor * 1,000 [ms] / 1,000,000 )
+    The server hashes the schedule as it arrives, so its hash is normally
+    available right away, even for large schedules. If the hashes do not
+    match, use repair_schedule() to resend only the parts that differ.
 
     If implementing this function with QTcpSocket, you can specify a re-usable
     QDataStream object to substantially increase performance.
     """
 
-    # For large schedules, estimate raised timeout:
-    if len(schedule) >= 1_000_000:
-        cf = 1.0
-        timeout_ms = int(1.25*(cf*1000/len(schedule)))
-        print("Large schedule detected. Dynamically set timeout to {:.3f} s".format(
-            timeout_ms))
-        print("If the verification fails due to timeout, please increase the timeout limit")
-
     hash_schedule_server = get_schedule_hash(
         socket,
         timeout_ms=timeout_ms,
@@ -930,9 +1725,9 @@ def get_play_info(
         - t_next (float)
     in that order.
     """
-    play_info = codec.decode_mpacket(
+    play_info = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("get_play_info"),
+            get_codec(socket).encode_xpacket("get_play_info"),
             socket,
             datastream=datastream
         )
@@ -945,6 +1740,104 @@ def get_play_info(
         int(n_steps), int(i_step), \
         float(t_play), float(t_current), float(t_next)
 
+def get_play_lateness(
+    socket,
+    reset: bool = False,
+    datastream: QDataStream = None):
+    """Requests the statistics of how late the server applied schedule steps
+    since playback was last started. Returns:
+        - n_steps (int): number of steps applied
+        - t_mean (float): mean lateness in [s]
+        - t_max (float): maximum lateness in [s]
+        - bin_edges (list of float): upper edges of the histogram bins in [s]
+        - counts (list of int): number of steps per bin, where the last bin
+            counts all steps later than the last edge
+    in that order. If `reset` is True, the statistics are reset afterwards.
+
+    If implementing this function with QTcpSocket, you can specify a re-usable
+    QDataStream object to substantially increase performance.
+    """
+    stats, edges, counts = get_codec(socket).decode_mpacket(
+        send_and_receive(
+            get_codec(socket).encode_xpacket("get_play_lateness", reset),
+            socket,
+            datastream=datastream
+        )
+    ).split(";")
+
+    n_steps, t_mean, t_max = stats.split(",")
+    return int(n_steps), float(t_mean), float(t_max), \
+        [float(edge) for edge in edges.split(",")], \
+        [int(count) for count in counts.split(",")]
+
+
+def get_play_plan(
+    socket,
+    datastream: QDataStream = None):
+    """Requests the results of the compilation of the schedule into DAC
+    voltages, which the server does when play mode is activated. Returns -1
+    if the schedule has not been compiled yet, otherwise:
+        - n_steps (int): number of steps in the schedule
+        - n_clamped_I (list of int): number of steps per axis at which the
+            current had to be clamped to the power supply limit
+        - n_clamped_dac (list of int): number of DAC voltages per axis that
+            had to be clamped to the DAC range
+        - slew_max (list of float): largest current slew rate per axis [A/s]
+        - n_violations (int): number of steps that exceed the slew rate limit
+        - i_first (int): first step that exceeds the slew rate limit, or -1
+    in that order.
+
+    If implementing this function with QTcpSocket, you can specify a re-usable
+    QDataStream object to substantially increase performance.
+    """
+    msg = get_codec(socket).decode_mpacket(
+        send_and_receive(
+            get_codec(socket).encode_xpacket("get_play_plan"),
+            socket,
+            datastream=datastream
+        )
+    )
+    if msg == "-1":
+        return -1
+
+    n_steps, n_clamped_I, n_clamped_dac, slew_max, violations = msg.split(";")
+    n_violations, i_first = violations.split(",")
+    return int(n_steps), \
+        [int(n) for n in n_clamped_I.split(",")], \
+        [int(n) for n in n_clamped_dac.split(",")], \
+        [float(s) for s in slew_max.split(",")], \
+        int(n_violations), int(i_first)
+
+
+def check_schedule_slew(
+    socket,
+    datastream: QDataStream = None):
+    """Has the server check the current schedule for segments at which the
+    coil currents would have to change faster than its slew rate limit
+    allows, i.e. the segments that would be clipped by the slew rate limiter
+    during playback. Best done right after uploading a schedule. Returns:
+        - n_violations (int): number of steps that exceed the slew rate limit
+        - slew_max (list of float): largest current slew rate per axis [A/s]
+        - violations (list of int): the first (at most 16) steps that exceed
+            the slew rate limit
+    in that order.
+
+    If implementing this function with QTcpSocket, you can specify a re-usable
+    QDataStream object to substantially increase performance.
+    """
+    n_violations, slew_max, violations = get_codec(socket).decode_mpacket(
+        send_and_receive(
+            get_codec(socket).encode_xpacket("check_schedule_slew"),
+            socket,
+            datastream=datastream
+        )
+    ).split(";")
+
+    return int(n_violations), \
+        [float(s) for s in slew_max.split(",")], \
+        [int(i) for i in violations.split(",") if i != ""]
+
+
 def set_play_mode(
     socket,
     play_mode: bool,
@@ -953,9 +1846,9 @@ def set_play_mode(
     it was set to False.
     """
 
-    confirm = codec.decode_mpacket(
+    confirm = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("set_play_mode", play_mode),
+            get_codec(socket).encode_xpacket("set_play_mode", play_mode),
             socket,
             datastream=datastream
         )
@@ -970,9 +1863,9 @@ def set_play(
     it was stopped.
     """
 
-    confirm = codec.decode_mpacket(
+    confirm = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("set_play", play),
+            get_codec(socket).encode_xpacket("set_play", play),
             socket,
             datastream=datastream
         )
@@ -987,9 +1880,9 @@ def set_play_looping(
     and 0 if it was set to one-shot.
     """
 
-    confirm = codec.decode_mpacket(
+    confirm = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("set_play_looping", play_looping),
+            get_codec(socket).encode_xpacket("set_play_looping", play_looping),
             socket,
             datastream=datastream
         )
@@ -1117,9 +2010,9 @@ def get_apply_Bc_period( # TODO EVALUATE
     If implementing this function with QTcpSocket, you can specify a re-usable
     QDataStream object to substantially increase performance.
     """
-    period_string = codec.decode_mpacket(
+    period_string = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("get_apply_Bc_period"),
+            get_codec(socket).encode_xpacket("get_apply_Bc_period"),
             socket,
             datastream=datastream
         )
@@ -1136,9 +2029,9 @@ def set_apply_Bc_period( # TODO EVALUATE
     If implementing this function with QTcpSocket, you can specify a re-usable
     QDataStream object to substantially increase performance.
     """
-    confirm = codec.decode_mpacket(
+    confirm = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("set_apply_Bc_period", period),
+            get_codec(socket).encode_xpacket("set_apply_Bc_period", period),
             socket,
             datastream=datastream
         )
@@ -1154,9 +2047,9 @@ def get_write_Bm_period( # TODO STALE
     If implementing this function with QTcpSocket, you can specify a re-usable
     QDataStream object to substantially increase performance.
     """
-    period_string = codec.decode_mpacket(
+    period_string = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("get_write_Bm_period"),
+            get_codec(socket).encode_xpacket("get_write_Bm_period"),
             socket,
             datastream=datastream
         )
@@ -1172,9 +2065,9 @@ def set_write_Bm_period( # TODO STALE
     If implementing this function with QTcpSocket, you can specify a re-usable
     QDataStream object to substantially increase performance.
     """
-    confirm = codec.decode_mpacket(
+    confirm = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("set_write_Bm_period", period),
+            get_codec(socket).encode_xpacket("set_write_Bm_period", period),
             socket,
             datastream=datastream
         )
@@ -1190,9 +2083,9 @@ def get_write_tmBmIm_period( # TODO EVALUATE
     If implementing this function with QTcpSocket, you can specify a re-usable
     QDataStream object to substantially increase performance.
     """
-    period_string = codec.decode_mpacket(
+    period_string = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("get_write_tmBmIm_period"),
+            get_codec(socket).encode_xpacket("get_write_tmBmIm_period"),
             socket,
             datastream=datastream
         )
@@ -1208,9 +2101,9 @@ def set_write_tmBmIm_period( # TODO STALE
     If implementing this function with QTcpSocket, you can specify a re-usable
     QDataStream object to substantially increase performance.
     """
-    confirm = codec.decode_mpacket(
+    confirm = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("set_write_tmBmIm_period", period),
+            get_codec(socket).encode_xpacket("set_write_tmBmIm_period", period),
             socket,
             datastream=datastream
         )
@@ -1230,9 +2123,9 @@ def set_Bm_sim( # TODO EVALUATE
     if len(Bm_sim) != 3:
         raise AssertionError(f"Bm_sim given is not length 3 but length {len(Bm_sim)}!")
 
-    confirm = codec.decode_mpacket(
+    confirm = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("set_Bm_sim",
+            get_codec(socket).encode_xpacket("set_Bm_sim",
                                  float(Bm_sim[0]),
                                  float(Bm_sim[1]),
                                  float(Bm_sim[2])),
@@ -1250,9 +2143,9 @@ def get_Bm_sim(socket, # TODO EVALUATE
     If implementing this function with QTcpSocket, you can specify a re-usable
     QDataStream object to substantially increase performance.
     """
-    Bm_sim = codec.decode_mpacket(
+    Bm_sim = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("get_Bm_sim"),
+            get_codec(socket).encode_xpacket("get_Bm_sim"),
             socket,
             datastream=datastream
         )
@@ -1269,9 +2162,9 @@ def get_serveropt_mutate_Bm(
     If implementing this function with QTcpSocket, you can specify a re-usable
     QDataStream object to substantially increase performance.
     """
-    serveropt_mutate_Bm = codec.decode_mpacket(
+    serveropt_mutate_Bm = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("get_serveropt_mutate_Bm"),
+            get_codec(socket).encode_xpacket("get_serveropt_mutate_Bm"),
             socket,
             datastream=datastream
         )
@@ -1289,9 +2182,9 @@ def set_serveropt_mutate_Bm(
     """
     # print(f"[DEBUG] get_serveropt_Bm_sim('{serveropt_Bm_sim}')")
 
-    confirm = codec.decode_mpacket(
+    confirm = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("set_serveropt_mutate_Bm", serveropt_mutate_Bm),
+            get_codec(socket).encode_xpacket("set_serveropt_mutate_Bm", serveropt_mutate_Bm),
             socket,
             datastream=datastream
         )
@@ -1302,9 +2195,9 @@ def get_serveropt_inject_Bm(
     socket,
     datastream: QDataStream = None):
     """Getter of serveropt_inject_Bm."""
-    serveropt_mutate_Bm = codec.decode_mpacket(
+    serveropt_mutate_Bm = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("get_serveropt_inject_Bm"),
+            get_codec(socket).encode_xpacket("get_serveropt_inject_Bm"),
             socket,
             datastream=datastream
         )
@@ -1317,9 +2210,9 @@ def set_serveropt_inject_Bm(
     datastream: QDataStream = None):
     """Setter of serveropt_inject_Bm."""
 
-    confirm = codec.decode_mpacket(
+    confirm = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("set_serveropt_inject_Bm", serveropt_inject_Bm),
+            get_codec(socket).encode_xpacket("set_serveropt_inject_Bm", serveropt_inject_Bm),
             socket,
             datastream=datastream
         )
@@ -1340,9 +2233,9 @@ def set_Br(
     if len(Br) != 3:
         raise AssertionError(f"Br given is not length 3 but length {len(Br)}!")
 
-    confirm = codec.decode_mpacket(
+    confirm = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("set_Br",
+            get_codec(socket).encode_xpacket("set_Br",
                                  float(Br[0]),
                                  float(Br[1]),
                                  float(Br[2])),
@@ -1360,9 +2253,9 @@ def get_Br(socket,
     If implementing this function with QTcpSocket, you can specify a re-usable
     QDataStream object to substantially increase performance.
     """
-    Br = codec.decode_mpacket(
+    Br = get_codec(socket).decode_mpacket(
         send_and_receive(
-            codec.encode_xpacket("get_Br"),
+            get_codec(socket).encode_xpacket("get_Br"),
             socket,
             datastream=datastream
         )
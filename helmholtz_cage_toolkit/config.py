@@ -23,7 +23,9 @@ config = {
 
     # ==== Data acquisition ====
     "telemetry_polling_rate": 30,   # [S/s] How frequently Bm is polled
-    "buffer_size": 64,              # Size of the buffer for acquired data
+    "telemetry_push": True,         # Let server push telemetry instead of polling
+    "telemetry_push_decimation": 1, # Server pushes every n-th tick
+    "history_duration": 1000,       # [s] How much acquired telemetry is kept (see Aqs)
 
     "CW_HHCPlots_refresh_rate": 30, # TODO DEPRECATED
     "CW_Cage3DPlot_refresh_rate": 30,
@@ -276,9 +278,14 @@ config = {
     },
 
     # ==== Orbital generator options ====
-    "eotc_order": 12,                       # Default order to use for the Equation of the Centre approximation
+    "eotc_order": 12,                       # Order of the Equation of the Centre series (only used by the "isochronal_eotc" spacing)
     "orbit_spacing": "isochronal",          # Default orbit point spacing
 
+    # IGRF lookup grids, used when "igrf_mode" is "grid" (see igrf_grid.py)
+    "igrf_grid_directory": "igrf_grids",    # Directory in which the grids are stored
+    "igrf_grid_resolution": [2., 2., 100.], # Grid spacing in [deg lat, deg lon, km alt]
+    "igrf_grid_alt_range": [0., 4000.],     # Altitudes covered by the grid [km]
+
     # ==== Orbital_default_parameters ====
     "orbital_default_generation_parameters": {
         # Orbital elements
@@ -300,6 +307,7 @@ config = {
         # Various
         "earth_zero_datum": 0,  # [deg]
         "date0": 2024.0,  # [decimal date]
+        "igrf_mode": "exact",  # [-] "exact" or "grid" (see igrf_grid.py)
 
         # Simulation settings
         "n_orbit_subs": 512,  # [-] <positive int>
@@ -338,6 +346,11 @@ config = {
         "noise_factorZ": 0.0,
     },
 
+    # ==== Schedule cache (see schedule_cache.py) ====
+    "schedule_cache_directory": "schedule_cache",   # Directory of the on-disk tier (None to disable)
+    "schedule_cache_size": 16,              # Number of schedules kept in memory
+    "schedule_cache_disk_size": 64,         # Number of schedules kept on disk
+
     # ==== default_interpolation_parameters ====
     "default_interpolation_parameters": {
         "function": "none",
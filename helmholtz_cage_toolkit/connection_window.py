@@ -331,6 +331,9 @@ class ConnectionWindow(QWidget):
         # self.socket.connectToHost(self.server_address, self.server_port)
         address = self.le_address.text()
         port = int(self.le_port.text())
+
+        # Start the new connection without state left over from the last one
+        cf.reset_socket_state(self.socket)
         self.socket.connectToHost(address, port)
         # self.socket.connectToHost("127.0.0.1", 7777)
 
@@ -427,6 +430,9 @@ class ConnectionWindow(QWidget):
         print("[DEBUG] SIGNAL: socket.disconnected")
         self.datapool.socket_connected = False
 
+        # The socket is reused for the next connection, so forget its state
+        cf.reset_socket_state(self.socket)
+
         # self.datapool.disable_Bm_acquisition()
         self.datapool.disable_timer_get_telemetry()
 
@@ -524,7 +530,11 @@ class ConnectionWindow(QWidget):
         self.label_socket_uptime.setText(f"{int(self.socket_uptime)} s")
 
     def update_general_labels(self):
-        hhc_play_info = cf.get_play_info(self.socket, self.ds)
+        # Both requests are sent in one go, to save a round trip per refresh
+        hhc_play_info, hhc_schedule_info = cf.batch(
+            self.socket, datastream=self.ds
+        ).get_play_info().get_schedule_info().run()
+
         if hhc_play_info[0] != self.hhc_play_info[0]:
             if hhc_play_info[0] is True:
                 self.label_play_mode.setText("play mode")
@@ -538,8 +548,6 @@ class ConnectionWindow(QWidget):
         self.hhc_play_info = hhc_play_info
 
 
-        hhc_schedule_info = cf.get_schedule_info(
-            self.socket, datastream=self.ds)
         if hhc_schedule_info != self.hhc_schedule_info:
             self.label_schedule_name.setText(hhc_schedule_info[0])
             self.label_schedule_length.setText(str(hhc_schedule_info[1]))
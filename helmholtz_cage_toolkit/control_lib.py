@@ -5,6 +5,8 @@ import adi
 import numpy as np
 from time import time, sleep
 
+from helmholtz_cage_toolkit.server.control_lib import adc_buffer_setup, adc_buffer_read
+
 
 # ===== InterfaceBoard class ============
 
@@ -24,6 +26,11 @@ class InterfaceBoard:
         self.dac_channels = self.setup_dac_channels()
         self.log(1, "InterfaceBoard: Initialized DAC channels")
 
+        # Buffered ADC acquisition, see setup_adc_buffer()
+        self.adc_buffer_channel_ids = None
+        self.adc_buffer_rows = None
+        self.adc_buffer_sample_rate = None
+
         # self.log(0, f"[DEBUG] self.dac_channels: {self.dac_channels}")
 
     # ========== ADC functions ==========
@@ -85,6 +92,44 @@ class InterfaceBoard:
         return measurement, timestamp
 
 
+    def setup_adc_buffer(self, channel_ids, n_samples: int, sample_rate):
+        """
+        Configures buffered acquisition, such that every adc_read_buffer()
+        returns a block of <n_samples> samples of each of the channels
+        <channel_ids>, sampled at <sample_rate> [S/s] per channel, in a single
+        transaction with the board. This is much faster than adc_read_multi(),
+        which does a separate transaction for every channel and sample.
+
+        The AD7124-8 cycles through the enabled channels with its sequencer,
+        so its output data rate is set to <sample_rate> times the number of
+        channels. See adc_buffer_setup() in server/control_lib.py.
+        """
+        self.log(2, f"InterfaceBoard: Setting up ADC buffer of {n_samples} samples for channels {channel_ids} at {sample_rate} S/s...")
+        self.adc_buffer_rows = adc_buffer_setup(
+            self.board, self.adc_channels, channel_ids, n_samples, sample_rate)
+        self.adc_buffer_channel_ids = list(channel_ids)
+        self.adc_buffer_sample_rate = sample_rate
+
+
+    def adc_read_buffer(self, invert=False):
+        """
+        Reads one block of samples of the channels configured with
+        setup_adc_buffer(), and returns the voltages as an (n_channels,
+        n_samples) array, oldest sample first, along with an (n_samples,)
+        array of the unix timestamps of the samples.
+
+        The ADC does not timestamp its samples, so the timestamps are
+        reconstructed from the moment that the block was received and the
+        sample rate, assuming that the last sample was taken just before that.
+        """
+        self.log(4, f"InterfaceBoard: Reading buffer of ADC channels {self.adc_buffer_channel_ids}...")
+        volts, timestamps = adc_buffer_read(
+            self.board, self.adc_buffer_rows, self.adc_buffer_sample_rate)
+        if invert:
+            volts = -volts
+        return volts, timestamps
+
+
     # ========== DAC functions ==========
     def setup_dac_channels(self):
         """
@@ -333,11 +378,37 @@ class Magnetometer:
 
         self.log(4, f"Performing measurement (convert to B: {convert_to_b})")
         if convert_to_b:
-            return [self.tf_vm_bm(vm) for vm in m[0]], m[1]
+            return self.tf_vm_bm(np.array(m[0])).tolist(), m[1]
         else:
             return m
 
 
+    def read_buffer(self, block=None, convert_to_b=True):
+        """
+        Reads a block of samples of the magnetometer through the buffered
+        acquisition of the interface board, and returns them as a (3,
+        n_samples) array, along with the (n_samples,) unix timestamps.
+
+        If the interface board buffer is also set up for other channels (e.g.
+        to sample Im and V_board in the same transaction), the block that
+        InterfaceBoard.adc_read_buffer() returned can be passed as <block>,
+        and the magnetometer rows are taken from it instead of reading again.
+        """
+        if block is None:
+            block = self.ib.adc_read_buffer()
+        volts, timestamps = block
+
+        rows = [self.ib.adc_buffer_channel_ids.index(channel_id)
+                for channel_id in self.channelids]
+        vm = -volts[rows]
+
+        self.log(4, f"Performing buffered measurement of {vm.shape[1]} samples (convert to B: {convert_to_b})")
+        if convert_to_b:
+            return self.tf_vm_bm(vm), timestamps
+        else:
+            return vm, timestamps
+
+
     def tf_vm_bm(self, vm):
         """Converts milligaussmeter voltage readings into uT"""
         return vm*100
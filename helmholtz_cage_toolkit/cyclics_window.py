@@ -21,6 +21,7 @@ from helmholtz_cage_toolkit import *
 
 from helmholtz_cage_toolkit.schedule_player import SchedulePlayer, PlayerControls
 from helmholtz_cage_toolkit.utilities import tB_to_schedule
+from helmholtz_cage_toolkit.schedule_cache import schedule_key
 # from helmholtz_cage_toolkit.hhcplot import HHCPlot, HHCPlotArrow
 from helmholtz_cage_toolkit.generator_cyclics import (
     generator_cyclics_single,
@@ -381,17 +382,33 @@ class CyclicsInput(QGroupBox):
         4. Do interpolation()
         6. Flood to datapool.schedule, datapool.generation_parameters
         7. Schedule changed -> self.datapool.refresh()
+
+        Steps 3 and 4 are skipped when the same schedule was generated
+        before, in which case t and B are taken from datapool.schedule_cache
+        instead. Schedules with noise are always generated anew.
         """
         # print("[DEBUG] generate()")
         generation_parameters = self.slurp_cyclics()
-        t, B = generator_cyclics(generation_parameters)
-
         interpolation_parameters = self.slurp_interpolation_parameters()
 
-        t, B = interpolate(t,
-                           B,
-                           interpolation_parameters["factor"],
-                           interpolation_parameters["function"])
+        deterministic = all([generation_parameters[f"noise_factor{axis}"] == 0.
+                             for axis in ("X", "Y", "Z")])
+        key = schedule_key("generator_cyclics", generation_parameters,
+                           interpolation_parameters)
+        cached = self.datapool.schedule_cache.get(key) if deterministic else None
+
+        if cached is None:
+            t, B = generator_cyclics(generation_parameters)
+
+            t, B = interpolate(t,
+                               B,
+                               interpolation_parameters["factor"],
+                               interpolation_parameters["function"])
+
+            if deterministic:
+                self.datapool.schedule_cache.put(key, t, B)
+        else:
+            t, B, _ = cached
 
         self.datapool.schedule = tB_to_schedule(t, B)
         self.datapool.generation_parameters_cyclics = generation_parameters
@@ -5,6 +5,8 @@ from time import time
 from helmholtz_cage_toolkit import *
 from helmholtz_cage_toolkit.orbit_visualizer import Orbit, Earth
 import helmholtz_cage_toolkit.client_functions as cf
+from helmholtz_cage_toolkit.ringbuffer import RingBuffer
+from helmholtz_cage_toolkit.schedule_cache import ScheduleCache
 # from file_handling import load_file, save_file, NewFileDialog
 import scc.scc4 as codec
 from helmholtz_cage_toolkit.server.server_config import server_config
@@ -44,6 +46,7 @@ class DataPool:
         self.ds = None
 
         self.socket_connected = False
+        self.telemetry_subscribed = False
 
 
         self.t_playstart = 0.
@@ -52,8 +55,10 @@ class DataPool:
         # Command
         self.play_mode = "manual"
 
-        # Data buffers
-        aqs = Aqs(self.config["buffer_size"])
+        # Data buffers, with room for history_duration seconds of telemetry
+        # at the highest rate at which it can arrive
+        self.aqs = Aqs(int(ceil(
+            self.config["history_duration"] * self.config["telemetry_polling_rate"])))
 
         self.tm = 0.                    # UNIX time of most recent Bm, Im measurement
         self.Bm = [0., 0., 0.]          # B vector measured by hardware
@@ -279,6 +284,13 @@ class DataPool:
 
         For this reason, this also checks self.socket_connected as a
         low-overhead (<1 us) method to handle this edge case.
+
+        When subscribed to pushed telemetry (see enable_timer_get_telemetry()),
+        no request is sent. Instead, the samples the server pushed since the
+        last call are read, and the most recent one is stored.
+
+        Either way, every received sample is also written to the history
+        buffers in self.aqs.
         """
         # print("[DEBUG] do_get_telemetry()")
         # t0 = time()
@@ -291,10 +303,17 @@ class DataPool:
 
 
         # t0 = time()  # [TIMING]
-        if self.socket_connected:
+        if self.socket_connected and self.telemetry_subscribed:
+            samples = cf.receive_telemetry(self.socket, self.ds)
+            for sample in samples:
+                self.aqs.input(*sample)
+            if samples:
+                self.tm, self.i_step, self.Im, self.Bm, self.Bc = samples[-1]
+        elif self.socket_connected:
             # t1 = time()  # [TIMING]
             self.tm, self.i_step, self.Im, self.Bm, self.Bc = cf.get_telemetry(
                 self.socket, self.ds)
+            self.aqs.input(self.tm, self.i_step, self.Im, self.Bm, self.Bc)
         else:
             # t1 = time()  # [TIMING]
             self.tm = -1.
@@ -308,6 +327,14 @@ class DataPool:
 
 
     def enable_timer_get_telemetry(self):
+        if self.config["telemetry_push"] and self.socket_connected:
+            self.telemetry_subscribed = cf.subscribe_telemetry(
+                self.socket,
+                self.config["telemetry_polling_rate"],
+                self.config["telemetry_push_decimation"],
+                datastream=self.ds
+            ) == 1
+
         self.timer_get_telemetry.start(
             int(1000 / self.config["telemetry_polling_rate"])
         )
@@ -316,6 +343,11 @@ class DataPool:
 
     def disable_timer_get_telemetry(self):
         self.timer_get_telemetry.stop()
+
+        if self.telemetry_subscribed:
+            cf.unsubscribe_telemetry(self.socket, datastream=self.ds,
+                                     notify_server=self.socket_connected)
+            self.telemetry_subscribed = False
         # self.timer_get_Bm.stop()
 
     def get_config(self):
@@ -332,6 +364,12 @@ class DataPool:
         self.generation_parameters_orbital = {}
         self.interpolation_parameters = {}
 
+        # Previously generated schedules (see schedule_cache.py)
+        self.schedule_cache = ScheduleCache(
+            self.config["schedule_cache_directory"],
+            max_entries=self.config["schedule_cache_size"],
+            max_disk_entries=self.config["schedule_cache_disk_size"])
+
     def init_simdata(self): #TODO UPDATE
         self.simdata = None
 
@@ -502,38 +540,38 @@ class DataPool:
 class Aqs:
     """
     Buffer class for the data coming from the server device in the form of a
-    t-packet.
+    t-packet. Every buffer is a RingBuffer (see ringbuffer.py), in which entry
+    0 is the most recent sample, and which is stamped with the measurement
+    time tm of each sample, so that the history can be looked up by time.
     """
     def __init__(self, buffer_size):
         # UNIX time of most recent Bm, Im measurement
-        self.tm = zeros(buffer_size).tolist()
+        self.tm = RingBuffer(buffer_size)
 
         # B vector measured by hardware (size: <buffer_size> by 3)
-        self.Bm = zeros((buffer_size, 3)).tolist()
+        self.Bm = RingBuffer(buffer_size, 3)
 
         # B vector as commanded by user
-        self.Bc = zeros((buffer_size, 3)).tolist()
+        self.Bc = RingBuffer(buffer_size, 3)
 
         # Coil current as measured by hardware
-        self.Im = zeros((buffer_size, 3)).tolist()
+        self.Im = RingBuffer(buffer_size, 3)
 
         # Error between Bc and Bm
-        self.E = zeros((buffer_size, 3)).tolist()
+        self.E = RingBuffer(buffer_size, 3)
 
         # Index of the schedule step that was commanded
-        self.i_step = zeros(buffer_size, int).tolist()
+        self.i_step = RingBuffer(buffer_size, dtype=int)
 
     def input(self, tm, i_step, Im: list, Bm: list, Bc: list):
-        self.write_buffer(self.tm, tm) # noqa
-        self.write_buffer(self.i_step, i_step) # noqa
-        self.write_buffer(self.Im, Im) # noqa
-        self.write_buffer(self.Bm, Bm) # noqa
-        self.write_buffer(self.Bc, Bc) # noqa
+        self.write_buffer(self.tm, tm, tm)
+        self.write_buffer(self.i_step, i_step, tm)
+        self.write_buffer(self.Im, Im, tm)
+        self.write_buffer(self.Bm, Bm, tm)
+        self.write_buffer(self.Bc, Bc, tm)
 
-        E_new = [0.0, 0.0, 0.0]
-        for i in range(3):
-            E_new[i] = Bc[i] - Bm[i]
-        self.write_buffer(self.E, E_new) # noqa
+        E_new = [Bc[0] - Bm[0], Bc[1] - Bm[1], Bc[2] - Bm[2]]
+        self.write_buffer(self.E, E_new, tm)
 
 
     def input_tpacket(self, tpacket):
@@ -541,8 +579,7 @@ class Aqs:
         self.input(tm, i_step, Im, Bm, Bc)
 
 
-    def write_buffer(self, buffer, value):
-        # Light first-in-last-out pop-and-append function
-        buffer.insert(0, value)
-        buffer.pop()
+    def write_buffer(self, buffer, value, t=None):
+        # Light first-in-last-out write, O(1) regardless of buffer size
+        buffer.append(value, t)
         return buffer
@@ -21,6 +21,12 @@ class InterfaceBoard:
     def adc_read_multi(self, channel_ids, invert=False):
         pass
 
+    def setup_adc_buffer(self, channel_ids, n_samples: int, sample_rate):
+        pass
+
+    def adc_read_buffer(self, invert=False):
+        pass
+
     # ========== DAC functions ==========
     def setup_dac_channels(self):
         pass
@@ -84,6 +90,9 @@ class Magnetometer:
     def read(self, convert_to_b=True):
         pass
 
+    def read_buffer(self, block=None, convert_to_b=True):
+        pass
+
     def tf_vm_bm(self, vm):
         """Converts milligaussmeter voltage readings into uT"""
         return vm * 100
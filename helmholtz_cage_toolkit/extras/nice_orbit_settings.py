@@ -29,6 +29,7 @@ a = {
         # Various
         "earth_zero_datum": 0,  # [deg]
         "date0": 2024.0,  # [decimal date]
+        "igrf_mode": "exact",  # [-] "exact" or "grid"
 
         # Simulation settings
         "n_orbit_subs": 512,  # [-] <positive int>
@@ -59,6 +60,7 @@ a = {
         # Various
         "earth_zero_datum": 0,  # [deg]
         "date0": 2024.0,  # [decimal date]
+        "igrf_mode": "exact",  # [-] "exact" or "grid"
 
         # Simulation settings
         "n_orbit_subs": 512,  # [-] <positive int>
@@ -89,6 +91,7 @@ a = {
         # Various
         "earth_zero_datum": 0,  # [deg]
         "date0": 2024.0,  # [decimal date]
+        "igrf_mode": "exact",  # [-] "exact" or "grid"
 
         # Simulation settings
         "n_orbit_subs": 512,  # [-] <positive int>
@@ -119,6 +122,7 @@ a = {
         # Various
         "earth_zero_datum": 0,  # [deg]
         "date0": 2024.0,  # [decimal date]
+        "igrf_mode": "exact",  # [-] "exact" or "grid"
 
         # Simulation settings
         "n_orbit_subs": 512,  # [-] <positive int>
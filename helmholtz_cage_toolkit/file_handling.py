@@ -67,6 +67,31 @@ def write_bsch_file(filename, schedule):
     return 0
 
 
+def write_bsch_chunks(filename, chunks, n: int):
+    """Streaming counterpart of write_bsch_file(), which appends the segments
+    of a schedule that arrives as a stream of (t, B) chunks, such as those of
+    generator_cyclics_chunks() or generator_orbital2_chunks(), to the file as
+    they arrive, without ever holding the whole schedule. `n` is the number of
+    segments of the whole schedule, which is part of every segment. The values
+    are rounded as in generate_schedule_segments().
+
+    Returns the number of segments written.
+    """
+    i = 0
+    with open(filename, 'a') as output_file:
+        for t, B in chunks:
+            lines = [f"{i+j},{n},{ti},{bx},{by},{bz}\n" for j, (ti, bx, by, bz) in enumerate(zip(
+                t.round(6).tolist(),
+                B[0].round(3).tolist(),
+                B[1].round(3).tolist(),
+                B[2].round(3).tolist()))]
+            output_file.write("".join(lines))
+            i += len(t)
+    if i != n:
+        print(f"[WARNING] write_bsch_chunks(): Wrote {i} segments, but the schedule should have {n}!")
+    return i
+
+
 def initialize_bsch_file(filename, header, overwrite=False):
     # Test if file already exists
     try:
@@ -1,6 +1,9 @@
+from scipy.interpolate import make_interp_spline
 from scipy.signal import sawtooth, square
+from numpy import searchsorted
 
 from helmholtz_cage_toolkit import *
+from helmholtz_cage_toolkit.schedule_chunks import rechunk
 
 def interpolate(t,
                 B,
@@ -31,8 +34,14 @@ def generator_cyclics_single(x,
                              phase,
                              offset,
                              fbase_noise: str = "gaussian",
-                             noise_factor: float = 0.0
+                             noise_factor: float = 0.0,
+                             span: float = None
                              ):
+    # `span` is the width of the whole time set, which the "linear" base
+    # function needs when `x` is only a chunk of it (see generator_cyclics_chunks())
+    if span is None:
+        span = x[-1]-x[0]
+
     # Noise generation
     if noise_factor != 0.0:
         if fbase_noise == "gaussian":
@@ -48,7 +57,7 @@ def generator_cyclics_single(x,
     if fbase == "constant":
         return ones(len(x))*offset + fnoise
     elif fbase == "linear":
-        return amplitude/(x[-1]-x[0]) * x + offset + fnoise
+        return amplitude/span * x + offset + fnoise
     elif fbase == "sine":
         return amplitude * sin(2 * pi * frequency * x + phase) + offset + fnoise
     elif fbase == "sawtooth":
@@ -117,6 +126,201 @@ def generator_cyclics(generation_parameters):
     return t, array(B)
 
 
+def interpolated_length(n, interpolation_parameters=None):
+    """Returns the length of a schedule of `n` points after interpolation
+    with `interpolation_parameters`."""
+    if interpolation_parameters is not None \
+            and interpolation_parameters["function"] in ("linear", "spline"):
+        return n * interpolation_parameters["factor"]
+    return n
+
+
+def generator_cyclics_extent(generation_parameters, interpolation_parameters=None):
+    """Returns the number of points, and the first and last value of t, of
+    the schedule that generator_cyclics() (followed by interpolation with
+    `interpolation_parameters`, if given) would make, without generating it.
+    """
+    g = generation_parameters  # Shorthand
+
+    n = int(g["resolution"] * g["duration"])
+    t_last = (int(g["duration"]) if n > 1 else 0.) + g["predelay"]
+    if g["predelay"] > 0.0:
+        n += 2
+    if g["postdelay"] > 0.0:
+        n += 2
+        t_last += g["postdelay"]
+
+    return interpolated_length(n, interpolation_parameters), 0., float(t_last)
+
+
+def _n_ready(limit, step, start, j, m, inclusive):
+    """Returns the number of points of the interpolated set, which are
+    j*step + start for j < m, that lie below `limit` (or at it, when
+    `inclusive`), given that the first `j` of them do."""
+    if inclusive:
+        def ready(j): return j*step + start <= limit
+    else:
+        def ready(j): return j*step + start < limit
+    if step > 0:
+        j = max(j, min(int((limit - start) / step), m))
+    while j < m and ready(j):
+        j += 1
+    while j > 0 and not ready(j-1):
+        j -= 1
+    return j
+
+
+def interpolate_chunks(chunks, n: int, t_first: float, t_last: float,
+                       factor: int, type: str, overlap: int = 16):
+    """Streaming counterpart of interpolate() in generator_orbital.py, which
+    interpolates a schedule of `n` points from t_first to t_last that arrives
+    as a stream of (t, B) chunks, and yields the interpolated schedule as a
+    stream of chunks as well. Only a few chunks are held at a time, rather
+    than the whole schedule.
+
+    The interpolated points are the same as those of interpolate(): n*factor
+    points evenly spaced from t_first to t_last. Every interpolated point is
+    made as soon as the source points around it have arrived:
+     - 'linear' needs only the source points on either side of it, so the
+        last source point of every chunk is carried over to the next one, and
+        the result is exactly that of interpolate().
+     - 'spline' fits a natural cubic spline through the buffered source
+        points, which include `overlap` points beyond both ends of the range
+        that is being interpolated. The influence of a source point on the
+        spline decays by a factor of about 3.7 per point, so with the default
+        overlap of 16 the result differs from fitting one spline through the
+        whole schedule by less than 1E-9 times the size of the data.
+     - 'none' yields the chunks untouched.
+
+    't' of every chunk must be a 1D array, and 'B' an array of shape (3, k).
+    """
+    if factor < 1:
+        raise ValueError(f"Input 'factor' must be a positive, non-zero integer (given {factor})!")
+
+    m = n * factor
+    if type not in ("linear", "spline") or m < 2:
+        if type not in ("linear", "spline", "none"):
+            print(f"interpolate_chunks() was given an unknown type '{type}'; No interpolation was performed.")
+        yield from chunks
+        return
+
+    step_t = (t_last - t_first) / (m - 1)   # As in linspace(t_first, t_last, m)
+    step_r = (n - 1) / (m - 1)              # As in linspace(0, n - 1, m)
+
+    t_buf = empty(0)            # Buffered source points
+    B_buf = empty((3, 0))
+    i_buf = 0                   # Index of the first buffered point in the source
+    n_in = 0                    # Number of source points received
+    j = 0                       # Index of the next interpolated point
+
+    chunks = iter(chunks)
+    while j < m:
+        chunk = next(chunks, None)
+        if chunk is None:
+            if n_in != n:
+                raise ValueError(f"interpolate_chunks() expected {n} source points, but received {n_in}!")
+        else:
+            t_buf = concatenate((t_buf, chunk[0]))
+            B_buf = concatenate((B_buf, chunk[1]), axis=1)
+            n_in += len(chunk[0])
+            if n_in > n:
+                raise ValueError(f"interpolate_chunks() expected {n} source points, but received more!")
+
+        # Find the points that can be interpolated with the buffered points
+        if n_in == n:
+            j_end = m
+        elif type == "linear":
+            j_end = min(_n_ready(t_buf[-1], step_t, t_first, j, m, False), m - 1)
+        else:
+            j_end = min(_n_ready(i_buf + len(t_buf) - 1 - overlap, step_r, 0., j, m, True), m - 1)
+        if j_end <= j:
+            continue
+
+        t_interp = arange(j, j_end) * step_t + t_first
+        if j_end == m:
+            t_interp[-1] = t_last
+        if type == "linear":
+            B_interp = array([interp(t_interp, t_buf, B_buf[i]) for i in range(3)])
+        else:
+            r_interp = arange(j, j_end) * step_r
+            if j_end == m:
+                r_interp[-1] = n - 1
+            spline = make_interp_spline(arange(i_buf, i_buf + len(t_buf)), B_buf,
+                                        bc_type="natural", axis=1)
+            B_interp = spline(r_interp)
+        yield t_interp, B_interp
+        j = j_end
+
+        # Drop the source points that are no longer needed
+        if type == "linear":
+            i_keep = max(int(searchsorted(t_buf, j*step_t + t_first, side="right")) - 1, 0)
+        else:
+            i_keep = min(max(int(j*step_r) - overlap - i_buf, 0), len(t_buf))
+        t_buf, B_buf = t_buf[i_keep:], B_buf[:, i_keep:]
+        i_buf += i_keep
+
+
+def generator_cyclics_chunks(generation_parameters, interpolation_parameters=None,
+                             chunk_size: int = 65536, overlap: int = 16):
+    """Chunked variant of generator_cyclics(), for schedules that are too
+    long to hold in memory at once. Returns a generator that yields the
+    schedule as (t, B) chunks of `chunk_size` points (the last one may be
+    shorter), with B of shape (3, chunk_size). If `interpolation_parameters`
+    are given, the schedule is interpolated chunk by chunk as well, using
+    interpolate_chunks(), with the given `overlap`.
+
+    Use generator_cyclics_extent() to get the length and duration of the
+    schedule beforehand, for instance to allocate it on the server.
+
+    Apart from the noise, which is drawn chunk by chunk, the chunks put
+    together are the same as the output of generator_cyclics() (followed by
+    linear interpolation).
+    """
+    g = generation_parameters  # Shorthand
+    if chunk_size < 1:
+        raise ValueError(f"generator_cyclics_chunks(): chunk_size must be positive (given {chunk_size})!")
+
+    n, t_first, t_last = generator_cyclics_extent(g)
+    chunks = _generator_cyclics_chunks(g, chunk_size)
+    if interpolation_parameters is not None:
+        chunks = interpolate_chunks(chunks, n, t_first, t_last,
+                                    interpolation_parameters["factor"],
+                                    interpolation_parameters["function"],
+                                    overlap=overlap)
+    return rechunk(chunks, chunk_size)
+
+
+def _generator_cyclics_chunks(g, chunk_size):
+    duration = int(g["duration"])
+    n = int(g["resolution"] * g["duration"])
+    step = duration / (n - 1) if n > 1 else 0.   # As in linspace(0, duration, n)
+    predelay, postdelay = g["predelay"], g["postdelay"]
+
+    if predelay > 0.0:
+        yield array([0., predelay]), zeros((3, 2))
+
+    for i0 in range(0, n, chunk_size):
+        i1 = min(i0 + chunk_size, n)
+        t = arange(i0, i1) * step
+        if i1 == n and n > 1:
+            t[-1] = duration
+        B = array([generator_cyclics_single(
+            t,
+            g[f"fbase{axis}"],
+            g[f"amplitude{axis}"],
+            g[f"frequency{axis}"],
+            g[f"phase{axis}"]*-pi,
+            g[f"offset{axis}"],
+            fbase_noise=g[f"fbase_noise{axis}"],
+            noise_factor=g[f"noise_factor{axis}"],
+            span=duration) for axis in ("X", "Y", "Z")])
+        yield t + predelay, B
+
+    if postdelay > 0.0:
+        t_end = (duration if n > 1 else 0.) + predelay
+        yield array([t_end, t_end + postdelay]), zeros((3, 2))
+
+
 # cyclics_generation_parameters = {
 #     "duration": 10,
 #     "resolution": 1,
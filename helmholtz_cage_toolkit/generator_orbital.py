@@ -1,19 +1,29 @@
 # from scipy.signal import sawtooth, square
-from pyIGRF import igrf_value
 from scipy.interpolate import make_interp_spline
+from numpy import einsum, stack
 
 from time import time  # todo remove
 
+from helmholtz_cage_toolkit.generator_cyclics import interpolate_chunks, interpolated_length
+from helmholtz_cage_toolkit.igrf import igrf_xyz
+from helmholtz_cage_toolkit.schedule_chunks import rechunk
+from helmholtz_cage_toolkit.igrf_grid import get_igrf_grid
+
 from helmholtz_cage_toolkit import *
 # from helmholtz_cage_toolkit
 from helmholtz_cage_toolkit.orbit import Orbit, Earth
 from helmholtz_cage_toolkit.utilities import cross3d
 from helmholtz_cage_toolkit.pg3d import (
     uv3d,
+    uv3d_batch,
     wrap,
+    wrap_batch,
     conv_ECI_geoc,
+    conv_ECI_geoc_batch,
     R_SI_B,
+    R_SI_B_batch,
     R_NED_ECI,
+    R_ECI_NED_batch,
 )
 
 
@@ -205,6 +215,21 @@ interpolation_parameters = {
 #         v_xyz, ma, ta, gamma, huv
 
 
+def orbit_from_parameters(generation_parameters):
+    """Returns the Orbit described by the orbital elements in the
+    `generation_parameters` of generator_orbital2()."""
+    g = generation_parameters  # Shorthand
+    return Orbit(
+        Earth(),
+        g["orbit_pericentre_altitude"],
+        g["orbit_eccentricity"],
+        g["orbit_inclination"],
+        g["orbit_RAAN"],
+        g["orbit_argp"],
+        g["orbit_ma0"],
+    )
+
+
 def generator_orbital2(generation_parameters, datapool, timing=False):
     if timing:
         t0 = time()
@@ -231,6 +256,9 @@ def generator_orbital2(generation_parameters, datapool, timing=False):
 
     earth_zero_datum = g["earth_zero_datum"]
     date0 = g["date0"]
+    igrf_mode = g.get("igrf_mode", "exact")     # Absent in schedules saved before it existed
+    if igrf_mode not in ("exact", "grid"):
+        raise ValueError(f"generator_orbital2(): igrf_mode must be 'exact' or 'grid' (given: '{igrf_mode}')!")
 
     n_orbit_subs = g["n_orbit_subs"]
     n_step = g["n_step"]
@@ -256,15 +284,7 @@ def generator_orbital2(generation_parameters, datapool, timing=False):
     # ==== PREAMBLE
 
     # Update the Orbit() class with the new orbital elements
-    data.orbit = Orbit(
-        Earth(),
-        orbit_pericentre_altitude,
-        orbit_eccentricity,
-        orbit_inclination,
-        orbit_RAAN,
-        orbit_argp,
-        orbit_ma0,
-    )
+    data.orbit = orbit_from_parameters(g)
 
     if timing:
         t3 = time()
@@ -301,109 +321,87 @@ def generator_orbital2(generation_parameters, datapool, timing=False):
     if timing:
         t5 = time()
 
+    # All orbit-dependent quantities only depend on the orbit point, which is
+    # i_step modulo n_orbit_subs. They are computed once per orbit point, and
+    # then indexed with isub for every step.
+    isub = simdata["i_step"] % n_orbit_subs
+
     # R_ECI_SI
-    for isub in range(n_orbit_subs):
-        simdata["Rt_ECI_SI"][isub, :, :] = vstack([
-            uv3d(simdata["v_xyz"][isub]),  # X-component points along velocity vector
-            simdata["huv"],  # Y-component points at angular momentum vector
-            cross3d(uv3d(simdata["v_xyz"][isub]),
-                    simdata["huv"])])  # Z-component points along the cross product of the two
+    uv_xyz = uv3d_batch(simdata["v_xyz"])
+    simdata["Rt_ECI_SI"][:, :, :] = stack((
+        uv_xyz,  # X-component points along velocity vector
+        tile(simdata["huv"], (n_orbit_subs, 1)),  # Y-component points at angular momentum vector
+        cross3d(uv_xyz.T, simdata["huv"]).T,      # Z-component points along the cross product of the two
+    ), axis=1)
 
     if timing:
         t6 = time()
-        t7a = 0
-        t7b = 0
-        t7c = 0
-        t7d = 0
-        t7e = 0
-        t7f = 0
-        t7g = 0
-        t7 = time()
-
-    for i in range(n_step):
-
-        # Note: 31_556_952 is number of seconds in a Gregorian calendar year
-        simdata["date"][i] = date0 + dt * i / 31_556_952  # decimal date at i_step
-
-        if timing:
-            t7a += time()-t7
-            t7 = time()
 
-        rotangles = array((  # [deg], [deg/s] -> [rad(/dt)]
-            pi/180 * (angle_body_x_0 + i * rate_body_x * dt),   # phi_B, angle around X
-            pi/180 * (angle_body_y_0 + i * rate_body_y * dt),   # theta_B, angle around Y
-            pi/180 * (angle_body_z_0 + i * rate_body_z * dt)    # psi_B, angle around Z
-        ))
-
-        if timing:
-            t7b += time()-t7
-            t7 = time()
-
-        # R_SI_B
-        simdata["Rt_SI_B"][i, :, :] = R_SI_B(rotangles)
-
-        if timing:
-            t7c += time()-t7
-            t7 = time()
+    # Note: 31_556_952 is number of seconds in a Gregorian calendar year
+    simdata["date"][:] = date0 + dt * simdata["i_step"] / 31_556_952  # decimal date at i_step
 
-        # Radius/altitude, longitude and latitude
-        rlli = conv_ECI_geoc(simdata["xyz"][divmod(i, n_orbit_subs)[1], :])  # |ECI
+    rotangles = column_stack((  # [deg], [deg/s] -> [rad(/dt)]
+        pi/180 * (angle_body_x_0 + simdata["i_step"] * rate_body_x * dt),   # phi_B, angle around X
+        pi/180 * (angle_body_y_0 + simdata["i_step"] * rate_body_y * dt),   # theta_B, angle around Y
+        pi/180 * (angle_body_z_0 + simdata["i_step"] * rate_body_z * dt)    # psi_B, angle around Z
+    ))
 
-        if timing:
-            t7d += time()-t7
-            t7 = time()
+    # R_SI_B
+    simdata["Rt_SI_B"][:, :, :] = R_SI_B_batch(rotangles)
 
-        simdata["hll"][i, :] = array((
-            1E-3 * (rlli[0] - data.orbit.body.r),  # Altitude in [km]
-            # 1E-3*(rlli[2]),  # Altitude in [km]
-            180 / pi * wrap(rlli[1] - (earth_zero_datum + i * dth_E), 2 * pi),  # Geocentric longitude |ECEF [deg]
-            # Geocentric latitude |ECEF [deg]
-            180 / pi * rlli[2]
-        ))
+    if timing:
+        t7 = time()
 
-        if timing:
-            t7e += time()-t7
-            t7 = time()
+    # Radius/altitude, longitude and latitude of the orbit points
+    rlli_subs = conv_ECI_geoc_batch(simdata["xyz"])     # |ECI
+    rlli = rlli_subs[isub]
 
-        # Local magnetic field vector (syntax: igrf_value(lat, lon, alt=0., year=2005.))
-        _, _, _, bx, by, bz, _ = igrf_value(
-            simdata["hll"][i, 2],
-            simdata["hll"][i, 1],
-            simdata["hll"][i, 0],
-            simdata["date"][i])
+    simdata["hll"][:, :] = column_stack((
+        1E-3 * (rlli[:, 0] - data.orbit.body.r),  # Altitude in [km]
+        # Geocentric longitude |ECEF [deg]
+        180 / pi * wrap_batch(rlli[:, 1] - (earth_zero_datum + simdata["i_step"] * dth_E), 2 * pi),
+        # Geocentric latitude |ECEF [deg]
+        180 / pi * rlli[:, 2]
+    ))
 
-        if timing:
-            t7f += time()-t7
-            t7 = time()
+    if timing:
+        t8 = time()
+
+    # Local magnetic field vectors, for all points at once, either evaluated
+    # directly (see igrf.py) or looked up in the grid of date0 (igrf_grid.py)
+    if igrf_mode == "grid":
+        grid = get_igrf_grid(date0, data.config, verbose=1)
+        print(f"[DEBUG] generator_orbital2() IGRF grid max error: {round(grid.error['max'], 2)} nT")
+        bx, by, bz = grid.lookup(simdata["hll"][:, 2], simdata["hll"][:, 1],
+                                 simdata["hll"][:, 0], simdata["date"])
+    else:
+        bx, by, bz = igrf_xyz(simdata["hll"][:, 2], simdata["hll"][:, 1],
+                              simdata["hll"][:, 0], simdata["date"])
+    B_NED = column_stack((bx, by, bz)) / 1000                       # B|NED and nT->uT
 
-        Bi_NED = array([bx/1000, by/1000, bz/1000])                     # B|NED and nT->uT
-        simdata["B_ECI"][i, :] = R_NED_ECI(rlli[1], rlli[2]) @ Bi_NED   # B|ECI
-        Bi_SI = simdata["Rt_ECI_SI"][divmod(i, n_orbit_subs)[1]] \
-                @ simdata["B_ECI"][i, :]                                # B|SI
-        simdata["B_B"][i, :] = simdata["Rt_SI_B"][i] @ Bi_SI            # B|B
+    if timing:
+        t9 = time()
 
-        if timing:
-            t7g += time()-t7
-            t7 = time()
+    # B|NED -> B|ECI -> B|SI -> B|B, as batched matrix-vector products
+    R_NED_ECI_subs = R_ECI_NED_batch(rlli_subs[:, 1], rlli_subs[:, 2]).transpose(0, 2, 1)
+    simdata["B_ECI"][:, :] = einsum("nij,nj->ni", R_NED_ECI_subs[isub], B_NED)          # B|ECI
+    Bi_SI = einsum("nij,nj->ni", simdata["Rt_ECI_SI"][isub], simdata["B_ECI"])        # B|SI
+    simdata["B_B"][:, :] = einsum("nij,nj->ni", simdata["Rt_SI_B"], Bi_SI)             # B|B
 
     if timing:
-        t7 = time()
+        t10 = time()
 
         print(f"[DEBUG] generator_orbital2() import:      {round((t1 - t0) * 1E6, 1)} us")
         print(f"[DEBUG] generator_orbital2() preallocate: {round((t2 - t1) * 1E6, 1)} us")
         print(f"[DEBUG] generator_orbital2() orbit updat: {round((t3 - t2) * 1E6, 1)} us")
         print(f"[DEBUG] generator_orbital2() draw:        {round((t4 - t3) * 1E6, 1)} us")
         print(f"[DEBUG] generator_orbital2() orbit props: {round((t5 - t4) * 1E6, 1)} us")
-        print(f"[DEBUG] generator_orbital2() loop n_subs: {round((t6 - t5) * 1E6, 1)} us")
-        print(f"[DEBUG] generator_orbital2() loop n_step: {round((t7 - t6) * 1E6, 1)} us")
-        print(f"[DEBUG] a): {round(t7a * 1E6, 1)} us")
-        print(f"[DEBUG] b): {round(t7b * 1E6, 1)} us")
-        print(f"[DEBUG] c): {round(t7c * 1E6, 1)} us")
-        print(f"[DEBUG] d): {round(t7d * 1E6, 1)} us")
-        print(f"[DEBUG] e): {round(t7e * 1E6, 1)} us")
-        print(f"[DEBUG] f): {round(t7f * 1E6, 1)} us")
-        print(f"[DEBUG] g): {round(t7g * 1E6, 1)} us")
-        print(f"[DEBUG] generator_orbital2() TOTAL:       {round((t7 - t0) * 1E6, 1)} us")
+        print(f"[DEBUG] generator_orbital2() R_ECI_SI:    {round((t6 - t5) * 1E6, 1)} us")
+        print(f"[DEBUG] generator_orbital2() R_SI_B:      {round((t7 - t6) * 1E6, 1)} us")
+        print(f"[DEBUG] generator_orbital2() hll:         {round((t8 - t7) * 1E6, 1)} us")
+        print(f"[DEBUG] generator_orbital2() IGRF:        {round((t9 - t8) * 1E6, 1)} us")
+        print(f"[DEBUG] generator_orbital2() frames:      {round((t10 - t9) * 1E6, 1)} us")
+        print(f"[DEBUG] generator_orbital2() TOTAL:       {round((t10 - t0) * 1E6, 1)} us")
 
     datapool.simdata = simdata
 
@@ -411,6 +409,114 @@ def generator_orbital2(generation_parameters, datapool, timing=False):
     # return simdata
 
 
+def generator_orbital2_extent(generation_parameters, interpolation_parameters=None):
+    """Returns the number of points, and the first and last value of t, of
+    the schedule that generator_orbital2() (followed by interpolation with
+    `interpolation_parameters`, if given) would make, without generating it.
+    """
+    g = generation_parameters  # Shorthand
+    dt = orbit_from_parameters(g).get_period() / g["n_orbit_subs"]
+    t_last = dt/g["time_speed_factor"] * (g["n_step"] - 1)
+    return interpolated_length(g["n_step"], interpolation_parameters), 0., t_last
+
+
+def generator_orbital2_chunks(generation_parameters, datapool,
+                              interpolation_parameters=None,
+                              chunk_size: int = 65536, overlap: int = 16):
+    """Chunked variant of generator_orbital2(), for schedules that are too
+    long to hold in memory at once, such as multi-day schedules at a high
+    n_step. Returns a generator that yields the schedule as (t, B) chunks of
+    `chunk_size` points (the last one may be shorter), with B of shape
+    (3, chunk_size). If `interpolation_parameters` are given, the schedule is
+    interpolated chunk by chunk as well, using interpolate_chunks(), with the
+    given `overlap`.
+
+    The quantities of the orbit points (n_orbit_subs of them) are computed
+    once, as in generator_orbital2(). Everything per step (dates, attitudes,
+    field vectors) is computed for one chunk of steps at a time, so memory use
+    does not grow with n_step. For the same reason, datapool.simdata is not
+    made; only datapool.orbit is updated.
+
+    Use generator_orbital2_extent() to get the length and duration of the
+    schedule beforehand, for instance to allocate it on the server.
+    """
+    g = generation_parameters  # Shorthand
+    igrf_mode = g.get("igrf_mode", "exact")
+    if igrf_mode not in ("exact", "grid"):
+        raise ValueError(f"generator_orbital2_chunks(): igrf_mode must be 'exact' or 'grid' (given: '{igrf_mode}')!")
+    if chunk_size < 1:
+        raise ValueError(f"generator_orbital2_chunks(): chunk_size must be positive (given {chunk_size})!")
+
+    n, t_first, t_last = generator_orbital2_extent(g)
+    chunks = _generator_orbital2_chunks(g, datapool, chunk_size, igrf_mode)
+    if interpolation_parameters is not None:
+        chunks = interpolate_chunks(chunks, n, t_first, t_last,
+                                    interpolation_parameters["factor"],
+                                    interpolation_parameters["function"],
+                                    overlap=overlap)
+    return rechunk(chunks, chunk_size)
+
+
+def _generator_orbital2_chunks(g, datapool, chunk_size, igrf_mode):
+    data = datapool
+    n_orbit_subs = g["n_orbit_subs"]
+    n_step = g["n_step"]
+    earth_zero_datum = g["earth_zero_datum"]
+    date0 = g["date0"]
+
+    # ==== Orbit points, as in generator_orbital2()
+    data.orbit = orbit_from_parameters(g)
+    xyz, v_xyz, _, _, _, huv = data.orbit.draw(
+        subdivisions=n_orbit_subs,
+        spacing="isochronal",
+        eotc_order=data.config["eotc_order"]
+    )
+
+    dt = data.orbit.get_period() / n_orbit_subs     # [s/dt]
+    dth_E = data.orbit.body.axial_rate * dt         # [rad/dt]
+
+    uv_xyz = uv3d_batch(v_xyz)
+    Rt_ECI_SI = stack((
+        uv_xyz,
+        tile(huv, (n_orbit_subs, 1)),
+        cross3d(uv_xyz.T, huv).T,
+    ), axis=1)
+    rlli_subs = conv_ECI_geoc_batch(xyz)
+    R_NED_ECI_subs = R_ECI_NED_batch(rlli_subs[:, 1], rlli_subs[:, 2]).transpose(0, 2, 1)
+
+    if igrf_mode == "grid":
+        grid = get_igrf_grid(date0, data.config, verbose=1)
+
+    # ==== Steps, one chunk at a time
+    for i0 in range(0, n_step, chunk_size):
+        i_step = arange(i0, min(i0 + chunk_size, n_step))
+        isub = i_step % n_orbit_subs
+
+        date = date0 + dt * i_step / 31_556_952
+        rotangles = column_stack((
+            pi/180 * (g["angle_body_x_0"] + i_step * g["rate_body_x"] * dt),
+            pi/180 * (g["angle_body_y_0"] + i_step * g["rate_body_y"] * dt),
+            pi/180 * (g["angle_body_z_0"] + i_step * g["rate_body_z"] * dt)
+        ))
+
+        rlli = rlli_subs[isub]
+        alt = 1E-3 * (rlli[:, 0] - data.orbit.body.r)
+        lon = 180 / pi * wrap_batch(rlli[:, 1] - (earth_zero_datum + i_step * dth_E), 2 * pi)
+        lat = 180 / pi * rlli[:, 2]
+
+        if igrf_mode == "grid":
+            bx, by, bz = grid.lookup(lat, lon, alt, date)
+        else:
+            bx, by, bz = igrf_xyz(lat, lon, alt, date)
+        B_NED = column_stack((bx, by, bz)) / 1000
+
+        B_ECI = einsum("nij,nj->ni", R_NED_ECI_subs[isub], B_NED)
+        Bi_SI = einsum("nij,nj->ni", Rt_ECI_SI[isub], B_ECI)
+        B_B = einsum("nij,nj->ni", R_SI_B_batch(rotangles), Bi_SI)
+
+        yield dt/g["time_speed_factor"] * i_step, B_B.transpose()
+
+
 orbital_generation_parameters = {
     # Orbital elements
     "orbit_eccentricity": 0.2,  # [-]
@@ -431,6 +537,7 @@ orbital_generation_parameters = {
     # Various
     "earth_zero_datum": 0,  # [deg]
     "date0": 2024.0,  # [decimal date]
+    "igrf_mode": "exact",  # [-] "exact" or "grid" (see igrf_grid.py)
 
     # Simulation settings
     "n_orbit_subs": 512,  # [-] <positive int>
@@ -465,6 +572,7 @@ if __name__ == "__main__":
         # Various
         "earth_zero_datum": 0,  # [deg]
         "date0": 2024.0,  # [decimal date]
+        "igrf_mode": "exact",  # [-] "exact" or "grid"
 
         # Simulation settings
         "n_orbit_subs": 256,  # [-] <positive int>
@@ -0,0 +1,254 @@
+"""
+Vectorized evaluation of the International Geomagnetic Reference Field (IGRF).
+
+pyIGRF.igrf_value() evaluates the IGRF spherical harmonic model for a single
+point at a time in pure Python, which costs in the order of a millisecond per
+point, and it fetches and interpolates the Gauss coefficients of the model
+anew on every call. For the orbital generator, which evaluates thousands of
+points per schedule, and the field line tracing in orbital_plot.py, this is
+by far the largest cost.
+
+This module evaluates the same model for whole arrays of points at once:
+ - The Gauss coefficients are taken from pyIGRF once, on first use, and kept
+    as a table of (14, 14) g and h arrays per 5-year interval of the model.
+    As the IGRF coefficients are linear in time within every interval (and
+    linear secular variation after the last epoch), the coefficients of any
+    date follow from the two ends of its interval.
+ - The associated Legendre functions (Schmidt quasi-normalized) and their
+    derivatives are computed with the same recursion as pyIGRF, but on arrays
+    of points, so the Python overhead is paid once per term of the model,
+    instead of once per term per point.
+The results match pyIGRF to well within 0.1 nT (see tests/igrf_checks.py).
+
+Use igrf_xyz() to get the north, east and down components, or igrf_value()
+as a drop-in replacement of pyIGRF.igrf_value() that works on arrays.
+
+[DEV NOTE] Points are evaluated in chunks of `chunk_size`, which keeps the
+memory use of the Legendre functions (2 x 105 arrays per chunk) bounded for
+millions of points.
+"""
+
+from contextlib import redirect_stdout
+from io import StringIO
+
+from numpy import (
+    arange,
+    arctan2,
+    asarray,
+    broadcast_arrays,
+    clip,
+    cos,
+    empty,
+    errstate,
+    floor,
+    ones,
+    pi,
+    sin,
+    sqrt,
+    where,
+    zeros,
+)
+from pyIGRF.loadCoeffs import get_coeffs
+
+
+nmax = 13               # Maximum degree of the model
+r_ref = 6371.2          # [km] Reference radius of the model
+epoch_first = 1900.0    # [decimal year] First epoch of the model
+epoch_step = 5.0        # [year] Spacing of the epochs
+chunk_size = 8192       # Number of points evaluated at once
+
+FACT = 180./pi
+
+_coefficients = None    # Coefficient table, see gauss_coefficients()
+
+
+def gauss_coefficients():
+    """Returns the Gauss coefficient table of the model, which is loaded from
+    pyIGRF on the first call. The table is a tuple of:
+     - epochs (k,): start of every interval [decimal year]
+     - g0, h0 (k, 14, 14): coefficients g[n, m], h[n, m] at the start of
+        every interval [nT]
+     - g1, h1 (k, 14, 14): the same at the end of every interval
+     - date_max: last date of the intended range of the model
+    Like pyIGRF, models before 1995 are truncated at degree 10.
+    """
+    global _coefficients
+    if _coefficients is not None:
+        return _coefficients
+
+    def coeffs_at(date, n_trunc):
+        g_arr, h_arr = zeros((nmax + 1, nmax + 1)), zeros((nmax + 1, nmax + 1))
+        # pyIGRF prints warnings for dates past the definitive models
+        with redirect_stdout(StringIO()):
+            g, h = get_coeffs(date)
+        for n in range(1, min(len(g) - 1, n_trunc) + 1):
+            for m in range(n + 1):
+                g_arr[n, m] = g[n][m]
+                if m != 0:
+                    h_arr[n, m] = h[n][m]
+        return g_arr, h_arr
+
+    # The end of the intended range of the model in the installed pyIGRF,
+    # after which get_coeffs() warns or refuses
+    date_max = epoch_first
+    while True:
+        out = StringIO()
+        with redirect_stdout(out):
+            get_coeffs(date_max + epoch_step)
+        if out.getvalue():
+            break
+        date_max += epoch_step
+
+    epochs = arange(epoch_first, date_max, epoch_step)
+    g0, h0, g1, h1 = [empty((len(epochs), nmax + 1, nmax + 1)) for i in range(4)]
+    for k, epoch in enumerate(epochs):
+        n_trunc = 10 if epoch < 1995.0 else nmax
+        g0[k], h0[k] = coeffs_at(epoch, n_trunc)
+        g1[k], h1[k] = coeffs_at(epoch + epoch_step, n_trunc)
+
+    _coefficients = (epochs, g0, h0, g1, h1, date_max)
+    return _coefficients
+
+
+def geodetic_to_geocentric(colat, alt):
+    """Vectorized conversion from geodetic to geocentric coordinates using the
+    WGS84 spheroid, as in pyIGRF. Takes the geodetic colatitude [rad] and
+    altitude [km], and returns the geocentric colatitude [rad], the
+    difference between the two (d), and the geocentric radius [km]."""
+    ct, st = cos(colat), sin(colat)
+    a2 = 40680631.6
+    b2 = 40408296.0
+    one = a2 * st * st
+    two = b2 * ct * ct
+    three = one + two
+    rho = sqrt(three)
+    r = sqrt(alt * (alt + 2.0 * rho) + (a2 * one + b2 * two) / three)
+    cd = (alt + rho) / r
+    sd = (a2 - b2) / rho * ct * st / r
+    gccolat = arctan2(st * cd + ct * sd, ct * cd - st * sd)
+    return gccolat, arctan2(sd, cd), r
+
+
+def _igrf_xyz_chunk(lat, lon, alt, year):
+    """igrf_xyz() for 1D arrays of at most chunk_size points."""
+    epochs, g0, h0, g1, h1, date_max = gauss_coefficients()
+
+    # Interval of every point, and the position of the point within it. The
+    # coefficients are interpolated per term in the loop below.
+    k = clip(floor((year - epoch_first) / epoch_step).astype(int), 0, len(epochs) - 1)
+    frac = (year - epochs[k]) / epoch_step
+    if (k == k[0]).all():   # Common case: a scalar index is much faster
+        k = k[0]
+
+    gccolat, d, r = geodetic_to_geocentric((90. - lat) / FACT, alt)
+    ct, st = cos(gccolat), sin(gccolat)
+    cd, sd = cos(d), sin(d)
+    st_safe = where(st == 0.0, 1.0, st)
+
+    cl = [cos(lon / FACT)]      # cos(m*lon), sin(m*lon), for m = 1, 2, ...
+    sl = [sin(lon / FACT)]
+
+    ratio = r_ref / r
+    rr = ratio * ratio
+
+    # Schmidt quasi-normal associated Legendre functions p and their
+    # derivatives q, indexed like pyIGRF
+    kmx = (nmax + 1) * (nmax + 2) // 2 + 1
+    p = [None] * kmx
+    q = [None] * kmx
+    p[0] = ones(len(lat))
+    p[2] = st
+    q[0] = zeros(len(lat))
+    q[2] = ct
+
+    x, y, z = zeros(len(lat)), zeros(len(lat)), zeros(len(lat))
+
+    n, m = 0, 1
+    fn, gn = 0., -1.
+    for kk in range(2, kmx):
+        if n < m:
+            m = 0
+            n = n + 1
+            rr = rr * ratio
+            fn = n
+            gn = n - 1
+
+        fm = m
+        if m != n:
+            gmm = m * m
+            one = sqrt(fn * fn - gmm)
+            two = sqrt(gn * gn - gmm) / one
+            three = (fn + gn) / one
+            i = kk - n
+            j = i - n + 1
+            p[kk - 1] = three * ct * p[i - 1] - two * p[j - 1]
+            q[kk - 1] = three * (ct * q[i - 1] - st * p[i - 1]) - two * q[j - 1]
+        elif kk != 3:
+            one = sqrt(1.0 - 0.5 / fm)
+            j = kk - n - 1
+            p[kk - 1] = one * st * p[j - 1]
+            q[kk - 1] = one * (st * q[j - 1] + ct * p[j - 1])
+            cl.append(cl[m - 2] * cl[0] - sl[m - 2] * sl[0])
+            sl.append(sl[m - 2] * cl[0] + cl[m - 2] * sl[0])
+
+        # Synthesis of x, y and z in geocentric coordinates
+        g_nm = g0[k, n, m] + frac * (g1[k, n, m] - g0[k, n, m])
+        one = g_nm * rr
+        if m == 0:
+            x += one * q[kk - 1]
+            z -= (fn + 1.0) * one * p[kk - 1]
+        else:
+            h_nm = h0[k, n, m] + frac * (h1[k, n, m] - h0[k, n, m])
+            two = h_nm * rr
+            three = one * cl[m - 1] + two * sl[m - 1]
+            x += three * q[kk - 1]
+            z -= (fn + 1.0) * three * p[kk - 1]
+            y += (one * sl[m - 1] - two * cl[m - 1]) * where(
+                st == 0.0, q[kk - 1] * ct, fm * p[kk - 1] / st_safe)
+        m = m + 1
+
+    # Conversion back to geodetic coordinates
+    return x * cd + z * sd, y, z * cd - x * sd
+
+
+def igrf_xyz(lat, lon, alt=0., year=2005.):
+    """Evaluates the IGRF for arrays (or scalars) of geodetic latitude [deg],
+    east longitude [deg], altitude above the WGS84 spheroid [km], and date
+    [decimal year], which are broadcast against each other. Returns the
+    north (x), east (y), and down (z) components of the field in [nT], as
+    arrays of the broadcast shape.
+
+    Raises a ValueError for dates outside the range of the model.
+    """
+    lat, lon, alt, year = broadcast_arrays(
+        *[asarray(v, dtype=float) for v in (lat, lon, alt, year)])
+    shape = lat.shape
+    lat, lon, alt, year = [v.ravel() for v in (lat, lon, alt, year)]
+
+    date_max = gauss_coefficients()[5]
+    if len(year) > 0 and (year.min() < epoch_first or year.max() > date_max):
+        raise ValueError(f"igrf_xyz(): Dates must be in the range {epoch_first} <= date <= {date_max} (given: {year.min()} - {year.max()})!")
+
+    x, y, z = empty(len(lat)), empty(len(lat)), empty(len(lat))
+    with errstate(invalid="ignore", divide="ignore"):
+        for i in range(0, len(lat), chunk_size):
+            s = slice(i, i + chunk_size)
+            x[s], y[s], z[s] = _igrf_xyz_chunk(lat[s], lon[s], alt[s], year[s])
+
+    return x.reshape(shape)[()], y.reshape(shape)[()], z.reshape(shape)[()]
+
+
+def igrf_value(lat, lon, alt=0., year=2005.):
+    """Vectorized drop-in replacement of pyIGRF.igrf_value(), with the same
+    arguments as igrf_xyz(). Returns arrays of:
+         D is declination (+ve east) [deg]
+         I is inclination (+ve down) [deg]
+         H is horizontal intensity [nT]
+         X is north component [nT]
+         Y is east component [nT]
+         Z is vertical component (+ve down) [nT]
+         F is total intensity [nT]
+    """
+    x, y, z = igrf_xyz(lat, lon, alt, year)
+    h = sqrt(x * x + y * y)
+    return FACT * arctan2(y, x), FACT * arctan2(z, h), h, x, y, z, sqrt(x*x + y*y + z*z)
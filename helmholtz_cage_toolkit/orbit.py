@@ -1,14 +1,35 @@
+from functools import lru_cache
 from time import time
 
 from scipy.special import jv
+from numpy import abs as np_abs, arctan2, asarray, multiply, sqrt, where
 
 import matplotlib.pyplot as plt #TODO REMOVE
 
 from helmholtz_cage_toolkit import *
 
+@lru_cache(maxsize=64)
+def eotc_coefficients(e: float, order: int):
+    """Coefficients c_s of the Bessel series of the equation of the center,
+    v - M = sum(c_s * sin(s*M)) for s = 1 .. order-1, as an array.
+
+    The coefficients only depend on the eccentricity `e` and the `order`, so
+    they are computed once per (e, order) and cached, with the least recently
+    used entries evicted beyond 64. The returned array is read-only, as it is
+    shared between all callers.
+    """
+    s = arange(1, order)[:, None]       # Terms of the series, along axis 0
+    p = arange(1, order)[None, :]       # Terms of the inner sum, along axis 1
+    b = 1/e * (1 - (1-e*e)**0.5)
+    bt = (b**p * (jv(s-p, s*e) + jv(s+p, s*e))).sum(axis=1)
+    c = 2/s[:, 0] * (jv(s[:, 0], s[:, 0]*e) + bt)
+    c.setflags(write=False)
+    return c
+
+
 class Orbit:
     def __init__(self, body, h_r, e, i, raan, argp, ma):
-        if 0 > e >= 1:
+        if not 0 <= e < 1:
             raise ValueError(f"Eccentricity value {e} not allowed (only elliptical orbits are supported)!")
         if h_r <= 0:
             # raise ValueError(f"Provided orbit collides with Earth (h_r = {h_r})!")
@@ -65,42 +86,74 @@ class Orbit:
         return self.period
 
     def equation_of_the_center(self, M, e, order=12):
+        """Approximates the true anomaly of the mean anomaly M (a scalar or an
+        array), with the series of the equation of the center up to `order`.
+        """
         # General expression in terms of Bessel functions of the first kind
         # (see: https://en.wikipedia.org/wiki/Equation_of_the_center#Series_expansion)
-        v = M
-        if 0 < e < 1:  # If e == 0 (circular orbit) don't bother
-            b = 1/e * (1 - (1-e*e)**0.5)
-            for s in range(1, order):
-                bt = 0
-                for p in range(1, order):
-                    bt += b**p*(jv(s-p, s*e)+jv(s+p, s*e))
-                v += 2/s * (jv(s, s*e) + bt)*sin(s*M)
-
-        return v
+        # of which the coefficients are cached (see eotc_coefficients())
+        if not 0 < e < 1:  # If e == 0 (circular orbit) don't bother
+            return M
+        c = eotc_coefficients(float(e), int(order))
+        return M + sin(multiply.outer(asarray(M, dtype=float), arange(1, order))) @ c
+
+    def solve_kepler(self, M, e, tol=1E-14, max_iter=64):
+        """Solves Kepler's equation M = E - e*sin(E) for the eccentric anomaly
+        E, for an array of mean anomalies M at once, with Newton's method.
+        Converges for all 0 <= e < 1 when starting from E = pi for high
+        eccentricities, to within `tol` [rad] in a handful of iterations.
+        """
+        M = array(M, dtype=float)
+        E = where(e > 0.8, pi + 0.*M, M + e*sin(M))
+        for i in range(max_iter):
+            dE = (E - e*sin(E) - M) / (1 - e*cos(E))
+            E = E - dE
+            if np_abs(dE).max(initial=0.) < tol:
+                break
+        return E
+
+    def true_anomaly_kepler(self, M, e):
+        """Exact true anomalies of an array of mean anomalies M, via the
+        eccentric anomaly from solve_kepler(). The results are kept on the
+        same branch as M, i.e. within pi of it, like those of
+        equation_of_the_center()."""
+        M = array(M, dtype=float)
+        E = self.solve_kepler(M, e)
+        v = 2*arctan2(sqrt(1+e)*sin(E/2), sqrt(1-e)*cos(E/2))
+        return M + ((v - M + pi) % (2*pi) - pi)
 
     def draw(self, subdivisions=128, spacing="isochronal", eotc_order=12):
-
+        """Computes `subdivisions` points of the orbit, with the following
+        spacings:
+         - "isochronal" (or "equitemporal"): equal steps in time, with the
+            true anomalies solved exactly from Kepler's equation
+            (see true_anomaly_kepler())
+         - "isochronal_eotc": the same, but with the true anomalies
+            approximated by the Bessel series of equation_of_the_center() of
+            order `eotc_order`, which oscillates for eccentricities > 0.5
+         - "equidistant": equal steps in true anomaly
+
+        All points are computed at once, with array operations.
+        """
         t0 = time()
+        # Spacing of mean anomaly
+        mean_anomaly = (linspace(0, 2 * pi, subdivisions + 1)[:-1] + self.ma0) % (2*pi)
+
         if spacing in ("equitemporal", "isochronal"):
-            if self.e > 0.5:
-                print("WARNING! Isochronal point generation of orbits with eccentricity > 0.5 may be subjected to oscillations. Consider increasing the order of the method, or using equidistant instead")
+            true_anomaly = self.true_anomaly_kepler(mean_anomaly, self.e)
 
-            # Spacing of mean anomaly
-            mean_anomaly = linspace(0, 2 * pi, subdivisions + 1)[:-1]
-            mean_anomaly = array([(ma+self.ma0) % (2*pi) for ma in mean_anomaly])
-            true_anomaly = zeros(len(mean_anomaly))
-            for i in range(len(mean_anomaly)):
-                true_anomaly[i] = self.equation_of_the_center(
-                    mean_anomaly[i], self.e, order=eotc_order)
+        elif spacing == "isochronal_eotc":
+            if self.e > 0.5:
+                print("WARNING! Isochronal point generation of orbits with eccentricity > 0.5 may be subjected to oscillations. Consider increasing the order of the method, or using 'isochronal' instead")
+            true_anomaly = self.equation_of_the_center(
+                mean_anomaly, self.e, order=eotc_order)
 
         elif spacing == "equidistant":
             # Equally spacing points along orbit:
-            mean_anomaly = linspace(0, 2*pi, subdivisions+1)[:-1]
-            mean_anomaly = [(ma+self.ma0) % (2*pi) for ma in mean_anomaly]
             true_anomaly = mean_anomaly  # TODO: This neglects eccentricity, or does it?
 
         else:
-            raise ValueError("Valid spacing settings: 'equidistant', 'isochronal'")
+            raise ValueError("Valid spacing settings: 'equidistant', 'isochronal', 'isochronal_eotc'")
 
         # Radial components relative to focus:
         radials = self.a*(1-self.e**2) / (1 + self.e * cos(true_anomaly))
@@ -117,25 +170,19 @@ class Orbit:
         # Calculate absolute velocities:
         vabs = (self.body.gm*(2/(xyzf[:, 0]**2+xyzf[:, 1]**2)**0.5 - 1/self.a))**0.5
 
-        # Calculate vectorial velocities (flat)
-        v_xyzf = empty((len(true_anomaly), 3))
-        for i in range(len(true_anomaly)):
-            tg = true_anomaly[i] - gamma[i]
-            v_xyzf[i, 0:2] = vabs[i]*array([[cos(tg), -sin(tg)], [sin(tg), cos(tg)]])@array([0., 1.])
-            v_xyzf[i, 2] = 0.
-
-
+        # Calculate vectorial velocities (flat), which is the velocity
+        # magnitude along [0, 1], rotated by (true anomaly - gamma)
+        tg = true_anomaly - gamma
+        v_xyzf = column_stack([
+            -vabs * sin(tg),
+            vabs * cos(tg),
+            zeros(len(true_anomaly))])
 
-        # Apply transformation to ellipse coordinates using orbital elements
+        # Apply transformation to ellipse coordinates using orbital elements,
+        # as a single matrix product for all orbit points
         T = self.orbit_transformation_matrix()
-        xyz = empty((len(true_anomaly), 3), dtype=float)
-        v_xyz = empty((len(true_anomaly), 3), dtype=float)
-
-        for i in range(len(xyzf)):
-            # Calculate 3D coordinates of orbit points
-            xyz[i] = dot(T, xyzf[i])
-            # Calculate 3D velocity vectors of orbit points
-            v_xyz[i] = dot(T, v_xyzf[i])
+        xyz = xyzf @ T.T            # 3D coordinates of orbit points
+        v_xyz = v_xyzf @ T.T        # 3D velocity vectors of orbit points
 
         # Angular momentum unit vector (is constant in both magnitude and
         # direction for unperturbed orbits with e>1)
@@ -1,6 +1,6 @@
 from time import time
 from scipy.special import jv
-from pyIGRF import igrf_value
+from numpy import column_stack, einsum
 
 import pyqtgraph as pg
 from pyqtgraph.opengl import (
@@ -20,13 +20,15 @@ from helmholtz_cage_toolkit.pg3d import (
     plotgrid, plotpoint, plotpoints, plotvector, plotframe, plotframe2,
     updatepoint, updatepoints, updatevector, updateframe,
     hex2rgb, hex2rgba,
-    sign, wrap, norm3d, uv3d,
-    conv_ECI_geoc,
-    R_NED_ECI, R_ECI_NED,
+    sign, wrap, norm3d, uv3d, wrap_batch, uv3d_batch,
+    conv_ECI_geoc, conv_ECI_geoc_batch,
+    R_NED_ECI, R_ECI_NED, R_ECI_NED_batch,
     R_SI_B, R_B_SI,
     R_ECI_ECEF, R_ECEF_ECI
 )
 
+from helmholtz_cage_toolkit.igrf import igrf_xyz
+from helmholtz_cage_toolkit.igrf_grid import get_igrf_grid
 from helmholtz_cage_toolkit.orbit import Orbit, Earth
 from helmholtz_cage_toolkit.utilities import cross3d
 
@@ -40,6 +42,76 @@ from helmholtz_cage_toolkit.utilities import cross3d
 #     -
 
 
+def trace_fieldlines(start_points, date, th_Ei, step_size=7.5E5, itr_max=2048,
+                     igrf_grid=None):
+    """Traces magnetic field lines from the ECI `start_points` [m] by stepping
+    `step_size` [m] along the IGRF field direction of `date` [decimal year],
+    with the Earth rotated by `th_Ei` [rad], until a line ends above
+    1.1 Earth radii in the northern hemisphere (z > 0), or after `itr_max`
+    steps.
+
+    All field lines are traced in lockstep, so that the IGRF is evaluated for
+    all lines that are still going in a single call per step, rather than
+    once per point. If an IGRFGrid is given as `igrf_grid`, the field is
+    looked up in it rather than evaluated directly.
+
+    Returns:
+     - all_points  (n, 3)  The points of all field lines, concatenated
+     - Bmags       (n,)    Field strength [uT] at every point, which is 0 for
+                            the first point of every line, and for the point
+                            after its last step, to hide the segments between
+                            the lines.
+     - iters       list    Number of steps of every field line
+    """
+    r_E = Earth().r
+    xyz = array(start_points, dtype=float)
+    lines = [[p.copy()] for p in xyz]
+    line_Bmags = [[] for p in xyz]
+    iters = [0] * len(xyz)
+
+    active = arange(len(xyz))
+    itr = 0
+    while len(active) > 0:
+        p = xyz[active]
+        done = ((p[:, 0]**2 + p[:, 1]**2 + p[:, 2]**2)**(1/2) < 1.1*r_E) \
+            & (p[:, 2] > 0)
+        if itr >= itr_max:
+            done[:] = True
+        for i in active[done]:
+            iters[i] = itr
+        active = active[~done]
+        if len(active) == 0:
+            break
+        itr += 1
+
+        rlonglat = conv_ECI_geoc_batch(xyz[active])
+        bx, by, bz = (igrf_xyz if igrf_grid is None else igrf_grid.lookup)(
+            180 / pi * rlonglat[:, 2],                          # Latitude [deg]
+            180 / pi * wrap_batch(rlonglat[:, 1] - th_Ei, 2 * pi),  # Longitude (ECEF) [deg]
+            1E-3 * (rlonglat[:, 0] - r_E),                      # Altitude [km]
+            date)                                               # Date formatted as decimal year
+
+        B_xyz = einsum("nij,nj->ni",
+                       R_ECI_NED_batch(rlonglat[:, 1], rlonglat[:, 2]).transpose(0, 2, 1),
+                       column_stack((bx, by, bz)) / 1000)       # nT -> uT
+
+        # Record Bmag, to be used later for alpha/intensity
+        Bmag = (B_xyz[:, 0]**2 + B_xyz[:, 1]**2 + B_xyz[:, 2]**2)**(1/2)
+        if itr == 1:
+            Bmag[:] = 0     # Set all first points to zero, so we hide cross lines
+
+        # Turn magnetic vector to unit vector, and move 'step_size' meters
+        # in that direction for the next point.
+        xyz[active] += uv3d_batch(B_xyz) * step_size
+
+        for i, p_new, b in zip(active, xyz[active], Bmag):
+            lines[i].append(p_new)
+            line_Bmags[i].append(b)
+
+    all_points = concatenate([array(line) for line in lines])
+    Bmags = concatenate([line_Bmag + [0.] for line_Bmag in line_Bmags])
+    return all_points, Bmags, iters
+
 
 class OrbitalPlot(GLViewWidget):
     def __init__(self, datapool):
@@ -806,43 +878,19 @@ class OrbitalPlot(GLViewWidget):
         #     print(f"[DEBUG] make_fieldline iters: {iters}  ,  len(fieldline) = {len(xyz_points)}")
 
         def make_fieldlines(start_points, step_size=7.5E5):
-            Bmags = []
-            iters = []
-            all_points = empty((0, 3))
-            # For each start point, propagate along the field line:
-            for i, start_point in enumerate(start_points):
-                xyz_points = [start_point,]
-                itr = 0
-
-                while not (norm3d(xyz_points[-1]) < 1.1*Earth().r
-                    and xyz_points[-1][2] > 0) and (itr < 2048):
-                    itr += 1
-                    rlonglat = conv_ECI_geoc(xyz_points[-1])
-
-                    # r = max((xyz_start[0]**2 + xyz_start[1]**2 + xyz_start[2]**2)**0.5 - Earth().r, 0)
-                    r = norm3d(xyz_points[-1]) - Earth().r
-
-                    _, _, _, bx, by, bz, _ = igrf_value(
-                        180 / pi * rlonglat[2],  # Latitude [deg]
-                        180 / pi * wrap(rlonglat[1] - self.th_Ei, 2 * pi),  # Longitude (ECEF) [deg]
-                        1E-3 * r,  # Altitude [km]
-                        self.data.config["orbital_default_generation_parameters"]["date0"])  # Date formatted as decimal year
-
-                    B_xyz = R_NED_ECI(rlonglat[1], rlonglat[2]) @ array([bx / 1000, by / 1000, bz / 1000])  # nT -> uT
-
-                    # Record Bmag, to be used later for alpha/intensity
-                    Bmag = norm3d(B_xyz)
-                    if itr == 1:
-                        Bmag = 0    # Set all first points to zero, so we hide cross lines
-                    Bmags.append(Bmag)
-
-                    # Turn magnetic vector to unit vector, and move 'step_size' meters
-                    # in that direction for the next point.
-                    xyz_points.append(xyz_points[-1] + uv3d(B_xyz)*step_size)
-
-                Bmags.append(0.)
-                all_points = concatenate((all_points, array(xyz_points)))
-                iters.append(itr)
+            genparams = self.data.config["orbital_default_generation_parameters"]
+            if genparams.get("igrf_mode", "exact") == "grid":
+                grid = get_igrf_grid(genparams["date0"], self.data.config, verbose=1)
+            else:
+                grid = None
+
+            # Propagate along the field lines of all start points at once
+            all_points, Bmags, iters = trace_fieldlines(
+                start_points,
+                genparams["date0"],  # Date formatted as decimal year
+                self.th_Ei,
+                step_size=step_size,
+                igrf_grid=grid)
 
             # print(f"all_points: {all_points}")
 
@@ -33,8 +33,10 @@ from helmholtz_cage_toolkit.generator_cyclics import (
 )
 from helmholtz_cage_toolkit.generator_orbital import (
     generator_orbital2,
+    orbit_from_parameters,
     orbital_generation_parameters,
 )
+from helmholtz_cage_toolkit.schedule_cache import schedule_key, orbital_config_keys
 from helmholtz_cage_toolkit.orbital_plot import OrbitalPlot, OrbitalPlotButtons
 from helmholtz_cage_toolkit.cage3dplot import Cage3DPlot, Cage3DPlotButtons
 
@@ -109,6 +111,13 @@ class OrbitalInput(QGroupBox):
                 "label": QLabel("Earth datum at t0 [\u00b0]:"),
                 "earth_zero_datum": QLineEdit(),
             },
+            "igrf_mode": {
+                "group": "common",
+                "pos": (6, 1),
+                "label": QLabel("IGRF evaluation:"),
+                "cb_items": ["exact", "grid"],
+                "igrf_mode": QComboBox(),
+            },
 
 
             "orbit_eccentricity": {
@@ -396,18 +405,21 @@ class OrbitalInput(QGroupBox):
         datapool.generation_parameters_orbital onto the user-editable widgets.
         """
         print("[DEBUG] deposit_orbital()")
+        defaults = self.datapool.config["orbital_default_generation_parameters"]
         if contents == {}:
-            contents = self.datapool.config["orbital_default_generation_parameters"]
+            contents = defaults
 
+        # Parameters that were added later (such as igrf_mode) are missing
+        # from schedules saved before, so fall back to the defaults for these
         for prop, elements in self.ui_elements.items():
             for key, val in elements.items():
                 if type(val) == QLineEdit:
                     if key in ("orbit_pericentre_altitude",):
-                        val.setPlaceholderText(str(contents[key]/1000)) # Convert [m] to [km]
+                        val.setPlaceholderText(str(contents.get(key, defaults[key])/1000)) # Convert [m] to [km]
                     else:
-                        val.setPlaceholderText(str(contents[key]))
+                        val.setPlaceholderText(str(contents.get(key, defaults[key])))
                 elif type(val) == QComboBox:
-                    val.setCurrentIndex(elements["cb_items"].index(contents[key]))
+                    val.setCurrentIndex(elements["cb_items"].index(contents.get(key, defaults[key])))
 
 
     def deposit_interpolation_parameters(self, contents):
@@ -438,6 +450,10 @@ class OrbitalInput(QGroupBox):
         4. Do interpolation()
         6. Flood to datapool.schedule, datapool.generation_parameters
         7. Schedule changed -> self.datapool.refresh()
+
+        Steps 3 and 4 are skipped when the same schedule was generated
+        before, in which case t, B, and simdata are taken from
+        datapool.schedule_cache instead.
         """
         print("[DEBUG] orbital.generate()")
         t_start = time()
@@ -445,14 +461,26 @@ class OrbitalInput(QGroupBox):
         self.datapool.status_bar.showMessage("Generating orbit...")
 
         generation_parameters = self.slurp_orbital()
-        t, B = generator_orbital2(generation_parameters, self.datapool)
-
         interpolation_parameters = self.slurp_interpolation_parameters()
 
-        t, B = interpolate(t,
-                           B,
-                           interpolation_parameters["factor"],
-                           interpolation_parameters["function"])
+        key = schedule_key(
+            "generator_orbital2", generation_parameters, interpolation_parameters,
+            extra={k: self.datapool.config[k] for k in orbital_config_keys})
+        cached = self.datapool.schedule_cache.get(key)
+
+        if cached is None:
+            t, B = generator_orbital2(generation_parameters, self.datapool)
+
+            t, B = interpolate(t,
+                               B,
+                               interpolation_parameters["factor"],
+                               interpolation_parameters["function"])
+
+            self.datapool.schedule_cache.put(key, t, B, self.datapool.simdata)
+        else:
+            print("[DEBUG] orbital.generate(): schedule taken from cache")
+            t, B, self.datapool.simdata = cached
+            self.datapool.orbit = orbit_from_parameters(generation_parameters)
 
         self.datapool.schedule = tB_to_schedule(t, B)
         self.datapool.generation_parameters_orbital = generation_parameters
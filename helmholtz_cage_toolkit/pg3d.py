@@ -1,4 +1,5 @@
 import pyqtgraph.opengl as gl
+from numpy import round as np_round, where
 
 from helmholtz_cage_toolkit import *
 
@@ -70,6 +71,24 @@ def R(a: ndarray) -> ndarray:
         [-c[0]*s[2]-s[0]*s[1]*c[2], c[0]*c[2]-s[0]*s[1]*s[2], -s[0]*c[1]],
         [-s[0]*s[2]+c[0]*s[1]*c[2], s[0]*c[2]+c[0]*s[1]*s[2], c[0]*c[1]]])
 
+def R_batch(a: ndarray) -> ndarray:
+    """Vectorized R(), which returns the 3-2-1 rotation matrices of all rows
+    of the (n, 3) ndarray 'a' as an (n, 3, 3) ndarray. Gives exactly the same
+    matrices as calling R() on every row.
+    """
+    s, c = sin(a).T, cos(a).T
+    Rn = empty((len(a), 3, 3))
+    Rn[:, 0, 0] = c[1]*c[2]
+    Rn[:, 0, 1] = c[1]*s[2]
+    Rn[:, 0, 2] = -s[1]
+    Rn[:, 1, 0] = -c[0]*s[2]-s[0]*s[1]*c[2]
+    Rn[:, 1, 1] = c[0]*c[2]-s[0]*s[1]*s[2]
+    Rn[:, 1, 2] = -s[0]*c[1]
+    Rn[:, 2, 0] = -s[0]*s[2]+c[0]*s[1]*c[2]
+    Rn[:, 2, 1] = s[0]*c[2]+c[0]*s[1]*s[2]
+    Rn[:, 2, 2] = c[0]*c[1]
+    return Rn
+
 
 # ==== Elemental geometry classes
 class PGPoint3D:
@@ -359,6 +378,30 @@ def conv_ECI_geoc(xyz_ECI, rd=6):
 
     return array([r, longitude, latitude])
 
+def conv_ECI_geoc_batch(xyz_ECI, rd=6):
+    """Vectorized conv_ECI_geoc(), which converts the (n, 3) ndarray of
+    (x, y, z)|ECI points to an (n, 3) ndarray of (r, long, lat)|ECI, with the
+    same handling of the singularities.
+    """
+    x, y, z = xyz_ECI[:, 0], xyz_ECI[:, 1], xyz_ECI[:, 2]
+
+    pole = (np_round(x, rd) == 0) & (np_round(y, rd) == 0)
+    if (pole & (np_round(z, rd) == 0)).any():
+        raise ValueError("xyz_ECI has no defined direction, as its length is 0!")
+
+    # The arguments of arccos are only valid away from the poles, the pole
+    # values are filled in afterwards
+    xy = where(pole, 1., (x**2 + y**2)**0.5)
+    r = (x**2 + y**2 + z**2)**0.5
+    longitude = where(y < 0, -1., 1.)*arccos(where(pole, 1., x/xy))
+    latitude = pi/2-arccos(z/r)
+
+    longitude = where(pole, 0., longitude)
+    latitude = where(pole, where(z < 0, -1., 1.)*pi/2, latitude)
+    r = where(pole, abs(z), r)
+
+    return column_stack((r, longitude, latitude))
+
 # def conv_ECEF_geoc(coor_ECEF, rd=6):
 #     """Converts (x, y, z)|ECEF to (r, long, lat)|ECEF
 #
@@ -418,6 +461,25 @@ def R_NED_ECI(long, lat):
     """
     return R_ECI_NED(long, lat).transpose()
 
+def R_ECI_NED_batch(long, lat):
+    """Vectorized R_ECI_NED(), for (n,) ndarrays of longitudes and latitudes,
+    which returns an (n, 3, 3) ndarray. For R_NED_ECI, transpose the last two
+    axes, e.g. with .transpose(0, 2, 1).
+    """
+    s_lat, c_lat = sin(lat), cos(lat)
+    s_long, c_long = sin(long), cos(long)
+    Rn = empty((len(long), 3, 3))
+    Rn[:, 0, 0] = -s_lat*c_long
+    Rn[:, 0, 1] = -s_lat*s_long
+    Rn[:, 0, 2] = c_lat
+    Rn[:, 1, 0] = -s_long
+    Rn[:, 1, 1] = c_long
+    Rn[:, 1, 2] = 0
+    Rn[:, 2, 0] = -c_lat*c_long
+    Rn[:, 2, 1] = -c_lat*s_long
+    Rn[:, 2, 2] = -s_lat
+    return Rn
+
 # def R_ECEF_NED(long, lat):
 #     """Converts (x, y, z)|ECEF to (x, y, z)|NED
 #     """
@@ -440,6 +502,10 @@ def R_SI_B(axyz):
     """Converts (x, y, z)|SI to (x, y, z)|B"""
     return R(array([axyz[0], axyz[1], axyz[2]]))
 
+def R_SI_B_batch(axyz):
+    """Vectorized R_SI_B(), for an (n, 3) ndarray of angles"""
+    return R_batch(axyz)
+
 def R_B_SI(axyz):
     """Converts (x, y, z)|B to (x, y, z)|SI"""
     return R_SI_B(axyz).transpose()
@@ -461,6 +527,11 @@ def wrap(angle, angle_range):
         angle_wrapped = -angle_wrapped
     return angle_wrapped
 
+def wrap_batch(angle, angle_range):
+    """Vectorized wrap(), for an ndarray of angles"""
+    angle_wrapped = (angle + angle_range / 2) % angle_range - angle_range / 2
+    return where(angle_wrapped == -angle, -angle_wrapped, angle_wrapped)
+
 def sign(number):
     if number == 0:
         return 1
@@ -478,4 +549,8 @@ def uv3d(vector: ndarray):
     """
     return vector / (vector[0]**2+vector[1]**2+vector[2]**2)**(1/2)
 
+def uv3d_batch(vectors: ndarray):
+    """Vectorized uv3d(), for an (n, 3) ndarray of vectors"""
+    return vectors / ((vectors[:, 0]**2+vectors[:, 1]**2+vectors[:, 2]**2)**(1/2))[:, None]
+
 # print(R_ECEF_ECI(pi/4)@array([1,0,0]))  # TODO REMOVE
\ No newline at end of file
@@ -0,0 +1,158 @@
+"""
+Preallocated ring buffer for telemetry history, used by the server DataPool
+and by the client Aqs buffers.
+
+The buffers used to be lists, which were updated by inserting each new value
+at position 0 and popping the last one. Inserting at the front of a list
+shifts every entry, so a write costs O(buffer size), and every entry is a
+separate Python object. A RingBuffer instead writes into a fixed NumPy array
+at a moving index, which costs the same for any buffer size.
+
+That cost is higher than that of the list update at small sizes, as NumPy
+has to convert every written value, so a write takes about 1.5 us instead of
+0.2 us for a buffer of 5 entries. The list catches up at a few thousand
+entries, beyond which every write to it gets slower and slower. RingBuffer is
+meant for the long buffers of telemetry history (see "history_duration" in
+the server and client configs), and the few short buffers use it too, for the
+same interface. Compare both with tests/ringbuffer_benchmarks.py.
+
+Indexing keeps the semantics of the old lists: buffer[0] is the most recent
+value, buffer[1] the one before it, and so on. Entries are returned as Python
+floats/ints (or lists of them, for vector buffers), so existing readers and
+the SCC codecs do not notice the difference.
+
+Every value is stored twice, at index i and i+size. Because of this mirror,
+the most recent n values are always available as one contiguous slice of the
+array, so last(n) can return a view rather than a copy, oldest value first.
+
+Every entry is also stamped with the time at which it was written (or a time
+given by the caller), so that entries can be looked up by time with since()
+and at(). Timestamps are assumed to be non-decreasing.
+
+[DEV NOTE] The views returned by last(), timestamps(), and since() point into
+the buffer itself, and will change when new values are written. If you need
+to keep them, or if other threads are writing to the buffer, take a copy
+(view.copy()) while holding the lock that guards the writes.
+"""
+
+from time import time
+
+from numpy import arange, asarray, zeros, searchsorted
+
+
+class RingBuffer:
+    def __init__(self, size: int, entry_size: int = 1, dtype=float):
+        if size <= 0:
+            raise ValueError(f"RingBuffer(): size cannot be {size}!")
+        if entry_size <= 0:
+            raise ValueError(f"RingBuffer(): entry_size cannot be {entry_size}!")
+
+        self.size = size
+        self.entry_size = entry_size
+
+        if entry_size == 1:
+            self._data = zeros(2*size, dtype=dtype)
+        else:
+            self._data = zeros((2*size, entry_size), dtype=dtype)
+        self._t = zeros(2*size)
+
+        self._i = 0             # Index at which the next value will be written
+        self.n_written = 0      # Total number of values written
+
+    def append(self, value, t: float = None):
+        """Writes <value> as the most recent entry, stamped with time <t>,
+        overwriting the oldest entry. If <t> is not given, the current UNIX
+        time is used.
+        Beware: There is NO input validation, you must ensure that the value
+        that is written is appropriate!
+        """
+        if t is None:
+            t = time()
+        i = self._i
+        self._data[i] = value
+        self._data[i + self.size] = value
+        self._t[i] = t
+        self._t[i + self.size] = t
+        self._i = (i + 1) % self.size
+        self.n_written += 1
+
+    def extend(self, values, t):
+        """Writes a block of entries at once, oldest first, stamped with the
+        times in <t>, which must have the same length. If the block is larger
+        than the buffer, only its most recent entries are kept. This is
+        equivalent to calling append() for every entry, but does all writes
+        in a few array operations.
+        """
+        n = len(values)
+        values = asarray(values)[-self.size:]
+        t = asarray(t, dtype=float)[-self.size:]
+        m = len(values)
+        idx = (self._i + n - m + arange(m)) % self.size
+        self._data[idx] = values
+        self._data[idx + self.size] = values
+        self._t[idx] = t
+        self._t[idx + self.size] = t
+        self._i = (self._i + n) % self.size
+        self.n_written += n
+
+    def __getitem__(self, k: int):
+        """Returns the entry written k writes ago, so [0] is the most recent
+        one, like the list buffers that this class replaces."""
+        if not -self.size <= k < self.size:
+            raise IndexError(f"RingBuffer index {k} out of range!")
+        if k < 0:
+            k += self.size
+        return self._data[self._i + self.size - 1 - k].tolist()
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for k in range(self.size):
+            yield self[k]
+
+    def __repr__(self):
+        return f"RingBuffer({self.tolist()})"
+
+    def tolist(self) -> list:
+        """Returns the contents as a list, most recent entry first."""
+        return self.last()[::-1].tolist()
+
+    def n_valid(self) -> int:
+        """Returns the number of entries that have actually been written."""
+        return min(self.n_written, self.size)
+
+    def last(self, n: int = None):
+        """Returns a view of the most recent <n> entries, oldest first. By
+        default, the whole buffer is returned."""
+        if n is None:
+            n = self.size
+        n = max(0, min(n, self.size))
+        end = self._i + self.size
+        return self._data[end - n:end]
+
+    def timestamps(self, n: int = None):
+        """Returns a view of the timestamps of the most recent <n> entries,
+        oldest first, matching last(n)."""
+        if n is None:
+            n = self.size
+        n = max(0, min(n, self.size))
+        end = self._i + self.size
+        return self._t[end - n:end]
+
+    def since(self, t: float):
+        """Returns views of the timestamps and entries written at or after
+        time <t>, oldest first."""
+        n = self.n_valid()
+        t_valid = self.timestamps(n)
+        i = searchsorted(t_valid, t, side="left")
+        return t_valid[i:], self.last(n)[i:]
+
+    def at(self, t: float):
+        """Returns the most recent entry written at or before time <t>, or
+        None if there is no such entry in the buffer."""
+        n = self.n_valid()
+        i = searchsorted(self.timestamps(n), t, side="right")
+        if i == 0:
+            return None
+        return self.last(n)[i - 1].tolist()
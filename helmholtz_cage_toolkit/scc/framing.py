@@ -0,0 +1,122 @@
+"""
+Stream framing for SCC packets
+
+Author: Johan Monster
+
+
+TCP is a byte stream, not a packet stream. A single call to recv() may return
+half a packet, exactly one packet, or several packets stuck together,
+depending on how the operating system happened to split and coalesce the
+data. Reading one packet per recv() call only works as long as exactly one
+packet is in flight at any moment, which rules out pipelining and batching.
+
+The PacketFramer in this module sits between the socket and the codec. All
+received bytes are fed into it, and it hands back complete packets as soon as
+they are available, keeping any remainder buffered for the next read.
+
+Two framing modes are supported:
+
+Fixed-size      For codecs where every packet has the same length, such as
+                SCC4 (256 B). Packets are sent as-is, and the stream is simply
+                cut every `packet_size` bytes. This keeps the wire format
+                identical to that of older clients and servers.
+
+Length-prefix   For codecs with variable-size packets, such as SCC4B. Every
+                packet is preceded by its length as a 4 B little-endian
+                unsigned integer:
+
+                length (4 B)   packet (length B)
+
+Use framer_for() to get a PacketFramer configured for a given codec module.
+"""
+
+from struct import Struct
+
+
+_length_prefix = Struct("<I")
+
+
+class PacketFramer:
+    """Buffers a byte stream and splits it into packets.
+
+    When `packet_size` is an int, fixed-size framing is used. When it is None,
+    length-prefixed framing is used.
+
+    Typical use on the receiving end:
+
+        framer.feed(socket.recv(4096))
+        for packet in framer:
+            process(packet)
+
+    and on the sending end:
+
+        socket.sendall(framer.frame(packet))
+
+    Not thread-safe; use one PacketFramer per connection and direction.
+    """
+    def __init__(self, packet_size: int = None):
+        self.packet_size = packet_size
+        self._buffer = bytearray()
+
+    def set_packet_size(self, packet_size: int = None):
+        """Switches the framing mode, e.g. after a codec change. Bytes that
+        are still buffered are kept, and will be framed in the new mode.
+        """
+        self.packet_size = packet_size
+
+    def frame(self, packet: bytes):
+        """Returns `packet` ready to be written to the stream."""
+        if self.packet_size is None:
+            return _length_prefix.pack(len(packet)) + packet
+        else:
+            return packet
+
+    def feed(self, data: bytes):
+        """Appends received bytes to the internal buffer."""
+        self._buffer += data
+
+    def next_packet(self):
+        """Returns the next complete packet in the buffer, or None if there is
+        no complete packet (yet).
+        """
+        if self.packet_size is None:
+            if len(self._buffer) < _length_prefix.size:
+                return None
+            n = _length_prefix.size + _length_prefix.unpack_from(self._buffer)[0]
+            start = _length_prefix.size
+        else:
+            n = self.packet_size
+            start = 0
+
+        if len(self._buffer) < n:
+            return None
+
+        packet = bytes(self._buffer[start:n])
+        del self._buffer[:n]
+        return packet
+
+    def __iter__(self):
+        """Yields all complete packets currently in the buffer."""
+        packet = self.next_packet()
+        while packet is not None:
+            yield packet
+            packet = self.next_packet()
+
+    def buffered(self):
+        """Returns the number of bytes buffered that are not yet part of a
+        complete packet."""
+        return len(self._buffer)
+
+
+def packet_size_for(codec):
+    """Returns the `packet_size` argument for PacketFramer that matches the
+    framing mode of `codec`."""
+    if getattr(codec, "fixed_size", True):
+        return codec.packet_size
+    else:
+        return None
+
+
+def framer_for(codec):
+    """Returns a new PacketFramer with the framing mode that `codec` uses."""
+    return PacketFramer(packet_size_for(codec))
@@ -79,6 +79,7 @@ Users desiring additional functionality are advised to subclass SCC instead.
 
 
 packet_size = 256   # Referable packet length for buffer size configuration
+fixed_size = True   # All packets are exactly packet_size long (see framing)
 _pad = "#"          # Packet padding character (cannot be @)
 # _xps = "@"          # (now hardcoded!) Internal separator used for x-packets
 
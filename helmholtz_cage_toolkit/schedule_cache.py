@@ -0,0 +1,193 @@
+"""
+Content-addressed cache of generated schedules.
+
+Generating a schedule (generator_cyclics() or generator_orbital2(), followed
+by interpolate()) only depends on its inputs, so a schedule that was made
+before can be reused rather than generated again. ScheduleCache stores the
+generated t and B arrays (and the simdata of the orbital generator) under a
+key that is a hash of everything that determines them:
+ - the name of the generator,
+ - the generation parameters,
+ - the interpolation parameters,
+ - any settings from the config that the generator uses (`extra`),
+ - the code version (see code_version()), so that entries made by other
+    versions of the generators are never used.
+
+There are two tiers:
+ - An in-memory tier of the `max_entries` most recently used schedules,
+    which makes going back to a previous configuration instant.
+ - An on-disk tier of .npz files in `directory`, which keeps schedules
+    across sessions, and holds at most `max_disk_entries` of them, of which
+    the least recently used are removed first.
+
+The arrays returned by get() are the ones in the cache, not copies, so they
+must not be modified in place.
+
+[DEV NOTE] Only deterministic generation may be cached. Cyclics with noise
+are random on every generation, so CyclicsInput.generate() bypasses the
+cache for them.
+"""
+
+from collections import OrderedDict
+from functools import lru_cache
+from hashlib import sha1, sha256
+from importlib.metadata import version, PackageNotFoundError
+from json import dumps
+from os import listdir, makedirs, remove, replace, utime
+from os.path import dirname, getmtime, isfile, join
+
+from numpy import asarray, load, savez
+
+from helmholtz_cage_toolkit.config import config
+
+
+# Source files whose contents determine the generated schedules
+code_files = (
+    "generator_cyclics.py",
+    "generator_orbital.py",
+    "igrf.py",
+    "igrf_grid.py",
+    "orbit.py",
+    "pg3d.py",
+    "utilities.py",
+)
+
+
+# Config settings that affect the result of generator_orbital2()
+orbital_config_keys = ("eotc_order", "igrf_grid_resolution", "igrf_grid_alt_range")
+
+
+@lru_cache(maxsize=1)
+def code_version() -> str:
+    """Returns a version string of the code that generates schedules: the
+    software version, a hash of the source files in `code_files`, and the
+    version of pyIGRF, which provides the IGRF coefficients."""
+    h = sha1()
+    for filename in code_files:
+        with open(join(dirname(__file__), filename), "rb") as f:
+            h.update(f.read())
+    try:
+        pyigrf_version = version("pyIGRF")
+    except PackageNotFoundError:
+        pyigrf_version = "none"
+    return f"{config['VERSION']}-{h.hexdigest()[:12]}-pyIGRF{pyigrf_version}"
+
+
+def schedule_key(generator_name: str, generation_parameters: dict,
+                 interpolation_parameters: dict, extra: dict = None) -> str:
+    """Returns the cache key of a schedule, which is a SHA-256 hash of its
+    inputs, serialized as JSON with sorted keys, so that the order of the
+    parameters does not matter."""
+    contents = {
+        "generator": generator_name,
+        "generation_parameters": generation_parameters,
+        "interpolation_parameters": interpolation_parameters,
+        "extra": extra if extra is not None else {},
+        "code_version": code_version(),
+    }
+    return sha256(dumps(contents, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class ScheduleCache:
+    """Two-tier cache of generated schedules. See the module docstring.
+    Set `directory` to None to only use the in-memory tier."""
+    def __init__(self, directory="schedule_cache", max_entries: int = 16,
+                 max_disk_entries: int = 64):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+
+        self.memory = OrderedDict()     # key -> (t, B, simdata), most recent last
+
+        self.n_hits_memory = 0
+        self.n_hits_disk = 0
+        self.n_misses = 0
+
+    def path(self, key: str) -> str:
+        return join(self.directory, key + ".npz")
+
+    def get(self, key: str):
+        """Returns (t, B, simdata) of the schedule with `key`, where simdata
+        is None if none was stored, or None if it is not in the cache."""
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.n_hits_memory += 1
+            return self.memory[key]
+
+        if self.directory is not None and isfile(self.path(key)):
+            entry = self.load(self.path(key))
+            utime(self.path(key))       # Mark as recently used
+            self._remember(key, entry)
+            self.n_hits_disk += 1
+            return entry
+
+        self.n_misses += 1
+        return None
+
+    def put(self, key: str, t, B, simdata: dict = None):
+        """Stores the schedule (t, B) with `key` in both tiers, along with the
+        simdata dict of the generator, if given."""
+        entry = (asarray(t), asarray(B), simdata)
+        self._remember(key, entry)
+        if self.directory is not None:
+            makedirs(self.directory, exist_ok=True)
+            self.save(self.path(key), entry)
+            self._evict_disk()
+
+    def clear(self):
+        """Empties the in-memory tier, and removes the files of the on-disk
+        tier."""
+        self.memory = OrderedDict()
+        if self.directory is not None:
+            for filename in self._disk_entries():
+                remove(join(self.directory, filename))
+
+    def stats(self):
+        """Returns n_hits_memory, n_hits_disk, n_misses."""
+        return self.n_hits_memory, self.n_hits_disk, self.n_misses
+
+    def _remember(self, key, entry):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def _disk_entries(self):
+        try:
+            return [f for f in listdir(self.directory) if f.endswith(".npz")]
+        except FileNotFoundError:
+            return []
+
+    def _evict_disk(self):
+        filenames = self._disk_entries()
+        if len(filenames) > self.max_disk_entries:
+            filenames.sort(key=lambda f: getmtime(join(self.directory, f)))
+            for filename in filenames[:len(filenames) - self.max_disk_entries]:
+                remove(join(self.directory, filename))
+
+    @staticmethod
+    def save(path, entry):
+        """Saves (t, B, simdata) as an .npz file, with the simdata entries
+        prefixed with 'simdata.'. The file is written under a temporary name
+        first, so that an interrupted write never leaves a broken entry."""
+        t, B, simdata = entry
+        arrays = {"t": t, "B": B}
+        if simdata is not None:
+            for key, val in simdata.items():
+                arrays["simdata." + key] = asarray(val)
+        with open(path + ".tmp", "wb") as f:
+            savez(f, **arrays)
+        replace(path + ".tmp", path)
+
+    @staticmethod
+    def load(path):
+        """Loads (t, B, simdata) from an .npz file made by save(). Scalars in
+        simdata are returned as Python scalars again."""
+        with load(path) as f:
+            t, B = f["t"], f["B"]
+            simdata = {}
+            for name in f.files:
+                if name.startswith("simdata."):
+                    val = f[name]
+                    simdata[name[len("simdata."):]] = val.item() if val.ndim == 0 else val
+        return t, B, (simdata if simdata else None)
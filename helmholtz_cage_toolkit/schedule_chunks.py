@@ -0,0 +1,29 @@
+"""
+Helpers for schedules that are handled as a stream of (t, B) chunks rather
+than as whole arrays, such as those of generator_cyclics_chunks() and
+generator_orbital2_chunks(). They are kept apart from the generators, so that
+the consumers of the chunks (file writers, the schedule transfer in
+client_functions.py) can use them without depending on a generator.
+"""
+
+from numpy import concatenate
+
+
+def rechunk(chunks, chunk_size: int):
+    """Regroups a stream of (t, B) chunks of any length into chunks of
+    exactly `chunk_size` points, except for the last one, which holds the
+    remainder. B must have shape (3, n)."""
+    ts, Bs, n = [], [], 0
+    for t, B in chunks:
+        ts.append(t)
+        Bs.append(B)
+        n += len(t)
+        if n >= chunk_size:
+            t, B = concatenate(ts), concatenate(Bs, axis=1)
+            i = 0
+            while n - i >= chunk_size:
+                yield t[i:i+chunk_size], B[:, i:i+chunk_size]
+                i += chunk_size
+            ts, Bs, n = [t[i:]], [B[:, i:]], n - i
+    if n > 0:
+        yield concatenate(ts), concatenate(Bs, axis=1)
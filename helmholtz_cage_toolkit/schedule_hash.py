@@ -0,0 +1,67 @@
+"""
+Chunked schedule hashing, shared by the server and the client, so that both
+sides compute identical schedule hashes.
+
+Rather than hashing the whole schedule in one go, the schedule is divided
+into chunks of `hash_chunk_size` segments, and every chunk is hashed
+separately into a leaf digest. The schedule hash is then the hash of all leaf
+digests together, making it the root of a two-level Merkle tree:
+
+    root = BLAKE2b(leaf_0 + leaf_1 + ... + leaf_n)
+    leaf_i = BLAKE2b(segments i*hash_chunk_size ... (i+1)*hash_chunk_size-1)
+
+The segments are hashed as (n, 6) float64 arrays, which is what array() makes
+of a list of segments.
+
+This has two advantages. First, the server can hash every chunk as soon as it
+has been written, rather than hashing everything at once when the hash is
+requested, so the schedule hash is available almost immediately after an
+upload. Second, when the schedule hash does not match, the client can compare
+the leaf digests to find the chunks that differ, and resend only those.
+"""
+
+from hashlib import blake2b
+
+from numpy import ascontiguousarray
+
+
+hash_chunk_size = 4096      # Number of segments per hashed chunk
+digest_size = 8             # Size of leaf digests and root hash in [B]
+
+
+def n_hash_chunks(n_seg: int) -> int:
+    """Returns the number of hash chunks of a schedule of `n_seg` segments."""
+    return max(1, -(-n_seg // hash_chunk_size))
+
+
+def chunk_bounds(i_chunk: int, n_seg: int):
+    """Returns the first segment and the end (exclusive) of hash chunk
+    `i_chunk` of a schedule of `n_seg` segments."""
+    i_first = i_chunk * hash_chunk_size
+    return i_first, min(i_first + hash_chunk_size, n_seg)
+
+
+def chunk_digest(rows) -> bytes:
+    """Returns the leaf digest of the schedule segments in `rows`."""
+    return blake2b(ascontiguousarray(rows, dtype=float).data,
+                   digest_size=digest_size).digest()
+
+
+def chunk_digests(schedule) -> list:
+    """Returns the leaf digests of all hash chunks of `schedule`, which must
+    be an (n, 6) array."""
+    n_seg = len(schedule)
+    return [chunk_digest(schedule[slice(*chunk_bounds(i, n_seg))])
+            for i in range(n_hash_chunks(n_seg))]
+
+
+def root_hash(digests: list) -> str:
+    """Returns the schedule hash belonging to a list of leaf digests, as a hex
+    string."""
+    return blake2b(b"".join(digests), digest_size=digest_size).hexdigest()
+
+
+def schedule_hash(schedule) -> str:
+    """Returns the schedule hash of `schedule`, which must be an (n, 6)
+    array."""
+    return root_hash(chunk_digests(schedule))
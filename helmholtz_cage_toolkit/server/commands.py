@@ -0,0 +1,138 @@
+"""
+Command table for the x-packet commands of the server.
+
+Rather than comparing the command name of every x-packet against a long
+chain of string literals, the server looks the command up in `command_table`,
+which is a dict and therefore takes the same time for every command. Handlers
+are added to the table with the @command decorator, which also declares the
+types of the arguments the command takes:
+
+    @command("set_Br", float, float, float)
+    def cmd_set_Br(self, bx, by, bz):
+        ...
+
+Every declared type may be a single type or a tuple of allowed types, like
+isinstance() accepts. An int is also accepted where a float is declared, and
+is then converted, as SCC encodes whole floats such as 1.0 just fine but
+users tend to type them as 1. Arguments are checked in check_args() before
+the handler is called, so that the handlers themselves do not have to.
+
+Commands that can take long enough to hold up other clients, such as those
+that compile a PlaybackPlan of the whole schedule, are declared with
+slow=True:
+
+    @command("set_play_mode", bool, slow=True)
+
+The threaded server ignores this, as every client has its own thread anyway,
+but server_asyncio.py runs these commands off the event loop.
+
+Every Command also keeps track of how often it was called, and how long its
+handler took, which can be requested by clients with 'get_command_stats'.
+"""
+
+from time import perf_counter
+
+
+# Single-character codes of the SCC x-packet argument types, used to describe
+# command signatures to clients (see 'list_commands').
+type_codes = {
+    float: "f",
+    int: "i",
+    bool: "b",
+    str: "s",
+}
+
+
+class Command:
+    """A single entry of the command table: the handler of a command and its
+    declared argument types, plus the call statistics."""
+    def __init__(self, name, handler, arg_types, slow=False):
+        self.name = name
+        self.handler = handler
+        self.arg_types = arg_types
+        self.slow = slow
+
+        self.n_calls = 0        # Not thread-safe
+        self.t_total = 0.       # Not thread-safe
+        self.t_max = 0.         # Not thread-safe
+
+    def check_args(self, args):
+        """Checks `args` against the declared argument types, and returns
+        them, with ints converted to float where a float was declared. Raises
+        a ValueError if the number or types of the arguments do not match.
+        """
+        if len(args) != len(self.arg_types):
+            raise ValueError(
+                f"Command '{self.name}' takes {len(self.arg_types)} argument(s), but {len(args)} were given!")
+
+        checked = []
+        for i, (arg, arg_type) in enumerate(zip(args, self.arg_types)):
+            if not isinstance(arg_type, tuple):
+                arg_type = (arg_type,)
+
+            if type(arg) in arg_type:
+                checked.append(arg)
+            elif float in arg_type and type(arg) == int:
+                checked.append(float(arg))
+            else:
+                raise ValueError(
+                    f"Argument {i} of command '{self.name}' must be {self.describe_type(i)}, not {type(arg).__name__}!")
+        return checked
+
+    def record(self, t):
+        """Adds a call that took `t` seconds to the statistics."""
+        self.n_calls += 1
+        self.t_total += t
+        self.t_max = max(self.t_max, t)
+
+    def t_mean(self):
+        if self.n_calls == 0:
+            return 0.
+        return self.t_total / self.n_calls
+
+    def describe_type(self, i):
+        """Returns the type code(s) of argument i, with alternatives separated
+        by '|', e.g. 'f|b' for an argument that can be float or bool."""
+        arg_type = self.arg_types[i]
+        if not isinstance(arg_type, tuple):
+            arg_type = (arg_type,)
+        return "|".join([type_codes[t] for t in arg_type])
+
+    def signature(self):
+        """Returns the command signature as a string, e.g. 'set_Br:f,f,f'."""
+        return self.name + ":" + ",".join(
+            [self.describe_type(i) for i in range(len(self.arg_types))])
+
+
+# Maps command names to Command objects
+command_table = {}
+
+
+def command(name, *arg_types, slow=False):
+    """Decorator that registers the decorated request handler method as the
+    handler of x-packet command `name`, taking arguments of `arg_types`. Set
+    `slow` for commands that can take a noticeable time to handle.
+    """
+    def register(handler):
+        if name in command_table:
+            raise ValueError(f"Command '{name}' is registered twice!")
+        command_table[name] = Command(name, handler, arg_types, slow=slow)
+        return handler
+    return register
+
+
+def run_command(handler_self, name, args):
+    """Looks up command `name`, checks `args`, runs the handler method on
+    `handler_self`, and returns its output. The time taken by the handler is
+    added to the statistics of the command.
+    """
+    cmd = command_table.get(name)
+    if cmd is None:
+        raise ValueError(f"Function name '{name}' not recognised!")
+
+    args = cmd.check_args(args)
+
+    t0 = perf_counter()
+    output = cmd.handler(handler_self, *args)
+    cmd.record(perf_counter() - t0)
+    return output
@@ -2,7 +2,6 @@
 
 # Imports
 import sys
-import adi
 import numpy as np
 from time import time, sleep
 
@@ -48,6 +47,55 @@ def adc_measurement(channels):
         measurement.append(adc_reading(chan))
     return measurement, timestamp
 
+def adc_buffer_setup(cn0554_object, adc_channels, channel_ids, n_samples,
+                     sample_rate, verbose=0):
+    """
+    Configures the buffered acquisition of the AD7124-8, such that every call
+    of adc_buffer_read() returns <n_samples> samples of each of the channels
+    <channel_ids> (positions in the sorted <adc_channels>), sampled at
+    <sample_rate> [S/s] per channel.
+
+    The ADC cycles through the enabled channels with its sequencer, so its
+    output data rate is set to <sample_rate> times the number of channels.
+    PyADI returns the channels in the order of their scan index, so this
+    returns the rows that put them back in the order of <channel_ids>.
+    """
+    adc = cn0554_object.adc
+    adc.rx_destroy_buffer()
+
+    # rx_enabled_channels translates channel names into scan indices, but
+    # stores them sorted, so look up the scan index of each channel by name
+    indices = []
+    for i in channel_ids:
+        adc.rx_enabled_channels = [adc_channels[i].name]
+        indices += adc.rx_enabled_channels
+
+    adc.sample_rate = int(sample_rate * len(indices))
+    adc.rx_output_type = "raw"
+    adc.rx_enabled_channels = indices
+    adc.rx_buffer_size = n_samples
+
+    if verbose >= 1:
+        print(f"adc_buffer_setup(): Buffering {n_samples} samples of ADC channels {list(channel_ids)} at {sample_rate} S/s")
+
+    return [sorted(indices).index(i) for i in indices]
+
+def adc_buffer_read(cn0554_object, rows, sample_rate):
+    """
+    Reads one buffer of samples from the ADC in a single transaction (see
+    adc_buffer_setup()), and returns the voltages as an (n_channels,
+    n_samples) array, along with the UNIX timestamps of the samples.
+
+    The ADC does not timestamp its samples, so they are reconstructed from
+    the moment that the buffer was received and the sample rate, assuming
+    that the last sample was taken just before that.
+    """
+    data = np.array(cn0554_object.adc.rx(), dtype=float, ndmin=2)
+    timestamp = time()
+    volts = adc_raw_to_volts(data)[rows]
+    n_samples = volts.shape[1]
+    return volts, timestamp - np.arange(n_samples - 1, -1, -1) / sample_rate
+
 def adc_channel_setup(cn0554_object, verbose=0):
     # Verbose feedback
     if verbose >= 1:
@@ -131,6 +179,21 @@ def dac_set_voltage(channels, value, verbose=0):
                   chan.name, "to", value, "V (",value_raw,")")
         chan.raw = value_raw
 
+def dac_set_voltages(channels, values, verbose=0):
+    """
+    Bulk version of dac_set_voltage(), which sets every DAC channel in
+    <channels> to the corresponding voltage in <values> in [V]. All values are
+    checked before any channel is written, so that an invalid value does not
+    leave the channels half-written. Used as the bulk write of a DACWriter
+    (see dac_writer.py).
+    """
+    for value in values:
+        if value > 5 or value < 0:
+            raise ValueError(f"Error: dac_set_voltages() only accepts [0, 5] (given: {value}) V!")
+
+    for chan, value in zip(channels, values):
+        dac_set_voltage(chan, value, verbose=verbose)
+
 # def dac_set_voltage(channels, value, verbose=0):
 #     """
 #     Take one or multiple DAC channels, and set it to a specific voltage in [V]
@@ -179,6 +242,9 @@ def cn0554_setup():
     """
     Instantiates a PyADI CN0554 object
     """
+    # Imported here, so that the rest of this module (e.g. PowerSupply) can
+    # be used on machines without PyADI
+    import adi
     board = adi.cn0554()
 
     return board
@@ -189,12 +255,20 @@ class PowerSupply:
     """
     Class for abstracting the configuration of a current and voltage programmable
     power supply through three LMC2688 DAC channels.
+
+    If a DACWriter (see dac_writer.py) is given as <dac_writer>, the channels
+    are not written right away, but staged on it, and only written when
+    dac_writer.flush() is called. This way, the power supplies sharing a
+    DACWriter are written in one bulk write per tick, which skips the
+    channels that did not change. Call flush() after setting all supplies.
     """
     def __init__(self, channel_vc, channel_cc, channel_polarity, 
                  vmax=30.0, imax=5.0, vpol=5.0, 
                  r_load=10.0, v_above=2.0, i_above = 0.2,
                  params_tf_vc=[1, 0], params_tf_cc=[1, 0], 
+                 dac_writer=None,
                  verbose=0):
+        self.dac_writer = dac_writer
         self.channel_vc = channel_vc
         self.channel_cc = channel_cc
         self.channel_polarity = channel_polarity
@@ -302,8 +376,16 @@ class PowerSupply:
             return i_val
 
 
+    def dac_write(self, channels, values, verbose=0):
+        """Writes <values> to the DAC <channels>, directly, or by staging them
+        on self.dac_writer if there is one."""
+        if self.dac_writer is not None:
+            self.dac_writer.stage(channels, values)
+        else:
+            dac_set_voltages(channels, values, verbose=verbose)
+
     def set_zero_output(self, verbose=0):
-        dac_set_channels_zero([self.channel_vc, self.channel_cc, self.channel_polarity], verbose=verbose)   
+        self.dac_write([self.channel_vc, self.channel_cc, self.channel_polarity], [0.0]*3, verbose=verbose)
         self.v = 0
         self.i = 0
         self.pol = 1
@@ -320,8 +402,9 @@ class PowerSupply:
         self.v = self.vlimit(self.v_compliance(current_out))
         self.i = self.ilimit(current_out)
 
-        dac_set_voltage(self.channel_vc, self.tf_vc_inv(self.v), verbose=verbose)
-        dac_set_voltage(self.channel_cc, self.tf_cc_inv(self.i), verbose=verbose)
+        self.dac_write([self.channel_vc, self.channel_cc],
+                       [self.tf_vc_inv(self.v), self.tf_cc_inv(self.i)],
+                       verbose=verbose)
 
 
     def set_voltage_out(self, voltage_out, verbose=0):
@@ -337,10 +420,9 @@ class PowerSupply:
         self.i = self.ilimit(self.i_compliance(voltage_out))
 
 
-        dac_set_voltage([self.channel_vc], 
-                        self.tf_vc_inv(self.v), 
-                        verbose=verbose)
-        dac_set_voltage([self.channel_cc], self.tf_cc_inv(self.i), verbose=verbose)
+        self.dac_write([self.channel_vc, self.channel_cc],
+                       [self.tf_vc_inv(self.v), self.tf_cc_inv(self.i)],
+                       verbose=verbose)
 
 
     def reverse_polarity(self, bool_reverse: bool):
@@ -354,10 +436,10 @@ class PowerSupply:
         if True: output 5V on DAC channel self.channel_polarity, output voltage is NEGATIVE
         """
         if bool_reverse is True:
-            dac_set_voltage(self.channel_polarity, self.vpol)
+            self.dac_write([self.channel_polarity], [self.vpol])
             self.pol = -1
         else:
-            dac_set_channels_zero([self.channel_polarity])
+            self.dac_write([self.channel_polarity], [0.0])
             self.pol = 1
             # dac_set_voltage(self.channel_polarity, 5.0)
 
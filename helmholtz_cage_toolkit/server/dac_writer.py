@@ -0,0 +1,106 @@
+"""
+Change-coalescing writes to the DAC channels.
+
+Every write to a channel of the LTC2688 is a separate transaction with the
+interface board, but a lot of them are redundant: a schedule step that only
+changes the field on one axis leaves the six DAC channels of the other two
+power supplies at the same voltage, and the polarity channels only change
+when a current changes sign. DACWriter keeps a shadow register with the last
+voltage written to every channel, and only passes on the channels whose
+voltage differs from it by more than `tolerance`. All changed channels of a
+tick are passed on as one bulk write.
+
+The writes can be made in two ways:
+ - write(), which writes a set of channels right away, as used by the
+    write_DAC thread of the server, which has all channels of a tick at hand,
+ - stage() followed by flush(), which gathers the channels of several callers
+    (e.g. the three PowerSupply objects in control_lib.py) and writes the
+    changed ones in one go when flush() is called, once per tick.
+
+Channels can be any hashable key, such as the channel numbers on the
+interface board used by the hardware backends (see hardware.py), or the PyADI
+channel objects used in control_lib.py.
+
+The default tolerance is half a step of the DAC (see dac_set_voltage() in
+control_lib.py), so that a skipped write would never have changed the output.
+
+[DEV NOTE] The shadow register only knows what was written through it. If
+the DAC channels are written some other way (e.g. dac_zero() on shutdown),
+call invalidate(), so that the next write passes on every channel again.
+"""
+
+dac_lsb = 0.457763671E-3    # V, step size of the LTC2688 in the [0, 5] V range
+
+
+class DACWriter:
+    """Change-coalescing writer in front of `write_bulk(channels, voltages)`,
+    which writes the `voltages` [V] to the DAC `channels`, two sequences of
+    equal length. See the module docstring.
+
+    The following counters are kept, in numbers of channel writes:
+     - n_requested  channel writes requested through write() and stage()
+     - n_written    channel writes passed on to write_bulk()
+     - n_saved      channel writes skipped, as the channel was already within
+                     tolerance of the requested voltage, or was staged again
+                     before the flush
+    And n_bulk, the number of calls of write_bulk().
+    """
+    def __init__(self, write_bulk, tolerance: float = dac_lsb/2):
+        self.write_bulk = write_bulk
+        self.tolerance = tolerance
+
+        self.shadow = {}        # Last voltage written per channel [V]
+        self.staged = {}        # Voltages staged for the next flush() [V]
+        self.n_staged = 0       # Channel writes requested since the last flush()
+
+        self.n_requested = 0
+        self.n_written = 0
+        self.n_saved = 0
+        self.n_bulk = 0
+
+    def stage(self, channels, voltages):
+        """Stages `voltages` [V] for the DAC `channels`, to be written on the
+        next flush(). A channel that is staged twice is written once, with
+        the last voltage."""
+        for channel, voltage in zip(channels, voltages):
+            self.staged[channel] = voltage
+            self.n_staged += 1
+
+    def flush(self):
+        """Writes the staged channels that changed by more than the tolerance
+        in a single bulk write, and returns the number of channels written."""
+        channels = []
+        voltages = []
+        for channel, voltage in self.staged.items():
+            v_prev = self.shadow.get(channel)
+            if v_prev is None or abs(voltage - v_prev) > self.tolerance:
+                channels.append(channel)
+                voltages.append(voltage)
+        self.n_requested += self.n_staged
+        self.n_saved += self.n_staged - len(channels)
+        self.staged = {}
+        self.n_staged = 0
+
+        if channels:
+            self.write_bulk(channels, voltages)
+            self.n_bulk += 1
+            self.n_written += len(channels)
+            for channel, voltage in zip(channels, voltages):
+                self.shadow[channel] = voltage
+        return len(channels)
+
+    def write(self, channels, voltages):
+        """Writes `voltages` [V] to the DAC `channels`, skipping the channels
+        that are already within tolerance. Returns the number of channels
+        written."""
+        self.stage(channels, voltages)
+        return self.flush()
+
+    def invalidate(self):
+        """Forgets the shadow register, so that every channel is written on
+        its next write."""
+        self.shadow = {}
+
+    def stats(self):
+        """Returns n_requested, n_written, n_saved, n_bulk."""
+        return self.n_requested, self.n_written, self.n_saved, self.n_bulk
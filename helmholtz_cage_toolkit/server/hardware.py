@@ -0,0 +1,306 @@
+"""
+Hardware backends of the server, through which the read_ADC and write_DAC
+threads read the ADC channels and write the DAC channels, without having to
+know what is behind them.
+
+A backend implements the interface of HardwareBackend, in which channels are
+referred to by their channel number on the interface board, as in the pin
+mapping of the server config. Three backends are available, selected with
+config["hardware_backend"]:
+
+ - "dummy": DummyBackend, which ignores DAC writes and has no ADC, like the
+    dummies in dummy_functions.py. Bm is then only changed by the
+    serveropts mutate_Bm and inject_Bm.
+
+ - "cn0554": CN0554Backend, the CN0554 interface board (AD7124-8 ADC and
+    LTC2688 DAC), through PyADI (see control_lib.py). This requires the
+    `adi` package and the physical board.
+
+ - "simulated": SimulatedCage, a simulation of the whole cage, consisting of
+    the power supplies, the coils, and the magnetometer, so that the full
+    read_ADC/write_DAC pipeline can be run on any machine, e.g. for
+    development, or for load testing at high thread rates. It models:
+     - the power supplies, using the forward transfer functions of their
+        CC and VC channels (params_tf_cc, params_tf_vc), the current limit
+        imax_supply, the compliance voltage, and the polarity switches,
+     - the coils, as first-order L/R circuits, whose currents approach the
+        setpoint of the power supply with time constant L/R,
+     - the field, which is the coil field (params_tf_VB) plus a
+        configurable Earth field,
+     - the magnetometer, which sees the field with a latency and Gaussian
+        noise.
+    The simulation is evaluated exactly at the moment that the ADC is read,
+    so its accuracy does not depend on the thread rates.
+
+Besides single reads with adc_read(), the ADC can be read in blocks with
+adc_read_buffer(), which returns `n_samples` samples of every channel at
+once, each with its own timestamp, taken at config["adc_sample_rate"] per
+channel. On the CN0554, this uses the buffered acquisition of the AD7124-8,
+which samples all channels continuously in the background and hands them over
+in a single transaction, instead of one sysfs read per channel and sample.
+This is what allows the read_ADC thread to sample well above its own rate.
+"""
+
+from collections import deque
+from math import exp
+from threading import Lock
+from time import time, perf_counter
+
+from numpy import arange, array, exp as np_exp, ones, zeros
+from numpy.random import default_rng
+
+
+axes = ("x", "y", "z")
+
+
+class HardwareBackend:
+    """Interface of the hardware backends. See the module docstring."""
+
+    def adc_read(self, channel_ids):
+        """Reads the ADC channels `channel_ids`, and returns the voltages [V]
+        as a list, along with a UNIX timestamp. Backends without an ADC
+        return None instead of the voltages."""
+        raise NotImplementedError
+
+    def adc_read_buffer(self, channel_ids, n_samples: int):
+        """Reads a block of `n_samples` samples of every ADC channel in
+        `channel_ids`, and returns the voltages [V] as an (n_channels,
+        n_samples) array, oldest sample first, along with the (n_samples,)
+        UNIX timestamps of the samples. Backends without an ADC return None
+        instead of the voltages.
+
+        Backends that cannot acquire in blocks fall back on this
+        implementation, which simply repeats adc_read().
+        """
+        volts = []
+        timestamps = []
+        for i in range(n_samples):
+            v, t = self.adc_read(channel_ids)
+            if v is None:
+                return None, array([t])
+            volts.append(v)
+            timestamps.append(t)
+        return array(volts).T, array(timestamps)
+
+    def dac_write(self, channel_ids, voltages):
+        """Writes `voltages` [V] to the DAC channels `channel_ids`, which are
+        sequences of equal length."""
+        raise NotImplementedError
+
+    def dac_zero(self):
+        """Sets all DAC channels to 0 V."""
+        raise NotImplementedError
+
+    def shutdown(self):
+        """Brings the hardware into a safe idling state. See
+        hardware_shutdown() in server.py."""
+        self.dac_zero()
+
+
+class DummyBackend(HardwareBackend):
+    """Backend without hardware."""
+
+    def adc_read(self, channel_ids):
+        return None, time()
+
+    def adc_read_buffer(self, channel_ids, n_samples: int):
+        return None, array([time()])
+
+    def dac_write(self, channel_ids, voltages):
+        pass
+
+    def dac_zero(self):
+        pass
+
+
+class CN0554Backend(HardwareBackend):
+    """Backend for the CN0554 interface board, using the functions in
+    control_lib.py."""
+
+    def __init__(self, config):
+        # Imported here, as PyADI is only available on the machine that has
+        # the interface board
+        from helmholtz_cage_toolkit.server import control_lib
+        self.cl = control_lib
+
+        self.board = control_lib.cn0554_setup()
+        self.adc_channels = control_lib.adc_channel_setup(self.board)
+        self.dac_channels = control_lib.dac_channel_setup(self.board)
+
+        self.adc_sample_rate = config["adc_sample_rate"]
+        self.adc_buffer = None          # (channel_ids, n_samples) of the buffer
+        self.adc_buffer_rows = None
+
+    def adc_read(self, channel_ids):
+        return self.cl.adc_measurement(
+            [self.adc_channels[i] for i in channel_ids])
+
+    def adc_read_buffer(self, channel_ids, n_samples: int):
+        # The buffer is only (re)configured when the requested channels or
+        # block size change, as this restarts the acquisition
+        if self.adc_buffer != (tuple(channel_ids), n_samples):
+            self.adc_buffer_rows = self.cl.adc_buffer_setup(
+                self.board, self.adc_channels, channel_ids, n_samples,
+                self.adc_sample_rate)
+            self.adc_buffer = (tuple(channel_ids), n_samples)
+        return self.cl.adc_buffer_read(
+            self.board, self.adc_buffer_rows, self.adc_sample_rate)
+
+    def dac_write(self, channel_ids, voltages):
+        self.cl.dac_set_voltages(
+            [self.dac_channels[i] for i in channel_ids], voltages)
+
+    def dac_zero(self):
+        self.cl.dac_set_channels_zero(self.dac_channels)
+
+
+class SimulatedCage(HardwareBackend):
+    """Simulated cage backend. See the module docstring.
+
+    `clock` is the time source of the simulation in [s], which can be
+    replaced for testing, and `seed` seeds the magnetometer noise.
+
+    The coil currents are piecewise exponential: every time the setpoint of
+    a power supply changes, the current relaxes from its value at that moment
+    to the new setpoint. self.changes keeps these moments as tuples of
+    (t, I at t, I setpoint) for as long as they are needed to evaluate the
+    currents `history` in the past, which is the magnetometer latency plus
+    the time spanned by an ADC block. As the ADC and DAC are used by
+    different threads, access to it is locked.
+    """
+    def __init__(self, config, clock=perf_counter, seed=None):
+        self.clock = clock
+        self.rng = default_rng(seed)
+
+        self.v_dac = [0.] * 16
+
+        self.pins_vc = [config[f"pin_dac_supply_{axis}_vvc"] for axis in axes]
+        self.pins_cc = [config[f"pin_dac_supply_{axis}_vcc"] for axis in axes]
+        self.pins_pol = [config[f"pin_dac_supply_{axis}_pol"] for axis in axes]
+        self.pins_Im = [config[f"pin_adc_channel_im{axis}"] for axis in axes]
+        self.pins_Bm = [config[f"pin_adc_channel_bm{axis}"] for axis in axes]
+        self.pin_V_board = config["pin_adc_board_power"]
+
+        self.params_tf_vc = [config[f"params_tf_vc_{axis}"] for axis in axes]
+        self.params_tf_cc = [config[f"params_tf_cc_{axis}"] for axis in axes]
+        self.params_tf_VB = [config[f"params_tf_VB_{axis}"] for axis in axes]
+        self.imax = config["imax_supply"]
+        self.vlevel_pol = config["vlevel_pol"]
+
+        self.R = config["sim_R_coil"]
+        self.tau = [L / R for L, R in zip(config["sim_L_coil"], self.R)]
+        self.B_earth = config["sim_B_earth"]
+        self.B_noise = config["sim_B_noise"]
+        self.latency = config["sim_latency"]
+        self.V_board = config["sim_V_board"]
+
+        self.adc_sample_rate = config["adc_sample_rate"]
+        self.history = self.latency + config["adc_block_size"] / self.adc_sample_rate
+
+        self.adc_scale_Im = config["adc_scale_Im"]
+        self.adc_scale_Bm = config["adc_scale_Bm"]
+
+        self.changes = deque([(self.clock(), (0., 0., 0.), (0., 0., 0.))])
+        self._lock = Lock()
+
+    def setpoint(self):
+        """Returns the currents [A] that the power supplies are set to output
+        by the current DAC voltages."""
+        I_set = []
+        for i in range(3):
+            a_cc, b_cc = self.params_tf_cc[i]
+            a_vc, b_vc = self.params_tf_vc[i]
+            I = min(max(a_cc*self.v_dac[self.pins_cc[i]] + b_cc, 0.), self.imax)
+            # The supply cannot exceed its voltage limit (compliance)
+            V_limit = a_vc*self.v_dac[self.pins_vc[i]] + b_vc
+            I = min(I, max(V_limit, 0.) / self.R[i])
+            if self.v_dac[self.pins_pol[i]] > self.vlevel_pol / 2:
+                I = -I
+            I_set.append(I)
+        return tuple(I_set)
+
+    def currents(self, t: float):
+        """Returns the coil currents [A] at time `t`, which must not be
+        earlier than `history` before the last call of dac_write()."""
+        for t_k, I_k, I_set in reversed(self.changes):
+            if t_k <= t:
+                break
+        return tuple([I_set[i] + (I_k[i] - I_set[i]) * exp(-(t - t_k) / self.tau[i])
+                      for i in range(3)])
+
+    def currents_block(self, t):
+        """Vectorized currents(), which returns the coil currents [A] at the
+        (n,) times `t` as an (n, 3) array."""
+        I = zeros((len(t), 3))
+        tau = array(self.tau)
+        # Every change overwrites the currents from its moment onwards. The
+        # first change also covers any earlier times, as in currents().
+        for k, (t_k, I_k, I_set) in enumerate(self.changes):
+            after = ones(len(t), dtype=bool) if k == 0 else t >= t_k
+            I_set = array(I_set)
+            I[after] = I_set + (array(I_k) - I_set) \
+                * np_exp(-(t[after, None] - t_k) / tau)
+        return I
+
+    def field(self, t: float):
+        """Returns the field [uT] in the cage at time `t`, without noise."""
+        I = self.currents(t)
+        return [b0 + b1*I[i] + self.B_earth[i]
+                for i, (b0, b1) in enumerate(self.params_tf_VB)]
+
+    def adc_read(self, channel_ids):
+        volts = [0.] * 16
+        with self._lock:
+            now = self.clock()
+            I = self.currents(now)
+            B = self.field(now - self.latency)
+        noise = self.rng.normal(0., self.B_noise, 3).tolist()
+        for i in range(3):
+            volts[self.pins_Im[i]] = I[i] / self.adc_scale_Im
+            volts[self.pins_Bm[i]] = (B[i] + noise[i]) / self.adc_scale_Bm
+        volts[self.pin_V_board] = self.V_board
+        return [volts[channel_id] for channel_id in channel_ids], time()
+
+    def adc_read_buffer(self, channel_ids, n_samples: int):
+        volts = zeros((16, n_samples))
+        # The block ends now, like a hardware buffer that has just filled up
+        dt = (arange(n_samples) - (n_samples - 1)) / self.adc_sample_rate
+        with self._lock:
+            now = self.clock()
+            I = self.currents_block(now + dt)
+            B = self.currents_block(now + dt - self.latency)
+        t_unix = time() + dt
+        b0, b1 = array(self.params_tf_VB, dtype=float).T
+        B = B*b1 + b0 + array(self.B_earth) \
+            + self.rng.normal(0., self.B_noise, (n_samples, 3))
+        volts[self.pins_Im] = I.T / self.adc_scale_Im
+        volts[self.pins_Bm] = B.T / self.adc_scale_Bm
+        volts[self.pin_V_board] = self.V_board
+        return volts[list(channel_ids)], t_unix
+
+    def dac_write(self, channel_ids, voltages):
+        with self._lock:
+            for channel_id, voltage in zip(channel_ids, voltages):
+                self.v_dac[channel_id] = voltage
+            I_set = self.setpoint()
+            if I_set != self.changes[-1][2]:
+                now = self.clock()
+                self.changes.append((now, self.currents(now), I_set))
+                # Keep only the changes needed to evaluate the past `history`
+                while len(self.changes) > 1 and self.changes[1][0] <= now - self.history:
+                    self.changes.popleft()
+
+    def dac_zero(self):
+        self.dac_write(range(16), [0.] * 16)
+
+
+def make_backend(config):
+    """Returns the hardware backend selected by config["hardware_backend"]."""
+    if config["hardware_backend"] == "dummy":
+        return DummyBackend()
+    elif config["hardware_backend"] == "cn0554":
+        return CN0554Backend(config)
+    elif config["hardware_backend"] == "simulated":
+        return SimulatedCage(config)
+    else:
+        raise ValueError(f"make_backend(): Unknown hardware backend '{config['hardware_backend']}'!")
@@ -0,0 +1,169 @@
+"""
+Compilation of schedules into playback plans.
+
+During playback, every schedule step specifies a field Bc in [uT], which has
+to be converted into three DAC voltages per axis before it can be applied:
+ - the voltage control (VC) channel of the power supply, which sets its
+    voltage limit to the compliance voltage of the coil current,
+ - the current control (CC) channel of the power supply, which sets the coil
+    current,
+ - the polarity channel, which switches the H-bridge to reverse the current
+    for negative fields.
+This is the same chain of conversions that PowerSupply.set_current_out() and
+PowerSupply.reverse_polarity() in control_lib.py perform for a single value:
+
+    Bc -> I         inverse of params_tf_VB:    Bc = b0 + b1*I
+    I -> v          v_compliance() and vlimit(): v = I*r_load + v_above
+    v -> v_vc       tf_vc_inv()
+    I -> v_cc       tf_cc_inv(), after ilimit()
+    sign(I) -> v_pol
+
+As in set_current_out(), the compliance voltage is computed from the
+requested current, and only the current itself is clamped to imax_supply.
+
+Rather than doing this step by step in the playback loop, PlaybackPlan does
+it for the whole schedule at once with NumPy when play mode is activated, so
+that applying a step during playback is only a matter of indexing into the
+precomputed arrays. Compiling also makes it possible to check the whole
+schedule before playback starts: values that have to be clamped to the limits
+of the power supplies or the DACs are counted, and steps at which the coil
+current would change faster than I_slew_max are reported (see slew.py).
+
+currents_to_voltages() does the part of the conversion from the coil currents
+onwards, which is also used by the DAC thread for currents that have been
+changed by the slew rate limiter.
+"""
+
+from numpy import abs as np_abs, array, clip, count_nonzero, minimum, stack, where
+
+from helmholtz_cage_toolkit.server.slew import find_slew_violations
+
+
+axes = ("x", "y", "z")
+
+
+def supply_channel_ids(config):
+    """Returns the DAC channels of the power supplies as [VC, CC, polarity],
+    each a list of the (x, y, z) channels."""
+    return [[config[f"pin_dac_supply_{axis}_{ch}"] for axis in axes]
+            for ch in ("vvc", "vcc", "pol")]
+
+
+def tf_params(config, channel: str):
+    """Returns the [a, b] transfer function parameters of the power supply
+    channel `channel` ("vc" or "cc") as two (3,) arrays."""
+    return array([config[f"params_tf_{channel}_{axis}"] for axis in axes],
+                 dtype=float).T
+
+
+def currents_to_voltages(I, config: dict):
+    """Converts the signed coil currents `I` [A], an (n, 3) array, into the
+    DAC voltages of the VC, CC and polarity channels of the power supplies,
+    as PowerSupply.set_current_out() does: the VC voltage follows from the
+    compliance voltage of the requested current, and the CC voltage from the
+    current clamped to imax_supply. Returns v_vc, v_cc, v_pol as (n, 3)
+    arrays clamped to [0, vmax_dac], and the number of DAC voltages that had
+    to be clamped per axis.
+    """
+    I = array(I, dtype=float, ndmin=2)
+    polarity = I < 0
+
+    # v_compliance() and vlimit(), of the requested current
+    v = clip(np_abs(I)*config["r_load"] + config["v_above"],
+             -config["vmax_supply"], config["vmax_supply"])
+
+    I_abs = minimum(np_abs(I), config["imax_supply"])     # ilimit()
+
+    # tf_vc_inv() and tf_cc_inv()
+    a_vc, b_vc = tf_params(config, "vc")
+    a_cc, b_cc = tf_params(config, "cc")
+    v_vc = (v - b_vc) / a_vc
+    v_cc = (I_abs - b_cc) / a_cc
+
+    # Clamp to the range that the DACs accept (see dac_set_voltage())
+    vmax_dac = config["vmax_dac"]
+    n_clipped_dac = count_nonzero((v_vc < 0) | (v_vc > vmax_dac), axis=0) \
+        + count_nonzero((v_cc < 0) | (v_cc > vmax_dac), axis=0)
+    v_pol = where(polarity, config["vlevel_pol"], 0.)
+
+    return clip(v_vc, 0., vmax_dac), clip(v_cc, 0., vmax_dac), v_pol, n_clipped_dac
+
+
+class PlaybackPlan:
+    """Precomputed DAC voltages for every step of a schedule.
+
+    `schedule` is an (n, 6) schedule array, of which the times (column 2) and
+    Bc (columns 3-5) are used. `params_tf_VB` is a dict with the [b0, b1]
+    coefficients of the field per axis, as in DataPool.params_tf_VB, and
+    `config` is the server config, from which the power supply, DAC, and
+    slew rate settings are taken.
+
+    After compilation, the following arrays are available, where n is the
+    number of steps and the last axis is always the (x, y, z) axis:
+     - I                (n, 3)  Signed coil currents [A], after clamping
+                                (the VC voltages follow from the currents
+                                before clamping, see currents_to_voltages())
+     - polarity         (n, 3)  True where the polarity is reversed
+     - v_vc, v_cc, v_pol  (n, 3)  DAC voltages of the VC, CC and polarity
+                                  channels [V], after clamping
+     - voltages         (n, 3, 3)  The above DAC voltages per step, as
+                                  [v_vc, v_cc, v_pol], in the same layout as
+                                  the DAC channels in `channel_ids`
+    And the following compilation results:
+     - n_clipped_I      (3,)    Number of steps clamped to imax_supply
+     - n_clipped_dac    (3,)    Number of DAC voltages clamped to
+                                [0, vmax_dac], which indicates that the
+                                transfer function parameters are off
+     - slew_max         (3,)    Largest current slew rate [A/s]
+     - slew_violations  (m,)    Indices of the steps at which the current
+                                slew rate exceeds I_slew_max on any axis
+
+    [DEV NOTE] The slew rates are computed as the current change between two
+    steps divided by the time between them, i.e. assuming that the current
+    ramps linearly between steps. As the power supplies step rather than
+    ramp, this underestimates the actual slew rate, so it is a check for
+    schedules that demand more than the hardware allows, not a guarantee
+    that the limit is respected. During playback, the limit is enforced by
+    the SlewLimiter in the DAC thread.
+    """
+    def __init__(self, schedule, params_tf_VB: dict, config: dict):
+        schedule = array(schedule, dtype=float, ndmin=2)
+        self.n_steps = len(schedule)
+        self.t = schedule[:, 2].copy()
+        Bc = schedule[:, 3:6]
+
+        self.channel_ids = supply_channel_ids(config)
+
+        # Bc -> I, with the polarity taken from the sign of I
+        b0, b1 = array([params_tf_VB[axis] for axis in axes], dtype=float).T
+        I = (Bc - b0) / b1
+        self.polarity = I < 0
+
+        # ilimit()
+        self.n_clipped_I = count_nonzero(np_abs(I) > config["imax_supply"], axis=0)
+        self.I = clip(I, -config["imax_supply"], config["imax_supply"])
+
+        self.v_vc, self.v_cc, self.v_pol, self.n_clipped_dac = \
+            currents_to_voltages(I, config)
+        self.voltages = stack((self.v_vc, self.v_cc, self.v_pol), axis=1)
+
+        self.slew_max, self.slew_violations = find_slew_violations(
+            self.t, self.I, config["I_slew_max"])
+
+    def step(self, i_step: int):
+        """Returns the DAC voltages of step `i_step` as [v_vc, v_cc, v_pol],
+        each a list of (x, y, z) values, in the same layout as channel_ids."""
+        return self.voltages[i_step].tolist()
+
+    def is_clean(self) -> bool:
+        """Returns True if nothing had to be clamped and no slew rate
+        violations were found."""
+        return not (self.n_clipped_I.any() or self.n_clipped_dac.any()
+                    or len(self.slew_violations) > 0)
+
+    def summary(self) -> str:
+        return f"{self.n_steps} steps | " \
+            + f"clamped I: {self.n_clipped_I.tolist()} | " \
+            + f"clamped DAC: {self.n_clipped_dac.tolist()} | " \
+            + f"slew max: {[round(s, 3) for s in self.slew_max.tolist()]} A/s " \
+            + f"({len(self.slew_violations)} violations)"
@@ -35,18 +35,37 @@ The server implementation relies on the server config and the SCC codec.
 """
 
 
+from math import ceil
 from socketserver import TCPServer, ThreadingMixIn, BaseRequestHandler
-from threading import Thread, Lock, main_thread, active_count
+from threading import Thread, Lock, Event, main_thread, active_count
 
-from hashlib import blake2b
-from numpy import array, zeros
+from numpy import arange, array, zeros
 from numpy.random import rand
-from time import time, sleep
+from time import time, sleep, perf_counter
 
 import helmholtz_cage_toolkit.scc.scc4 as codec
+import helmholtz_cage_toolkit.scc.scc4b as codec_b
+from helmholtz_cage_toolkit.scc.framing import framer_for, packet_size_for
+from helmholtz_cage_toolkit.ringbuffer import RingBuffer
+from helmholtz_cage_toolkit.schedule_hash import (
+    hash_chunk_size, n_hash_chunks, chunk_bounds, chunk_digest, root_hash)
+from helmholtz_cage_toolkit.server.commands import command, command_table, run_command
+from helmholtz_cage_toolkit.server.dac_writer import DACWriter
+from helmholtz_cage_toolkit.server.hardware import make_backend
+from helmholtz_cage_toolkit.server.playback_plan import (
+    PlaybackPlan, currents_to_voltages, supply_channel_ids)
+from helmholtz_cage_toolkit.server.slew import SlewLimiter
+from helmholtz_cage_toolkit.server.timing import sleep_until, LatenessHistogram, LoopTimer
 from helmholtz_cage_toolkit.server.server_config import server_config as config
 
 
+# Codecs that a client can switch its connection to using 'set_codec'
+codecs = {
+    "scc4": codec,
+    "scc4b": codec_b,
+}
+
+
 
 def hardware_shutdown(datapool):
     """
@@ -71,6 +90,10 @@ def hardware_shutdown(datapool):
         dedicated software toggle implementation.
     """
     print("hardware_shutdown() called")
+    if datapool.hardware is not None:
+        datapool.hardware.shutdown()
+    if datapool.dac_writer is not None:
+        datapool.dac_writer.invalidate()
 
 
 def threaded_control(datapool):
@@ -86,6 +109,14 @@ def threaded_control(datapool):
 
     serveropt_mutate_Bm:
         if not serveropt_inject_Bm:     mutate() -> Bm
+
+    During playback, every schedule step has an absolute deadline on the
+    monotonic clock: datapool.t_play_mono plus the time of the step. The
+    thread wakes up every threaded_control_period, unless a step is due
+    sooner, in which case it wakes up at the deadline of that step instead,
+    using sleep_until() to hit it within microseconds. How late every step
+    was applied is recorded in datapool.play_lateness, which clients can
+    request with 'get_play_lateness'.
     """
     print(f"Started 'control' thread with period {datapool.threaded_control_period}")
     datapool.kill_threaded_control = False
@@ -93,7 +124,12 @@ def threaded_control(datapool):
     t_prev_mutate = 0.0
     t_prev_inject = 0.0
 
+    timer = datapool.loop_timers["control"]
+    t_planned = perf_counter()
+
     while not datapool.kill_threaded_control:
+        timer.tick(t_planned)
+
         # Bm routing based on certain serveropts:
         if datapool.serveropt_inject_Bm and \
             (2*(time() - t_prev_inject) > datapool.threaded_read_ADC_period):
@@ -120,49 +156,64 @@ def threaded_control(datapool):
             # datapool.write_buffer(datapool.Bm, datapool.mutate(datapool.Bm[0]))
 
 
+        t_wake = timer.next_deadline()
+
         # ==== PLAY MODE ====
-        if datapool.play_mode:
-            # Do only if playback is active
-            if datapool.play is True:
-                # Measure current time since start of play
-                datapool.t_current = time() - datapool.t_play
-
-                # If it is time, move to the next step, unless end of schedule is reached
-                if datapool.t_current >= datapool.t_next:
-                    if datapool.i_step[0] == datapool.n_steps - 2:
-                        datapool.write_buffer(datapool.i_step, datapool.i_step[0]+1)
-                        datapool.write_Bc(datapool.schedule[datapool.i_step[0]][3:6])
-                        # print(
-                        #     f"[DEBUG] Current step: {datapool.i_step}/{datapool.n_steps} (+{round(datapool.t_current, 3)} s)")
-                        if datapool.play_looping:
-                            datapool.write_buffer(datapool.i_step, 0)
-                            datapool.t_play = time()
-                            datapool.t_next = datapool.schedule[1][2]
-                            print(f"[DEBUG] Reached end of schedule -> RESETTING")
-
-                        else:
-                            confirm = datapool.set_play(False)
-                            print(f"[DEBUG] Reached end of schedule -> STOPPING")
+        # Do only if playback is active
+        if datapool.play_mode and datapool.play is True:
+            # Steps are timed against absolute deadlines on the monotonic
+            # clock, so that timing errors do not accumulate from step to step.
+            now = perf_counter()
+            t_deadline = datapool.t_play_mono + datapool.t_next
+            datapool.t_current = now - datapool.t_play_mono
+
+            # If it is time, move to the next step, unless end of schedule is reached
+            if now >= t_deadline:
+                datapool.play_lateness.record(now - t_deadline)
+
+                if datapool.i_step[0] == datapool.n_steps - 2:
+                    datapool.write_i_step(datapool.i_step[0]+1)
+                    datapool.write_Bc(datapool.schedule[datapool.i_step[0]][3:6])
+                    # print(
+                    #     f"[DEBUG] Current step: {datapool.i_step}/{datapool.n_steps} (+{round(datapool.t_current, 3)} s)")
+                    if datapool.play_looping:
+                        # The next loop starts at the deadline of the last
+                        # step, rather than now, so that looping does not drift
+                        t_loop = datapool.schedule[datapool.n_steps - 1][2]
+                        datapool.write_i_step(0)
+                        datapool.t_play_mono += t_loop
+                        datapool.t_play += t_loop
+                        datapool.t_next = datapool.schedule[1][2]
+                        print(f"[DEBUG] Reached end of schedule -> RESETTING")
 
                     else:
-                        datapool.write_buffer(datapool.i_step, datapool.i_step[0] + 1)
-                        # datapool.i_step += 1
-                        # instruct_DACs(datapool, datapool.schedule[datapool.i_step][3:6])
-                        datapool.write_Bc(datapool.schedule[datapool.i_step[0]][3:6])
-                        datapool.t_next = datapool.schedule[datapool.i_step[0] + 1][2]
-                        # print(
-                        #     f"[DEBUG] Current step: {datapool.i_step}/{datapool.n_steps} (+{round(datapool.t_current, 3)} s)")
-                    sleep(max(0., datapool.threaded_control_period - (time() - t0)))
+                        confirm = datapool.set_play(False)
+                        print(f"[DEBUG] Reached end of schedule -> STOPPING")
 
                 else:
-                    sleep(datapool.threaded_control_period)
-
-            else:
-                sleep(datapool.threaded_control_period)
-
-        # ==== MANUAL MODE ====
-        else:
-            sleep(datapool.threaded_control_period)
+                    datapool.write_i_step(datapool.i_step[0] + 1)
+                    # instruct_DACs(datapool, datapool.schedule[datapool.i_step][3:6])
+                    datapool.write_Bc(datapool.schedule[datapool.i_step[0]][3:6])
+                    datapool.t_next = datapool.schedule[datapool.i_step[0] + 1][2]
+                    # print(
+                    #     f"[DEBUG] Current step: {datapool.i_step}/{datapool.n_steps} (+{round(datapool.t_current, 3)} s)")
+
+                # Check again right away, in case the next step is also due
+                timer.tock()
+                t_planned = perf_counter()
+                continue
+
+            # If the next step is due before the next regular wake-up, wake
+            # up exactly at its deadline instead.
+            if t_deadline <= t_wake:
+                timer.tock()
+                t_planned = t_deadline
+                sleep_until(t_deadline, datapool.play_spin_margin)
+                continue
+
+        timer.tock()
+        t_planned = t_wake
+        sleep_until(t_wake)
 
     print(f"Closing control thread")
 
@@ -191,6 +242,20 @@ def threaded_write_DAC(datapool):
         4. If a change was detected, apply this change by instructing the DACs
         5. Also store a copy to datapool.Bc_applied
 
+    In "play mode", the DAC voltages of every schedule step have already been
+    computed when play mode was activated (see DataPool.compile_schedule()),
+    so applying a step only takes looking up its voltages in
+    datapool.play_plan. In "manual mode", Bc is converted when it changes.
+
+    In both modes, the currents are passed through datapool.slew_limiter
+    every tick, which limits how fast the currents change to I_slew_max. If
+    the limiter is active, the DAC voltages of the limited currents are
+    computed on the spot. See slew.py.
+
+    The DAC voltages are written through datapool.dac_writer, which only
+    passes the channels that changed on to datapool.hardware, in one bulk
+    write (see dac_writer.py and hardware.py).
+
     The thread running this function will be in charge of controlling hardware.
     It is important for this hardware that in the event of a software
     exception, the hardware is reset to zero before the code is fully
@@ -216,24 +281,60 @@ def threaded_write_DAC(datapool):
     print(f"Started 'write DAC' thread with period {datapool.threaded_write_DAC_period}")
     datapool.kill_threaded_write_DAC = False
 
-    Bc_prev = [0., 0., 0.]
+    Bc_prev = None
+    i_step_prev = -1
+    I_target = None             # Currents of the current step or Bc [A]
+    voltages_target = None      # DAC voltages belonging to I_target [V]
+    I_applied = None            # Currents last applied, after slew limiting
 
-    # TODO Implement software slew rate limiting for dI/dt
-    # TODO Basically for all three values compute abs(dI/dt) and do not change
-    # TODO Bc more than the limit allows within the DAC writing speed.
-    # TODO Useful for ensuring no hardware is damaged.
+    limiter = datapool.slew_limiter
+    limiter.reset()
+
+    # DAC channels of v_vc, v_cc, v_pol, in that order
+    dac_channel_ids = [channel_id for channel_ids in supply_channel_ids(config)
+                       for channel_id in channel_ids]
+
+    timer = datapool.loop_timers["write_DAC"]
+    t_planned = perf_counter()
 
     while not datapool.kill_threaded_write_DAC:  # Kills loop when set to True
         if not datapool.pause_threaded_write_DAC:  # Pause loop when set to True
             # print("threaded_write_DAC() loop")
-            t0 = time()
-            Bc_read = [0., 0., 0.]
-            if Bc_read == Bc_prev:
-                sleep(max(0., datapool.threaded_write_DAC_period - (time() - t0)))
+            timer.tick(t_planned)
+            plan = datapool.play_plan
+            if datapool.play_mode and plan is not None:
+                Bc_prev = None
+                i_step = datapool.read_i_step()
+                if i_step != i_step_prev:
+                    I_target = tuple(plan.I[i_step].tolist())
+                    voltages_target = plan.step(i_step)
+                    i_step_prev = i_step
             else:
-                pass # TODO Apply Bc_read to the hardware!
+                i_step_prev = -1
+                Bc_read = datapool.read_Bc()
+                if Bc_read != Bc_prev:
+                    plan_Bc = datapool.compile_Bc(Bc_read)
+                    I_target = tuple(plan_Bc.I[0].tolist())
+                    voltages_target = plan_Bc.step(0)
+                    Bc_prev = Bc_read
+
+            I_limited = limiter.limit(I_target, perf_counter())
+            if I_limited != I_applied:
+                if I_limited == I_target:
+                    v_vc, v_cc, v_pol = voltages_target
+                else:
+                    v_vc, v_cc, v_pol = [
+                        v[0].tolist() for v in currents_to_voltages(I_limited, config)[:3]]
+                datapool.dac_writer.write(dac_channel_ids, v_vc + v_cc + v_pol)
+                datapool.write_dac_voltages(v_vc, v_cc)
+                I_applied = I_limited
+            timer.tock()
+            t_planned = timer.next_deadline()
+            sleep_until(t_planned)
         else:
             sleep(datapool.threaded_write_DAC_period)
+            t_planned = perf_counter()
+            limiter.reset(limiter.I)
 
     # When loop is broken, set power supply values to zero.
     # TODO implement safe shutdown
@@ -248,7 +349,14 @@ def threaded_read_ADC(datapool):
 
     The basic idea is this:
     -1. Run until datapool.kill_threaded_read_ADC is set to True, then finish
-
+    1. Read the Im, V_board, Bm, and aux channels through datapool.hardware
+        (see hardware.py). If config["adc_block_size"] is larger than 1,
+        a whole block of samples is read per channel, each with its own
+        timestamp, otherwise a single sample.
+    2. Convert Im and Bm from [V] to [A] and [uT], and write them to the
+        datapool. If serveropt_mutate_Bm or serveropt_inject_Bm is set, Bm
+        is written by the control thread instead, so the measured Bm is
+        discarded.
 
     So, in order to gracefully kill the thread you do the following:
     1. Set datapool.kill_threaded_read_ADC to True
@@ -261,21 +369,57 @@ def threaded_read_ADC(datapool):
     print(f"Started 'read ADC' thread with rate {1/datapool.threaded_read_ADC_period}")
     datapool.kill_threaded_read_ADC = False
 
+    adc_channel_ids = [config[f"pin_adc_channel_im{axis}"] for axis in "xyz"] \
+        + [config["pin_adc_board_power"]] \
+        + [config[f"pin_adc_channel_bm{axis}"] for axis in "xyz"] \
+        + [config["pin_adc_aux1"]]
+    adc_scale_Im = config["adc_scale_Im"]
+    adc_scale_Bm = config["adc_scale_Bm"]
+
+    adc_block_size = config["adc_block_size"]
+    if adc_block_size > 1:
+        block_period = adc_block_size / config["adc_sample_rate"]
+        if abs(block_period - datapool.threaded_read_ADC_period) > 0.01*block_period:
+            print(f"[WARNING] threaded_read_ADC(): ADC blocks span {block_period} s, but the thread period is {datapool.threaded_read_ADC_period} s!")
+
+    timer = datapool.loop_timers["read_ADC"]
+    t_planned = perf_counter()
+
     while not datapool.kill_threaded_read_ADC:  # Kills loop when set to True
 
         if not datapool.pause_threaded_read_ADC:  # Pause loop when set to True
-            t0 = time()
+            timer.tick(t_planned)
             # print("threaded_read_ADC() loop")
 
-            pass # TODO DO ADC READING STUFF
-
-            # TODO if serveropt_mutate_Bm or serveropt_inject_Bm -> Do not write_Bm() here!
+            if adc_block_size > 1:
+                # Block of samples, converted as a whole: (channels, samples)
+                volts, t_read = datapool.hardware.adc_read_buffer(
+                    adc_channel_ids, adc_block_size)
+                if volts is not None:
+                    Im = volts[0:3].T * adc_scale_Im
+                    if datapool.serveropt_mutate_Bm or datapool.serveropt_inject_Bm:
+                        Bm = [datapool.read_Bm()[1]] * len(t_read)
+                    else:
+                        Bm = volts[4:7].T * adc_scale_Bm
+                    datapool.write_adc_block(t_read, Bm, Im, volts[3], volts[7])
+            else:
+                volts, t_read = datapool.hardware.adc_read(adc_channel_ids)
+                if volts is not None:
+                    Im = [v*adc_scale_Im for v in volts[0:3]]
+                    if datapool.serveropt_mutate_Bm or datapool.serveropt_inject_Bm:
+                        Bm = datapool.read_Bm()[1]
+                    else:
+                        Bm = [v*adc_scale_Bm for v in volts[4:7]]
+                    datapool.write_adc_data(Bm, Im, volts[3], volts[7])
 
             # print(f"[DEBUG] Bm = {datapool.read_Bm()}")
-            sleep(max(0., datapool.threaded_read_ADC_period - (time() - t0)))
+            timer.tock()
+            t_planned = timer.next_deadline()
+            sleep_until(t_planned)
 
         else:
             sleep(datapool.threaded_read_ADC_period)
+            t_planned = perf_counter()
 
     print(f"Closing read ADC thread")
 
@@ -299,34 +443,55 @@ class DataPool:
         self.threaded_read_ADC_period = 1/config["threaded_read_ADC_rate"]  # Not thread-safe
         self.threaded_write_DAC_period = 1/config["threaded_write_DAC_rate"]  # Not thread-safe
 
+        # Timing instruments of the thread loops (see 'get_loop_stats')
+        self.loop_timers = {
+            "control": LoopTimer(self.threaded_control_period, config["loop_stats_window"]),
+            "read_ADC": LoopTimer(self.threaded_read_ADC_period, config["loop_stats_window"]),
+            "write_DAC": LoopTimer(self.threaded_write_DAC_period, config["loop_stats_window"]),
+        }
+
 
         # ==== Data buffers ==================================================
-        """ Here all data buffers are defined. They are all defined as lists,
-        such that previous data can be stored for potential analysis.
+        """ Here all data buffers are defined. They are all defined as
+        RingBuffer objects (see ringbuffer.py), such that previous data can be
+        stored for potential analysis.
         
         Entry 0 will always be the most recent value, and should therefore be
         useful in most cases. To write to the buffer, use self.write_buffer().
         """
 
         ibs = config["internal_buffer_size"]
-
-        self.tm = self.init_buffer(ibs, 1)      # Time at which Bm, Im were taken
-        self.Im = self.init_buffer(ibs, 3)      # Measured current Im in [A]
-        self.Bm = self.init_buffer(ibs, 3)      # Measured field Bm in [uT]
-
-        self.Bc = self.init_buffer(ibs, 3)      # Control vector Bc to be applied [uT]
-        self.Vvc = self.init_buffer(ibs, 3)  # Currently unused
-        self.Vcc = self.init_buffer(ibs, 3)  # Currently unused
+        # Buffers with history hold config["history_duration"] seconds of
+        # values at the rate of the thread that writes them. The ADC buffers
+        # must also fit at least one block of ADC samples.
+        ibs_adc = max(ibs, config["adc_block_size"], self.history_size(
+            config["threaded_read_ADC_rate"] * config["adc_block_size"]))
+        ibs_control = max(ibs, self.history_size(config["threaded_control_rate"]))
+        ibs_dac = max(ibs, self.history_size(config["threaded_write_DAC_rate"]))
+
+        self.tm = self.init_buffer(ibs_adc, 1)  # Time at which Bm, Im were taken
+        self.Im = self.init_buffer(ibs_adc, 3)  # Measured current Im in [A]
+        self.Bm = self.init_buffer(ibs_adc, 3)  # Measured field Bm in [uT]
+
+        self.Bc = self.init_buffer(ibs_control, 3)  # Control vector Bc to be applied [uT]
+        self.Vvc = self.init_buffer(ibs_dac, 3)     # DAC voltages of the VC channels [V]
+        self.Vcc = self.init_buffer(ibs_dac, 3)     # DAC voltages of the CC channels [V]
 
         self.Br = self.init_buffer(ibs, 3)      # Magnetic field vector to be rejected
 
-        self.V_board = self.init_buffer(ibs, 1) # Measured value of +12V bus - +5V bus
+        self.V_board = self.init_buffer(ibs_adc, 1) # Measured value of +12V bus - +5V bus
 
-        self.i_step = self.init_buffer(ibs, 1, dtype=int)
+        self.i_step = self.init_buffer(ibs_control, 1, dtype=int)
 
-        self.aux_adc = self.init_buffer(ibs, 1)
+        self.aux_adc = self.init_buffer(ibs_adc, 1)
         self.aux_dac = self.init_buffer(ibs, 6)
 
+        # Immutable snapshots of the most recent telemetry, which the writers
+        # replace as a whole, so that they can be read without locks. See
+        # read_telemetry().
+        self._snapshot_ADC = (0., (0., 0., 0.), (0., 0., 0.))  # (tm, Im, Bm)
+        self._snapshot_DAC = (0, (0., 0., 0.), (0., 0., 0.))   # (i_step, Bc, Br)
+
         # ==== Other parameters ==============================================
         self.params_tf_VB = {
             "x": config["params_tf_VB_x"],
@@ -338,6 +503,14 @@ class DataPool:
 
         self.output_enable = False              # Enable/disable H-bridge output using PSUE pin
 
+        # Hardware backend through which the ADC and DAC are accessed (see
+        # hardware.py). Created by start_hardware_threads().
+        self.hardware = None
+
+        # Change-coalescing writer in front of self.hardware.dac_write() (see
+        # dac_writer.py). Created by start_hardware_threads().
+        self.dac_writer = None
+
         # Initialize schedule
         self.initialize_schedule()
 
@@ -349,8 +522,16 @@ class DataPool:
         self.play = False               # True: Playing | False: Stopped
         self.n_steps = 1                # Number of steps in schedule
         self.t_play = 0.0               # UNIX time at which "play" began
+        self.t_play_mono = 0.0          # perf_counter() time at which "play" began
         self.t_current = 0.0            # Current time in schedule
         self.t_next = 0.0               # Time of next step in schedule
+        self.play_plan = None           # PlaybackPlan of the schedule (see compile_schedule())
+
+        # Slew rate limiter of the coil currents, used by the DAC thread
+        self.slew_limiter = SlewLimiter(config["I_slew_max"], self.threaded_write_DAC_period)
+
+        self.play_spin_margin = config["play_spin_margin"]
+        self.play_lateness = LatenessHistogram(config["play_lateness_bins"])
 
 
         # ==== Serveropts ====================================================
@@ -359,40 +540,39 @@ class DataPool:
 
     # ==== INTERNAL FUNCTIONS ================================================
 
-    def write_buffer(self, buffer: list, value):
+    def write_buffer(self, buffer: RingBuffer, value):
         """First-in, last-out buffer update function.
-        - Increases length of buffer by 1 by inserting new value at position 0
-        - Deletes the last value of the buffer using pop()
+        - Writes the new value as entry 0, stamped with the current time
+        - Overwrites the oldest value of the buffer
+        This is O(1) regardless of the buffer size, see ringbuffer.py.
         Beware: There is NO input validation or type/size checking, you must
         ensure that the value that is written is appropriate!
         """
-        buffer.insert(0, value)
-        buffer.pop()
+        buffer.append(value)
+
+    @staticmethod
+    def history_size(rate: float) -> int:
+        """Returns the number of buffer entries needed to keep
+        config["history_duration"] seconds of values written at <rate> [Hz].
+        """
+        return ceil(config["history_duration"] * rate)
 
-    def init_buffer(self, buffer_size, entry_size, dtype=float) -> list:
-        """Automatically creates a buffer object, which is a list with a number
-        of entries. The number of entries is equal to <buffer_size>.
-        The entries themselves are lists if <entry_size> is larger than 1,
+    def init_buffer(self, buffer_size, entry_size, dtype=float) -> RingBuffer:
+        """Automatically creates a buffer object, which is a RingBuffer with a
+        number of entries. The number of entries is equal to <buffer_size>.
+        The entries themselves are vectors if <entry_size> is larger than 1,
         making the buffer 2D. For <entry_size> equal to 1, the buffer will be
         1D instead. The entries will be floats by default, but the data typing
         of the entries can be controlled using the dtype argument.
 
-        [DEV NOTE] Buffers are created by creating a Numpy array of zeroes of
-        the right type, then using .tolist() to cast it into a list of lists.
-        This will create the correct data format, but for some reason the
-        output of (array).tolist() will be signalled as an <object> rather than
-        a <list>, causing the linter to misreport it. Hence, the operation is
-        enclosed in another list() operation, at negligible performance cost.
-        This now causes a linter misreport on the list() calls, but the error
-        is now localized to this function and can be ignored using # noqa.
+        Like the list buffers that were used before, buffer[0] returns the
+        most recent entry as a float/int, or as a list for 2D buffers.
         """
         if buffer_size <= 0:
             raise ValueError(f"init_buffer(): buffer_size cannot be {buffer_size}!")
 
-        if entry_size == 1:
-            return list(zeros(buffer_size, dtype=dtype).tolist()) # noqa
-        elif entry_size > 1:
-            return list(zeros((buffer_size, entry_size), dtype=dtype).tolist()) # noqa
+        if entry_size >= 1:
+            return RingBuffer(buffer_size, entry_size, dtype=dtype)
         else:
             raise ValueError(f"init_buffer(): Negative entry_size given!")
 
@@ -436,18 +616,11 @@ class DataPool:
     # ==== IO FUNCTIONS ======================================================
 
     def read_Bm(self):
-        """Thread-safely reads the current Bm field from the datapool.
-
-        The lock prevents other threads from updating self.Bm whilst it is
-        being read. Useful to prevent hard-to-debug race condition bugs.
+        """Thread-safely reads the current Bm field, and the time tm at which
+        it was taken, from the datapool, without taking a lock. See
+        read_telemetry().
         """
-        self._lock_ADC.acquire(timeout=0.001)
-        try:
-            tm = self.tm[0]
-            Bm = self.Bm[0]
-        except:  # noqa
-            print("[WARNING] DataPool.read_Bm(): Unable to read self.Bm!")
-        self._lock_ADC.release()
+        tm, Im, Bm = self._snapshot_ADC
         return tm, Bm
 
     def write_Bm(self, Bm: list):
@@ -459,24 +632,18 @@ class DataPool:
         print(f"[DEBUG] write_Bm({Bm})")
         self._lock_ADC.acquire(timeout=0.001)
         try:
+            self.write_buffer(self.tm, time())
             self.write_buffer(self.Bm, Bm)
+            self.publish_ADC()
         except:  # noqa
             print("[WARNING] DataPool.write_Bm(): Unable to write to self.Bm!")
         self._lock_ADC.release()
 
     def read_Bc(self):
-        """Thread-safely reads the current Bc field from the datapool.
-
-        The lock prevents other threads from updating self.Bc whilst it is
-        being read. Useful to prevent hard-to-debug race condition bugs.
+        """Thread-safely reads the current Bc field from the datapool, without
+        taking a lock. See read_telemetry().
         """
-        self._lock_DAC.acquire(timeout=0.001)
-        try:
-            Bc = self.Bc[0]
-        except:  # noqa
-            print("[WARNING] DataPool.read_Bc(): Unable to read self.Bc!")
-        self._lock_DAC.release()
-        return Bc
+        return self._snapshot_DAC[1]
 
     def write_Bc(self, Bc: list):
         """Thread-safely write Bc to the datapool.
@@ -488,23 +655,53 @@ class DataPool:
         self._lock_DAC.acquire(timeout=0.001)
         try:
             self.write_buffer(self.Bc, Bc)
+            self.publish_DAC()
         except:  # noqa
             print("[WARNING] DataPool.write_Bc(): Unable to write to self.Bc!")
         self._lock_DAC.release()
 
-    def read_Br(self):
-        """Thread-safely reads the current Br field from the datapool.
+    def write_i_step(self, i_step: int):
+        """Thread-safely write the current schedule step i_step to the
+        datapool.
 
-        The lock prevents other threads from updating self.Bc whilst it is
-        being read. Useful to prevent hard-to-debug race condition bugs.
+        The lock prevents other threads from accessing self.i_step whilst it
+        is being updated. Useful to prevent hard-to-debug race condition bugs.
+        """
+        self._lock_DAC.acquire(timeout=0.001)
+        try:
+            self.write_buffer(self.i_step, i_step)
+            self.publish_DAC()
+        except:  # noqa
+            print("[WARNING] DataPool.write_i_step(): Unable to write to self.i_step!")
+        self._lock_DAC.release()
+
+    def read_i_step(self):
+        """Thread-safely reads the current schedule step i_step from the
+        datapool, without taking a lock. See read_telemetry().
+        """
+        return self._snapshot_DAC[0]
+
+    def write_dac_voltages(self, Vvc: list, Vcc: list):
+        """Thread-safely writes the DAC voltages of the VC and CC channels of
+        the power supplies to the datapool.
+
+        The lock prevents other threads from accessing self.Vvc and self.Vcc
+        whilst they are being updated. Useful to prevent hard-to-debug race
+        condition bugs.
         """
         self._lock_DAC.acquire(timeout=0.001)
         try:
-            Br = self.Br[0]
+            self.write_buffer(self.Vvc, Vvc)
+            self.write_buffer(self.Vcc, Vcc)
         except:  # noqa
-            print("[WARNING] DataPool.read_Br(): Unable to read self.Br!")
+            print("[WARNING] DataPool.write_dac_voltages(): Unable to write to self.Vvc, self.Vcc!")
         self._lock_DAC.release()
-        return Br
+
+    def read_Br(self):
+        """Thread-safely reads the current Br field from the datapool, without
+        taking a lock. See read_telemetry().
+        """
+        return self._snapshot_DAC[2]
 
     def write_Br(self, Br: list):
         """Thread-safely write Br to the datapool.
@@ -515,30 +712,54 @@ class DataPool:
         self._lock_DAC.acquire(timeout=0.001)
         try:
             self.write_buffer(self.Br, Br)
+            self.publish_DAC()
         except:  # noqa
             print("[WARNING] DataPool.write_Br(): Unable to write to self.Br!")
         self._lock_DAC.release()
 
     def read_telemetry(self):
-        """Thread-safely reads the telemetry data from the datapool.
-
-        The lock prevents other threads from updating this data whilst it is
-        being read. Useful to prevent hard-to-debug race condition bugs.
+        """Thread-safely reads the telemetry data from the datapool, without
+        taking a lock.
+
+        Telemetry has a single writer per group of values (the ADC and DAC
+        sides), but is read by every client, often many times per second.
+        Rather than having every reader take the locks, and contend with the
+        hardware threads for them, every writer publishes an immutable
+        snapshot tuple of the most recent values of its group after each
+        write, by replacing self._snapshot_ADC or self._snapshot_DAC as a
+        whole (see publish_ADC() and publish_DAC()). Readers only read the
+        snapshot attributes, which can never be seen half-updated, as
+        replacing or reading an attribute is atomic. A reader therefore never
+        blocks a writer, nor another reader.
+
+        The values within each snapshot are always mutually consistent, i.e.
+        tm always belongs to Bm. The ADC and DAC snapshots are read one after
+        the other, so a write that happens in between can make one of them one
+        sample newer than the other, which the previous locked implementation
+        also did not protect against in any meaningful way, as ADC and DAC
+        values are updated independently.
+
+        [DEV NOTE] The snapshots contain tuples, not lists, so that a reader
+        cannot modify the snapshot that other readers are reading.
         """
-        self._lock_ADC.acquire(timeout=0.001)
-        self._lock_DAC.acquire(timeout=0.001)
-        try:
-            tm = self.tm[0]
-            i_step = self.i_step[0]
-            Im = self.Im[0]
-            Bm = self.Bm[0]
-            Bc = self.Bc[0]
-        except:  # noqa
-            print("[WARNING] DataPool.read_telemetry(): Unable to read telemetry!")
-        self._lock_ADC.release()
-        self._lock_DAC.release()
+        tm, Im, Bm = self._snapshot_ADC
+        i_step, Bc, Br = self._snapshot_DAC
         return tm, i_step, Im, Bm, Bc
 
+    def publish_ADC(self):
+        """Replaces the ADC telemetry snapshot with the most recent ADC
+        values. Must be called by writers whilst holding self._lock_ADC, after
+        writing to the ADC buffers. See read_telemetry()."""
+        self._snapshot_ADC = (
+            self.tm[0], tuple(self.Im[0]), tuple(self.Bm[0]))
+
+    def publish_DAC(self):
+        """Replaces the DAC telemetry snapshot with the most recent DAC
+        values. Must be called by writers whilst holding self._lock_DAC, after
+        writing to the DAC buffers. See read_telemetry()."""
+        self._snapshot_DAC = (
+            self.i_step[0], tuple(self.Bc[0]), tuple(self.Br[0]))
+
     def write_adc_data(self, Bm, Im, V_board, aux_adc):
         """Thread-safely writes all ADC data to their corresponding fields
          in the datapool.
@@ -548,14 +769,35 @@ class DataPool:
         """
         self._lock_ADC.acquire(timeout=0.001)
         try:
+            self.write_buffer(self.tm, time())
             self.write_buffer(self.Bm, Bm)
             self.write_buffer(self.Im, Im)
             self.write_buffer(self.V_board, V_board)
             self.write_buffer(self.aux_adc, aux_adc)
+            self.publish_ADC()
         except:  # noqa
             print("[WARNING] DataPool.read_Bm(): Unable to read self.Bm!")
         self._lock_ADC.release()
 
+    def write_adc_block(self, tm, Bm, Im, V_board, aux_adc):
+        """Thread-safely writes a block of ADC samples to the datapool, with
+        <tm> the (n,) timestamps of the samples, <Bm> and <Im> (n, 3), and
+        <V_board> and <aux_adc> (n,), oldest sample first. Every sample is
+        stored with its own timestamp, but the telemetry snapshot is only
+        updated once, with the most recent sample.
+        """
+        self._lock_ADC.acquire(timeout=0.001)
+        try:
+            self.tm.extend(tm, tm)
+            self.Bm.extend(Bm, tm)
+            self.Im.extend(Im, tm)
+            self.V_board.extend(V_board, tm)
+            self.aux_adc.extend(aux_adc, tm)
+            self.publish_ADC()
+        except:  # noqa
+            print("[WARNING] DataPool.write_adc_block(): Unable to write ADC data!")
+        self._lock_ADC.release()
+
     def read_aux_adc(self):
         """Thread-safely reads the ADC aux1 channel data from the datapool.
 
@@ -616,8 +858,8 @@ class DataPool:
 
     def read_schedule_segment(self, segment_id: int):
         """Thread-safely reads a schedule segment from the schedule in the
-        datapool, if it exists, and returns it. If it does not exist, it
-        returns 0.
+        datapool, if it exists, and returns it as a list, with the segment
+        number and schedule length as ints. If it does not exist, it returns 0.
 
         The lock prevents other threads from accessing the schedule whilst it
         is being edited. Useful to prevent hard-to-debug race condition bugs.
@@ -630,16 +872,23 @@ class DataPool:
             print(f"[WARNING] get_schedule_segment(): Tried to set " +
                   f"segment {segment_id}, but this is out of bounds for a " +
                   f"schedule of length {len(self.schedule)}!")
+            self._lock_schedule.release()
             return 0
 
-        segment = self.schedule[segment_id]
+        segment = self.schedule[segment_id].tolist()
         self._lock_schedule.release()
+        segment[0] = int(segment[0])
+        segment[1] = int(segment[1])
         return segment
 
     def write_schedule_segment(self, segment: list):
         """Thread-safely writes a schedule segment into the schedule, by
         consulting the ID of the segment (first entry, segment[0]) and writing
-        it to the schedule object.
+        it into the corresponding row of the schedule array, in place.
+
+        The hash chunk containing the segment is rehashed if the segment is
+        its last one, so that a schedule sent in order is hashed as it arrives
+        (see update_schedule_digests()).
 
         The lock prevents other threads from accessing the schedule whilst it
         is being edited. Useful to prevent hard-to-debug race condition bugs.
@@ -648,8 +897,68 @@ class DataPool:
 
         self._lock_schedule.acquire(timeout=0.001)
         self.schedule[segment[0]] = segment
-        self.schedule_hash = ""     # Modifying the schedule voids the hash.
+        self.update_schedule_digests(segment[0], 1)
+        self._lock_schedule.release()
+
+    def write_schedule_chunk(self, i_first: int, tB):
+        """Thread-safely writes a chunk of consecutive schedule segments into
+        the schedule, starting at segment `i_first`. `tB` is an (n, 4) array
+        with the segment times and Bc values, as it comes out of a k-packet.
+        The segment numbers and schedule length are filled in here, so the
+        resulting segments are identical to those written by
+        write_schedule_segment(). The chunk is written in place, directly into
+        the rows of the schedule array, and the hash chunks it completes are
+        rehashed right away.
+
+        Returns 1 if successful, and -1 if the chunk does not fit in the
+        allocated schedule.
+
+        The lock prevents other threads from accessing the schedule whilst it
+        is being modified. Useful to prevent hard-to-debug race condition bugs.
+        """
+        n_seg = len(tB)
+
+        self._lock_schedule.acquire(timeout=0.001)
+        n_total = len(self.schedule)
+        if i_first + n_seg > n_total:
+            print(f"[WARNING] write_schedule_chunk(): Tried to write segments " +
+                  f"{i_first}-{i_first + n_seg - 1} into schedule of length {n_total}!")
+            self._lock_schedule.release()
+            return -1
+
+        rows = self.schedule[i_first:i_first + n_seg]   # View, not a copy
+        rows[:, 0] = arange(i_first, i_first + n_seg)
+        rows[:, 1] = n_total
+        rows[:, 2:] = tB
+        self.update_schedule_digests(i_first, n_seg)
         self._lock_schedule.release()
+        return 1
+
+    def update_schedule_digests(self, i_first: int, n_seg: int):
+        """Updates the leaf digests of the hash chunks touched by a write of
+        `n_seg` segments starting at segment `i_first`, and voids the schedule
+        hash. See schedule_hash.py for how the schedule is hashed.
+
+        A touched hash chunk is rehashed right away if the write covers its
+        last segment, as the chunk is then most likely complete. Otherwise, its
+        digest is voided, and it is rehashed by read_schedule_hash() when the
+        hash is requested. This way, a schedule that is written from start to
+        end is hashed while it arrives, with every chunk hashed only once, and
+        the schedule hash is available almost immediately afterwards.
+
+        Must be called whilst holding self._lock_schedule.
+        """
+        n_total = len(self.schedule)
+        i_end = i_first + n_seg
+        for i_chunk in range(i_first // hash_chunk_size,
+                             (i_end - 1) // hash_chunk_size + 1):
+            chunk_first, chunk_end = chunk_bounds(i_chunk, n_total)
+            if i_end >= chunk_end:
+                self.schedule_digests[i_chunk] = chunk_digest(
+                    self.schedule[chunk_first:chunk_end])
+            else:
+                self.schedule_digests[i_chunk] = None
+        self.schedule_hash = ""     # Modifying the schedule voids the hash.
 
     def initialize_schedule(self):
         """Thread-safely writes the default init schedule to the datapool.
@@ -664,7 +973,8 @@ class DataPool:
 
         self.schedule_hash = ""     # Modifying the schedule voids the hash.
 
-        self.schedule = [[0, 0, 0., 0., 0., 0.], ]
+        self.schedule = array([[0, 0, 0., 0., 0., 0.], ])
+        self.schedule_digests = [None]      # Leaf digests, see schedule_hash.py
         self.schedule_name = "init"
         self.schedule_duration = 0.0
 
@@ -679,8 +989,13 @@ class DataPool:
         write_schedule_segment(). The schedule name and duration are also
         written to the datapool. Returns a 1 for remote confirmation purposes.
 
-        Note that the dtypes of the empty schedule values will all be float,
-        where some have to be int, but write_schedule_segment() addresses this.
+        The schedule is a single (n_seg, 6) float64 array, rather than a list
+        of lists, which takes about a fifth of the memory and can be hashed
+        without copying it. This means the segment number and schedule length
+        are stored as floats, which is exact up to 2^53 segments, and which
+        read_schedule_segment() casts back to int. Note that a float64 array
+        is also exactly what array() makes of a list of segments, so the hash
+        is identical to the one the client computes.
 
         The lock prevents other threads from accessing the schedule whilst it
         is being edited. Useful to prevent hard-to-debug race condition bugs.
@@ -694,7 +1009,8 @@ class DataPool:
         self.schedule_name = name
         self.schedule_duration = duration
         # self.schedule = [[0, 0, 0., 0., 0., 0.], ]*n_seg  # Risky implementation
-        self.schedule = self.init_buffer(n_seg, 6)
+        self.schedule = zeros((n_seg, 6))
+        self.schedule_digests = [None] * n_hash_chunks(n_seg)
 
         self._lock_schedule.release()
 
@@ -706,20 +1022,29 @@ class DataPool:
         """Thread-safely reads the value of self.schedule_hash and returns it.
         If the hash is empty, generate it, but only when allowed.
 
-        The reason for potentially disallowing it is that hashing takes
-        significant time and computational resources, and since accessing it
-        here thread-locks the object, it means that it cannot be accessed for
-        schedule playback, which would result in execution lag.
+        The schedule hash is the root hash of the leaf digests of all hash
+        chunks (see schedule_hash.py). Normally, these were already computed
+        whilst the schedule was written, and generating the hash only takes a
+        single hash over the leaf digests. Only hash chunks whose digest was
+        voided are hashed here.
+
+        The reason for potentially disallowing it is that hashing voided
+        chunks can take significant time and computational resources, and
+        since accessing it here thread-locks the object, it means that it
+        cannot be accessed for schedule playback, which would result in
+        execution lag.
 
         The lock prevents other threads from accessing the schedule whilst it
         is being edited. Useful to prevent hard-to-debug race condition bugs.
 
-        [DEV NOTE] As an extra safety/performance measure, the schedule could
-        be deep-copied so that the thread lock can be lifted while the hashing
-        function works on the schedule copy. However, this will take twice the
-        memory resources, and for large schedules, where you expect the hashing
-        to take a long time, available memory will already be limited. So this
-        idea has been shelved for now, but may be revisited in the future.
+        [DEV NOTE] The schedule array is contiguous, so its chunks are hashed
+        directly from its memory buffer, without first copying them.
+        As an extra safety measure, the schedule could be deep-copied so that
+        the thread lock can be lifted while the hashing function works on the
+        schedule copy. However, this will take twice the memory resources, and
+        for large schedules, where you expect the hashing to take a long time,
+        available memory will already be limited. So this idea has been
+        shelved for now, but may be revisited in the future.
         """
         # print("[DEBUG] read_schedule_hash()")
 
@@ -729,15 +1054,39 @@ class DataPool:
 
         if schedule_hash == "" and generate_hash is True:
             t0 = time()
-            schedule_hash = blake2b(
-                array(self.schedule).tobytes(), digest_size=8
-            ).hexdigest()
-            print(f"[BLAKE2B] Hash generated in {int((time()-t0)*1E6)} \u03bcs")
+            n_voided = self.complete_schedule_digests()
+            schedule_hash = root_hash(self.schedule_digests)
+            print(f"[BLAKE2B] Hash generated in {int((time()-t0)*1E6)} \u03bcs ({n_voided} chunk(s) rehashed)")
             self.schedule_hash = schedule_hash
 
         self._lock_schedule.release()
         return schedule_hash
 
+    def complete_schedule_digests(self):
+        """Hashes all hash chunks whose leaf digest was voided, and returns
+        how many there were. Must be called whilst holding
+        self._lock_schedule."""
+        n_total = len(self.schedule)
+        n_voided = 0
+        for i_chunk, digest in enumerate(self.schedule_digests):
+            if digest is None:
+                self.schedule_digests[i_chunk] = chunk_digest(
+                    self.schedule[slice(*chunk_bounds(i_chunk, n_total))])
+                n_voided += 1
+        return n_voided
+
+    def read_schedule_digests(self):
+        """Thread-safely returns the leaf digests of all hash chunks of the
+        schedule as hex strings, hashing voided chunks first if needed. These
+        can be used by the client to find the chunks that differ from its local
+        copy, if the schedule hashes do not match.
+        """
+        self._lock_schedule.acquire(timeout=30.000)
+        self.complete_schedule_digests()
+        digests = [digest.hex() for digest in self.schedule_digests]
+        self._lock_schedule.release()
+        return digests
+
     def read_schedule_info(self, generate_hash=True):
         # print("[DEBUG] read_schedule_info()")
 
@@ -791,6 +1140,43 @@ class DataPool:
 
     # ==== SCHEDULE PLAYBACK =================================================
 
+    def compile_schedule(self):
+        """Converts the Bc values of the whole schedule into the DAC voltages
+        of the power supplies, and stores the result in self.play_plan, so
+        that the DAC thread only has to look up the voltages of a step during
+        playback. See playback_plan.py for details.
+
+        The compiled plan also reports the steps that exceed the limits of the
+        power supplies or the DACs, or the current slew rate limit
+        I_slew_max, which are printed as a warning, and can be requested by
+        clients with 'get_play_plan'.
+
+        The plan is based on the schedule and params_tf_VB at the time of
+        compilation, so it is recompiled every time that play mode is
+        activated.
+        """
+        self.play_plan = PlaybackPlan(self.schedule, self.params_tf_VB, config)
+        if not self.play_plan.is_clean():
+            print(f"[WARNING] DataPool.compile_schedule(): {self.play_plan.summary()}")
+        return self.play_plan
+
+    def check_schedule_slew(self):
+        """Checks the whole schedule for segments at which the coil currents
+        would have to change faster than I_slew_max, i.e. the segments that
+        the slew rate limiter would clip during playback. Intended to be
+        used right after a schedule has been uploaded, see 'check_schedule_slew'.
+        Returns the largest slew rate per axis [A/s], and the indices of the
+        steps that violate the limit.
+        """
+        plan = PlaybackPlan(self.schedule, self.params_tf_VB, config)
+        return plan.slew_max, plan.slew_violations
+
+    def compile_Bc(self, Bc):
+        """Converts a single Bc value into the DAC voltages of the power
+        supplies, by compiling a plan of a single step. Used in manual mode.
+        """
+        return PlaybackPlan([[0, 1, 0.] + list(Bc)], self.params_tf_VB, config)
+
     def set_play_mode(self, play_mode_on: bool):
         """Activates or deactivates play_mode."""
         # print("[DEBUG] set_play_mode():", play_mode_on, type(play_mode_on))
@@ -808,21 +1194,26 @@ class DataPool:
                 2. The internal play tracking parameters will be initialized to the
                     first step of the current schedule.
                 3. The hardware is instructed to output the first schedule step.
+            Before all of this, the schedule is compiled into DAC voltages
+            (see compile_schedule()).
             """
             # print("[DEBUG] activate_play_mode")
 
+            self.compile_schedule()
+
             self.play_mode = True
             self.play = False
 
             self.n_steps = len(self.schedule)
-            self.write_buffer(self.i_step, 0)
+            self.write_i_step(0)
 
             self.t_play = time()
+            self.t_play_mono = perf_counter()
             self.t_current = self.schedule[self.i_step[0]][2]
             self.t_next = self.schedule[self.i_step[0]+1][2]
 
             # Set hardware to first schedule step
-            self.write_Bc(self.schedule[datapool.i_step[0]][3:6])
+            self.write_Bc(self.schedule[self.i_step[0]][3:6])
 
             return 1
 
@@ -851,7 +1242,8 @@ class DataPool:
         Starts or stops schedule playback. Pausing is not implemented.
 
         When playback is started, self.play is set to True and the unix start
-        time is recorded.
+        time is recorded, along with the monotonic start time that the step
+        deadlines are based on. The step lateness statistics are also reset.
 
         When playback is stopped, the playback parameters are reset to the
         beginning of the schedule. The hardware is also set to the first
@@ -860,21 +1252,91 @@ class DataPool:
         # print("[DEBUG] set_play:", play)
 
         if play is True:
+            self.play_lateness.reset()
             self.t_play = time()
+            self.t_play_mono = perf_counter()
             self.play = True
             return 1
         else:
             self.play = False
             self.t_current = 0.0
-            self.write_buffer(self.i_step, 0)
+            self.write_i_step(0)
             self.t_next = self.schedule[self.i_step[0]][2]
 
             # Reset hardware to first schedule step
-            self.write_Bc(self.schedule[datapool.i_step[0]][3:6])
+            self.write_Bc(self.schedule[self.i_step[0]][3:6])
 
             return 0
 
 
+def start_hardware_threads(datapool):
+    """Creates and starts the control, read_ADC, and write_DAC threads, and
+    returns them as a tuple, for stop_hardware_threads() to stop later. This
+    is shared by the server entry points in this file and server_asyncio.py.
+    The hardware backend is created first, if the datapool does not have one
+    yet, along with a DACWriter for it.
+    """
+    if datapool.hardware is None:
+        datapool.hardware = make_backend(config)
+    datapool.dac_writer = DACWriter(datapool.hardware.dac_write,
+                                    config["dac_write_tolerance"])
+
+    # Set up thread for control
+    thread_control = Thread(
+        name="Control Thread",
+        target=threaded_control,
+        args=(datapool,),
+        daemon=True)
+    thread_control.start()
+
+    # Set up thread for continuously polling the ADC, and writing it to the
+    # server datapool.
+    thread_read_ADC = Thread(
+        name="Read ADC Thread",
+        target=threaded_read_ADC,
+        args=(datapool,),
+        daemon=True)
+    thread_read_ADC.start()
+
+    # Set up thread that finds when a change in control parameters occurs, and
+    # when it occurs, ensures that it is written to the DAC.
+    thread_write_DAC = Thread(
+        name="Write DAC Thread",
+        target=threaded_write_DAC,
+        args=(datapool,),
+        daemon=False)  # Not set as daemon to ensure that it finishes properly
+    thread_write_DAC.start()
+
+    return thread_control, thread_read_ADC, thread_write_DAC
+
+
+def stop_hardware_threads(datapool, hardware_threads):
+    """Gracefully terminates the threads started by start_hardware_threads(),
+    and then resets the hardware."""
+    thread_control, thread_read_ADC, thread_write_DAC = hardware_threads
+
+    print("Shutting down - finishing threads.")
+    datapool.kill_threaded_read_ADC = True
+    datapool.kill_threaded_write_DAC = True
+    datapool.kill_threaded_control = True
+
+    ttest = time()
+    thread_read_ADC.join(timeout=1.0)
+    print(f"Shut down read_ADC thread in {round((time()-ttest)*1E3, 3)} ms")
+
+    ttest = time()
+    thread_write_DAC.join(timeout=5.0)
+    print(f"Shut down write_DAC thread in {round((time()-ttest)*1E3, 3)} ms")
+
+    ttest = time()
+    thread_control.join(timeout=1.0)
+    print(f"Shut down control thread in {round((time()-ttest)*1E3, 3)} ms")
+
+    # For safety: set power supplies to zero, separately from apply_Bc_thread
+    print(f"Resetting Bc just in case")
+    hardware_shutdown(datapool)
+
+
 # Server object
 class ThreadedTCPServer(ThreadingMixIn, TCPServer):
     """ This is a subclassed TCP Server class with threading enabled.
@@ -921,18 +1383,32 @@ class ThreadedTCPRequestHandler(BaseRequestHandler):
 
         self.v = config["verbosity"]
 
+        # Every connection starts out in SCC4, so that clients that do not
+        # know about other codecs keep working. See 'set_codec'.
+        self.codec = codec
+        self.framer = framer_for(self.codec)
+
+        # Telemetry push subscription (see 'subscribe_telemetry'). The send
+        # lock keeps pushed packets and responses from interleaving. A new
+        # subscription is pending until its confirmation has been sent.
+        self._lock_send = Lock()
+        self.push_thread = None
+        self.push_stop = Event()
+        self.push_pending = None
+
     def handle(self):
         """
         This is the default handling routine for any data packets sent to the
         server from any client. Its behaviour is to while-loop forever until
         interrupted.
 
-        Every server-client interaction is blocking for that client. This
-        means that every incoming packet warrants a response packet from the
-        server before a new packet can be sent from the client. A packet from
-        one client will not block a packet coming from another client, as it
-        will be interacting with a different instance of the handler running
-        in its own thread.
+        Every incoming packet warrants a response packet from the server, and
+        responses are sent in the order in which the packets arrived. A client
+        may either wait for each response before sending the next packet, or
+        send several packets at once and read back the responses in order. A
+        packet from one client will not block a packet coming from another
+        client, as it will be interacting with a different instance of the
+        handler running in its own thread.
 
         The first thing that is done when a packet arrives is its type is
         identified. This involves the reading of the first byte character
@@ -944,366 +1420,653 @@ class ThreadedTCPRequestHandler(BaseRequestHandler):
         Every subroutine for handling a particular package type will result in
         the creation "package_out", which holds the package that will be sent
         in response. Empty packets will not be sent.
+
+        Incoming bytes are passed through a PacketFramer rather than assuming
+        that every recv() returns exactly one packet. A single recv() may
+        contain a partial packet, which is then kept until the rest arrives,
+        or several packets, which are all handled in order. Responses to the
+        packets of a single recv() are sent back together in one sendall().
         """
         print("handle()")
         while True:
-            packet_out = None
-            packet_in = self.request.recv(256)
-            # t0 = time()  # [TIMING]
-            if packet_in == b"":
+            data = self.request.recv(config["recv_buffer_size"])
+            if data == b"":
                 break
-            type_id = codec.packet_type(packet_in)
-            # t1 = time()  # [TIMING]
-
-            if self.v >= 3:
-                print("[DEBUG] packet_in:", packet_in)
-
-            if type_id == "b":
-                """b-packets received from a client are considered a request 
-                for Bm, and always have their contents discarded. The server
-                sends back a b-packet with a timestamp and the current value
-                of Bm."""
-                if self.v >= 2:
-                    print("[DEBUG] Detected b-packet")
-                # print("[DEBUG] READ_BM()", self.server.datapool.read_Bm())
-                packet_out = codec.encode_bpacket(
-                    *self.server.datapool.read_Bm()
-                )
-
-
-            elif type_id == "c":
-                """c-packets contain power supply instructions in the form of
-                Bc: a desired flux density value for all three axes. Return
-                an m-packet with 1 if successfully passed on to the Datapool,
-                or -1 if it was unsuccessful."""
-                if self.v >= 2:
-                    print("[DEBUG] Detected c-packet")
-                Bc = codec.decode_cpacket(packet_in)
-                try:
-                    # Safety measure that prevents manual control when play
-                    # mode is active.
-                    if self.server.datapool.play_mode is True:
-                        packet_out = codec.encode_mpacket("-2")
-                    else:
-                        self.server.datapool.write_Bc(Bc)
-                        if self.v >= 4:
-                            print("[DEBUG] Bc written to datapool:", Bc, type(Bc))
-                            print("[DEBUG] CHECK datapool.Bc:", self.server.datapool.Bc)
-                        packet_out = codec.encode_mpacket("1")
-                except:  # noqa
-                    packet_out = codec.encode_mpacket("-1")
-
-
-            elif type_id == "e":
-                """The purpose of e-packets is to require as little processing 
-                as possible, and they will be comstantly coming in from the 
-                client, so they are instantly decoded, re-encoded, and echoed 
-                back without any additional action."""
-                if self.v >= 2:
-                    print("[DEBUG] Detected e-packet")
-                packet_out = codec.encode_epacket(
-                    codec.decode_epacket(packet_in)
-                )
-
-
-            elif type_id == "m":
-                """m-packets comprise simple string messages. They are always 
-                displayed in the server terminal, and a simple acknowledgement 
-                m-packet is sent in response."""
-                if self.v >= 2:
-                    print("[DEBUG] Detected m-packet")
-
-                msg = codec.decode_mpacket(packet_in)
-                print(f"[{self.client_address[0]}:{self.client_address[1]}] {msg}")
-                packet_out = codec.encode_mpacket("1")  # Send 1 as confirmation
-
-
-            elif type_id == "s":
-                """s-packets are schedule segments and usually sent in large
-                batches. The corresponding entry in the schedule located in
-                the Datapool is updated with the information in the s-packet.
-                The segment number is sent back as a acknowledgement and 
-                verification."""
-                if self.v >= 2:
-                    print("[DEBUG] Detected s-packet")
-
-                segment = codec.decode_spacket(packet_in)
-                self.server.datapool.write_schedule_segment(segment)
-                # Send segment number back as a verification
-                packet_out = codec.encode_mpacket(str(segment[0]))
-
-
-            elif type_id == "t":
-                """t-packets received from a client are considered a request 
-                for telemetry, and always have their contents discarded. The 
-                server responds with a t-packet with a timestamp and the 
-                latest telemetry values as specified by the SCC codec."""
-                if self.v >= 2:
-                    print("[DEBUG] Detected t-packet")
-                packet_out = codec.encode_tpacket(
-                    *self.server.datapool.read_telemetry()
-                )
-
-
-            elif type_id == "x":
-                """x-packets always contain a command, the number of additional
-                arguments, as well as these additional arguments. This routine
-                simply identifies the function name and its arguments, and 
-                delegates these to command_handle() for further processing.
-                When done, command_handle() returns the contents of packet_out.
-                """
-                if self.v >= 2:
-                    print("[DEBUG] Detected x-packet")
-                fname, args = codec.decode_xpacket(packet_in)
-                if self.v >= 2:
-                    print(f"[DEBUG] {fname}({args})")
-                packet_out = self.command_handle(fname, args)
 
+            data_out = self.handle_data(data)
 
-            else:
-                """Raise exception when encountering an unrecognised packet 
-                type."""
-                raise ValueError(f"Encountered uninterpretable type_id '{type_id}' in received packet.")
+            if data_out:
+                self._lock_send.acquire()
+                self.request.sendall(data_out)
+                self._lock_send.release()
 
-            if self.v >= 3:
-                print("[DEBUG] packet_out:", packet_out)
+            self.start_pending_push()
 
-            # t2 = time()  # [TIMING]
+    def handle_data(self, data):
+        """Feeds received bytes to the framer, handles every packet that is
+        complete as a result, and returns the framed responses as a single
+        bytes object (which is empty if there is nothing to send).
 
-            # Send packet_out:
-            if packet_out is not None:
-                self.request.sendall(packet_out)
+        This is the part of handle() that does not touch the socket, so that
+        other server cores (see server_asyncio.py) can reuse it.
+        """
+        self.framer.feed(data)
 
-            # t3 = time()  # [TIMING]
-            # print(f"Sent {codec.packet_type(packet_out)}-packet. Time: {int((t1-t0)*1E6)}, {int((t2-t1)*1E6)}, {int((t3-t2)*1E6)} \u03bcs")  # [TIMING]
+        packets_out = []
+        for packet_in in self.framer:
+            packets_out.append(self.frame_response(self.handle_packet(packet_in)))
 
+        return b"".join(packets_out)
 
-    def command_handle(self, fname, args):
-        """
-        This function handles the interpretation of all x-packets sent to the
-        server, executes the corresponding actions, and composes the
-        appropriate properties of the response packet.
+    def frame_response(self, packet_out):
+        """Returns the response `packet_out` of handle_packet() framed for
+        sending, or b"" if it is None."""
+        data_out = b"" if packet_out is None else self.framer.frame(packet_out)
 
-        Here is a list of all functions the server currently supports:
+        # If the codec was just switched (see 'set_codec'), the response above
+        # still goes out in the old framing, and everything after it is
+        # framed according to the new codec.
+        if packet_size_for(self.codec) != self.framer.packet_size:
+            self.framer.set_packet_size(packet_size_for(self.codec))
 
-        get_aux_adc
-        get_aux_dac / set_aux_dac
-        get_Bc
-        get_Br / set_Br
-        get output_enable / set output_enable
-        get_schedule_info
-        get_server_uptime
-        get_socket_info
-        get_serveropt_mutate_Bm / set_serveropt_mutate_Bm
-        get_V_board
+        return data_out
 
+    def handle_packet(self, packet_in):
+        """Handles a single complete packet, and returns the response packet,
+        or None if no response should be sent. See handle().
         """
         packet_out = None
-
-        if fname == "get_aux_adc":
-            packet_out = codec.encode_mpacket(
-                str(self.server.datapool.read_aux_adc()))
-
-
-        elif fname == "get_aux_dac":
-            dac = self.server.datapool.aux_dac[0]               # Not thread-safe
-            packet_out = codec.encode_mpacket(
-                f"{dac[0]},{dac[1]},{dac[2]},{dac[3]},{dac[4]},{dac[5]}"
-            )
-
-        elif fname == "set_aux_dac":
-            dac_str = [args[0], args[1], args[2], args[3], args[4], args[5]]
-            dac_vals = [float(item) for item in dac_str]
-            self.server.datapool.write_buffer(
-                self.server.datapool.aux_dac, dac_vals
-            )                                               # Not thread-safe
-            dac = self.server.datapool.aux_dac[0]           # Not thread-safe
-            packet_out = codec.encode_mpacket(
-                f"{dac[0]},{dac[1]},{dac[2]},{dac[3]},{dac[4]},{dac[5]}"
+        # t0 = time()  # [TIMING]
+        type_id = self.codec.packet_type(packet_in)
+        # t1 = time()  # [TIMING]
+
+        if self.v >= 3:
+            print("[DEBUG] packet_in:", packet_in)
+
+        if type_id == "b":
+            """b-packets received from a client are considered a request 
+            for Bm, and always have their contents discarded. The server
+            sends back a b-packet with a timestamp and the current value
+            of Bm."""
+            if self.v >= 2:
+                print("[DEBUG] Detected b-packet")
+            # print("[DEBUG] READ_BM()", self.server.datapool.read_Bm())
+            packet_out = self.codec.encode_bpacket(
+                *self.server.datapool.read_Bm()
             )
 
 
-        # Requests the Bc value:
-        elif fname == "get_Bc":
-            packet_out = codec.encode_cpacket(self.server.datapool.read_Bc())
-
-
-        # Requests the Br value:
-        elif fname == "get_Br":
-            packet_out = codec.encode_mpacket("{},{},{}".format(
-                *self.server.datapool.read_Br()))
-        # Sets the Br value:
-        elif fname == "set_Br":
-            Br = [args[0], args[1], args[2]]
-            self.server.datapool.write_Br(Br)
-            if self.v >= 4:
-                print("[DEBUG] Br written to datapool:", Br, type(Br))
-                print("[DEBUG] CHECK datapool.Br:", self.server.datapool.Br)
-            packet_out = codec.encode_mpacket("1")
-
-
-        elif fname == "get_params_VB":
-            p = self.server.datapool.params_tf_VB           # Not thread-safe
-            packet_out = codec.encode_mpacket(
-                f"{p['x'][0]},{p['x'][1]},"
-                + f"{p['y'][0]},{p['y'][1]},"
-                + f"{p['z'][0]},{p['z'][1]},"
+        elif type_id == "c":
+            """c-packets contain power supply instructions in the form of
+            Bc: a desired flux density value for all three axes. Return
+            an m-packet with 1 if successfully passed on to the Datapool,
+            or -1 if it was unsuccessful."""
+            if self.v >= 2:
+                print("[DEBUG] Detected c-packet")
+            Bc = self.codec.decode_cpacket(packet_in)
+            try:
+                # Safety measure that prevents manual control when play
+                # mode is active.
+                if self.server.datapool.play_mode is True:
+                    packet_out = self.codec.encode_mpacket("-2")
+                else:
+                    self.server.datapool.write_Bc(Bc)
+                    if self.v >= 4:
+                        print("[DEBUG] Bc written to datapool:", Bc, type(Bc))
+                        print("[DEBUG] CHECK datapool.Bc:", self.server.datapool.Bc)
+                    packet_out = self.codec.encode_mpacket("1")
+            except:  # noqa
+                packet_out = self.codec.encode_mpacket("-1")
+
+
+        elif type_id == "e":
+            """The purpose of e-packets is to require as little processing 
+            as possible, and they will be comstantly coming in from the 
+            client, so they are instantly decoded, re-encoded, and echoed 
+            back without any additional action."""
+            if self.v >= 2:
+                print("[DEBUG] Detected e-packet")
+            packet_out = self.codec.encode_epacket(
+                self.codec.decode_epacket(packet_in)
             )
 
-        elif fname == "set_params_VB":
-            count = 0
-            if args[0] is not False:
-                self.server.datapool.params_tf_VB["x"][0] = args[0]     # Not thread-safe
-                count += 1
-            if args[1] is not False:
-                self.server.datapool.params_tf_VB["x"][1] = args[1]     # Not thread-safe
-                count += 1
-            if args[2] is not False:
-                self.server.datapool.params_tf_VB["y"][0] = args[2]     # Not thread-safe
-                count += 1
-            if args[3] is not False:
-                self.server.datapool.params_tf_VB["y"][1] = args[3]     # Not thread-safe
-                count += 1
-            if args[4] is not False:
-                self.server.datapool.params_tf_VB["z"][0] = args[4]     # Not thread-safe
-                count += 1
-            if args[5] is not False:
-                self.server.datapool.params_tf_VB["z"][1] = args[5]     # Not thread-safe
-                count += 1
-
-            packet_out = codec.encode_mpacket(str(count))
 
-
-        elif fname == "get_output_enable":
-            packet_out = codec.encode_mpacket(
-                str(int(self.server.datapool.read_output_enable()))
+        elif type_id == "m":
+            """m-packets comprise simple string messages. They are always 
+            displayed in the server terminal, and a simple acknowledgement 
+            m-packet is sent in response."""
+            if self.v >= 2:
+                print("[DEBUG] Detected m-packet")
+
+            msg = self.codec.decode_mpacket(packet_in)
+            print(f"[{self.client_address[0]}:{self.client_address[1]}] {msg}")
+            packet_out = self.codec.encode_mpacket("1")  # Send 1 as confirmation
+
+
+        elif type_id == "s":
+            """s-packets are schedule segments and usually sent in large
+            batches. The corresponding entry in the schedule located in
+            the Datapool is updated with the information in the s-packet.
+            The segment number is sent back as a acknowledgement and 
+            verification."""
+            if self.v >= 2:
+                print("[DEBUG] Detected s-packet")
+
+            segment = self.codec.decode_spacket(packet_in)
+            self.server.datapool.write_schedule_segment(segment)
+            # Send segment number back as a verification
+            packet_out = self.codec.encode_mpacket(str(segment[0]))
+
+
+        elif type_id == "k":
+            """k-packets are chunks of many consecutive schedule segments,
+            used for bulk schedule transfers. They only exist in SCC4B. The
+            chunk is written into the schedule in the Datapool in one go, and
+            the chunk index is sent back as acknowledgement and verification,
+            or -1 if the chunk did not fit the allocated schedule, or if the
+            connection does not use SCC4B (see 'set_codec')."""
+            if self.v >= 2:
+                print("[DEBUG] Detected k-packet")
+
+            if not hasattr(self.codec, "decode_kpacket"):
+                packet_out = self.codec.encode_mpacket("-1")
+            else:
+                i_chunk, i_first, tB = self.codec.decode_kpacket(packet_in)
+                if self.server.datapool.write_schedule_chunk(i_first, tB) == 1:
+                    packet_out = self.codec.encode_mpacket(str(i_chunk))
+                else:
+                    packet_out = self.codec.encode_mpacket("-1")
+
+
+        elif type_id == "t":
+            """t-packets received from a client are considered a request 
+            for telemetry, and always have their contents discarded. The 
+            server responds with a t-packet with a timestamp and the 
+            latest telemetry values as specified by the SCC codec."""
+            if self.v >= 2:
+                print("[DEBUG] Detected t-packet")
+            packet_out = self.codec.encode_tpacket(
+                *self.server.datapool.read_telemetry()
             )
 
-        elif fname == "set_output_enable":
-            bool_val = bool(int(args[0]))
-            self.server.datapool.write_output_enable(bool_val)
-            packet_out = codec.encode_mpacket(str(int(bool_val)))
-
-        # Requests the server uptime:
-        elif fname == "get_server_uptime":
-            packet_out = codec.encode_mpacket(str(self.server.uptime()))
-
-        elif fname == "get_socket_info":
-            """Return an m-packet with some information about the client from
-            the perspective of the server:
-            1. The time for which the client socket has been active
-            2. The client address
-            3. The client port
-            This information is packaged as a csv string.
+
+        elif type_id == "x":
+            """x-packets always contain a command, the number of additional
+            arguments, as well as these additional arguments. This routine
+            simply identifies the function name and its arguments, and 
+            delegates these to command_handle() for further processing.
+            When done, command_handle() returns the contents of packet_out.
             """
-            uptime = time()-self.socket_tstart
-            packet_out = codec.encode_mpacket(
-                f"{uptime},{self.client_address[0]},{self.client_address[1]}"
-            )
+            if self.v >= 2:
+                print("[DEBUG] Detected x-packet")
+            fname, args = self.codec.decode_xpacket(packet_in)
+            if self.v >= 2:
+                print(f"[DEBUG] {fname}({args})")
+            packet_out = self.command_handle(fname, args)
 
 
-        # ==== Playback functions ============================================
-        elif fname == "set_serveropt_mutate_Bm":
-            self.server.datapool.serveropt_mutate_Bm = args[0]              # Not thread-safe
-            packet_out = codec.encode_mpacket(
-                str(int(self.server.datapool.serveropt_mutate_Bm)))         # Not thread-safe
+        else:
+            """Raise exception when encountering an unrecognised packet 
+            type."""
+            raise ValueError(f"Encountered uninterpretable type_id '{type_id}' in received packet.")
 
-        elif fname == "get_serveropt_mutate_Bm":
-            packet_out = codec.encode_mpacket(
-                str(int(self.server.datapool.serveropt_mutate_Bm)))         # Not thread-safe
+        if self.v >= 3:
+            print("[DEBUG] packet_out:", packet_out)
 
+        # t2 = time()  # [TIMING]
+        # print(f"Handled {type_id}-packet. Time: {int((t1-t0)*1E6)}, {int((t2-t1)*1E6)} \u03bcs")  # [TIMING]
 
-        elif fname == "set_serveropt_inject_Bm":
-            self.server.datapool.serveropt_inject_Bm = args[0]              # Not thread-safe
-            packet_out = codec.encode_mpacket(
-                str(int(self.server.datapool.serveropt_inject_Bm)))         # Not thread-safe
+        return packet_out
 
-        elif fname == "get_serveropt_inject_Bm":
-            packet_out = codec.encode_mpacket(
-                str(int(self.server.datapool.serveropt_inject_Bm)))          # Not thread-safe
 
+    def command_handle(self, fname, args):
+        """
+        This function handles the interpretation of all x-packets sent to the
+        server, executes the corresponding actions, and composes the
+        appropriate properties of the response packet.
 
-        # ==== Playback functions ============================================
-        elif fname == "get_play_info":
-            packet_out = codec.encode_mpacket(
-                f"{int(self.server.datapool.play_mode)}," +     # Not thread-safe
-                f"{int(self.server.datapool.play)}," +          # Not thread-safe
-                f"{int(self.server.datapool.play_looping)}," +  # Not thread-safe
-                f"{self.server.datapool.n_steps}," +            # Not thread-safe
-                f"{self.server.datapool.i_step[0]}," +             # Not thread-safe
-                f"{self.server.datapool.t_play}," +             # Not thread-safe
-                f"{self.server.datapool.t_current}," +          # Not thread-safe
-                f"{self.server.datapool.t_next}"                # Not thread-safe
-            )
+        The command is looked up in the command table (see commands.py), in
+        which every cmd_* method below is registered with the @command
+        decorator, together with the types of the arguments it takes. The
+        arguments are checked against these before the method is called.
+        Unknown commands or invalid arguments raise a ValueError.
 
-        elif fname == "set_play_mode":
-            packet_out = codec.encode_mpacket(
-                str(self.server.datapool.set_play_mode(args[0])))       # Not thread-safe
-
-        elif fname == "set_play":
-            packet_out = codec.encode_mpacket(
-                str(self.server.datapool.set_play(args[0])))            # Not thread-safe
-
-        elif fname == "set_play_looping":
-            self.server.datapool.play_looping = args[0]                 # Not thread-safe
-            packet_out = codec.encode_mpacket(
-                str(int(self.server.datapool.play_looping)))            # Not thread-safe
-
-        # ==== Schedule functions ===============================
-
-        # Prints info about the schedule into the terminal
-        elif fname == "print_schedule_info":
-            confirm = self.server.datapool.print_schedule_info(max_entries=args[0])
-            packet_out = codec.encode_mpacket(str(confirm))
-
-        # Requests the schedule name, length, and duration as csv string
-        elif fname == "get_schedule_info":
-            name, length, duration, schedule_hash = \
-                self.server.datapool.read_schedule_info(
-                    generate_hash=bool(int(args[0]))
-                )
-            packet_out = codec.encode_mpacket(
-                f"{name},{length},{duration},{schedule_hash}"
-            )
+        Clients can request the full list of supported commands and their
+        signatures with 'list_commands'.
+        """
+        return run_command(self, fname, args)
+
+
+    @command("get_aux_adc")
+    def cmd_get_aux_adc(self):
+        return self.codec.encode_mpacket(
+            str(self.server.datapool.read_aux_adc()))
+
+
+    @command("get_aux_dac")
+    def cmd_get_aux_dac(self):
+        dac = self.server.datapool.aux_dac[0]               # Not thread-safe
+        return self.codec.encode_mpacket(
+            f"{dac[0]},{dac[1]},{dac[2]},{dac[3]},{dac[4]},{dac[5]}"
+        )
+
+    @command("set_aux_dac", *[(float, str)]*6)
+    def cmd_set_aux_dac(self, *dac_str):
+        dac_vals = [float(item) for item in dac_str]
+        self.server.datapool.write_buffer(
+            self.server.datapool.aux_dac, dac_vals
+        )                                               # Not thread-safe
+        dac = self.server.datapool.aux_dac[0]           # Not thread-safe
+        return self.codec.encode_mpacket(
+            f"{dac[0]},{dac[1]},{dac[2]},{dac[3]},{dac[4]},{dac[5]}"
+        )
+
+
+    # Requests the Bc value:
+    @command("get_Bc")
+    def cmd_get_Bc(self):
+        return self.codec.encode_cpacket(self.server.datapool.read_Bc())
+
+
+    # Requests the Br value:
+    @command("get_Br")
+    def cmd_get_Br(self):
+        return self.codec.encode_mpacket("{},{},{}".format(
+            *self.server.datapool.read_Br()))
+
+    # Sets the Br value:
+    @command("set_Br", float, float, float)
+    def cmd_set_Br(self, *Br):
+        Br = list(Br)
+        self.server.datapool.write_Br(Br)
+        if self.v >= 4:
+            print("[DEBUG] Br written to datapool:", Br, type(Br))
+            print("[DEBUG] CHECK datapool.Br:", self.server.datapool.Br)
+        return self.codec.encode_mpacket("1")
+
+
+    @command("get_params_VB")
+    def cmd_get_params_VB(self):
+        p = self.server.datapool.params_tf_VB           # Not thread-safe
+        return self.codec.encode_mpacket(
+            f"{p['x'][0]},{p['x'][1]},"
+            + f"{p['y'][0]},{p['y'][1]},"
+            + f"{p['z'][0]},{p['z'][1]},"
+        )
+
+    @command("set_params_VB", *[(float, bool)]*6)
+    def cmd_set_params_VB(self, *args):
+        """Sets any of the six VB parameters. Parameters given as False are
+        left as they are."""
+        count = 0
+        for i, (axis, j) in enumerate((("x", 0), ("x", 1), ("y", 0),
+                                       ("y", 1), ("z", 0), ("z", 1))):
+            if args[i] is not False:
+                self.server.datapool.params_tf_VB[axis][j] = args[i]    # Not thread-safe
+                count += 1
 
-        elif fname == "get_schedule_segment":
-            seg = self.server.datapool.read_schedule_segment(args[0])
-            packet_out = codec.encode_spacket(
-                seg[0], seg[1], seg[2], seg[3], seg[4], seg[5]
+        return self.codec.encode_mpacket(str(count))
+
+
+    @command("get_output_enable")
+    def cmd_get_output_enable(self):
+        return self.codec.encode_mpacket(
+            str(int(self.server.datapool.read_output_enable()))
+        )
+
+    @command("set_output_enable", (str, int, bool))
+    def cmd_set_output_enable(self, enable):
+        bool_val = bool(int(enable))
+        self.server.datapool.write_output_enable(bool_val)
+        return self.codec.encode_mpacket(str(int(bool_val)))
+
+    # Requests the server uptime:
+    @command("get_server_uptime")
+    def cmd_get_server_uptime(self):
+        return self.codec.encode_mpacket(str(self.server.uptime()))
+
+    @command("get_socket_info")
+    def cmd_get_socket_info(self):
+        """Return an m-packet with some information about the client from
+        the perspective of the server:
+        1. The time for which the client socket has been active
+        2. The client address
+        3. The client port
+        This information is packaged as a csv string.
+        """
+        uptime = time()-self.socket_tstart
+        return self.codec.encode_mpacket(
+            f"{uptime},{self.client_address[0]},{self.client_address[1]}"
+        )
+
+
+    # ==== Serveropt functions ===============================================
+    @command("set_serveropt_mutate_Bm", bool)
+    def cmd_set_serveropt_mutate_Bm(self, serveropt_mutate_Bm):
+        self.server.datapool.serveropt_mutate_Bm = serveropt_mutate_Bm      # Not thread-safe
+        return self.codec.encode_mpacket(
+            str(int(self.server.datapool.serveropt_mutate_Bm)))             # Not thread-safe
+
+    @command("get_serveropt_mutate_Bm")
+    def cmd_get_serveropt_mutate_Bm(self):
+        return self.codec.encode_mpacket(
+            str(int(self.server.datapool.serveropt_mutate_Bm)))             # Not thread-safe
+
+
+    @command("set_serveropt_inject_Bm", bool)
+    def cmd_set_serveropt_inject_Bm(self, serveropt_inject_Bm):
+        self.server.datapool.serveropt_inject_Bm = serveropt_inject_Bm      # Not thread-safe
+        return self.codec.encode_mpacket(
+            str(int(self.server.datapool.serveropt_inject_Bm)))             # Not thread-safe
+
+    @command("get_serveropt_inject_Bm")
+    def cmd_get_serveropt_inject_Bm(self):
+        return self.codec.encode_mpacket(
+            str(int(self.server.datapool.serveropt_inject_Bm)))             # Not thread-safe
+
+
+    # ==== Playback functions ============================================
+    @command("get_play_info")
+    def cmd_get_play_info(self):
+        return self.codec.encode_mpacket(
+            f"{int(self.server.datapool.play_mode)}," +     # Not thread-safe
+            f"{int(self.server.datapool.play)}," +          # Not thread-safe
+            f"{int(self.server.datapool.play_looping)}," +  # Not thread-safe
+            f"{self.server.datapool.n_steps}," +            # Not thread-safe
+            f"{self.server.datapool.i_step[0]}," +             # Not thread-safe
+            f"{self.server.datapool.t_play}," +             # Not thread-safe
+            f"{self.server.datapool.t_current}," +          # Not thread-safe
+            f"{self.server.datapool.t_next}"                # Not thread-safe
+        )
+
+    @command("get_play_lateness", bool)
+    def cmd_get_play_lateness(self, reset):
+        """Returns the statistics of how late schedule steps were applied
+        since playback started, as:
+            n_steps,t_mean,t_max;bin_edge,bin_edge,...;count,count,...
+        with times in [s]. See LatenessHistogram. If `reset` is True, the
+        statistics are reset afterwards."""
+        lateness = self.server.datapool.play_lateness      # Not thread-safe
+        msg = f"{lateness.n},{lateness.t_mean()},{lateness.t_max};" + \
+            ",".join([str(edge) for edge in lateness.bin_edges]) + ";" + \
+            ",".join([str(count) for count in lateness.counts])
+        if reset:
+            lateness.reset()
+        return self.codec.encode_mpacket(msg)
+
+    @command("get_loop_stats", str)
+    def cmd_get_loop_stats(self, name):
+        """Returns the timing statistics of the loop of thread `name`
+        ('control', 'read_ADC' or 'write_DAC'), or -1 if it does not exist, as:
+            n_iterations,n_missed,period;min,mean,p99,max;min,mean,p99,max
+        where the second and third fields are the iteration time and lateness
+        in [s] over the rolling window. See LoopTimer."""
+        timer = self.server.datapool.loop_timers.get(name)
+        if timer is None:
+            return self.codec.encode_mpacket("-1")
+        n_iterations, n_missed, iteration, lateness = timer.stats()   # Not thread-safe
+        return self.codec.encode_mpacket(
+            f"{n_iterations},{n_missed},{timer.period};" +
+            ",".join([str(t) for t in iteration]) + ";" +
+            ",".join([str(t) for t in lateness])
+        )
+
+    @command("get_dac_write_stats")
+    def cmd_get_dac_write_stats(self):
+        """Returns the channel write counters of the DACWriter of the write_DAC
+        thread, or -1 if it has not been created yet, as:
+            n_requested,n_written,n_saved,n_bulk
+        See DACWriter."""
+        dac_writer = self.server.datapool.dac_writer
+        if dac_writer is None:
+            return self.codec.encode_mpacket("-1")
+        return self.codec.encode_mpacket(
+            ",".join([str(n) for n in dac_writer.stats()]))   # Not thread-safe
+
+    @command("get_play_plan")
+    def cmd_get_play_plan(self):
+        """Returns the results of the compilation of the schedule into DAC
+        voltages when play mode was last activated, or -1 if it has not been
+        compiled yet, as:
+            n_steps;clamped_I_x,y,z;clamped_DAC_x,y,z;slew_max_x,y,z;n_violations,i_first
+        with slew rates in [A/s], and i_first the first step that exceeds
+        I_slew_max, or -1 if there are none. See PlaybackPlan."""
+        plan = self.server.datapool.play_plan
+        if plan is None:
+            return self.codec.encode_mpacket("-1")
+        violations = plan.slew_violations
+        i_first = int(violations[0]) if len(violations) > 0 else -1
+        return self.codec.encode_mpacket(
+            f"{plan.n_steps};" +
+            ",".join([str(n) for n in plan.n_clipped_I.tolist()]) + ";" +
+            ",".join([str(n) for n in plan.n_clipped_dac.tolist()]) + ";" +
+            ",".join([str(s) for s in plan.slew_max.tolist()]) + ";" +
+            f"{len(violations)},{i_first}"
+        )
+
+    @command("check_schedule_slew", slow=True)
+    def cmd_check_schedule_slew(self):
+        """Checks the current schedule for slew rate violations (see
+        DataPool.check_schedule_slew()), and returns the results as:
+            n_violations;slew_max_x,y,z;i,i,...
+        with slew rates in [A/s], followed by the indices of (at most) the
+        first 16 steps that violate I_slew_max."""
+        slew_max, violations = self.server.datapool.check_schedule_slew()   # Not thread-safe
+        return self.codec.encode_mpacket(
+            f"{len(violations)};" +
+            ",".join([str(s) for s in slew_max.tolist()]) + ";" +
+            ",".join([str(i) for i in violations[:16].tolist()])
+        )
+
+    @command("set_play_mode", bool, slow=True)
+    def cmd_set_play_mode(self, play_mode):
+        return self.codec.encode_mpacket(
+            str(self.server.datapool.set_play_mode(play_mode)))     # Not thread-safe
+
+    @command("set_play", bool)
+    def cmd_set_play(self, play):
+        return self.codec.encode_mpacket(
+            str(self.server.datapool.set_play(play)))               # Not thread-safe
+
+    @command("set_play_looping", bool)
+    def cmd_set_play_looping(self, play_looping):
+        self.server.datapool.play_looping = play_looping            # Not thread-safe
+        return self.codec.encode_mpacket(
+            str(int(self.server.datapool.play_looping)))            # Not thread-safe
+
+    # ==== Schedule functions ===============================
+
+    # Prints info about the schedule into the terminal
+    @command("print_schedule_info", int)
+    def cmd_print_schedule_info(self, max_entries):
+        confirm = self.server.datapool.print_schedule_info(max_entries=max_entries)
+        return self.codec.encode_mpacket(str(confirm))
+
+    # Requests the schedule name, length, and duration as csv string
+    @command("get_schedule_info", (str, bool))
+    def cmd_get_schedule_info(self, generate_hash):
+        name, length, duration, schedule_hash = \
+            self.server.datapool.read_schedule_info(
+                generate_hash=bool(int(generate_hash))
             )
-
-        # Initialize the schedule (reset)
-        elif fname == "initialize_schedule":
-            confirm = self.server.datapool.initialize_schedule()
-            packet_out = codec.encode_mpacket(str(confirm))
-
-        # Allocate an empty schedule (args: name: str, n_seg: int, duration: float)
-        elif fname == "allocate_schedule":
-            confirm = self.server.datapool.allocate_schedule(args[0], args[1], args[2])
-            packet_out = codec.encode_mpacket(str(confirm))
-
-
-        elif fname == "get_V_board":
-            packet_out = codec.encode_mpacket(
-                str(self.server.datapool.read_V_board()))
-
-        # # Requests the value of play mode (False indicates `manual mode`)
-        # elif fname == "get_play_mode":
-        #     packet_out = codec.encode_mpacket(str(self.server.datapool.get_play_mode()))
-        #
-        # # Requests the value of play status (False indicates `manual mode`)
-        # elif fname == "get_play_status":
-        #     packet_out = codec.encode_mpacket(self.server.datapool.get_play_status())
-
-
+        return self.codec.encode_mpacket(
+            f"{name},{length},{duration},{schedule_hash}"
+        )
+
+    @command("get_schedule_segment", int)
+    def cmd_get_schedule_segment(self, segment_id):
+        seg = self.server.datapool.read_schedule_segment(segment_id)
+        return self.codec.encode_spacket(
+            seg[0], seg[1], seg[2], seg[3], seg[4], seg[5]
+        )
+
+    @command("get_schedule_digests", int)
+    def cmd_get_schedule_digests(self, i_chunk):
+        """Returns the leaf digests of the hash chunks of the schedule (see
+        schedule_hash.py), starting at chunk `i_chunk`, as many as fit in a
+        single m-packet. The first field is the total number of chunks:
+            n_chunks;digest;digest;..."""
+        digests = self.server.datapool.read_schedule_digests()
+        msg = str(len(digests))
+        for digest in digests[i_chunk:]:
+            if len(msg) + len(digest) + 1 > self.codec.packet_size - 3:
+                break
+            msg += ";" + digest
+        return self.codec.encode_mpacket(msg)
+
+    # Initialize the schedule (reset)
+    @command("initialize_schedule")
+    def cmd_initialize_schedule(self):
+        confirm = self.server.datapool.initialize_schedule()
+        return self.codec.encode_mpacket(str(confirm))
+
+    # Allocate an empty schedule
+    @command("allocate_schedule", str, int, float)
+    def cmd_allocate_schedule(self, name, n_seg, duration):
+        confirm = self.server.datapool.allocate_schedule(name, n_seg, duration)
+        return self.codec.encode_mpacket(str(confirm))
+
+
+    @command("get_V_board")
+    def cmd_get_V_board(self):
+        return self.codec.encode_mpacket(
+            str(self.server.datapool.read_V_board()))
+
+    @command("set_codec", str)
+    def cmd_set_codec(self, codec_name):
+        """Switches the codec used on this connection. The confirmation
+        is still encoded with the current codec, since that is what the
+        client is expecting. Returns 0 if the codec name is unknown, or if
+        telemetry is being pushed, in which case nothing changes. A pushed
+        t-packet in the new codec could otherwise reach the client before the
+        confirmation, so unsubscribe first."""
+        if codec_name in codecs \
+                and self.push_thread is None and self.push_pending is None:
+            packet_out = self.codec.encode_mpacket("1")
+            self.codec = codecs[codec_name]
+            if self.v >= 1:
+                print(f"Client {self.client_address[0]}:{self.client_address[1]} switched to codec '{codec_name}'")
         else:
-            raise ValueError(f"Function name '{fname}' not recognised!")
-
+            packet_out = self.codec.encode_mpacket("0")
         return packet_out
 
+    @command("subscribe_telemetry", float, int)
+    def cmd_subscribe_telemetry(self, rate, decimation):
+        """Starts pushing t-packets to this client without it having to
+        request each one. The push loop ticks at `rate` Hz, and sends
+        every `decimation`-th tick, so the effective push rate is
+        rate/decimation S/s. An existing subscription is replaced, so this
+        can also be used to change the rate. The push starts once this
+        confirmation has been sent (see start_pending_push())."""
+        self.stop_push_telemetry()
+        if rate > 0 and decimation >= 1:
+            self.push_pending = (rate, decimation)
+            return self.codec.encode_mpacket("1")
+        else:
+            return self.codec.encode_mpacket("-1")
+
+    @command("unsubscribe_telemetry")
+    def cmd_unsubscribe_telemetry(self):
+        """Stops the telemetry push. No pushed t-packets will follow the
+        confirmation."""
+        self.stop_push_telemetry()
+        return self.codec.encode_mpacket("1")
+
+
+    # ==== Introspection =====================================================
+    @command("list_commands", int)
+    def cmd_list_commands(self, i_first):
+        """Returns the signatures of the supported commands in alphabetical
+        order, starting at command number `i_first`, as many as fit in a
+        single m-packet. The first field is the total number of commands:
+            n_commands;name:types;name:types;...
+        See Command.signature() for the format of the signatures."""
+        names = sorted(command_table.keys())
+        msg = str(len(names))
+        for name in names[i_first:]:
+            entry = ";" + command_table[name].signature()
+            if len(msg) + len(entry) > self.codec.packet_size - 3:
+                break
+            msg += entry
+        return self.codec.encode_mpacket(msg)
+
+    @command("get_command_stats", str)
+    def cmd_get_command_stats(self, name):
+        """Returns the number of calls, and the mean and maximum handling time
+        in [s] of command `name` as a csv string, or -1 if it does not exist.
+        The statistics are shared by all clients."""
+        cmd = command_table.get(name)
+        if cmd is None:
+            return self.codec.encode_mpacket("-1")
+        return self.codec.encode_mpacket(
+            f"{cmd.n_calls},{cmd.t_mean()},{cmd.t_max}")
+
+
+    def start_push_telemetry(self, rate: float, decimation: int):
+        """Starts push_telemetry() in its own thread."""
+        self.push_stop.clear()
+        self.push_thread = Thread(
+            name=f"push {self.client_address[0]}:{self.client_address[1]}",
+            target=self.push_telemetry,
+            args=(rate, decimation),
+            daemon=True,
+        )
+        self.push_thread.start()
+        if self.v >= 1:
+            print(f"Client {self.client_address[0]}:{self.client_address[1]} subscribed to telemetry at {rate}/{decimation} S/s")
+
+    def start_pending_push(self):
+        """Starts the subscription made by 'subscribe_telemetry', if any.
+        This is called after the responses have been sent, so that no pushed
+        t-packet can overtake the confirmation, or the confirmation of a
+        preceding 'set_codec' that is still in the old codec."""
+        if self.push_pending is not None:
+            self.start_push_telemetry(*self.push_pending)
+            self.push_pending = None
+
+    def stop_push_telemetry(self):
+        """Stops the push_telemetry() thread, if any, and waits for it to
+        finish, so that no more t-packets are pushed after this returns."""
+        self.push_pending = None
+        if self.push_thread is not None:
+            self.push_stop.set()
+            self.push_thread.join()
+            self.push_thread = None
+
+    def push_telemetry(self, rate: float, decimation: int):
+        """Pushes a t-packet with the latest telemetry to the client on every
+        `decimation`-th tick, ticking at `rate` Hz until push_stop is set.
+
+        Tick deadlines are kept on a fixed grid (t_next += period) rather than
+        sleeping a fixed period after each send, so the push rate does not
+        drift with the time spent sending.
+
+        The packet is encoded and framed while holding the send lock, so that
+        it always uses the codec of the packets sent around it.
+        """
+        period = 1/rate
+        i_tick = 0
+        t_next = time()
+        while not self.push_stop.is_set():
+            if i_tick % decimation == 0:
+                telemetry = self.server.datapool.read_telemetry()
+                self._lock_send.acquire()
+                try:
+                    self.request.sendall(self.framer.frame(
+                        self.codec.encode_tpacket(*telemetry)))
+                except OSError:     # Client disconnected
+                    self.push_stop.set()
+                self._lock_send.release()
+            i_tick += 1
+            t_next += period
+            # After a stall, skip the missed ticks rather than bursting
+            if time() - t_next > period:
+                t_next = time()
+            self.push_stop.wait(max(0., t_next - time()))
 
     def finish(self):
         """Overloaded from base class. Runs once after handle() loop ends."""
+        self.stop_push_telemetry()
         print(f"Client {self.client_address[0]}:{self.client_address[1]} disconnected.")
 
 
@@ -1335,31 +2098,8 @@ if __name__ == "__main__":
     # Start server thread
     server_thread.start()
 
-    # Set up thread for control
-    thread_control = Thread(
-        name="Control Thread",
-        target=threaded_control,
-        args=(datapool,),
-        daemon=True)
-    thread_control.start()
-
-    # Set up thread for continuously polling the ADC, and writing it to the
-    # server datapool.
-    thread_read_ADC = Thread(
-        name="Read ADC Thread",
-        target=threaded_read_ADC,
-        args=(datapool,),
-        daemon=True)
-    thread_read_ADC.start()
-
-    # Set up thread that finds when a change in control parameters occurs, and
-    # when it occurs, ensures that it is written to the DAC.
-    thread_write_DAC = Thread(
-        name="Write DAC Thread",
-        target=threaded_write_DAC,
-        args=(datapool,),
-        daemon=False)  # Not set as daemon to ensure that it finishes properly
-    thread_write_DAC.start()
+    # Start control, ADC, and DAC threads
+    hardware_threads = start_hardware_threads(datapool)
 
     print(f"Server is up. Time elapsed: {round((time()-t0)*1E3, 3)} ms. Active threads: {active_count()}")
 
@@ -1377,27 +2117,8 @@ if __name__ == "__main__":
 
     # ==== Server shutdown ===================================================
 
-    # Gracefully terminate control threads
-    print("Shutting down - finishing threads.")
-    datapool.kill_threaded_read_ADC = True
-    datapool.kill_threaded_write_DAC = True
-    datapool.kill_threaded_control = True
-
-    ttest = time()
-    thread_read_ADC.join(timeout=1.0)
-    print(f"Shut down read_ADC thread in {round((time()-ttest)*1E3, 3)} ms")
-
-    ttest = time()
-    thread_write_DAC.join(timeout=5.0)
-    print(f"Shut down write_DAC thread in {round((time()-ttest)*1E3, 3)} ms")
-
-    ttest = time()
-    thread_control.join(timeout=1.0)
-    print(f"Shut down control thread in {round((time()-ttest)*1E3, 3)} ms")
-
-    # For safety: set power supplies to zero, separately from apply_Bc_thread
-    print(f"Resetting Bc just in case")
-    hardware_shutdown(datapool)
+    # Gracefully terminate control threads and reset hardware
+    stop_hardware_threads(datapool, hardware_threads)
 
     # Server termination
     total_uptime = server.uptime()
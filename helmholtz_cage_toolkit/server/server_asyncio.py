@@ -0,0 +1,186 @@
+"""
+This is an alternative entry point for the server side of the Helmholtz Cage
+Toolkit, which serves all clients from a single asyncio event loop, rather
+than from one OS thread per client as server.py does. Run it with:
+
+    python -m helmholtz_cage_toolkit.server.server_asyncio
+
+Clients cannot tell the difference: everything that happens between the
+socket and the DataPool is reused from server.py. The DataPool is the same,
+the hardware loops (control, read_ADC, write_DAC) still run on their own
+dedicated threads, and every connection is handled by an AsyncRequestHandler,
+which is a ThreadedTCPRequestHandler with the socket I/O swapped out for
+asyncio streams. Packet dispatch, command handling, codec negotiation, and
+telemetry push subscriptions therefore behave identically.
+
+The difference is in how the server scales with the number of clients. With
+ThreadingMixIn, every client is an OS thread that competes with the control,
+ADC, and DAC threads for the GIL and the DataPool locks. Here, only the event
+loop thread does, regardless of how many clients are connected.
+
+[DEV NOTE] Packets are handled inline on the event loop, as almost all of them
+take only microseconds. The exceptions are the commands declared slow=True
+(see commands.py), 'set_play_mode' and 'check_schedule_slew', which build a
+PlaybackPlan of the whole schedule, taking about half a second for a million
+segments. These are handled on a worker thread with run_in_executor(), so
+that the other clients and the telemetry pushes carry on in the meantime.
+"""
+
+import asyncio
+from threading import active_count
+from time import time
+
+from helmholtz_cage_toolkit.server.commands import command_table
+from helmholtz_cage_toolkit.server.server import (
+    DataPool,
+    ThreadedTCPRequestHandler,
+    start_hardware_threads,
+    stop_hardware_threads,
+)
+from helmholtz_cage_toolkit.server.server_config import server_config as config
+
+
+class AsyncTCPServer:
+    """Counterpart of ThreadedTCPServer. Holds the datapool and provides
+    uptime(), which is all the request handlers need from their server.
+    """
+    def __init__(self, host, datapool):
+        self.host = host
+        self.datapool = datapool
+        self.server_tstart = time()
+
+    def uptime(self):
+        """Returns the uptime of the AsyncTCPServer instance in [s]"""
+        return time() - self.server_tstart
+
+    async def serve_forever(self):
+        server = await asyncio.start_server(
+            self.handle_connection, self.host[0], self.host[1])
+        async with server:
+            await server.serve_forever()
+
+    async def handle_connection(self, reader, writer):
+        """Runs for every connected client, for as long as it is connected."""
+        handler = AsyncRequestHandler(
+            AsyncRequest(writer, asyncio.get_running_loop()),
+            writer.get_extra_info("peername"),
+            self,
+        )
+        try:
+            await handler.handle_async(reader, writer)
+        except (ConnectionError, ValueError) as e:
+            print(f"[WARNING] Dropping client {handler.client_address[0]}:{handler.client_address[1]}: {e}")
+        finally:
+            handler.finish()
+            writer.close()
+
+
+class AsyncRequest:
+    """Stands in for the socket (self.request) of a request handler, so that
+    the telemetry push thread can keep calling self.request.sendall(). Writes
+    are handed over to the event loop, which owns the stream.
+
+    Unlike a blocking sendall(), the writes never wait for the client, so the
+    data of a slow or stalled client would pile up in the transport buffer
+    without limit. Whilst more than `buffer_max` bytes are waiting there,
+    further writes are dropped instead. Only pushed telemetry is written
+    this way, so the client just misses samples.
+    """
+    def __init__(self, writer, loop, buffer_max: int = config["push_buffer_max"]):
+        self.writer = writer
+        self.loop = loop
+        self.buffer_max = buffer_max
+        self.n_dropped = 0
+
+    def sendall(self, data):
+        if self.writer.is_closing():
+            raise ConnectionResetError
+        self.loop.call_soon_threadsafe(self.write, data)
+
+    def write(self, data):
+        """Writes `data` to the stream, unless the transport buffer is over
+        `buffer_max`. Runs on the event loop."""
+        if self.writer.transport.get_write_buffer_size() > self.buffer_max:
+            if self.n_dropped == 0:
+                print(f"[WARNING] Client {self.writer.get_extra_info('peername')} is not keeping up, dropping pushed packets")
+            self.n_dropped += 1
+        else:
+            self.writer.write(data)
+
+
+class AsyncRequestHandler(ThreadedTCPRequestHandler):
+    """ThreadedTCPRequestHandler driven by asyncio streams instead of a
+    blocking socket.
+
+    BaseRequestHandler runs setup(), handle(), and finish() from its
+    constructor, which would block the event loop. Here, the constructor only
+    runs setup(), and the connection is then served by handle_async(), which
+    replaces handle(). All packet handling is inherited unchanged, but slow
+    commands are handled on a worker thread.
+    """
+    def __init__(self, request, client_address, server):
+        self.request = request
+        self.client_address = client_address
+        self.server = server
+        self.setup()
+
+    def is_slow(self, packet_in):
+        """Returns whether `packet_in` is an x-packet of a command that was
+        declared with slow=True (see commands.py)."""
+        if self.codec.packet_type(packet_in) != "x":
+            return False
+        cmd = command_table.get(self.codec.decode_xpacket(packet_in)[0])
+        return cmd is not None and cmd.slow
+
+    async def handle_async(self, reader, writer):
+        """Counterpart of handle() and handle_data(), which awaits the
+        handling of slow commands rather than blocking the event loop. Other
+        packets from this client wait for them, so the order of the responses
+        is kept."""
+        loop = asyncio.get_running_loop()
+        while True:
+            data = await reader.read(config["recv_buffer_size"])
+            if data == b"":
+                break
+
+            self.framer.feed(data)
+            packets_out = []
+            for packet_in in self.framer:
+                if self.is_slow(packet_in):
+                    packet_out = await loop.run_in_executor(
+                        None, self.handle_packet, packet_in)
+                else:
+                    packet_out = self.handle_packet(packet_in)
+                packets_out.append(self.frame_response(packet_out))
+            data_out = b"".join(packets_out)
+
+            if data_out:
+                writer.write(data_out)
+                await writer.drain()
+
+            self.start_pending_push()
+
+
+if __name__ == "__main__":
+    t0 = time()
+
+    # Initialize common DataPool object
+    datapool = DataPool()
+
+    HOST = (config["SERVER_ADDRESS"], config["SERVER_PORT"])
+    server = AsyncTCPServer(HOST, datapool)
+
+    # Start control, ADC, and DAC threads
+    hardware_threads = start_hardware_threads(datapool)
+
+    print(f"Server (asyncio) is up. Time elapsed: {round((time()-t0)*1E3, 3)} ms. Active threads: {active_count()}")
+
+    # ==== Main loop of server ===============================================
+    try:
+        asyncio.run(server.serve_forever())
+    except:  # noqa
+        pass
+
+    # ==== Server shutdown ===================================================
+    stop_hardware_threads(datapool, hardware_threads)
+    print(f"Server is closed. Total uptime: {round(server.uptime(), 3)} s")
@@ -2,21 +2,43 @@ server_config = {
     # ==== General settings ====
     "SERVER_ADDRESS": "127.0.0.1",
     "SERVER_PORT": 7777,
+    "recv_buffer_size": 65536,  # B, max bytes taken from the socket per recv()
+    "push_buffer_max": 262144,  # B, pushed telemetry is dropped while more than this waits to be sent to a client (server_asyncio.py)
 
     # ==== Thread settings ====
     "threaded_read_ADC_rate": 8,   # S/s
     "threaded_write_DAC_rate": 8,  # S/s
     "threaded_control_rate": 100, # Hz
+    "loop_stats_window": 1000,     # Number of thread loop iterations in the rolling timing statistics
 
+    # The DataPool keeps history_duration seconds of history of the ADC data
+    # (Bm, Im, ...), Bc and i_step, and the DAC voltages, at the rate at which
+    # their thread writes them (about 40 MB for 1000 s at the default rates).
+    # The other buffers only keep the last internal_buffer_size values.
+    "history_duration": 1000,      # s
     "internal_buffer_size": 5,
     "verbosity": 4,
     # "verbosity_printtimestamp": True,
 
+    # ==== Hardware backend ====
+    # "dummy": no hardware | "cn0554": CN0554 interface board | "simulated": simulated cage
+    # (see hardware.py)
+    "hardware_backend": "dummy",
+
     # ==== ADC settings ====
     "adc_pollrate": 30,     # S/s TODO DEPRECATED?
+    "adc_scale_Bm": -100.0, # uT/V, magnetometer output (inverted, see Magnetometer.read())
+    "adc_scale_Im": 1.0,    # A/V, current sense output
+    # Buffered acquisition: every read_ADC loop reads a block of adc_block_size
+    # samples per channel, sampled at adc_sample_rate. Set adc_block_size to 1
+    # to read single samples instead. Keep threaded_read_ADC_rate at
+    # adc_sample_rate/adc_block_size, so that the blocks follow up seamlessly.
+    "adc_sample_rate": 128, # S/s per channel
+    "adc_block_size": 16,   # Samples per channel per read_ADC loop
 
     # ==== DAC settings ====
     "vmax_dac": 5.0,        # V
+    "dac_write_tolerance": 0.00023,  # V, DAC channels are only rewritten on larger changes (half a DAC step, see dac_writer.py)
 
     # ==== Settings for Bm mutation ====
     "mutate_Bm": False,
@@ -42,8 +64,19 @@ server_config = {
 
     "I_slew_max": [1000, 1000, 1000],    # [A/s] Maximum allowed current slew rate
 
+    # ==== Simulated cage settings (hardware_backend "simulated") ====
+    "sim_L_coil": [0.05, 0.05, 0.05],   # H, coil inductance
+    "sim_R_coil": [7, 7, 7],            # Ohm, coil resistance
+    "sim_B_earth": [17.0, 1.0, 45.0],   # uT, ambient field in the cage frame
+    "sim_B_noise": 0.05,                # uT, standard deviation of magnetometer noise
+    "sim_latency": 0.002,               # s, magnetometer latency
+    "sim_V_board": 7.0,                 # V, measured value of +12V bus - +5V bus
+
     # ==== Playback settings ====
     "default_play_looping": True,
+    "play_spin_margin": 0.001,      # s, spin rather than sleep this long before a step deadline
+    # Upper bin edges of the step lateness histogram in [s] (see 'get_play_lateness')
+    "play_lateness_bins": [1E-5, 5E-5, 1E-4, 5E-4, 1E-3, 5E-3, 1E-2, 5E-2],
 
     # Linear regression coefficients for VC transfer function ([b0, b1] -> B_out = b0 + b1*V)
     "params_tf_VB_x": [0, 100],
@@ -1,8 +1,10 @@
 import sys
+from time import time
 
 from helmholtz_cage_toolkit import *
 from helmholtz_cage_toolkit.server.server_config import server_config as config
 from helmholtz_cage_toolkit.server.control_lib import *
+import helmholtz_cage_toolkit.client_functions as cf
 
 
 # Helper subclasses for QLabel to facilitate neat one-liners later on
@@ -337,11 +339,35 @@ class DebugWindow(QMainWindow):
 
 
     def make_layout_10(self):
+        """Table with the loop timing statistics of the server threads, which
+        are requested from the server with 'get_loop_stats', if it is
+        running. See LoopTimer in timing.py."""
         layout_10 = QGridLayout()
         # label_layout10 = QLabel("layout_10")
         # label_layout10.setFrameStyle(QFrame.Box | QFrame.Plain)
         # label_layout10.setLineWidth(1)
         # layout_10.addWidget(label_layout10)
+
+        # Socket to the server, which is connected on the first update
+        self.socket = QTcpSocket(self)
+        self.ds = QDataStream(self.socket)
+        self.t_connect = 0.             # Time of the last connection attempt
+        self.connect_interval = 2.      # [s] between connection attempts
+
+        self.loop_names = ("control", "read_ADC", "write_DAC")
+
+        for i in range(6):
+            texth = ["Server loop", "Rate [Hz]", "Iter. mean [ms]",
+                     "Iter. p99 [ms]", "Late p99 [ms]", "Missed"][i]
+            layout_10.addWidget(QLabelCenter(texth), 0, i)
+
+        self.labels_loops = [[None]*5, [None]*5, [None]*5]
+        for i, name in enumerate(self.loop_names):
+            layout_10.addWidget(QLabel(name), i+1, 0)
+            for j in range(5):
+                self.labels_loops[i][j] = QLabelCenter("-")
+                layout_10.addWidget(self.labels_loops[i][j], i+1, j+1)
+
         return layout_10
 
 
@@ -434,6 +460,55 @@ class DebugWindow(QMainWindow):
         return pinnames_board
 
 
+    def update_loop_stats(self):
+        """Requests the loop timing statistics of the server threads, and
+        shows them in layout_10. While the server cannot be reached, the table
+        is cleared, and connecting is tried again every connect_interval
+        seconds. The connection is made in the background, so that the GUI
+        does not wait for it."""
+        if self.socket.state() != QAbstractSocket.ConnectedState:
+            for labels in self.labels_loops:
+                for label in labels:
+                    label.setText("-")
+            if self.socket.state() == QAbstractSocket.UnconnectedState \
+                    and time() - self.t_connect >= self.connect_interval:
+                self.t_connect = time()
+                # Start the new connection without state left over from the last one
+                cf.reset_socket_state(self.socket)
+                self.socket.connectToHost(config["SERVER_ADDRESS"], config["SERVER_PORT"])
+            return
+
+        # All loops in a single round trip
+        loop_stats = cf.batch(self.socket, datastream=self.ds)
+        for name in self.loop_names:
+            loop_stats.get_loop_stats(name)
+
+        try:
+            results = loop_stats.run()
+        except:  # noqa
+            # No response, e.g. as the server just went down. The socket is
+            # reconnected on the next update.
+            self.socket.abort()
+            return
+
+        for i, stats in enumerate(results):
+            if stats == -1:     # Server has no loop with this name
+                for label in self.labels_loops[i]:
+                    label.setText("-")
+                continue
+
+            n_iterations, n_missed, period, iteration, lateness = stats
+            texts = (
+                "{:.1f}".format(1/period),
+                "{:.3f}".format(iteration[1]*1E3),
+                "{:.3f}".format(iteration[2]*1E3),
+                "{:.3f}".format(lateness[2]*1E3),
+                f"{n_missed}/{n_iterations}",
+            )
+            for j, text in enumerate(texts):
+                self.labels_loops[i][j].setText(text)
+
+
     def set_update_rate(self, rate: float):
         print(f"[DEBUG] set_update_rate({rate})")
         self.timer_update.stop()
@@ -526,6 +601,8 @@ class DebugWindow(QMainWindow):
         bnorm = (bvals[0]**2 + bvals[1]**2 + bvals[2]**2)**0.5
         self.label_b.setText("{:.2f}".format(bnorm))
 
+        self.update_loop_stats()
+
         # print("update(): {} {} {} {} = {} ms".format(
         #     round((t1-t0)*1000, 1),
         #     round((t2-t1)*1000, 1),
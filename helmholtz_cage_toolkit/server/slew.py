@@ -0,0 +1,104 @@
+"""
+Software slew rate limiting of the coil currents.
+
+Changing the current through the coils too quickly induces voltage spikes
+that can damage the power supplies and H-bridges, so the rate of change of
+the current dI/dt has to stay below config["I_slew_max"] [A/s] on every
+axis. This is dealt with in two places:
+
+ - Offline, find_slew_violations() checks a whole schedule at once with
+    NumPy, and reports the segments at which the schedule demands a faster
+    change than allowed, i.e. the segments that would be clipped by the
+    limiter during playback. This way, a schedule can be checked right after
+    it has been uploaded, rather than finding out during playback.
+
+ - Online, SlewLimiter limits the currents that the DAC thread applies, on
+    every tick, based on the time that has actually passed since the
+    previous tick. It works on the three axes as one vector: when one or
+    more axes would exceed their limit, the whole change is scaled down by
+    the same factor, rather than clipping the axes separately. This keeps
+    the direction of the field change intact, so that the field moves along
+    a straight line towards the target instead of veering off.
+
+[DEV NOTE] SlewLimiter works on plain tuples of three floats. For vectors this
+short, the overhead of calling into NumPy is several times larger than the
+arithmetic itself, and the DAC thread has to do this every tick.
+"""
+
+from numpy import abs as np_abs, array, diff, errstate, flatnonzero, where, zeros
+
+
+def segment_slew_rates(t, I):
+    """Returns the slew rates [A/s] required by every segment of a schedule,
+    with `t` the (n,) step times [s] and `I` the (n, 3) coil currents [A].
+    Row i of the (n-1, 3) result belongs to the transition from step i to
+    step i+1. Steps at equal times that change the current give inf.
+    """
+    dI = np_abs(diff(I, axis=0))
+    dt = diff(t)[:, None]
+    with errstate(divide="ignore", invalid="ignore"):
+        return where(dI == 0, 0., dI / dt)
+
+
+def find_slew_violations(t, I, I_slew_max):
+    """Checks a whole schedule for slew rate violations, with `t` the (n,)
+    step times [s], `I` the (n, 3) coil currents [A], and `I_slew_max` the
+    maximum slew rate per axis [A/s]. Returns:
+     - slew_max (3,): the largest slew rate per axis [A/s]
+     - violations (m,): the indices of the steps that cannot be reached in
+        time from the previous step without exceeding I_slew_max on at least
+        one axis, i.e. the steps that the online limiter would clip
+    """
+    if len(t) < 2:
+        return zeros(3), zeros(0, dtype=int)
+    slew = segment_slew_rates(t, I)
+    violations = flatnonzero((slew > array(I_slew_max)).any(axis=1)) + 1
+    return slew.max(axis=0), violations
+
+
+class SlewLimiter:
+    """Online slew rate limiter for the three coil currents.
+
+    limit() is called every tick with the target currents, and returns the
+    currents to apply, which move towards the target as fast as I_slew_max
+    allows. The time between ticks is measured from the `t` arguments, so a
+    tick that is late is allowed a correspondingly larger step, up to
+    `dt_max` [s]. Without this cap, the first tick after the thread has been
+    paused would be allowed an arbitrarily large step.
+    """
+    def __init__(self, I_slew_max, dt_max: float, I0=(0., 0., 0.), t0=None):
+        self.I_slew_max = tuple(I_slew_max)
+        self.dt_max = dt_max
+        self.I = tuple(I0)          # Currents applied at the previous tick
+        self.t = t0                 # Time of the previous tick
+        self.n_limited = 0          # Number of ticks at which the limiter was active
+
+    def reset(self, I0=(0., 0., 0.), t0=None):
+        self.I = tuple(I0)
+        self.t = t0
+
+    def limit(self, I_target, t: float):
+        """Returns the currents to apply at time `t` [s] to move towards
+        `I_target` [A], as a tuple of three floats. On the first tick after
+        (re)initialization without a time, the currents are held, as no time
+        has passed yet."""
+        I_target = tuple(I_target)
+        if self.t is None:
+            self.t = t
+        dt = min(t - self.t, self.dt_max)
+        self.t = t
+
+        # Largest fraction of the change that every axis allows
+        scale = 1.
+        for dI, I_max in zip([a - b for a, b in zip(I_target, self.I)],
+                             self.I_slew_max):
+            dI_max = I_max * dt
+            if abs(dI) > dI_max:
+                scale = min(scale, dI_max / abs(dI))
+
+        if scale < 1.:
+            self.n_limited += 1
+            self.I = tuple([b + scale*(a - b) for a, b in zip(I_target, self.I)])
+        else:
+            self.I = I_target
+        return self.I
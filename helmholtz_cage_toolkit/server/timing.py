@@ -0,0 +1,145 @@
+"""
+Timing tools for the real-time loops of the server.
+
+All timing in here uses time.perf_counter(), which is monotonic and has a
+resolution well below a microsecond. Unlike time.time(), it does not jump
+when the system clock is adjusted (e.g. by NTP), so deadlines derived from it
+do not drift with wall-clock corrections. Its values are only meaningful
+relative to each other, so UNIX timestamps that are reported to clients
+should still come from time.time().
+
+sleep() alone cannot be used to hit a deadline precisely, as the OS may wake
+the thread up anywhere from tens of microseconds to over a millisecond late.
+sleep_until() therefore sleeps until `spin_margin` before the deadline, and
+then busy-waits ("spins") for the remainder. The spin costs CPU time, so the
+margin should be no larger than the typical oversleep of the OS.
+
+LoopTimer instruments the periodic loops of the server threads, so that their
+rates can be tuned based on how long their iterations actually take.
+"""
+
+from bisect import bisect_right
+from time import perf_counter, sleep
+
+from numpy import percentile
+
+from helmholtz_cage_toolkit.ringbuffer import RingBuffer
+
+
+def sleep_until(t_deadline: float, spin_margin: float = 0.):
+    """Returns at perf_counter() time `t_deadline`, by sleeping until
+    `spin_margin` seconds before it, and spinning for the remainder. Returns
+    immediately if the deadline has already passed.
+    """
+    t_sleep = t_deadline - spin_margin - perf_counter()
+    if t_sleep > 0:
+        sleep(t_sleep)
+    while perf_counter() < t_deadline:
+        pass
+
+
+class LatenessHistogram:
+    """Histogram of how late events happened relative to their deadlines,
+    e.g. schedule steps during playback.
+
+    `bin_edges` are the upper edges of the bins in [s], in ascending order.
+    Lateness below the first edge is counted in bin 0, and lateness above the
+    last edge in an extra overflow bin, so there are len(bin_edges)+1 bins.
+    """
+    def __init__(self, bin_edges):
+        self.bin_edges = list(bin_edges)
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * (len(self.bin_edges) + 1)  # Not thread-safe
+        self.n = 0                                      # Not thread-safe
+        self.t_total = 0.                               # Not thread-safe
+        self.t_max = 0.                                 # Not thread-safe
+
+    def record(self, lateness: float):
+        """Adds an event that happened `lateness` seconds after its
+        deadline."""
+        self.counts[bisect_right(self.bin_edges, lateness)] += 1
+        self.n += 1
+        self.t_total += lateness
+        self.t_max = max(self.t_max, lateness)
+
+    def t_mean(self):
+        if self.n == 0:
+            return 0.
+        return self.t_total / self.n
+
+
+class LoopTimer:
+    """Timing instrument for a periodic loop, such as the loops of the
+    control, read_ADC, and write_DAC threads. For every iteration, it records:
+     - the iteration time: how long the work of the iteration took
+     - the lateness: how long after its planned start the iteration started
+     - whether it missed its deadline: whether the iteration ended after the
+        planned start of the next one, i.e. whether the loop overran
+    The iteration times and lateness of the last `window` iterations are
+    kept in RingBuffers, from which stats() computes rolling statistics.
+
+    It is used as follows:
+
+        t_planned = perf_counter()
+        while ...:
+            timer.tick(t_planned)
+            <work>
+            timer.tock()
+            t_planned = timer.next_deadline()
+            sleep_until(t_planned)
+
+    Recording an iteration takes a few microseconds. The statistics are only
+    computed when requested.
+    """
+    def __init__(self, period: float, window: int = 1000):
+        self.period = period
+
+        self.iteration_times = RingBuffer(window)
+        self.lateness = RingBuffer(window)
+
+        self.n_iterations = 0       # Not thread-safe
+        self.n_missed = 0           # Not thread-safe
+
+        self._t_planned = 0.
+        self._t_start = 0.
+
+    def tick(self, t_planned: float):
+        """Marks the start of an iteration that was planned to start at
+        perf_counter() time `t_planned`."""
+        self._t_start = now = perf_counter()
+        self._t_planned = t_planned
+        self.lateness.append(max(0., now - t_planned), now)
+
+    def tock(self):
+        """Marks the end of the work of the current iteration."""
+        now = perf_counter()
+        self.iteration_times.append(now - self._t_start, now)
+        self.n_iterations += 1
+        if now > self._t_planned + self.period:
+            self.n_missed += 1
+
+    def next_deadline(self) -> float:
+        """Returns the planned start of the next iteration, which is one
+        period after the planned start of the current one. Planning against
+        the previous plan rather than against the current time keeps the loop
+        rate from drifting. If the deadline has already passed, the current
+        time is returned instead, so that a loop that overran does not try to
+        catch up with a burst of iterations."""
+        return max(self._t_planned + self.period, perf_counter())
+
+    def stats(self):
+        """Returns the number of iterations, the number of missed deadlines,
+        and the (min, mean, p99, max) of the iteration time and of the
+        lateness in [s] over the rolling window, in that order."""
+        return self.n_iterations, self.n_missed, \
+            self._summary(self.iteration_times), self._summary(self.lateness)
+
+    @staticmethod
+    def _summary(buffer: RingBuffer):
+        values = buffer.last(buffer.n_valid()).copy()
+        if len(values) == 0:
+            return 0., 0., 0., 0.
+        return float(values.min()), float(values.mean()), \
+            float(percentile(values, 99)), float(values.max())
@@ -0,0 +1,117 @@
+"""
+Checks the buffered ADC acquisition (adc_read_buffer() in hardware.py), and
+compares the sample rate that it gives the server with that of single reads:
+ - RingBuffer.extend() stores a block exactly like appending its samples one
+   by one.
+ - A block from the simulated cage matches single reads at the same moments,
+   and its samples are timestamped at the configured sample rate.
+ - The read_ADC thread of an in-process DataPool with the simulated cage
+   samples Bm at threaded_read_ADC_rate with single reads, and at
+   adc_sample_rate with blocks, with every sample stored with its own
+   timestamp.
+Also times a single read against a block read of the simulated cage.
+"""
+
+from time import sleep, perf_counter
+
+from numpy import allclose, arange, array, diff, random
+
+from helmholtz_cage_toolkit.ringbuffer import RingBuffer
+from helmholtz_cage_toolkit.server.hardware import SimulatedCage
+from helmholtz_cage_toolkit.server.server import DataPool, start_hardware_threads, stop_hardware_threads
+from helmholtz_cage_toolkit.server.server_config import server_config as config
+
+
+cc = "\033[96m" # cyan
+cg = "\033[92m" # green
+cr = "\033[91m" # red
+ce = "\033[0m"  # endc
+
+duration = 3.0  # s per sampling rate measurement
+
+
+class FakeClock:
+    def __init__(self):
+        self.t = 0.
+
+    def __call__(self):
+        return self.t
+
+
+def check(name, passed):
+    if passed:
+        print(cg + f"{name}: PASS" + ce)
+    else:
+        print(cr + f"{name}: FAIL" + ce)
+
+
+def measure_sample_rate(block_size):
+    """Runs the server threads with the simulated cage for `duration`, and
+    returns the number of Bm samples per second, and the Bm timestamps."""
+    config["adc_block_size"] = block_size
+    datapool = DataPool()
+    datapool.hardware = SimulatedCage(config)
+    hardware_threads = start_hardware_threads(datapool)
+    n0 = datapool.Bm.n_written
+    sleep(duration)
+    n1 = datapool.Bm.n_written
+    stop_hardware_threads(datapool, hardware_threads)
+    return (n1 - n0) / duration, datapool.tm.last(min(n1, datapool.tm.size)).copy()
+
+
+if __name__ == "__main__":
+
+    # ==== RingBuffer.extend() ====
+    rng = random.default_rng(0)
+    a = RingBuffer(8, 3)
+    b = RingBuffer(8, 3)
+    equal = True
+    for n in (3, 5, 8, 1, 13, 2):
+        values, t = rng.random((n, 3)), rng.random(n)
+        a.extend(values, t)
+        for k in range(n):
+            b.append(values[k], t[k])
+        equal &= allclose(a.last(), b.last()) and allclose(a.timestamps(), b.timestamps()) \
+            and a[0] == b[0] and a.n_written == b.n_written
+    check("RingBuffer.extend() equals repeated append()", equal)
+
+    # ==== Block reads of the simulated cage ====
+    n = config["adc_block_size"]
+    rate = config["adc_sample_rate"]
+    channel_ids = [config[f"pin_adc_channel_im{axis}"] for axis in "xyz"] \
+        + [config[f"pin_adc_channel_bm{axis}"] for axis in "xyz"]
+
+    clock = FakeClock()
+    cage = SimulatedCage(dict(config, sim_B_noise=0.), clock=clock)
+    cage.dac_write([config[f"pin_dac_supply_{axis}_vcc"] for axis in "xyz"]
+                   + [config[f"pin_dac_supply_{axis}_vvc"] for axis in "xyz"], [1.]*3 + [5.]*3)
+    clock.t = 0.1
+    block, t_block = cage.adc_read_buffer(channel_ids, n)
+    singles = []
+    for k in range(n):
+        clock.t = 0.1 - (n - 1 - k) / rate
+        singles.append(cage.adc_read(channel_ids)[0])
+    check("Block matches single reads at the sample times", allclose(block, array(singles).T))
+    check("Block shape is (channels, samples)", block.shape == (len(channel_ids), n))
+    check("Samples timestamped at the sample rate", allclose(diff(t_block), 1/rate))
+
+    cage = SimulatedCage(config)
+    n_reads = 2000
+    t0 = perf_counter()
+    for i in range(n_reads):
+        cage.adc_read(channel_ids)
+    t_single = (perf_counter() - t0) / n_reads
+    t0 = perf_counter()
+    for i in range(n_reads):
+        cage.adc_read_buffer(channel_ids, n)
+    t_block = (perf_counter() - t0) / n_reads
+    print(cc + f"Simulated cage: single read {t_single*1E6:.1f} μs/sample, block of {n} {t_block/n*1E6:.1f} μs/sample" + ce)
+
+    # ==== Sample rate of the read_ADC thread ====
+    rate_single, _ = measure_sample_rate(1)
+    rate_block, tm = measure_sample_rate(n)
+    print(cc + f"Bm sample rate: {rate_single:.1f} S/s with single reads, {rate_block:.1f} S/s with blocks of {n}" + ce)
+    check("Single reads sample at threaded_read_ADC_rate",
+          abs(rate_single - config["threaded_read_ADC_rate"]) < 0.2*config["threaded_read_ADC_rate"])
+    check("Blocks sample at adc_sample_rate", abs(rate_block - rate) < 0.2*rate)
+    check("Every sample has its own, increasing timestamp", (diff(tm) > 0).all())
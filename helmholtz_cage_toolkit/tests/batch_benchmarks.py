@@ -0,0 +1,64 @@
+"""
+Compares sequential helper calls against the same calls sent as a pipelined
+batch (client_functions.batch()), and checks that both give the same results.
+Requires a running server.
+"""
+
+import sys
+import socket
+from time import time
+
+import helmholtz_cage_toolkit.client_functions as cf
+from helmholtz_cage_toolkit.server.server_config import server_config
+
+
+HOST = server_config["SERVER_ADDRESS"]
+PORT = server_config["SERVER_PORT"]
+
+cc = "\033[96m" # cyan
+cg = "\033[92m" # green
+cr = "\033[91m" # red
+ce = "\033[0m"  # endc
+
+N = 1000    # Number of repetitions
+
+
+if __name__ == "__main__":
+
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        try:
+            s.connect((HOST, PORT))
+        except:  # noqa
+            print("Connection failed!")
+            sys.exit(0)
+
+        # ==== Equivalence check ====
+        r_seq = [cf.get_play_info(s), cf.get_schedule_info(s),
+                 cf.echo(s, "batch"), cf.get_Bc(s)]
+        r_batch = cf.batch(s).get_play_info().get_schedule_info() \
+            .echo("batch").get_Bc().run()
+        if r_seq == r_batch:
+            print(cg + "Batch results match sequential results: PASS" + ce)
+        else:
+            print(cr + "Batch results match sequential results: FAIL" + ce)
+            print(cr + "Sequential:", r_seq, ce)
+            print(cr + "Batch:     ", r_batch, ce)
+
+        # ==== Timing ====
+        for n_requests in (1, 3, 10):
+            t0 = time()
+            for _ in range(N):
+                for _ in range(n_requests):
+                    cf.get_play_info(s)
+            t1 = time()
+            for _ in range(N):
+                b = cf.batch(s)
+                for _ in range(n_requests):
+                    b.get_play_info()
+                b.run()
+            t2 = time()
+
+            t_seq = (t1-t0)/N
+            t_batch = (t2-t1)/N
+            print(cc + f"{n_requests:>2} requests: sequential {t_seq*1E6:8.1f} μs"
+                  + f" | batch {t_batch*1E6:8.1f} μs | {t_seq/t_batch:4.1f}x" + ce)
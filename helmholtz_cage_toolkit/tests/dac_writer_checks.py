@@ -0,0 +1,118 @@
+"""
+Checks the change-coalescing DAC writer (server/dac_writer.py):
+ - Only channels that changed by more than the tolerance are written, in a
+   single bulk write, and the skipped writes are counted.
+ - Writes staged by several callers are gathered into one bulk write on
+   flush().
+ - After invalidate(), every channel is written again.
+Then plays back a schedule in which only the x-axis field changes, on an
+in-process DataPool with the simulated cage at 1 kHz, and reports how many
+DAC channel writes the writer saved, and that the field still follows.
+"""
+
+from time import sleep
+
+from numpy import arange, column_stack, full, mean, sin
+
+from helmholtz_cage_toolkit.server.dac_writer import DACWriter, dac_lsb
+from helmholtz_cage_toolkit.server.hardware import SimulatedCage
+from helmholtz_cage_toolkit.server.server import DataPool, start_hardware_threads, stop_hardware_threads
+from helmholtz_cage_toolkit.server.server_config import server_config as config
+from helmholtz_cage_toolkit.server.timing import LoopTimer
+
+
+cc = "\033[96m" # cyan
+cg = "\033[92m" # green
+cr = "\033[91m" # red
+ce = "\033[0m"  # endc
+
+rate = 1000     # Hz, thread rates of the playback test
+duration = 3.0  # s
+
+
+def check(name, passed):
+    if passed:
+        print(cg + f"{name}: PASS" + ce)
+    else:
+        print(cr + f"{name}: FAIL" + ce)
+
+
+class BulkRecorder:
+    def __init__(self):
+        self.writes = []
+
+    def __call__(self, channels, voltages):
+        self.writes.append(dict(zip(channels, voltages)))
+
+
+if __name__ == "__main__":
+
+    # ==== Offline checks ====
+    recorder = BulkRecorder()
+    writer = DACWriter(recorder, config["dac_write_tolerance"])
+    channels = list(range(9))
+
+    writer.write(channels, [1.0]*9)
+    check("First write writes every channel", recorder.writes[-1] == {c: 1.0 for c in channels})
+
+    n = writer.write(channels, [1.0]*9)
+    check("Unchanged channels are not written", n == 0 and len(recorder.writes) == 1)
+
+    writer.write(channels, [1.0 + dac_lsb/4]*9)
+    check("Changes within tolerance are not written", len(recorder.writes) == 1)
+
+    writer.write(channels, [2.0, 1.0, 1.0, 3.0] + [1.0]*5)
+    check("Only changed channels are written, in one bulk write",
+          len(recorder.writes) == 2 and recorder.writes[-1] == {0: 2.0, 3: 3.0})
+
+    # Three callers, like three PowerSupply objects, stage their channels
+    for axis in range(3):
+        writer.stage([axis, 3 + axis], [2.0 if axis == 0 else 1.0, 4.0])
+    writer.flush()
+    check("Staged channels are flushed in one bulk write",
+          len(recorder.writes) == 3 and recorder.writes[-1] == {3: 4.0, 4: 4.0, 5: 4.0})
+
+    n_requested, n_written, n_saved, n_bulk = writer.stats()
+    check("Write counters add up",
+          (n_requested, n_written, n_saved, n_bulk) == (42, 14, 28, 3))
+
+    writer.invalidate()
+    writer.write(channels, [1.0]*9)
+    check("Every channel is written after invalidate()", len(recorder.writes[-1]) == 9)
+
+    # ==== Playback with the simulated cage ====
+    config["adc_block_size"] = 1    # Single ADC reads, at the kHz thread rate
+    datapool = DataPool()
+    datapool.hardware = SimulatedCage(config)
+    for name in ("control", "read_ADC", "write_DAC"):
+        setattr(datapool, f"threaded_{name}_period", 1/rate)
+        datapool.loop_timers[name] = LoopTimer(1/rate, config["loop_stats_window"])
+    datapool.slew_limiter.dt_max = 1/rate
+    datapool.params_tf_VB = {axis: list(config[f"params_tf_VB_{axis}"]) for axis in "xyz"}
+
+    n = int(duration*100) + 1
+    t = arange(n) * 0.01
+    schedule = column_stack((arange(n), full(n, n), t, 100*sin(2*t), full(n, 20.), full(n, -30.)))
+    datapool.allocate_schedule("x_only", n, t[-1])
+    datapool.write_schedule_chunk(0, schedule[:, 2:])
+
+    hardware_threads = start_hardware_threads(datapool)
+    datapool.play_looping = False
+    datapool.set_play_mode(True)
+    sleep(0.5)      # Let the coils settle at the first step
+    datapool.set_play(True)
+
+    errors = []
+    while datapool.play:
+        sleep(0.01)
+        tm, i_step, Im, Bm, Bc = datapool.read_telemetry()
+        errors.append([bm - bc - be for bm, bc, be in zip(Bm, Bc, config["sim_B_earth"])])
+
+    n_requested, n_written, n_saved, n_bulk = datapool.dac_writer.stats()
+    stop_hardware_threads(datapool, hardware_threads)
+
+    print(cc + f"DAC channel writes: {n_requested} requested, {n_written} written, {n_saved} saved ({100*n_saved/n_requested:.1f} %), in {n_bulk} bulk writes" + ce)
+    check("Writes of the constant y and z channels are saved", n_saved > 0.6*n_requested)
+    error_rms = (mean([e**2 for error in errors for e in error]))**0.5
+    print(cc + f"Field tracking error during playback: {error_rms:.2f} μT RMS" + ce)
+    check("Field follows the schedule", error_rms < 5.)
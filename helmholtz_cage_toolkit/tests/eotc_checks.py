@@ -0,0 +1,93 @@
+"""
+Checks and benchmark of Orbit.equation_of_the_center() in orbit.py, which
+takes the coefficients of its Bessel series from the cache of
+eotc_coefficients(), against equation_of_the_center_loop() below, which is
+the previous implementation, evaluating all Bessel functions for every point.
+"""
+
+from time import perf_counter
+
+from numpy import abs as np_abs, array, linspace, pi, sin
+from scipy.special import jv
+
+from helmholtz_cage_toolkit.orbit import Orbit, Earth, eotc_coefficients
+
+
+cc = "\033[96m" # cyan
+cg = "\033[92m" # green
+cr = "\033[91m" # red
+ce = "\033[0m"  # endc
+
+
+def check(name, passed):
+    if passed:
+        print(cg + f"{name}: PASS" + ce)
+    else:
+        print(cr + f"{name}: FAIL" + ce)
+
+
+def equation_of_the_center_loop(M, e, order=12):
+    """Orbit.equation_of_the_center() before its coefficients were cached"""
+    v = M
+    if 0 < e < 1:
+        b = 1/e * (1 - (1-e*e)**0.5)
+        for s in range(1, order):
+            bt = 0
+            for p in range(1, order):
+                bt += b**p*(jv(s-p, s*e)+jv(s+p, s*e))
+            v += 2/s * (jv(s, s*e) + bt)*sin(s*M)
+    return v
+
+
+if __name__ == "__main__":
+    orbit = Orbit(Earth(), 400E3, 0.2, 51.6, 24., 120., 17.)
+    M = linspace(0, 2*pi, 97)
+
+    # ==== Same values as the loop ====
+    diff = 0.
+    for e in (0.01, 0.1, 0.3, 0.5, 0.7):
+        for order in (2, 4, 12, 20):
+            v = orbit.equation_of_the_center(M, e, order=order)
+            v_ref = array([equation_of_the_center_loop(m, e, order=order) for m in M])
+            diff = max(diff, np_abs(v - v_ref).max())
+    check(f"Same values as the loop for all e and orders (max difference {diff:.1E} rad)", diff < 1E-12)
+
+    v = orbit.equation_of_the_center(1.2, 0.3)
+    check("Scalars in, scalars out", v.shape == () and abs(v - equation_of_the_center_loop(1.2, 0.3)) < 1E-12)
+    check("Circular orbit returns M", (orbit.equation_of_the_center(M, 0.) == M).all())
+
+    # ==== Cache ====
+    eotc_coefficients.cache_clear()
+    orbit.draw(subdivisions=512, spacing="isochronal_eotc", eotc_order=12)
+    orbit.draw(subdivisions=512, spacing="isochronal_eotc", eotc_order=12)
+    orbit.draw(subdivisions=512, spacing="isochronal_eotc", eotc_order=16)
+    info = eotc_coefficients.cache_info()
+    check(f"Coefficients computed once per (e, order) ({info.misses} misses, {info.hits} hits)",
+          info.misses == 2 and info.hits == 1)
+
+    try:
+        eotc_coefficients(0.2, 12)[0] = 0.
+        check("Cached coefficients are read-only", False)
+    except ValueError:
+        check("Cached coefficients are read-only", True)
+
+    # ==== Benchmark ====
+    print(f"\n{'points':>8} | {'loop':>10} | {'1st call':>10} | {'cached':>10} | speedup (cached)")
+    for n in (128, 512, 4096):
+        M = linspace(0, 2*pi, n, endpoint=False)
+
+        t0 = perf_counter()
+        for m in M:
+            equation_of_the_center_loop(m, 0.2)
+        t_loop = perf_counter() - t0
+
+        eotc_coefficients.cache_clear()
+        t0 = perf_counter()
+        orbit.equation_of_the_center(M, 0.2)
+        t_first = perf_counter() - t0
+
+        t0 = perf_counter()
+        orbit.equation_of_the_center(M, 0.2)
+        t_cached = perf_counter() - t0
+        print(cc + f"{n:>8} | {t_loop*1E3:>8.1f}ms | {t_first*1E3:>8.3f}ms | {t_cached*1E3:>8.3f}ms | "
+              + f"{t_loop/t_cached:.0f}x" + ce)
@@ -0,0 +1,108 @@
+"""Checks that PacketFramer reassembles packets correctly, regardless of how
+the byte stream is split up, for both fixed-size (SCC4) and length-prefixed
+(SCC4B) framing."""
+
+from numpy.random import default_rng
+
+import helmholtz_cage_toolkit.scc.scc4 as codec
+import helmholtz_cage_toolkit.scc.scc4b as codec_b
+from helmholtz_cage_toolkit.scc.framing import framer_for
+
+cg = "\033[92m" # green
+cr = "\033[91m" # red
+ce = "\033[0m"  # endc
+
+rng = default_rng(1)
+
+
+def make_packets(codec):
+    return [
+        codec.encode_bpacket(1705321618.6226978, [278.0, -12.4, -123456.1]),
+        codec.encode_mpacket("Lorem ipsum"),
+        codec.encode_epacket(""),
+        codec.encode_tpacket(1705321618.6226978, 12, [1., 2., 3.],
+                             [4., 5., 6.], [7., 8., 9.]),
+        codec.encode_xpacket("get_schedule_info"),
+        codec.encode_spacket(35, 60, 355.932203, -83331.392, -55280.007, 18644.068),
+    ]
+
+
+def check(name, codec, chunking):
+    packets = make_packets(codec)*20
+    framer_tx = framer_for(codec)
+    framer_rx = framer_for(codec)
+    stream = b"".join([framer_tx.frame(p) for p in packets])
+
+    received = []
+    i = 0
+    while i < len(stream):
+        n = chunking(len(stream) - i)
+        framer_rx.feed(stream[i:i+n])
+        received += list(framer_rx)
+        i += n
+
+    if received == packets and framer_rx.buffered() == 0:
+        print(cg + f"{name:>6} | {chunking.__name__:<12} : PASS" + ce)
+    else:
+        print(cr + f"{name:>6} | {chunking.__name__:<12} : FAIL" + ce)
+        print(cr + f"Got {len(received)}/{len(packets)} packets, {framer_rx.buffered()} B left in buffer" + ce)
+
+
+def byte_by_byte(n_left):
+    return 1
+
+def random_split(n_left):
+    return int(rng.integers(1, 300))
+
+def all_at_once(n_left):
+    return n_left
+
+
+print("\n ==== FRAMING CHECKS ====")
+for name, c in (("scc4", codec), ("scc4b", codec_b)):
+    for chunking in (byte_by_byte, random_split, all_at_once):
+        check(name, c, chunking)
+
+
+print("\n ==== FRAMING MODE SWITCH ====")
+# Mimics a 'set_codec' exchange: an SCC4 packet followed by SCC4B packets,
+# which arrive in a single read.
+framer_tx = framer_for(codec)
+framer_rx = framer_for(codec)
+stream = framer_tx.frame(codec.encode_mpacket("1"))
+framer_tx = framer_for(codec_b)
+stream += b"".join([framer_tx.frame(p) for p in make_packets(codec_b)])
+
+framer_rx.feed(stream)
+received = [framer_rx.next_packet()]
+framer_rx.set_packet_size(None)
+received += list(framer_rx)
+
+if received == [codec.encode_mpacket("1")] + make_packets(codec_b):
+    print(cg + "switch : PASS" + ce)
+else:
+    print(cr + "switch : FAIL" + ce)
+
+
+print("\n ==== RECONNECT ====")
+# A connection that dropped halfway through a packet leaves that half in the
+# framer of the socket, and a connection that switched to SCC4B leaves that
+# codec attached to it. When the socket object is reused for a new
+# connection, which always starts in SCC4, cf.reset_socket_state() must
+# discard both.
+from socket import socketpair
+import helmholtz_cage_toolkit.client_functions as cf
+
+client, server = socketpair()
+packet = codec.encode_mpacket("Lorem ipsum")
+cf._socket_codecs[client] = codec_b          # As after set_codec(s, "scc4b")
+cf.get_framer(client).feed(packet[:100])    # Remainder of the old connection
+
+cf.reset_socket_state(client)
+server.sendall(framer_for(codec).frame(packet))
+if cf.get_codec(client) is codec and cf.receive_packet(client) == packet:
+    print(cg + "reset codec and framer : PASS" + ce)
+else:
+    print(cr + "reset codec and framer : FAIL" + ce)
+client.close()
+server.close()
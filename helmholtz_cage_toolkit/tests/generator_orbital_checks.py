@@ -0,0 +1,163 @@
+"""
+Regression test and benchmark of the vectorized generator_orbital2() in
+generator_orbital.py, against generator_orbital2_loop() below, which is the
+previous implementation, looping over every step and evaluating the IGRF with
+pyIGRF point by point. For a range of orbits and body rotations, it checks
+that both give the same schedule and the same simulation data, and compares
+their run times.
+"""
+
+from contextlib import redirect_stdout
+from io import StringIO
+from time import perf_counter
+
+from numpy import abs as np_abs, array, empty, pi, vstack
+from pyIGRF import igrf_value
+
+from helmholtz_cage_toolkit.config import config
+from helmholtz_cage_toolkit.generator_orbital import generator_orbital2, orbital_generation_parameters
+from helmholtz_cage_toolkit.orbit import Orbit, Earth
+from helmholtz_cage_toolkit.pg3d import uv3d, wrap, conv_ECI_geoc, R_SI_B, R_NED_ECI
+from helmholtz_cage_toolkit.utilities import cross3d
+
+
+cc = "\033[96m" # cyan
+cg = "\033[92m" # green
+cr = "\033[91m" # red
+ce = "\033[0m"  # endc
+
+
+class Datapool:
+    def __init__(self):
+        self.config = config
+
+
+def check(name, passed):
+    if passed:
+        print(cg + f"{name}: PASS" + ce)
+    else:
+        print(cr + f"{name}: FAIL" + ce)
+
+
+def generator_orbital2_loop(generation_parameters, datapool):
+    """The implementation of generator_orbital2() before it was vectorized.
+    The time spent outside draw() and the IGRF evaluations is stored in
+    datapool.t_frames."""
+    g = generation_parameters
+    data = datapool
+    n_orbit_subs = g["n_orbit_subs"]
+    n_step = g["n_step"]
+
+    simdata = {
+        "i_step": array(range(n_step)),
+        "Rt_ECI_SI": empty((n_orbit_subs, 3, 3)),
+        "Rt_SI_B": empty((n_step, 3, 3)),
+        "hll": empty((n_step, 3)),
+        "B_ECI": empty((n_step, 3)),
+        "B_B": empty((n_step, 3)),
+        "date": empty(n_step),
+    }
+
+    data.orbit = Orbit(Earth(), g["orbit_pericentre_altitude"], g["orbit_eccentricity"],
+                       g["orbit_inclination"], g["orbit_RAAN"], g["orbit_argp"], g["orbit_ma0"])
+    simdata["xyz"], simdata["v_xyz"], simdata["ma"], \
+        simdata["ta"], simdata["gamma"], simdata["huv"] = data.orbit.draw(
+            subdivisions=n_orbit_subs, spacing="isochronal", eotc_order=data.config["eotc_order"])
+
+    t_start = perf_counter()
+    t_igrf = 0.
+    dt = data.orbit.get_period() / n_orbit_subs
+    dth_E = data.orbit.body.axial_rate * dt
+    simdata["t"] = dt/g["time_speed_factor"] * simdata["i_step"]
+
+    for isub in range(n_orbit_subs):
+        simdata["Rt_ECI_SI"][isub, :, :] = vstack([
+            uv3d(simdata["v_xyz"][isub]),
+            simdata["huv"],
+            cross3d(uv3d(simdata["v_xyz"][isub]), simdata["huv"])])
+
+    for i in range(n_step):
+        simdata["date"][i] = g["date0"] + dt * i / 31_556_952
+        rotangles = array((
+            pi/180 * (g["angle_body_x_0"] + i * g["rate_body_x"] * dt),
+            pi/180 * (g["angle_body_y_0"] + i * g["rate_body_y"] * dt),
+            pi/180 * (g["angle_body_z_0"] + i * g["rate_body_z"] * dt)
+        ))
+        simdata["Rt_SI_B"][i, :, :] = R_SI_B(rotangles)
+        rlli = conv_ECI_geoc(simdata["xyz"][divmod(i, n_orbit_subs)[1], :])
+        simdata["hll"][i, :] = array((
+            1E-3 * (rlli[0] - data.orbit.body.r),
+            180 / pi * wrap(rlli[1] - (g["earth_zero_datum"] + i * dth_E), 2 * pi),
+            180 / pi * rlli[2]
+        ))
+        t_igrf0 = perf_counter()
+        _, _, _, bx, by, bz, _ = igrf_value(
+            simdata["hll"][i, 2], simdata["hll"][i, 1], simdata["hll"][i, 0], simdata["date"][i])
+        t_igrf += perf_counter() - t_igrf0
+        Bi_NED = array([bx/1000, by/1000, bz/1000])
+        simdata["B_ECI"][i, :] = R_NED_ECI(rlli[1], rlli[2]) @ Bi_NED
+        Bi_SI = simdata["Rt_ECI_SI"][divmod(i, n_orbit_subs)[1]] @ simdata["B_ECI"][i, :]
+        simdata["B_B"][i, :] = simdata["Rt_SI_B"][i] @ Bi_SI
+
+    datapool.t_frames = perf_counter() - t_start - t_igrf
+    datapool.simdata = simdata
+    return simdata["t"], simdata["B_B"].transpose()
+
+
+def vectorized_t_frames(genparams):
+    """Runs generator_orbital2() with its timing breakdown, and returns the
+    time spent outside draw() and the IGRF evaluations."""
+    out = StringIO()
+    with redirect_stdout(out):
+        generator_orbital2(genparams, Datapool(), timing=True)
+    sections = {line.split("generator_orbital2()")[1].split(":")[0].strip():
+                float(line.split(":")[-1].split()[0]) * 1E-6
+                for line in out.getvalue().splitlines() if "us" in line}
+    return sections["TOTAL"] - sum([sections[key] for key in
+                                    ("import", "preallocate", "orbit updat", "draw", "IGRF")])
+
+
+def max_rel_diff(a, b):
+    return (np_abs(a - b) / (np_abs(b).max() + 1E-300)).max()
+
+
+if __name__ == "__main__":
+
+    cases = {
+        "default": {},
+        "equatorial": {"orbit_inclination": 0., "orbit_eccentricity": 0.},
+        "polar": {"orbit_inclination": 90., "orbit_eccentricity": 0.01},
+        "tumbling": {"rate_body_x": 3.0, "rate_body_y": -2.0, "rate_body_z": 1.0,
+                     "angle_body_y_0": 45., "earth_zero_datum": 1.0},
+        "eccentric": {"orbit_eccentricity": 0.45, "orbit_argp": 120., "orbit_ma0": 33.},
+    }
+
+    for name, changes in cases.items():
+        genparams = dict(orbital_generation_parameters, n_step=2048, **changes)
+        datapool_loop, datapool_vec = Datapool(), Datapool()
+        t_loop, B_loop = generator_orbital2_loop(genparams, datapool_loop)
+        t_vec, B_vec = generator_orbital2(genparams, datapool_vec)
+
+        diff_simdata = max([max_rel_diff(datapool_vec.simdata[key], datapool_loop.simdata[key])
+                            for key in ("Rt_ECI_SI", "Rt_SI_B", "hll", "B_ECI", "B_B", "date")])
+        identical = (t_vec == t_loop).all() and B_vec.shape == B_loop.shape
+        # Bitwise equality is not guaranteed, as the batched matrix products
+        # may sum in a different order than the matrix products of the loop
+        check(f"'{name}': output identical to loop (max relative difference {diff_simdata:.1E})",
+              identical and diff_simdata < 1E-12)
+
+    # ==== Benchmark ====
+    # The orbit points (Orbit.draw()) are the same in both and take most of the
+    # time, and the IGRF evaluations are benchmarked in tests/igrf_checks.py,
+    # so only the time spent in the rest of the generator is compared
+    print(f"\n{'n_step':>8} | {'loop':>10} | {'vectorized':>10} | speedup   (excl. draw() and IGRF)")
+    for n_step in (1024, 4096, 16384):
+        genparams = dict(orbital_generation_parameters, n_step=n_step)
+        datapool = Datapool()
+        generator_orbital2_loop(genparams, datapool)
+        t_vec = vectorized_t_frames(genparams)
+        print(cc + f"{n_step:>8} | {datapool.t_frames*1E3:>8.2f}ms | {t_vec*1E3:>8.2f}ms | "
+              + f"{datapool.t_frames/t_vec:.0f}x" + ce)
+
+    print("\nTiming breakdown of generator_orbital2():")
+    generator_orbital2(dict(orbital_generation_parameters, n_step=4096), Datapool(), timing=True)
@@ -0,0 +1,150 @@
+"""
+Checks and benchmark of the vectorized IGRF evaluation in igrf.py, against
+pyIGRF.igrf_value(), which it replaces:
+ - The field components must match pyIGRF to within 0.1 nT, for random points
+    over the whole range of the model, and for edge cases (poles, exact
+    epochs, the ends of the range, negative longitudes).
+ - Dates outside the range of the model must raise a ValueError.
+ - trace_fieldlines() in orbital_plot.py must trace the same field lines as
+    the point-by-point tracing it replaces.
+"""
+
+from time import perf_counter
+
+from numpy import abs as np_abs, array, concatenate, empty, pi
+from numpy.random import default_rng
+from pyIGRF import igrf_value as igrf_value_pyigrf
+
+from helmholtz_cage_toolkit.igrf import igrf_value, igrf_xyz, gauss_coefficients
+from helmholtz_cage_toolkit.orbit import Earth
+from helmholtz_cage_toolkit.orbital_plot import trace_fieldlines
+from helmholtz_cage_toolkit.pg3d import conv_ECI_geoc, wrap, norm3d, uv3d, R_NED_ECI
+
+
+cc = "\033[96m" # cyan
+cg = "\033[92m" # green
+cr = "\033[91m" # red
+ce = "\033[0m"  # endc
+
+
+def check(name, passed):
+    if passed:
+        print(cg + f"{name}: PASS" + ce)
+    else:
+        print(cr + f"{name}: FAIL" + ce)
+
+
+def pyigrf_xyz(lat, lon, alt, year):
+    """pyIGRF.igrf_value() for every point, returns an (n, 3) array [nT]"""
+    return array([igrf_value_pyigrf(*p)[3:6] for p in zip(lat, lon, alt, year)])
+
+
+def trace_fieldlines_loop(start_points, date, th_Ei, step_size=7.5E5, itr_max=2048):
+    """The field line tracing of OrbitalPlot.make_b_fieldgrid() before it was
+    vectorized, with pyIGRF."""
+    Bmags = []
+    iters = []
+    all_points = empty((0, 3))
+    for start_point in start_points:
+        xyz_points = [start_point, ]
+        itr = 0
+        while not (norm3d(xyz_points[-1]) < 1.1*Earth().r
+                   and xyz_points[-1][2] > 0) and (itr < itr_max):
+            itr += 1
+            rlonglat = conv_ECI_geoc(xyz_points[-1])
+            r = norm3d(xyz_points[-1]) - Earth().r
+            _, _, _, bx, by, bz, _ = igrf_value_pyigrf(
+                180 / pi * rlonglat[2], 180 / pi * wrap(rlonglat[1] - th_Ei, 2 * pi),
+                1E-3 * r, date)
+            B_xyz = R_NED_ECI(rlonglat[1], rlonglat[2]) @ array([bx / 1000, by / 1000, bz / 1000])
+            Bmag = norm3d(B_xyz)
+            if itr == 1:
+                Bmag = 0
+            Bmags.append(Bmag)
+            xyz_points.append(xyz_points[-1] + uv3d(B_xyz)*step_size)
+        Bmags.append(0.)
+        all_points = concatenate((all_points, array(xyz_points)))
+        iters.append(itr)
+    return all_points, array(Bmags), iters
+
+
+if __name__ == "__main__":
+
+    date_max = gauss_coefficients()[5]
+    print(f"Range of the model: 1900.0 - {date_max}")
+
+    # ==== Random points ====
+    rng = default_rng(20)
+    n = 2000
+    lat = rng.uniform(-90, 90, n)
+    lon = rng.uniform(-180, 360, n)
+    alt = rng.uniform(-10, 5000, n)
+    year = rng.uniform(1900, date_max, n)
+
+    x, y, z = igrf_xyz(lat, lon, alt, year)
+    err = np_abs(array((x, y, z)).T - pyigrf_xyz(lat, lon, alt, year)).max()
+    check(f"Random points, max error {err:.1E} nT", err < 0.1)
+
+    # ==== Edge cases ====
+    edge_cases = array([
+        # lat,   lon,    alt,    year
+        [ 90.,    0.,    0.,     2020.],     # North pole
+        [-90.,   45.,    400.,   2020.],     # South pole
+        [ 90.,    0.,    400.,   1950.],     # North pole, degree 10 model
+        [  0.,    0.,    0.,     1900.],     # First date of the model
+        [ 52., -179.,    400.,   date_max],  # Last date of the model
+        [ 45.,   10.,    400.,   1995.],     # Exact epoch, start of degree 13
+        [-30.,  200.,    800.,   2020.],     # Exact epoch, last model
+        [ 10.,  -60.,    35786., 2010.5],    # Geostationary altitude
+    ])
+    lat, lon, alt, year = edge_cases.T
+    x, y, z = igrf_xyz(lat, lon, alt, year)
+    err = np_abs(array((x, y, z)).T - pyigrf_xyz(lat, lon, alt, year)).max(axis=1)
+    check(f"Edge cases, max error {err.max():.1E} nT", err.max() < 0.1)
+
+    # Scalars in, scalars out, identical to pyIGRF within 0.1 nT
+    values, values_ref = igrf_value(45., 10., 400., 2024.), igrf_value_pyigrf(45., 10., 400., 2024.)
+    check("Scalar igrf_value() matches pyIGRF",
+          all([abs(v - v_ref) < 0.1 for v, v_ref in zip(values[2:], values_ref[2:])])
+          and abs(values[0] - values_ref[0]) < 1E-6 and abs(values[1] - values_ref[1]) < 1E-6
+          and all([v.shape == () for v in values]))
+
+    # Broadcasting: one date for an array of points
+    x, y, z = igrf_xyz(array([10., 20., 30.]), 5., 400., 2015.)
+    x_ref = pyigrf_xyz([10., 20., 30.], [5.]*3, [400.]*3, [2015.]*3)[:, 0]
+    check("Broadcasting of scalar arguments", x.shape == (3,) and np_abs(x - x_ref).max() < 0.1)
+
+    # ==== Out of range ====
+    for year in (1899.9, date_max + 0.1):
+        try:
+            igrf_xyz(0., 0., 0., year)
+            check(f"ValueError for date {year}", False)
+        except ValueError:
+            check(f"ValueError for date {year}", True)
+
+    # ==== Field lines ====
+    start_points = [0.9*Earth().r * uv3d(array([0.6*(i % 3 - 1), 0.6*(i // 3 - 1), -1.]))
+                    for i in range(9)]
+    date0, th_Ei = 2020.0, 0.3
+    points, Bmags, iters = trace_fieldlines(start_points, date0, th_Ei)
+    points_ref, Bmags_ref, iters_ref = trace_fieldlines_loop(start_points, date0, th_Ei)
+    same_shape = points.shape == points_ref.shape and iters == iters_ref
+    check(f"Field lines identical to point-by-point tracing ({len(points)} points)",
+          same_shape and np_abs(points - points_ref).max() < 1.
+          and np_abs(Bmags - Bmags_ref).max() < 1E-3)
+
+    # ==== Benchmark ====
+    print(f"\n{'points':>8} | {'pyIGRF':>10} | {'igrf.py':>10} | speedup")
+    for n in (100, 1000, 10000, 100000):
+        lat, lon = rng.uniform(-90, 90, n), rng.uniform(-180, 180, n)
+        alt, year = rng.uniform(300, 800, n), 2020.5 + rng.uniform(0, 0.1, n)
+        n_ref = min(n, 1000)    # pyIGRF time is extrapolated from 1000 points
+
+        t0 = perf_counter()
+        pyigrf_xyz(lat[:n_ref], lon[:n_ref], alt[:n_ref], year[:n_ref])
+        t_ref = (perf_counter() - t0) * n / n_ref
+
+        t0 = perf_counter()
+        igrf_xyz(lat, lon, alt, year)
+        t_vec = perf_counter() - t0
+        print(cc + f"{n:>8} | {t_ref*1E3:>8.1f}ms | {t_vec*1E3:>8.2f}ms | {t_ref/t_vec:.0f}x" + ce)
@@ -0,0 +1,140 @@
+"""
+Checks and benchmark of the IGRF lookup grids in igrf_grid.py:
+ - The grid must be exact (to float32 precision) on its nodes, and points
+    outside its altitude range must be evaluated exactly.
+ - The error bounds reported by the grid must hold for other points.
+ - A grid must be built once, and loaded from disk after that.
+ - generator_orbital2() in "grid" mode must give the same field as in
+    "exact" mode, to within the error bounds of the grid.
+The grids are made in a temporary directory, which is removed afterwards.
+"""
+
+from contextlib import redirect_stdout
+from io import StringIO
+from os import listdir
+from os.path import getmtime
+from shutil import rmtree
+from tempfile import mkdtemp
+from time import perf_counter
+
+from numpy import array, column_stack, sqrt
+from numpy.random import default_rng
+
+from helmholtz_cage_toolkit.config import config
+from helmholtz_cage_toolkit.generator_orbital import generator_orbital2, orbital_generation_parameters
+from helmholtz_cage_toolkit.igrf import igrf_xyz
+from helmholtz_cage_toolkit.igrf_grid import IGRFGrid, get_igrf_grid
+
+
+cc = "\033[96m" # cyan
+cg = "\033[92m" # green
+cr = "\033[91m" # red
+ce = "\033[0m"  # endc
+
+
+class Datapool:
+    def __init__(self, config):
+        self.config = config
+
+
+def check(name, passed):
+    if passed:
+        print(cg + f"{name}: PASS" + ce)
+    else:
+        print(cr + f"{name}: FAIL" + ce)
+
+
+def error_norm(b, b_ref):
+    return sqrt(((column_stack(b) - column_stack(b_ref))**2).sum(axis=1))
+
+
+if __name__ == "__main__":
+    directory = mkdtemp()
+    date = 2024.3
+
+    try:
+        # ==== Building and loading ====
+        t0 = perf_counter()
+        grid = IGRFGrid(date, (2., 2., 100.), (0., 4000.), directory, verbose=1)
+        t_build = perf_counter() - t0
+        files = listdir(directory)
+        mtime = getmtime(grid.path)
+
+        t0 = perf_counter()
+        grid2 = IGRFGrid(date, (2., 2., 100.), (0., 4000.), directory)
+        t_load = perf_counter() - t0
+        check(f"Grid built once ({t_build:.1f} s) and loaded after ({t_load*1E3:.1f} ms)",
+              len(files) == 1 and files[0].endswith(".npy")
+              and getmtime(grid2.path) == mtime and grid2.error == grid.error)
+
+        # ==== Nodes and fallback ====
+        lat = array([-90., -88., 0., 44., 90.])
+        lon = array([0., 2., 358., 360., 180.])
+        alt = array([0., 100., 4000., 3900., 500.])
+        err = error_norm(grid.lookup(lat, lon, alt), igrf_xyz(lat, lon, alt, date)).max()
+        check(f"Exact on grid nodes (max error {err:.1E} nT)", err < 0.01)
+
+        alt = array([-200., 4100., 35786.])
+        err = error_norm(grid.lookup(lat[:3], lon[:3], alt), igrf_xyz(lat[:3], lon[:3], alt, date)).max()
+        check(f"Exact outside the altitude range (max error {err:.1E} nT)", err < 1E-9)
+
+        # ==== Error bounds ====
+        rng = default_rng(21)
+        n = 20000
+        lat, lon = rng.uniform(-90, 90, n), rng.uniform(-180, 540, n)
+        alt, year = rng.uniform(0, 4000, n), date + rng.uniform(-0.2, 0.2, n)
+        err = error_norm(grid.lookup(lat, lon, alt, year), igrf_xyz(lat, lon, alt, year))
+        print(f"Reported error bounds: {grid.error}")
+        check(f"Error within 1.5x the reported bounds (max {err.max():.1f} nT, "
+              + f"rms {sqrt((err**2).mean()):.1f} nT)",
+              err.max() < 1.5 * grid.error["max"] and sqrt((err**2).mean()) < 1.5 * grid.error["rms"])
+
+        for resolution in ((7., 2., 100.), (2., 7., 100.), (2., 2., 300.)):
+            try:
+                IGRFGrid(date, resolution, (0., 4000.), directory)
+                check(f"ValueError for resolution {resolution}", False)
+            except ValueError:
+                check(f"ValueError for resolution {resolution}", True)
+
+        # ==== Generator ====
+        config_grid = dict(config, igrf_grid_directory=directory)
+        datapool_exact, datapool_grid = Datapool(config_grid), Datapool(config_grid)
+        with redirect_stdout(StringIO()):
+            _, B_exact = generator_orbital2(
+                dict(orbital_generation_parameters, date0=date, igrf_mode="exact"), datapool_exact)
+            _, B_grid = generator_orbital2(
+                dict(orbital_generation_parameters, date0=date, igrf_mode="grid"), datapool_grid)
+        err = sqrt(((B_grid - B_exact)**2).sum(axis=0)).max() * 1000   # uT -> nT
+        check(f"generator_orbital2() grid mode within error bounds (max error {err:.1f} nT)",
+              err < 1.5 * get_igrf_grid(date, config_grid).error["max"])
+
+        # Schedules saved before igrf_mode existed do not have it
+        legacy_parameters = dict(orbital_generation_parameters, date0=date)
+        del legacy_parameters["igrf_mode"]
+        with redirect_stdout(StringIO()):
+            _, B_legacy = generator_orbital2(legacy_parameters, datapool_exact)
+        check("generator_orbital2() without igrf_mode uses 'exact' mode", (B_legacy == B_exact).all())
+
+        try:
+            generator_orbital2(dict(orbital_generation_parameters, igrf_mode="fast"), datapool_exact)
+            check("ValueError for unknown igrf_mode", False)
+        except ValueError:
+            check("ValueError for unknown igrf_mode", True)
+
+        # ==== Benchmark ====
+        print(f"\n{'points':>8} | {'igrf_xyz':>10} | {'lookup':>10} | speedup")
+        for n in (1000, 10000, 100000, 1000000):
+            lat, lon = rng.uniform(-90, 90, n), rng.uniform(-180, 180, n)
+            alt, year = rng.uniform(300, 800, n), date + rng.uniform(0, 0.1, n)
+
+            t0 = perf_counter()
+            igrf_xyz(lat, lon, alt, year)
+            t_exact = perf_counter() - t0
+
+            t0 = perf_counter()
+            grid.lookup(lat, lon, alt, year)
+            t_grid = perf_counter() - t0
+            print(cc + f"{n:>8} | {t_exact*1E3:>8.1f}ms | {t_grid*1E3:>8.1f}ms | {t_exact/t_grid:.1f}x" + ce)
+
+    finally:
+        rmtree(directory)
@@ -0,0 +1,72 @@
+"""
+Requests the loop timing statistics of the server threads ('get_loop_stats')
+from a running server and prints them, once with the server idle, and once
+whilst it is busy answering telemetry requests from this script, to show how
+client load affects the thread loops. Also checks that the loops keep their
+configured rate and that unknown loop names are rejected.
+"""
+
+import sys
+import socket
+from time import time, sleep
+
+import helmholtz_cage_toolkit.client_functions as cf
+from helmholtz_cage_toolkit.server.server_config import server_config
+
+
+HOST = server_config["SERVER_ADDRESS"]
+PORT = server_config["SERVER_PORT"]
+
+cc = "\033[96m" # cyan
+cg = "\033[92m" # green
+cr = "\033[91m" # red
+ce = "\033[0m"  # endc
+
+loop_names = ("control", "read_ADC", "write_DAC")
+duration = 3.0      # s per measurement
+
+
+def print_loop_stats(s, counts_prev):
+    print(f"{'loop':>10} | {'rate':>7} | {'iter mean':>9} {'p99':>8} {'max':>8} | {'late mean':>9} {'p99':>8} {'max':>8} | missed   (μs)")
+    counts = {}
+    for name in loop_names:
+        n_iterations, n_missed, period, iteration, lateness = cf.get_loop_stats(s, name)
+        counts[name] = n_iterations
+        rate = (n_iterations - counts_prev.get(name, 0)) / duration
+        print(cc + f"{name:>10} | {rate:>7.1f} | {iteration[1]*1E6:>9.1f} {iteration[2]*1E6:>8.1f} {iteration[3]*1E6:>8.1f}"
+              + f" | {lateness[1]*1E6:>9.1f} {lateness[2]*1E6:>8.1f} {lateness[3]*1E6:>8.1f} | {n_missed}/{n_iterations}" + ce)
+    return counts
+
+
+if __name__ == "__main__":
+
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        try:
+            s.connect((HOST, PORT))
+        except:  # noqa
+            print("Connection failed!")
+            sys.exit(0)
+
+        if cf.get_loop_stats(s, "nonexistent") == -1:
+            print(cg + "Unknown loop name rejected: PASS" + ce)
+        else:
+            print(cr + "Unknown loop name rejected: FAIL" + ce)
+
+        counts0 = {name: cf.get_loop_stats(s, name)[0] for name in loop_names}
+        sleep(duration)
+        print("\nIdle:")
+        counts1 = print_loop_stats(s, counts0)
+
+        # Check that the control loop keeps its configured rate when idle
+        rate = (counts1["control"] - counts0["control"]) / duration
+        rate_config = server_config["threaded_control_rate"]
+        if abs(rate - rate_config) < 0.05*rate_config:
+            print(cg + f"Control loop rate {rate:.1f} Hz (configured {rate_config} Hz): PASS" + ce)
+        else:
+            print(cr + f"Control loop rate {rate:.1f} Hz (configured {rate_config} Hz): FAIL" + ce)
+
+        t0 = time()
+        while time() - t0 < duration:
+            cf.get_telemetry(s)
+        print("\nBusy (back-to-back telemetry requests):")
+        print_loop_stats(s, counts1)
@@ -0,0 +1,129 @@
+"""
+Checks and benchmark of Orbit.draw() in orbit.py, which solves Kepler's
+equation for all orbit points at once, against draw_loop() below, which is the
+previous implementation, using the Bessel series of equation_of_the_center()
+and looping over every point. The checks are:
+ - The true anomalies satisfy Kepler's equation to machine precision, for
+    eccentricities up to 0.99.
+ - The positions and velocities conserve the specific angular momentum and
+    energy of the orbit (vis-viva), and are consistent with the orbital
+    elements.
+ - For low eccentricities, where the Bessel series converges, draw() agrees
+    with draw_loop() to within the truncation error of the series, and
+    spacing="isochronal_eotc" gives the same results as draw_loop().
+"""
+
+from time import perf_counter
+
+from numpy import abs as np_abs, arctan, arctan2, array, column_stack, cos, cross, dot, empty, linspace, pi, sin, sqrt, zeros
+
+from helmholtz_cage_toolkit.orbit import Orbit, Earth
+
+
+cc = "\033[96m" # cyan
+cg = "\033[92m" # green
+cr = "\033[91m" # red
+ce = "\033[0m"  # endc
+
+
+def check(name, passed):
+    if passed:
+        print(cg + f"{name}: PASS" + ce)
+    else:
+        print(cr + f"{name}: FAIL" + ce)
+
+
+def draw_loop(orbit, subdivisions=128, eotc_order=12):
+    """The isochronal Orbit.draw() before it was vectorized"""
+    mean_anomaly = linspace(0, 2 * pi, subdivisions + 1)[:-1]
+    mean_anomaly = array([(ma+orbit.ma0) % (2*pi) for ma in mean_anomaly])
+    true_anomaly = zeros(len(mean_anomaly))
+    for i in range(len(mean_anomaly)):
+        true_anomaly[i] = orbit.equation_of_the_center(mean_anomaly[i], orbit.e, order=eotc_order)
+
+    radials = orbit.a*(1-orbit.e**2) / (1 + orbit.e * cos(true_anomaly))
+    xyzf = column_stack([radials * cos(true_anomaly), radials * sin(true_anomaly), zeros(len(true_anomaly))])
+    gamma = arctan((orbit.e * sin(true_anomaly)) / (1 + orbit.e * cos(true_anomaly)))
+    vabs = (orbit.body.gm*(2/(xyzf[:, 0]**2+xyzf[:, 1]**2)**0.5 - 1/orbit.a))**0.5
+
+    v_xyzf = empty((len(true_anomaly), 3))
+    for i in range(len(true_anomaly)):
+        tg = true_anomaly[i] - gamma[i]
+        v_xyzf[i, 0:2] = vabs[i]*array([[cos(tg), -sin(tg)], [sin(tg), cos(tg)]])@array([0., 1.])
+        v_xyzf[i, 2] = 0.
+
+    T = orbit.orbit_transformation_matrix()
+    xyz = empty((len(true_anomaly), 3), dtype=float)
+    v_xyz = empty((len(true_anomaly), 3), dtype=float)
+    for i in range(len(xyzf)):
+        xyz[i] = dot(T, xyzf[i])
+        v_xyz[i] = dot(T, v_xyzf[i])
+    H_unit_vector = dot(T, array([0, 0, 1]))
+    return xyz, v_xyz, mean_anomaly, true_anomaly, gamma, H_unit_vector
+
+
+def make_orbit(e, ma0=17.):
+    return Orbit(Earth(), 400E3, e, 51.6, 24., 120., ma0)
+
+
+if __name__ == "__main__":
+
+    # ==== Kepler's equation and conservation laws ====
+    for e in (0., 0.001, 0.2, 0.5, 0.7, 0.9, 0.99):
+        orbit = make_orbit(e, ma0=0.)
+        xyz, v_xyz, ma, ta, gamma, huv = orbit.draw(subdivisions=4096)
+
+        # Mean anomaly back from the true anomaly
+        E = 2*arctan2(sqrt(1-e)*sin(ta/2), sqrt(1+e)*cos(ta/2))
+        M = E - e*sin(E)
+        err_kepler = np_abs((M - ma + pi) % (2*pi) - pi).max()
+
+        # Specific angular momentum and energy
+        r = sqrt((xyz**2).sum(axis=1))
+        h = cross(xyz, v_xyz)
+        h_ref = sqrt(orbit.body.gm * orbit.a * (1 - e**2))
+        err_h = np_abs(h - h_ref*huv).max() / h_ref
+        energy = (v_xyz**2).sum(axis=1)/2 - orbit.body.gm/r
+        err_energy = np_abs(energy + orbit.body.gm/(2*orbit.a)).max() * 2*orbit.a/orbit.body.gm
+
+        # Pericentre and apocentre, which are the first and middle points
+        err_r = max(abs(r[0] - orbit.r_p), abs(r[2048] - orbit.r_a)) / orbit.a
+
+        check(f"e = {e}: Kepler residual {err_kepler:.1E} rad, angular momentum {err_h:.1E}, "
+              + f"energy {err_energy:.1E}",
+              err_kepler < 1E-12 and err_h < 1E-12 and err_energy < 1E-12 and err_r < 1E-12)
+
+    # ==== Agreement with the Bessel series ====
+    # The series of order 12 has a truncation error that grows from 1E-15 rad
+    # at e = 0.05 to 1E-6 rad at e = 0.3
+    for e in (0., 0.05, 0.2, 0.3):
+        orbit = make_orbit(e)
+        new = orbit.draw(subdivisions=512)
+        eotc = orbit.draw(subdivisions=512, spacing="isochronal_eotc")
+        old = draw_loop(orbit, subdivisions=512)
+        diff_ta = np_abs(new[3] - old[3]).max()
+        diff_xyz = np_abs(new[0] - old[0]).max() / orbit.a
+        # Relative, as the matrix products may sum in a different order
+        diff_eotc = max([np_abs(a - b).max() / (np_abs(b).max() + 1E-300) for a, b in zip(eotc, old)])
+        check(f"e = {e}: matches the Bessel series (true anomaly {diff_ta:.1E} rad, "
+              + f"position {diff_xyz:.1E} a)",
+              diff_ta < 1E-5 and diff_xyz < 1E-5 and diff_eotc < 1E-12 and (new[2] == old[2]).all())
+
+    try:
+        make_orbit(1.0)
+        check("ValueError for e = 1", False)
+    except ValueError:
+        check("ValueError for e = 1", True)
+
+    # ==== Benchmark ====
+    print(f"\n{'points':>8} | {'loop':>10} | {'vectorized':>10} | speedup")
+    orbit = make_orbit(0.2)
+    for n in (128, 512, 4096, 16384):
+        t0 = perf_counter()
+        draw_loop(orbit, subdivisions=n)
+        t_loop = perf_counter() - t0
+
+        t0 = perf_counter()
+        orbit.draw(subdivisions=n)
+        t_vec = perf_counter() - t0
+        print(cc + f"{n:>8} | {t_loop*1E3:>8.1f}ms | {t_vec*1E3:>8.3f}ms | {t_loop/t_vec:.0f}x" + ce)
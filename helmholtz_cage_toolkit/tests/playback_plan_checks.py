@@ -0,0 +1,156 @@
+"""
+Checks the compilation of schedules into DAC voltages (playback_plan.py):
+ - The vectorized PlaybackPlan gives the same DAC voltages as driving the
+   PowerSupply objects of server/control_lib.py step by step with
+   set_current_out() and reverse_polarity(), and how much faster it is for
+   large schedules.
+ - Currents beyond imax_supply are clamped and counted, with the same DAC
+   voltages as PowerSupply gives for them, and steps that exceed I_slew_max
+   are reported.
+ - With a running server: activating play mode compiles the schedule, and
+   the results can be requested with 'get_play_plan'.
+"""
+
+import sys
+import socket
+from time import time
+
+from numpy import arange, array, column_stack, full, sin, allclose
+
+import helmholtz_cage_toolkit.client_functions as cf
+from helmholtz_cage_toolkit.server.control_lib import PowerSupply
+from helmholtz_cage_toolkit.server.playback_plan import PlaybackPlan, axes, supply_channel_ids
+from helmholtz_cage_toolkit.server.server_config import server_config as config
+
+
+HOST = config["SERVER_ADDRESS"]
+PORT = config["SERVER_PORT"]
+
+cc = "\033[96m" # cyan
+cg = "\033[92m" # green
+cr = "\033[91m" # red
+ce = "\033[0m"  # endc
+
+params_tf_VB = {axis: config[f"params_tf_VB_{axis}"] for axis in axes}
+
+
+def make_schedule(n, dt=0.01, amplitude=400.):
+    t = arange(n) * dt
+    return column_stack((arange(n), full(n, n), t, amplitude*sin(t),
+                         amplitude*sin(2*t), amplitude*sin(3*t)))
+
+
+class RecordingDACWriter:
+    """Takes the place of the DACWriter of the power supplies, and records
+    the last voltage staged on every DAC channel."""
+    def __init__(self):
+        self.voltages = {}
+
+    def stage(self, channels, values):
+        for channel, value in zip(channels, values):
+            self.voltages[channel] = value
+
+
+def compile_stepwise(schedule, config=config):
+    """Reference implementation, which drives a PowerSupply per axis one step
+    at a time, and records the DAC voltages it writes. Voltages outside
+    [0, vmax_dac], which dac_set_voltages() would refuse, are clamped, as
+    PlaybackPlan does."""
+    writer = RecordingDACWriter()
+    channel_ids = supply_channel_ids(config)
+    supplies = [PowerSupply(channel_ids[0][i], channel_ids[1][i], channel_ids[2][i],
+                            vmax=config["vmax_supply"],
+                            imax=config["imax_supply"],
+                            vpol=config["vlevel_pol"],
+                            r_load=config["r_load"],
+                            v_above=config["v_above"],
+                            i_above=config["i_above"],
+                            params_tf_vc=config[f"params_tf_vc_{axis}"],
+                            params_tf_cc=config[f"params_tf_cc_{axis}"],
+                            dac_writer=writer)
+                for i, axis in enumerate(axes)]
+
+    voltages = []
+    for segment in schedule.tolist():
+        for i, axis in enumerate(axes):
+            b0, b1 = params_tf_VB[axis]
+            current = (segment[3+i] - b0) / b1
+            supplies[i].set_current_out(abs(current))
+            supplies[i].reverse_polarity(current < 0)
+        voltages.append([[min(max(writer.voltages[channel], 0.), config["vmax_dac"])
+                          for channel in channels] for channels in channel_ids])
+    return voltages
+
+
+def check(name, passed):
+    if passed:
+        print(cg + f"{name}: PASS" + ce)
+    else:
+        print(cr + f"{name}: FAIL" + ce)
+
+
+if __name__ == "__main__":
+
+    # ==== Offline checks ====
+    for n in (1_000, 100_000, 1_000_000):
+        schedule = make_schedule(n)
+        t0 = time()
+        plan = PlaybackPlan(schedule, params_tf_VB, config)
+        t1 = time()
+        voltages = compile_stepwise(schedule)
+        t2 = time()
+        print(cc + f"{n:>9} steps | vectorized {(t1-t0)*1E3:8.1f} ms | stepwise {(t2-t1)*1E3:8.1f} ms" + ce)
+        check(f"{n} steps identical to stepwise", allclose(plan.voltages, voltages, rtol=0, atol=1E-12))
+
+    t0 = time()
+    for i in range(100_000):
+        plan.step(i)
+    t1 = time()
+    print(cc + f"Looking up a step: {(t1-t0)/100_000*1E6:.2f} μs" + ce)
+
+    imax = config["imax_supply"]
+    b0, b1 = params_tf_VB["x"]
+    schedule = make_schedule(100)
+    schedule[10:13, 3] = b0 + 2*imax*b1       # Beyond imax_supply
+    plan = PlaybackPlan(schedule, params_tf_VB, config)
+    check("Clamped currents counted",
+          plan.n_clipped_I.tolist() == [3, 0, 0] and abs(plan.I[:, 0]).max() == imax)
+
+    # With a low load resistance, the compliance voltage of a clamped current
+    # stays below vmax_supply, and the VC voltage follows the requested
+    # current, as in set_current_out()
+    config_low_r = dict(config, r_load=1.)
+    a_vc, b_vc = config["params_tf_vc_x"]
+    plan = PlaybackPlan(schedule, params_tf_VB, config_low_r)
+    check("Clamped currents identical to PowerSupply",
+          allclose(plan.voltages, compile_stepwise(schedule, config_low_r), rtol=0, atol=1E-12)
+          and plan.v_vc[10, 0] > (imax*1. + config["v_above"] - b_vc) / a_vc)
+
+    # A jump of 1 A within 0.1 ms exceeds I_slew_max on every axis
+    schedule = make_schedule(100, amplitude=0.)
+    schedule[:, 2] = arange(100) * 1E-4
+    schedule[50:, 3:6] = array([b1 for b0, b1 in params_tf_VB.values()])
+    plan = PlaybackPlan(schedule, params_tf_VB, config)
+    check("Slew rate violation found",
+          plan.slew_violations.tolist() == [50] and (plan.slew_max > config["I_slew_max"]).all())
+    check("Clean schedule has no findings", PlaybackPlan(make_schedule(100), params_tf_VB, config).is_clean())
+
+    # ==== Server checks ====
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        try:
+            s.connect((HOST, PORT))
+        except:  # noqa
+            print("Connection failed!")
+            sys.exit(0)
+
+        schedule_list = schedule.tolist()
+        for segment in schedule_list:
+            segment[0], segment[1] = int(segment[0]), int(segment[1])
+        cf.transfer_schedule(s, schedule_list, "plan_test", bulk=True)
+        cf.set_play_mode(s, True)
+        n_steps, n_clamped_I, n_clamped_dac, slew_max, n_violations, i_first = cf.get_play_plan(s)
+        cf.set_play_mode(s, False)
+        check("Server plan reports slew rate violation",
+              n_steps == 100 and n_violations == 1 and i_first == 50)
+
+        cf.initialize_schedule(s)
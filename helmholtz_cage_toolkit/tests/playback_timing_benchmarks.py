@@ -0,0 +1,76 @@
+"""
+Plays back schedules with several step intervals on a running server, and
+reports how late the server applied the schedule steps, using the step
+lateness histogram ('get_play_lateness'). Also checks that one-shot playback
+ends on time, i.e. that the step timing does not drift over the schedule.
+"""
+
+import sys
+import socket
+from time import time, sleep
+
+from numpy import arange, column_stack, full, sin
+
+import helmholtz_cage_toolkit.client_functions as cf
+from helmholtz_cage_toolkit.server.server_config import server_config
+
+
+HOST = server_config["SERVER_ADDRESS"]
+PORT = server_config["SERVER_PORT"]
+
+cc = "\033[96m" # cyan
+cg = "\033[92m" # green
+cr = "\033[91m" # red
+ce = "\033[0m"  # endc
+
+duration = 3.0                      # s per schedule
+step_intervals = (0.1, 0.01, 0.002) # s
+
+
+def make_schedule(dt):
+    n = int(duration/dt) + 1
+    t = arange(n) * dt
+    schedule = column_stack((arange(n), full(n, n), t,
+                             50*sin(t), 50*sin(2*t), 50*sin(3*t))).tolist()
+    for segment in schedule:
+        segment[0], segment[1] = int(segment[0]), int(segment[1])
+    return schedule
+
+
+if __name__ == "__main__":
+
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        try:
+            s.connect((HOST, PORT))
+        except:  # noqa
+            print("Connection failed!")
+            sys.exit(0)
+
+        cf.set_play_looping(s, False)
+
+        for dt in step_intervals:
+            schedule = make_schedule(dt)
+            cf.transfer_schedule(s, schedule, "timing_test", bulk=True)
+            cf.set_play_mode(s, True)
+
+            cf.set_play(s, True)
+            t0 = time()
+            while cf.get_play_info(s)[1]:   # Wait until playback stops
+                sleep(0.001)
+            t_end = time() - t0
+
+            n, t_mean, t_max, edges, counts = cf.get_play_lateness(s)
+            cf.set_play_mode(s, False)
+
+            print(cc + f"dt = {dt*1E3:5.1f} ms | {n} steps | lateness mean {t_mean*1E6:7.1f} μs, max {t_max*1E6:7.1f} μs" + ce)
+            labels = [f"<{edge*1E6:.0f} μs" for edge in edges] + [f">{edges[-1]*1E6:.0f} μs"]
+            print("    " + " | ".join([f"{label}: {count}" for label, count in zip(labels, counts)]))
+
+            # One-shot playback should end at the time of the final step
+            if n == len(schedule) - 1 and abs(t_end - duration) < 0.02:
+                print(cg + f"    {n} steps applied, ended after {t_end:.3f} s: PASS" + ce)
+            else:
+                print(cr + f"    {n} steps applied, ended after {t_end:.3f} s: FAIL" + ce)
+
+        cf.set_play_looping(s, server_config["default_play_looping"])
+        cf.initialize_schedule(s)
@@ -0,0 +1,92 @@
+"""
+Checks that RingBuffer (ringbuffer.py) behaves like the list buffers it
+replaces, and compares the write times of both for several buffer sizes, and
+for the buffer sizes that the server and client DataPools use with their
+current configs. Does not require a running server.
+"""
+
+from math import ceil
+from time import perf_counter
+
+from numpy import zeros
+
+from helmholtz_cage_toolkit.config import config
+from helmholtz_cage_toolkit.ringbuffer import RingBuffer
+from helmholtz_cage_toolkit.server.server import DataPool
+from helmholtz_cage_toolkit.server.server_config import server_config
+
+
+cc = "\033[96m" # cyan
+cg = "\033[92m" # green
+cr = "\033[91m" # red
+ce = "\033[0m"  # endc
+
+N = 20_000      # Number of writes per timing
+
+
+def write_list(buffer, value):
+    # The list buffer update that RingBuffer replaces
+    buffer.insert(0, value)
+    buffer.pop()
+
+
+def check(name, passed):
+    if passed:
+        print(cg + f"{name}: PASS" + ce)
+    else:
+        print(cr + f"{name}: FAIL" + ce)
+
+
+if __name__ == "__main__":
+
+    # ==== Equivalence checks ====
+    size = 5
+    rb = RingBuffer(size, 3)
+    lb = zeros((size, 3)).tolist()
+    for i in range(13):
+        value = [float(i), 2.*i, 3.*i]
+        rb.append(value, t=100.+i)
+        write_list(lb, value)
+    check("Indexing matches list buffer", [rb[k] for k in range(size)] == lb)
+    check("tolist() matches list buffer", rb.tolist() == lb)
+    check("last(n) is a view, oldest first",
+          rb.last(3).base is not None and rb.last(3).tolist() == lb[:3][::-1])
+    check("last() of full buffer", rb.last().tolist() == lb[::-1])
+
+    t, v = rb.since(110.)
+    check("since() by timestamp",
+          t.tolist() == [110., 111., 112.] and v.tolist() == lb[:3][::-1])
+    check("at() by timestamp",
+          rb.at(110.5) == [10., 20., 30.] and rb.at(50.) is None)
+
+    rs = RingBuffer(4, dtype=int)
+    rs.append(7)
+    check("Scalar entries are Python ints",
+          type(rs[0]) is int and rs[0] == 7 and rs.n_valid() == 1)
+
+    # ==== Timing ====
+    sizes = {
+        "": (5, 64, 1024, 4096, 16384),
+        "server, internal_buffer_size": (server_config["internal_buffer_size"],),
+        "server, ADC history": (DataPool.history_size(
+            server_config["threaded_read_ADC_rate"] * server_config["adc_block_size"]),),
+        "server, control history": (DataPool.history_size(server_config["threaded_control_rate"]),),
+        "server, DAC history": (DataPool.history_size(server_config["threaded_write_DAC_rate"]),),
+        "client, Aqs": (ceil(config["history_duration"] * config["telemetry_polling_rate"]),),
+    }
+
+    print(f"\n{'size':>8} | {'list':>10} | {'RingBuffer':>10} |")
+    value = [1., 2., 3.]
+    for label, size in [(label, size) for label in sizes for size in sizes[label]]:
+        lb = zeros((size, 3)).tolist()
+        rb = RingBuffer(size, 3)
+
+        t0 = perf_counter()
+        for _ in range(N):
+            write_list(lb, value)
+        t1 = perf_counter()
+        for _ in range(N):
+            rb.append(value)
+        t2 = perf_counter()
+
+        print(cc + f"{size:>8} | {(t1-t0)/N*1E9:>7.0f} ns | {(t2-t1)/N*1E9:>7.0f} ns | {label}" + ce)
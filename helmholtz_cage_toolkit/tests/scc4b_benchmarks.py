@@ -0,0 +1,117 @@
+"""This file benchmarks the binary SCC4B codec against the ASCII SCC4 codec,
+for every packet type. Like scc_benchmarks.py, it is meant to be run on
+different hardware."""
+
+from timeit import timeit
+
+import helmholtz_cage_toolkit.scc.scc4 as codec
+import helmholtz_cage_toolkit.scc.scc4b as codec_b
+
+cc = "\033[96m" # cyan
+cg = "\033[92m" # green
+cr = "\033[91m" # red
+ce = "\033[0m"  # endc
+
+tmult = int(1E6)    # 1 / 1E3 / 1E6 / 1E9 for s / ms / us / ns respectively
+N = int(1E5)        # Generic number of tests
+
+if tmult == 1:
+    t_unit = "s"
+elif tmult == 1E3:
+    t_unit = "ms"
+elif tmult == 1E6:
+    t_unit = "μs"
+elif tmult == 1E9:
+    t_unit = "ns"
+else:
+    t_unit = "?s"
+
+print("Running tests with N={:.0E}...".format(N))
+
+Bm_test = [1705321618.6226978, [278.0, -12.4, -123456.12345678]]
+Bc_test = [123.0, -456.321, -123456.12345678]
+msg_test = "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore et dolore magna aliqua. Tellus elementum sagittis vitae et leo. Quam vulputate dignissim suspendisse in est ante in nibh mauris. Aliquam faucibus purus in "
+seg_test = [35, 60, 355.932203, -83331.392, -55280.007, 18644.068]
+echo_test = "ECHO!"
+input_t = {
+    "tm": 1705321618.6226978,
+    "i_step": 1_234_567_890,
+    "Im": [1234.1234, 1234.2345, 1234.3456],
+    "Bm": [-12345.12345, -12345.23456, -12345.34567],
+    "Bc": [-92345.12345, -82345.23456, -72345.34567],
+}
+input_x = (
+    "x_test",
+    1,                                  # int
+    -12345,                             # signed int
+    -345.6,                             # signed float
+    1.4E6,                              # scientific notation input
+    True,                               # bool
+    "Normal string",                    # normal string
+    "Иностранные буквы",                # foreign, non-ASCII characters
+)
+
+# Encoding inputs per packet type, as (function suffix, args)
+inputs = {
+    "bpacket": Bm_test,
+    "cpacket": [Bc_test],
+    "epacket": [echo_test],
+    "mpacket": [msg_test],
+    "spacket": seg_test,
+    "tpacket": list(input_t.values()),
+    "xpacket": input_x,
+}
+
+# Expected decoded outputs per packet type
+outputs = {
+    "bpacket": [Bm_test[0], *Bm_test[1]],
+    "cpacket": Bc_test,
+    "epacket": echo_test,
+    "mpacket": msg_test[:codec_b.packet_size-3],  # SCC4B truncates 2 B earlier
+    "spacket": seg_test,
+    "tpacket": tuple(input_t.values()),
+    "xpacket": (input_x[0], list(input_x[1:])),
+}
+
+
+print("\n ==== LENGTH CHECKS ====")
+for key in inputs.keys():
+    l_scc4 = len(getattr(codec, "encode_" + key)(*inputs[key]))
+    l_scc4b = len(getattr(codec_b, "encode_" + key)(*inputs[key]))
+    if l_scc4b <= codec_b.packet_size:
+        print(cg + key, ":", l_scc4, "B ->", l_scc4b, "B" + ce)
+    else:
+        print(cr + key, ":", l_scc4, "B ->", l_scc4b, "B" + ce)
+
+
+print("\n ==== COMMUTATION CHECKS (SCC4B) ====")
+for key in inputs.keys():
+    decoded = getattr(codec_b, "decode_" + key)(
+        getattr(codec_b, "encode_" + key)(*inputs[key]))
+    if decoded == outputs[key]:
+        print(cg + key, ": PASS" + ce)
+    else:
+        print(cr + key, ": FAIL" + ce)
+        print(cr + "PRE  :", outputs[key], ce)
+        print(cr + "POST :", decoded, ce)
+
+
+n = N
+print("\n ==== TIMING BENCHMARKS ====")
+print(f"t_avg (n={'{:1.0E}'.format(n)}) in {t_unit}:")
+print(f"{'':22} {'SCC4':>10} {'SCC4B':>10} {'speedup':>9}")
+
+for key in inputs.keys():
+    packet = getattr(codec, "encode_" + key)(*inputs[key])
+    packet_b = getattr(codec_b, "encode_" + key)(*inputs[key])
+
+    for action, stmt, stmt_b in (
+        ("encode", f"codec.encode_{key}(*inputs['{key}'])",
+                   f"codec_b.encode_{key}(*inputs['{key}'])"),
+        ("decode", f"codec.decode_{key}(packet)",
+                   f"codec_b.decode_{key}(packet_b)"),
+    ):
+        t_scc4 = timeit(stmt, globals=globals(), number=n)*tmult/n
+        t_scc4b = timeit(stmt_b, globals=globals(), number=n)*tmult/n
+        print(cc, f"{action}_{key}(): {t_scc4:10.3f} {t_scc4b:10.3f}",
+              f"{t_scc4/t_scc4b:8.1f}x", ce)
@@ -0,0 +1,141 @@
+"""
+Checks and benchmark of the schedule cache in schedule_cache.py:
+ - Keys must only depend on the contents of the parameters, not their order,
+    and must change when any parameter or config setting changes.
+ - Schedules and simdata must come back unchanged from both the in-memory and
+    the on-disk tier, including the scalars in simdata.
+ - Both tiers must evict their least recently used entries.
+ - Reloading a previous orbital schedule must take milliseconds.
+The on-disk tier is made in a temporary directory, which is removed
+afterwards.
+"""
+
+from contextlib import redirect_stdout
+from io import StringIO
+from shutil import rmtree
+from tempfile import mkdtemp
+from time import perf_counter
+
+from numpy import ndarray
+
+from helmholtz_cage_toolkit.config import config
+from helmholtz_cage_toolkit.generator_cyclics import generator_cyclics, interpolate
+from helmholtz_cage_toolkit.generator_orbital import generator_orbital2, orbital_generation_parameters
+from helmholtz_cage_toolkit.schedule_cache import ScheduleCache, schedule_key, orbital_config_keys
+
+
+cc = "\033[96m" # cyan
+cg = "\033[92m" # green
+cr = "\033[91m" # red
+ce = "\033[0m"  # endc
+
+
+class Datapool:
+    def __init__(self):
+        self.config = config
+        self.simdata = None
+
+
+def check(name, passed):
+    if passed:
+        print(cg + f"{name}: PASS" + ce)
+    else:
+        print(cr + f"{name}: FAIL" + ce)
+
+
+def generate_orbital(cache, genparams, intparams, datapool):
+    """The schedule generation of OrbitalInput.generate(), with the cache"""
+    key = schedule_key("generator_orbital2", genparams, intparams,
+                       extra={k: config[k] for k in orbital_config_keys})
+    cached = cache.get(key)
+    if cached is None:
+        with redirect_stdout(StringIO()):
+            t, B = generator_orbital2(genparams, datapool)
+        t, B = interpolate(t, B, intparams["factor"], intparams["function"])
+        cache.put(key, t, B, datapool.simdata)
+        return t, B, datapool.simdata
+    return cached
+
+
+def same_simdata(a, b):
+    if a.keys() != b.keys():
+        return False
+    for key in a:
+        if isinstance(a[key], ndarray):
+            if not (a[key] == b[key]).all():
+                return False
+        elif a[key] != b[key] or type(a[key]) != type(b[key]):
+            return False
+    return True
+
+
+if __name__ == "__main__":
+    directory = mkdtemp()
+    intparams = dict(config["default_interpolation_parameters"])
+    genparams = dict(orbital_generation_parameters)
+
+    try:
+        # ==== Keys ====
+        key = schedule_key("generator_orbital2", genparams, intparams)
+        reordered = dict(reversed(list(genparams.items())))
+        check("Key independent of parameter order",
+              schedule_key("generator_orbital2", reordered, intparams) == key)
+        changed = [
+            schedule_key("generator_cyclics", genparams, intparams),
+            schedule_key("generator_orbital2", dict(genparams, date0=2024.5), intparams),
+            schedule_key("generator_orbital2", genparams, dict(intparams, factor=2)),
+            schedule_key("generator_orbital2", genparams, intparams, extra={"eotc_order": 8}),
+        ]
+        check("Key changes with generator, parameters, and config",
+              len(set(changed + [key])) == len(changed) + 1)
+
+        # ==== Both tiers ====
+        cache = ScheduleCache(directory, max_entries=2, max_disk_entries=3)
+        datapool = Datapool()
+
+        t0 = perf_counter()
+        t, B, simdata = generate_orbital(cache, genparams, intparams, datapool)
+        t_generate = perf_counter() - t0
+
+        t0 = perf_counter()
+        t_mem, B_mem, simdata_mem = generate_orbital(cache, genparams, intparams, datapool)
+        t_memory = perf_counter() - t0
+        check("In-memory tier returns the same schedule",
+              t_mem is t and B_mem is B and simdata_mem is simdata)
+
+        cache2 = ScheduleCache(directory)     # As in a new session
+        t0 = perf_counter()
+        t_disk, B_disk, simdata_disk = generate_orbital(cache2, genparams, intparams, Datapool())
+        t_disk_load = perf_counter() - t0
+        check("On-disk tier returns the same schedule and simdata",
+              (t_disk == t).all() and (B_disk == B).all() and same_simdata(simdata_disk, simdata)
+              and cache2.stats() == (0, 1, 0))
+
+        # ==== Eviction ====
+        for date0 in (2021.0, 2022.0, 2023.0):
+            generate_orbital(cache, dict(genparams, date0=date0, n_step=256), intparams, datapool)
+        n_disk = len(cache._disk_entries())
+        check(f"LRU eviction ({len(cache.memory)} in memory, {n_disk} on disk)",
+              len(cache.memory) == 2 and n_disk == 3 and key not in cache.memory
+              and cache.get(key) is None)
+
+        # Cyclics, without simdata
+        cyc_params = dict(config["cyclics_default_generation_parameters"])
+        cyc_key = schedule_key("generator_cyclics", cyc_params, intparams)
+        t_cyc, B_cyc = generator_cyclics(cyc_params)
+        cache.put(cyc_key, t_cyc, B_cyc)
+        t_cyc2, B_cyc2, simdata_cyc = ScheduleCache(directory).get(cyc_key)
+        check("Cyclics schedule from the on-disk tier",
+              (t_cyc2 == t_cyc).all() and (B_cyc2 == B_cyc).all() and simdata_cyc is None)
+
+        cache.clear()
+        check("clear() empties both tiers", len(cache.memory) == 0 and len(cache._disk_entries()) == 0)
+
+        # ==== Benchmark ====
+        print(f"\nOrbital schedule of {genparams['n_step']} steps:")
+        print(cc + f"  generated:     {t_generate*1E3:>8.1f} ms" + ce)
+        print(cc + f"  from memory:   {t_memory*1E3:>8.3f} ms" + ce)
+        print(cc + f"  from disk:     {t_disk_load*1E3:>8.3f} ms" + ce)
+
+    finally:
+        rmtree(directory)
@@ -0,0 +1,111 @@
+"""
+Checks the incremental, chunked schedule hash (schedule_hash.py):
+ - The server DataPool gives the same hash as calculate_schedule_hash() on the
+   client, whether the schedule is written in order, out of order, segment by
+   segment or in chunks.
+ - With a running server: after a bulk upload, the schedule hash is returned
+   without rehashing the schedule, and a schedule with corrupted segments is
+   found and repaired by resending only the corrupted chunks.
+"""
+
+import sys
+import socket
+from time import time
+
+from numpy import arange, column_stack, full, sin
+from numpy.random import permutation
+
+import helmholtz_cage_toolkit.client_functions as cf
+from helmholtz_cage_toolkit.schedule_hash import hash_chunk_size
+from helmholtz_cage_toolkit.server.server import DataPool
+from helmholtz_cage_toolkit.server.server_config import server_config
+
+
+HOST = server_config["SERVER_ADDRESS"]
+PORT = server_config["SERVER_PORT"]
+
+cc = "\033[96m" # cyan
+cg = "\033[92m" # green
+cr = "\033[91m" # red
+ce = "\033[0m"  # endc
+
+
+def make_schedule(n):
+    t = arange(n) * 0.01
+    schedule = column_stack((arange(n), full(n, n), t,
+                             50*sin(t), 50*sin(2*t), 50*sin(3*t))).tolist()
+    for segment in schedule:
+        segment[0], segment[1] = int(segment[0]), int(segment[1])
+    return schedule
+
+
+def check(name, passed):
+    if passed:
+        print(cg + f"{name}: PASS" + ce)
+    else:
+        print(cr + f"{name}: FAIL" + ce)
+
+
+if __name__ == "__main__":
+
+    # ==== Offline checks ====
+    n = 3*hash_chunk_size + 123
+    schedule = make_schedule(n)
+    hash_local = cf.calculate_schedule_hash(schedule)
+    tB = [segment[2:] for segment in schedule]
+
+    datapool = DataPool()
+
+    datapool.allocate_schedule("in_order", n, schedule[-1][2])
+    for segment in schedule:
+        datapool.write_schedule_segment(segment)
+    n_voided = datapool.schedule_digests.count(None)
+    check("Segments in order", datapool.read_schedule_hash() == hash_local and n_voided == 0)
+
+    datapool.allocate_schedule("out_of_order", n, schedule[-1][2])
+    for i in permutation(n):
+        datapool.write_schedule_segment(schedule[i])
+    check("Segments out of order", datapool.read_schedule_hash() == hash_local)
+
+    for chunk_size in (1000, hash_chunk_size, 10000):
+        datapool.allocate_schedule("chunks", n, schedule[-1][2])
+        for i_first in range(0, n, chunk_size):
+            datapool.write_schedule_chunk(i_first, tB[i_first:i_first+chunk_size])
+        n_voided = datapool.schedule_digests.count(None)
+        check(f"Chunks of {chunk_size}", datapool.read_schedule_hash() == hash_local and n_voided == 0)
+
+    # ==== Server checks ====
+    n = 1_000_000
+    schedule = make_schedule(n)
+
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        try:
+            s.connect((HOST, PORT))
+        except:  # noqa
+            print("Connection failed!")
+            sys.exit(0)
+
+        cf.transfer_schedule(s, schedule, "hash_test", bulk=True)
+        t0 = time()
+        hash_server = cf.get_schedule_hash(s)
+        t1 = time()
+        hash_local = cf.calculate_schedule_hash(schedule)
+        t2 = time()
+        print(cc + f"{n} segments: server hash after upload {(t1-t0)*1E3:.1f} ms, local hash {(t2-t1)*1E3:.1f} ms" + ce)
+        check("Server hash matches local hash", hash_server == hash_local)
+
+        corrupted = [5, 100_000, 100_001, 999_999]
+        for i in corrupted:
+            cf.set_schedule_segment(s, schedule[i][:3] + [0., 0., 0.])
+        expected = sorted(set([i // hash_chunk_size for i in corrupted]))
+        check("Corruption detected", not cf.verify_schedule(s, schedule)[0])
+        check("Corrupted chunks found",
+              cf.find_schedule_mismatches(s, schedule) == expected)
+
+        t0 = time()
+        repaired = cf.repair_schedule(s, schedule, "hash_test")
+        t1 = time()
+        check(f"Repaired {len(repaired)} chunks in {(t1-t0)*1E3:.1f} ms",
+              repaired == expected and cf.verify_schedule(s, schedule)[0])
+
+        cf.initialize_schedule(s)
@@ -0,0 +1,104 @@
+"""
+Compares the old server schedule storage (a list of lists, hashed through
+array(schedule).tobytes()) against the new one (a preallocated (n, 6) float64
+array, hashed directly from its memory) in terms of memory use and allocate,
+fill, and hash times, and checks that both give the same hash. Then uploads a
+schedule to a running server and checks that its hash matches the client's.
+"""
+
+import sys
+import socket
+import tracemalloc
+from hashlib import blake2b
+from time import perf_counter
+
+from numpy import arange, array, column_stack, full, zeros, sin
+
+import helmholtz_cage_toolkit.client_functions as cf
+from helmholtz_cage_toolkit.server.server_config import server_config
+
+
+HOST = server_config["SERVER_ADDRESS"]
+PORT = server_config["SERVER_PORT"]
+
+cc = "\033[96m" # cyan
+cg = "\033[92m" # green
+cr = "\033[91m" # red
+ce = "\033[0m"  # endc
+
+n_seg = 1_000_000
+
+
+def make_tB(n):
+    t = arange(n) * 0.01
+    return column_stack((t, 50*sin(t), 50*sin(2*t), 50*sin(3*t)))
+
+
+def run_list(tB):
+    tracemalloc.start()
+    t0 = perf_counter()
+    schedule = list(zeros((n_seg, 6)).tolist())
+    t1 = perf_counter()
+    schedule[0:n_seg] = column_stack((arange(n_seg), full(n_seg, n_seg), tB)).tolist()
+    t2 = perf_counter()
+    h = blake2b(array(schedule).tobytes(), digest_size=8).hexdigest()
+    t3 = perf_counter()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return h, memory, t1-t0, t2-t1, t3-t2
+
+
+def run_array(tB):
+    tracemalloc.start()
+    t0 = perf_counter()
+    schedule = zeros((n_seg, 6))
+    t1 = perf_counter()
+    rows = schedule[0:n_seg]
+    rows[:, 0] = arange(n_seg)
+    rows[:, 1] = n_seg
+    rows[:, 2:] = tB
+    t2 = perf_counter()
+    h = blake2b(schedule.data, digest_size=8).hexdigest()
+    t3 = perf_counter()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return h, memory, t1-t0, t2-t1, t3-t2
+
+
+if __name__ == "__main__":
+    tB = make_tB(n_seg)
+
+    print(f"{'storage':>8} | {'memory':>8} | {'allocate':>9} | {'fill':>9} | {'hash':>9}   ({n_seg} segments)")
+    results = {}
+    for name, run in (("list", run_list), ("array", run_array)):
+        h, memory, t_alloc, t_fill, t_hash = run(tB)
+        results[name] = h
+        print(cc + f"{name:>8} | {memory/1E6:>5.0f} MB | {t_alloc*1E3:>6.1f} ms"
+              + f" | {t_fill*1E3:>6.1f} ms | {t_hash*1E3:>6.1f} ms" + ce)
+
+    if results["list"] == results["array"]:
+        print(cg + "List and array hashes match: PASS" + ce)
+    else:
+        print(cr + "List and array hashes match: FAIL" + ce)
+
+    # ==== Server check ====
+    n = 10_000
+    tB = make_tB(n)
+    schedule = column_stack((arange(n), full(n, n), tB)).tolist()
+    for segment in schedule:
+        segment[0], segment[1] = int(segment[0]), int(segment[1])
+
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        try:
+            s.connect((HOST, PORT))
+        except:  # noqa
+            print("Connection failed!")
+            sys.exit(0)
+
+        cf.transfer_schedule(s, schedule, "storage_test", bulk=True)
+        segment = cf.get_schedule_segment(s, n-1)
+        if cf.verify_schedule(s, schedule) and segment == schedule[n-1]:
+            print(cg + "Server schedule hash and segment readback: PASS" + ce)
+        else:
+            print(cr + f"Server schedule hash and segment readback: FAIL ({segment})" + ce)
+        cf.initialize_schedule(s)
@@ -0,0 +1,190 @@
+"""
+Checks and benchmark of the chunked schedule generation, for schedules that
+are too long to hold in memory at once:
+ - generator_cyclics_chunks() and generator_orbital2_chunks() must yield
+    chunks of the requested size, which together are the same as the output
+    of generator_cyclics() and generator_orbital2().
+ - Linear interpolation chunk by chunk must give the same result as
+    interpolate() on the whole schedule, and spline interpolation must agree
+    to within the error of the overlap.
+ - The peak memory use of the chunked orbital generator must not grow with
+    the length of the schedule.
+ - write_bsch_chunks() must write the same file as write_bsch_file().
+ - With a running server: a streamed schedule must arrive intact, which is
+    checked with the hash returned by transfer_schedule_stream().
+"""
+
+import sys
+import socket
+from contextlib import redirect_stdout
+from io import StringIO
+from os import remove
+from tempfile import mkstemp
+from time import perf_counter
+from tracemalloc import start, stop, get_traced_memory, reset_peak
+
+from numpy import abs as np_abs, array, concatenate
+
+import helmholtz_cage_toolkit.client_functions as cf
+from helmholtz_cage_toolkit.config import config
+from helmholtz_cage_toolkit.file_handling import (
+    generate_schedule_segments, write_bsch_file, write_bsch_chunks)
+from helmholtz_cage_toolkit.generator_cyclics import (
+    generator_cyclics, generator_cyclics_chunks, generator_cyclics_extent)
+from helmholtz_cage_toolkit.generator_orbital import (
+    generator_orbital2, generator_orbital2_chunks, generator_orbital2_extent,
+    interpolate, orbital_generation_parameters)
+from helmholtz_cage_toolkit.server.server_config import server_config
+from helmholtz_cage_toolkit.utilities import tB_to_schedule
+
+
+HOST = server_config["SERVER_ADDRESS"]
+PORT = server_config["SERVER_PORT"]
+
+cc = "\033[96m" # cyan
+cg = "\033[92m" # green
+cr = "\033[91m" # red
+ce = "\033[0m"  # endc
+
+
+class Datapool:
+    def __init__(self):
+        self.config = config
+        self.schedule = None
+
+    def get_schedule_steps(self):
+        return len(self.schedule[0])
+
+
+def check(name, passed):
+    if passed:
+        print(cg + f"{name}: PASS" + ce)
+    else:
+        print(cr + f"{name}: FAIL" + ce)
+
+
+def join(chunks, chunk_size):
+    """Puts the chunks together, and checks that all but the last one have
+    `chunk_size` points."""
+    chunks = list(chunks)
+    sizes_ok = all([len(t) == chunk_size for t, _ in chunks[:-1]]) and len(chunks[-1][0]) <= chunk_size
+    return concatenate([t for t, _ in chunks]), concatenate([B for _, B in chunks], axis=1), sizes_ok
+
+
+def consume(chunks):
+    n = 0
+    for t, B in chunks:
+        n += len(t)
+    return n
+
+
+if __name__ == "__main__":
+
+    # ==== Cyclics ====
+    genparams = dict(config["cyclics_default_generation_parameters"],
+                     duration=100, resolution=37, fbaseX="sine", fbaseY="triangle", fbaseZ="linear",
+                     amplitudeX=3., frequencyX=0.05, offsetZ=-2.)
+    for predelay, postdelay in ((0., 0.), (1.5, 2.)):
+        g = dict(genparams, predelay=predelay, postdelay=postdelay)
+        t, B = generator_cyclics(g)
+        passed = generator_cyclics_extent(g) == (len(t), t[0], t[-1])
+        for chunk_size in (1, 7, 1000, 100000):
+            tc, Bc, sizes_ok = join(generator_cyclics_chunks(g, chunk_size=chunk_size), chunk_size)
+            passed = passed and sizes_ok and (tc == t).all() and (Bc == B).all()
+        check(f"Cyclics chunks match generator_cyclics() (predelay {predelay}, postdelay {postdelay})", passed)
+
+        diff_spline = 0.
+        passed = True
+        for function in ("linear", "spline"):
+            for factor in (1, 4):
+                intparams = {"function": function, "factor": factor}
+                ti, Bi = interpolate(t, B, factor, function)
+                for chunk_size in (7, 1000):
+                    tc, Bc, sizes_ok = join(generator_cyclics_chunks(g, intparams, chunk_size=chunk_size), chunk_size)
+                    passed = passed and sizes_ok and (tc == ti).all() \
+                        and len(tc) == generator_cyclics_extent(g, intparams)[0]
+                    if function == "linear":
+                        passed = passed and (Bc == array(Bi)).all()
+                    else:
+                        diff_spline = max(diff_spline, np_abs(Bc - array(Bi)).max())
+        check(f"Interpolation per chunk matches interpolate() (spline difference {diff_spline:.1E} uT)",
+              passed and diff_spline < 1E-8)
+
+    # ==== Orbital ====
+    g = dict(orbital_generation_parameters, n_step=20000)
+    with redirect_stdout(StringIO()):
+        t, B = generator_orbital2(g, Datapool())
+    intparams = {"function": "linear", "factor": 3}
+    ti, Bi = interpolate(t, B, 3, "linear")
+    passed = generator_orbital2_extent(g) == (len(t), t[0], t[-1])
+    for chunk_size in (1000, 4096, 100000):
+        tc, Bc, sizes_ok = join(generator_orbital2_chunks(g, Datapool(), chunk_size=chunk_size), chunk_size)
+        tci, Bci, sizes_ok_i = join(generator_orbital2_chunks(g, Datapool(), intparams, chunk_size=chunk_size),
+                                    chunk_size)
+        passed = passed and sizes_ok and sizes_ok_i and (tc == t).all() and (Bc == B).all() \
+            and (tci == ti).all() and (Bci == array(Bi)).all()
+    check("Orbital chunks match generator_orbital2(), with and without interpolation", passed)
+
+    # ==== Memory ====
+    print(f"\n{'n_step':>8} | {'full':>18} | {'chunked':>18}")
+    peaks = []
+    for n_step in (50_000, 200_000):
+        g = dict(orbital_generation_parameters, n_step=n_step)
+        start()
+        t0 = perf_counter()
+        with redirect_stdout(StringIO()):
+            t, B = interpolate(*generator_orbital2(g, Datapool()), 3, "linear")
+        t_full = perf_counter() - t0
+        peak_full = get_traced_memory()[1]
+        del t, B
+        reset_peak()
+        t0 = perf_counter()
+        consume(generator_orbital2_chunks(g, Datapool(), intparams, chunk_size=4096))
+        t_chunked = perf_counter() - t0
+        peak_chunked = get_traced_memory()[1]
+        stop()
+        peaks.append(peak_chunked)
+        print(cc + f"{n_step:>8} | {peak_full/1E6:>6.1f} MB {t_full*1E3:>6.0f} ms | "
+              + f"{peak_chunked/1E6:>6.1f} MB {t_chunked*1E3:>6.0f} ms" + ce)
+    check("Peak memory of the chunked generator does not grow with n_step", peaks[1] < 1.5*peaks[0])
+
+    # ==== File writer ====
+    g = dict(orbital_generation_parameters, n_step=10000)
+    datapool = Datapool()
+    with redirect_stdout(StringIO()):
+        datapool.schedule = tB_to_schedule(*generator_orbital2(g, datapool))
+    _, filename_full = mkstemp(suffix=".bsch")
+    _, filename_chunks = mkstemp(suffix=".bsch")
+    try:
+        write_bsch_file(filename_full, generate_schedule_segments(datapool))
+        n_written = write_bsch_chunks(filename_chunks, generator_orbital2_chunks(g, Datapool(), chunk_size=999),
+                                      generator_orbital2_extent(g)[0])
+        with open(filename_full) as f_full, open(filename_chunks) as f_chunks:
+            check("write_bsch_chunks() writes the same file as write_bsch_file()",
+                  n_written == 10000 and f_full.read() == f_chunks.read())
+    finally:
+        remove(filename_full)
+        remove(filename_chunks)
+
+    # ==== Server check ====
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        try:
+            s.connect((HOST, PORT))
+        except:  # noqa
+            print("Connection failed!")
+            sys.exit(0)
+
+        g = dict(orbital_generation_parameters, n_step=50000)
+        n_seg, _, duration = generator_orbital2_extent(g, intparams)
+        t_transfer, hash_local = cf.transfer_schedule_stream(
+            s, generator_orbital2_chunks(g, Datapool(), intparams, chunk_size=10000),
+            n_seg, duration, name="stream_test")
+        hash_server = cf.get_schedule_hash(s)
+
+        with redirect_stdout(StringIO()):
+            t, B = interpolate(*generator_orbital2(g, Datapool()), 3, "linear")
+        hash_full = cf.calculate_schedule_hash(tB_to_schedule(t, B).transpose())
+        check(f"Streamed schedule of {n_seg} segments arrived intact ({t_transfer*1E3:.0f} ms)",
+              hash_local == hash_server == hash_full)
+
+        cf.initialize_schedule(s)
@@ -0,0 +1,96 @@
+"""
+Benchmarks the per-segment schedule transfer (one s-packet and one round trip
+per segment) against the bulk schedule transfer (k-packets of many segments
+each), for schedules of various lengths. Also checks that a k-packet is
+refused on a connection that does not use SCC4B. Requires a running server.
+
+Transferring a 1M segment schedule per segment takes on the order of minutes,
+so it can be skipped by setting `skip_slow` to True.
+"""
+
+import sys
+import socket
+from time import time
+
+from helmholtz_cage_toolkit import *
+import helmholtz_cage_toolkit.client_functions as cf
+from helmholtz_cage_toolkit.server.server_config import server_config
+
+
+HOST = server_config["SERVER_ADDRESS"]
+PORT = server_config["SERVER_PORT"]
+
+cc = "\033[96m" # cyan
+cg = "\033[92m" # green
+cr = "\033[91m" # red
+ce = "\033[0m"  # endc
+
+n_segs = (1_000, 100_000, 1_000_000)
+chunk_size = 4096
+skip_slow = False   # Skip per-segment transfer of the 1M segment schedule
+
+
+def make_schedule(n):
+    """Makes an (n, 6) schedule with values that survive the SCC4 encoding
+    without truncation, so that the hashes can be compared afterwards."""
+    i = arange(n)
+    t = i*0.5
+    B = uniform(-1E5, 1E5, (n, 3)).round(3)
+    return column_stack((i, n*ones(n), t, B))
+
+
+def run_transfer(bulk, schedule):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        try:
+            s.connect((HOST, PORT))
+        except:  # noqa
+            print("Connection failed!")
+            sys.exit(0)
+
+        t_transfer = cf.transfer_schedule(
+            s, schedule, name=f"bench_{len(schedule)}",
+            bulk=bulk, chunk_size=chunk_size)
+        verify, _, _ = cf.verify_schedule(s, schedule)
+        cf.initialize_schedule(s)
+    return t_transfer, verify
+
+
+if __name__ == "__main__":
+    # ==== k-packet without SCC4B ====
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        try:
+            s.connect((HOST, PORT))
+        except:  # noqa
+            print("Connection failed!")
+            sys.exit(0)
+
+        r = cf.get_codec(s).decode_mpacket(cf.send_and_receive(b"k" + b"#"*255, s))
+        if r == "-1" and cf.echo(s, "alive") == "alive":
+            print(cg + "k-packet refused on SCC4 connection: PASS" + ce)
+        else:
+            print(cr + f"k-packet refused on SCC4 connection: FAIL (response: {r})" + ce)
+
+    print(f"Benchmarking schedule transfer to {HOST}:{PORT} (chunk_size={chunk_size})")
+    print(f"{'n_seg':>10} {'per-segment':>14} {'bulk':>14} {'speedup':>9}")
+
+    for n in n_segs:
+        schedule = make_schedule(n)
+
+        if skip_slow and n >= 1_000_000:
+            t_seg, v_seg = None, True
+        else:
+            t_seg, v_seg = run_transfer(False, schedule)
+        t_bulk, v_bulk = run_transfer(True, schedule)
+
+        if v_seg and v_bulk:
+            c = cc
+        else:
+            c = cr
+
+        if t_seg is None:
+            print(c + f"{n:>10} {'skipped':>14} {t_bulk*1E3:>11.1f} ms {'':>9}" + ce)
+        else:
+            print(c + f"{n:>10} {t_seg*1E3:>11.1f} ms {t_bulk*1E3:>11.1f} ms {t_seg/t_bulk:>8.1f}x" + ce)
+
+        if not (v_seg and v_bulk):
+            print(cr + f"Hash verification failed! per-segment: {v_seg}, bulk: {v_bulk}" + ce)
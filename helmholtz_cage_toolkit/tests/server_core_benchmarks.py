@@ -0,0 +1,102 @@
+"""
+Benchmarks packet latency of the threaded server core (server.py) against the
+asyncio server core (server_asyncio.py), with 1, 4, and 16 concurrent
+clients. Each client runs in its own process, so that the clients do not
+compete with each other for the GIL, and sends get_telemetry() requests
+back-to-back, timing every round trip.
+
+This script starts and stops the servers itself, so make sure no other server
+is running on the configured port. Server verbosity is set to 0 for the test,
+as printing would otherwise dominate the measurements.
+"""
+
+import sys
+import socket
+import subprocess
+from multiprocessing import Pool
+from time import time, sleep
+
+from numpy import array, percentile
+
+import helmholtz_cage_toolkit.client_functions as cf
+from helmholtz_cage_toolkit.server.server_config import server_config
+
+
+HOST = server_config["SERVER_ADDRESS"]
+PORT = server_config["SERVER_PORT"]
+
+cc = "\033[96m" # cyan
+cr = "\033[91m" # red
+ce = "\033[0m"  # endc
+
+n_clients_list = (1, 4, 16)
+n_requests = 2000           # Per client
+
+server_modules = {
+    "threaded": "helmholtz_cage_toolkit.server.server",
+    "asyncio": "helmholtz_cage_toolkit.server.server_asyncio",
+}
+
+server_launcher = """
+import runpy
+from helmholtz_cage_toolkit.server.server_config import server_config
+server_config["verbosity"] = 0
+runpy.run_module("{}", run_name="__main__")
+"""
+
+
+def run_client(_):
+    """Connects, sends n_requests requests, and returns their latencies."""
+    latencies = []
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.connect((HOST, PORT))
+        for _ in range(n_requests):
+            t0 = time()
+            cf.get_telemetry(s)
+            latencies.append(time() - t0)
+    return latencies
+
+
+def wait_for_server(timeout=10.):
+    t0 = time()
+    while time() - t0 < timeout:
+        try:
+            with socket.create_connection((HOST, PORT), timeout=0.1):
+                return True
+        except OSError:
+            sleep(0.1)
+    return False
+
+
+if __name__ == "__main__":
+    results = {}
+
+    for name, module in server_modules.items():
+        process = subprocess.Popen(
+            [sys.executable, "-c", server_launcher.format(module)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_for_server():
+                print(cr + f"Could not start {name} server!" + ce)
+                continue
+
+            for n_clients in n_clients_list:
+                with Pool(n_clients) as pool:
+                    latencies = array(sum(pool.map(run_client, range(n_clients)), []))
+                results[(name, n_clients)] = (
+                    percentile(latencies, 50), percentile(latencies, 99))
+        finally:
+            process.terminate()
+            process.wait()
+            sleep(0.5)  # Give the OS a moment to release the port
+
+    print(f"\n{'clients':>8} | {'threaded p50':>12} {'p99':>9} | {'asyncio p50':>12} {'p99':>9}   (μs)")
+    for n_clients in n_clients_list:
+        row = f"{n_clients:>8} |"
+        for name in server_modules.keys():
+            if (name, n_clients) in results:
+                p50, p99 = results[(name, n_clients)]
+                row += f" {p50*1E6:>12.1f} {p99*1E6:>9.1f} |"
+            else:
+                row += f" {'-':>12} {'-':>9} |"
+        print(cc + row[:-2] + ce)
@@ -0,0 +1,132 @@
+"""
+Checks the simulated cage hardware backend (hardware.py), and uses it to load
+test the full read_ADC/write_DAC pipeline of the server at kHz thread rates:
+ - The DAC voltages that the server computes for a current (see
+   playback_plan.py) make the simulated power supplies output that current.
+ - The coil currents follow a first-order L/R step response, and the
+   magnetometer sees the field with the configured latency, Earth field, and
+   noise.
+ - The control, read_ADC and write_DAC threads run in-process on a DataPool
+   with the simulated cage at 1 kHz, while a schedule is played back, after
+   which the loop statistics and the field tracking error are reported.
+"""
+
+from math import exp
+from time import sleep
+
+from numpy import arange, column_stack, full, sin, std, mean
+
+from helmholtz_cage_toolkit.server.hardware import SimulatedCage
+from helmholtz_cage_toolkit.server.playback_plan import currents_to_voltages, supply_channel_ids
+from helmholtz_cage_toolkit.server.server import DataPool, start_hardware_threads, stop_hardware_threads
+from helmholtz_cage_toolkit.server.server_config import server_config as config
+from helmholtz_cage_toolkit.server.timing import LoopTimer
+
+
+cc = "\033[96m" # cyan
+cg = "\033[92m" # green
+cr = "\033[91m" # red
+ce = "\033[0m"  # endc
+
+rate = 1000     # Hz, thread rates of the load test
+duration = 3.0  # s
+
+
+class FakeClock:
+    def __init__(self):
+        self.t = 0.
+
+    def __call__(self):
+        return self.t
+
+
+def check(name, passed):
+    if passed:
+        print(cg + f"{name}: PASS" + ce)
+    else:
+        print(cr + f"{name}: FAIL" + ce)
+
+
+def apply_currents(cage, I):
+    v_vc, v_cc, v_pol, _ = currents_to_voltages(I, config)
+    channel_ids = [c for channel_ids in supply_channel_ids(config) for c in channel_ids]
+    cage.dac_write(channel_ids, v_vc[0].tolist() + v_cc[0].tolist() + v_pol[0].tolist())
+
+
+if __name__ == "__main__":
+
+    # ==== Offline checks ====
+    clock = FakeClock()
+    cage = SimulatedCage(config, clock=clock, seed=0)
+    tau = config["sim_L_coil"][0] / config["sim_R_coil"][0]
+    latency = config["sim_latency"]
+
+    I_target = (1.5, -0.8, 0.)
+    apply_currents(cage, I_target)
+    check("DAC voltages give the intended supply currents",
+          all([abs(a - b) < 1E-9 for a, b in zip(cage.setpoint(), I_target)]))
+
+    clock.t = tau
+    I = cage.currents(clock.t)
+    check("Current after one time constant is 63.2 % of the step",
+          abs(I[0] - I_target[0]*(1 - exp(-1))) < 1E-9)
+
+    clock.t = 1000*tau
+    pins_Bm = [config[f"pin_adc_channel_bm{axis}"] for axis in "xyz"]
+    samples = [[v*config["adc_scale_Bm"] for v in cage.adc_read(pins_Bm)[0]] for i in range(10000)]
+    B_expected = [b0 + b1*I + B_e for (b0, b1), I, B_e in zip(
+        [config[f"params_tf_VB_{axis}"] for axis in "xyz"], I_target, config["sim_B_earth"])]
+    B_mean = mean(samples, axis=0).tolist()
+    B_std = std(samples, axis=0).tolist()
+    check("Steady state field includes Earth field",
+          all([abs(a - b) < 5*config["sim_B_noise"]/100 for a, b in zip(B_mean, B_expected)]))
+    check("Magnetometer noise as configured",
+          all([abs(s - config["sim_B_noise"]) < 0.05*config["sim_B_noise"] for s in B_std]))
+
+    # The magnetometer should not see a change until `latency` has passed
+    apply_currents(cage, (0., 0., 0.))
+    clock.t += 0.5*latency
+    B_before = cage.field(clock.t - latency)
+    clock.t += latency
+    B_after = cage.field(clock.t - latency)
+    check("Magnetometer latency",
+          abs(B_before[0] - B_expected[0]) < 1E-9 and B_after[0] < B_expected[0] - 1)
+
+    # ==== Load test of the server pipeline ====
+    config["adc_block_size"] = 1    # Single ADC reads, at the kHz thread rate
+    datapool = DataPool()
+    datapool.hardware = SimulatedCage(config)
+    for name in ("control", "read_ADC", "write_DAC"):
+        setattr(datapool, f"threaded_{name}_period", 1/rate)
+        datapool.loop_timers[name] = LoopTimer(1/rate, config["loop_stats_window"])
+    datapool.slew_limiter.dt_max = 1/rate
+    datapool.params_tf_VB = {axis: list(config[f"params_tf_VB_{axis}"]) for axis in "xyz"}
+
+    n = int(duration*100) + 1
+    t = arange(n) * 0.01
+    schedule = column_stack((arange(n), full(n, n), t, 100*sin(2*t), 100*sin(3*t), 50*sin(5*t)))
+    datapool.allocate_schedule("load_test", n, t[-1])
+    datapool.write_schedule_chunk(0, schedule[:, 2:])
+
+    hardware_threads = start_hardware_threads(datapool)
+    datapool.play_looping = False
+    datapool.set_play_mode(True)
+    sleep(0.5)      # Let the coils settle at the first step
+    datapool.set_play(True)
+
+    errors = []
+    while datapool.play:
+        sleep(0.01)
+        tm, i_step, Im, Bm, Bc = datapool.read_telemetry()
+        errors.append([bm - bc - be for bm, bc, be in zip(Bm, Bc, config["sim_B_earth"])])
+
+    stop_hardware_threads(datapool, hardware_threads)
+
+    print(f"\n{'loop':>10} | {'rate':>7} | {'iter mean':>9} {'p99':>8} | missed   (μs)")
+    for name in ("control", "read_ADC", "write_DAC"):
+        n_iterations, n_missed, iteration, lateness = datapool.loop_timers[name].stats()
+        print(cc + f"{name:>10} | {n_iterations/(duration+0.5):>7.1f} | {iteration[1]*1E6:>9.1f} {iteration[2]*1E6:>8.1f} | {n_missed}/{n_iterations}" + ce)
+
+    error_rms = (mean([e**2 for error in errors for e in error]))**0.5
+    print(cc + f"Field tracking error during playback: {error_rms:.2f} μT RMS" + ce)
+    check("Field follows the schedule", error_rms < 5.)
@@ -0,0 +1,124 @@
+"""
+Checks the software slew rate limiting of the coil currents (slew.py):
+ - The vectorized offline check find_slew_violations() finds the same
+   segments as checking the schedule segment by segment, and how much faster
+   it is for large schedules.
+ - The online SlewLimiter moves the currents towards their target at
+   I_slew_max on the limiting axis, keeps the direction of the change
+   intact, and how long a tick takes.
+ - With a running server: a schedule can be checked for violations right
+   after it has been uploaded, using 'check_schedule_slew'.
+"""
+
+import sys
+import socket
+from time import time
+
+from numpy import arange, column_stack, full, sin
+from numpy.random import default_rng
+
+import helmholtz_cage_toolkit.client_functions as cf
+from helmholtz_cage_toolkit.server.slew import find_slew_violations, SlewLimiter
+from helmholtz_cage_toolkit.server.server_config import server_config as config
+
+
+HOST = config["SERVER_ADDRESS"]
+PORT = config["SERVER_PORT"]
+
+cc = "\033[96m" # cyan
+cg = "\033[92m" # green
+cr = "\033[91m" # red
+ce = "\033[0m"  # endc
+
+I_slew_max = config["I_slew_max"]
+
+
+def find_slew_violations_stepwise(t, I):
+    """Reference implementation, checking one segment and axis at a time."""
+    violations = []
+    for i in range(1, len(t)):
+        for j in range(3):
+            dI = abs(I[i][j] - I[i-1][j])
+            if dI > 0 and (t[i] == t[i-1] or dI / (t[i] - t[i-1]) > I_slew_max[j]):
+                violations.append(i)
+                break
+    return violations
+
+
+def check(name, passed):
+    if passed:
+        print(cg + f"{name}: PASS" + ce)
+    else:
+        print(cr + f"{name}: FAIL" + ce)
+
+
+if __name__ == "__main__":
+
+    # ==== Offline check ====
+    rng = default_rng(0)
+    for n in (1_000, 100_000, 1_000_000):
+        t = arange(n) * 1E-3
+        I = column_stack((sin(t), sin(2*t), sin(3*t)))
+        i_jumps = rng.choice(n, 10, replace=False)
+        I[i_jumps, rng.integers(0, 3, 10)] += 2.   # 2 A within 1 ms
+        t0 = time()
+        slew_max, violations = find_slew_violations(t, I, I_slew_max)
+        t1 = time()
+        violations_stepwise = find_slew_violations_stepwise(t.tolist(), I.tolist())
+        t2 = time()
+        print(cc + f"{n:>9} steps | vectorized {(t1-t0)*1E3:8.1f} ms | stepwise {(t2-t1)*1E3:8.1f} ms | {len(violations)} violations" + ce)
+        check(f"{n} steps identical to stepwise", violations.tolist() == violations_stepwise)
+
+    # ==== Online limiter ====
+    dt = 1E-4
+    limiter = SlewLimiter(I_slew_max, dt_max=dt)
+    I_target = (2., -1., 0.5)
+    I_trace = [limiter.limit(I_target, i*dt) for i in range(100)]
+
+    # The x axis needs the longest, so it limits, and the others follow along
+    n_ticks = [i for i, I in enumerate(I_trace) if I == I_target][0]
+    dI_x = [I_trace[i+1][0] - I_trace[i][0] for i in range(0, n_ticks-1)]
+    check("Limiting axis slews at I_slew_max",
+          all([abs(d - I_slew_max[0]*dt) < 1E-9 for d in dI_x]))
+    check("Direction of change is preserved",
+          all([abs(I[1]/I[0] - I_target[1]/I_target[0]) < 1E-9 for I in I_trace[1:]]))
+    check(f"Target reached after {n_ticks} ticks",
+          abs(n_ticks - I_target[0] / (I_slew_max[0]*dt)) <= 1)
+
+    limiter.reset()
+    held = limiter.limit(I_target, 1000.)
+    late = limiter.limit(I_target, 1001.)
+    check("Held after reset, late tick capped at dt_max",
+          held == (0., 0., 0.) and abs(late[0] - I_slew_max[0]*dt) < 1E-9)
+
+    dt = 1E-3
+    n = 100_000
+    targets = rng.uniform(-1, 1, (n, 3)).tolist()
+    t0 = time()
+    for i in range(n):
+        limiter.limit(targets[i], i*dt)
+    t1 = time()
+    print(cc + f"Online limiter: {(t1-t0)/n*1E6:.2f} μs per tick" + ce)
+
+    # ==== Server check ====
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        try:
+            s.connect((HOST, PORT))
+        except:  # noqa
+            print("Connection failed!")
+            sys.exit(0)
+
+        n = 1000
+        t = arange(n) * 1E-3
+        schedule = column_stack((arange(n), full(n, n), t, full(n, 0.), full(n, 0.), full(n, 0.))).tolist()
+        for segment in schedule:
+            segment[0], segment[1] = int(segment[0]), int(segment[1])
+        for i in (100, 600):
+            schedule[i][3] = 200.     # 2 A within 1 ms, and back
+        cf.transfer_schedule(s, schedule, "slew_test", bulk=True)
+        cf.set_params_VB(s, 0., 100., 0., 100., 0., 100.)
+        n_violations, slew_max, violations = cf.check_schedule_slew(s)
+        check("Server finds violations after upload",
+              n_violations == 4 and violations == [100, 101, 600, 601])
+
+        cf.initialize_schedule(s)
@@ -0,0 +1,143 @@
+"""
+Compares polled telemetry (one get_telemetry() request per sample) against
+pushed telemetry (subscribe_telemetry()) at several sample rates, in terms of
+achieved sample rate and client CPU time. Also checks that a subscription can
+be ended and restarted at a different rate, and that no pushed t-packet can
+get mixed up with a codec switch. Requires a running server.
+"""
+
+import sys
+import socket
+from time import time, sleep, process_time
+
+import helmholtz_cage_toolkit.client_functions as cf
+import helmholtz_cage_toolkit.scc.scc4 as codec
+import helmholtz_cage_toolkit.scc.scc4b as codec_b
+from helmholtz_cage_toolkit.scc.framing import framer_for
+from helmholtz_cage_toolkit.server.server_config import server_config
+
+
+HOST = server_config["SERVER_ADDRESS"]
+PORT = server_config["SERVER_PORT"]
+
+cc = "\033[96m" # cyan
+cg = "\033[92m" # green
+cr = "\033[91m" # red
+ce = "\033[0m"  # endc
+
+rates = (30, 100, 1000)     # S/s
+duration = 2.0              # s per test
+gui_period = 1/30           # s, how often the GUI would collect samples
+
+
+def run_polled(s, rate):
+    n = 0
+    t_next = t0 = time()
+    c0 = process_time()
+    while time() - t0 < duration:
+        cf.get_telemetry(s)
+        n += 1
+        t_next += 1/rate
+        sleep(max(0., t_next - time()))
+    return n/duration, process_time() - c0
+
+
+def run_pushed(s, rate):
+    n = 0
+    cf.subscribe_telemetry(s, rate)
+    t0 = time()
+    c0 = process_time()
+    while time() - t0 < duration:
+        n += len(cf.receive_telemetry(s))
+        sleep(gui_period)
+    n += len(cf.unsubscribe_telemetry(s))
+    return n/duration, process_time() - c0
+
+
+if __name__ == "__main__":
+
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        try:
+            s.connect((HOST, PORT))
+        except:  # noqa
+            print("Connection failed!")
+            sys.exit(0)
+
+        print(f"{'rate':>6} | {'polled S/s':>10} {'CPU':>8} | {'pushed S/s':>10} {'CPU':>8}")
+        for rate in rates:
+            r_poll, c_poll = run_polled(s, rate)
+            r_push, c_push = run_pushed(s, rate)
+            print(cc + f"{rate:>6} | {r_poll:>10.1f} {c_poll*1E3:>5.0f} ms | {r_push:>10.1f} {c_push*1E3:>5.0f} ms" + ce)
+
+        # ==== Resubscribe check ====
+        cf.subscribe_telemetry(s, 50)
+        sleep(0.5)
+        cf.subscribe_telemetry(s, 200)      # Replaces the subscription
+        cf.receive_telemetry(s)
+        sleep(0.5)
+        n_fast = len(cf.receive_telemetry(s))
+        cf.unsubscribe_telemetry(s)
+        sleep(0.2)
+        r = cf.echo(s, "after")             # No pushed packets may follow
+        if 80 <= n_fast <= 120 and r == "after":
+            print(cg + f"Resubscribe / unsubscribe: PASS ({n_fast} samples in 0.5 s at 200 S/s)" + ce)
+        else:
+            print(cr + f"Resubscribe / unsubscribe: FAIL ({n_fast} samples, echo: {r})" + ce)
+
+        # ==== get_telemetry() while subscribed ====
+        cf.subscribe_telemetry(s, 100)
+        try:
+            cf.get_telemetry(s)
+            raised = False
+        except AssertionError:
+            raised = True
+        cf.unsubscribe_telemetry(s)
+        r = cf.echo(s, "after")
+        if raised and r == "after":
+            print(cg + "get_telemetry() refused while subscribed: PASS" + ce)
+        else:
+            print(cr + f"get_telemetry() refused while subscribed: FAIL (raised: {raised}, echo: {r})" + ce)
+
+        # ==== Codec switch checks ====
+        cf.subscribe_telemetry(s, 100)
+        refused = cf.set_codec(s, "scc4b") == 0
+        cf.unsubscribe_telemetry(s)
+        switched = cf.set_codec(s, "scc4b") == 1 and cf.echo(s, "scc4b") == "scc4b"
+        if refused and switched:
+            print(cg + "set_codec refused while subscribed: PASS" + ce)
+        else:
+            print(cr + f"set_codec refused while subscribed: FAIL (refused: {refused}, switched after: {switched})" + ce)
+
+    # With 'set_codec' and 'subscribe_telemetry' sent in one go, the SCC4
+    # confirmation of the former must arrive before any SCC4B t-packet
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.connect((HOST, PORT))
+        s.sendall(codec.encode_xpacket("set_codec", "scc4b")
+                  + framer_for(codec_b).frame(
+                      codec_b.encode_xpacket("subscribe_telemetry", 1000., 1)))
+        # A misframed stream may never complete a packet, so give up after 2 s
+        s.settimeout(2.)
+        t_end = time() + 2.
+        framer = framer_for(codec)
+        packets = []
+        try:
+            while len(packets) < 3 and time() < t_end:
+                data = s.recv(4096)
+                if data == b"":
+                    break
+                framer.feed(data)
+                for packet in framer:
+                    packets.append(packet)
+                    framer.set_packet_size(None)    # Everything after is SCC4B
+        except socket.timeout:
+            pass
+        in_order = len(packets) >= 3 \
+            and codec.packet_type(packets[0]) == "m" \
+            and codec.decode_mpacket(packets[0]) == "1" \
+            and codec_b.packet_type(packets[1]) == "m" \
+            and codec_b.decode_mpacket(packets[1]) == "1" \
+            and codec_b.packet_type(packets[2]) == "t"
+        if in_order:
+            print(cg + "Pipelined set_codec / subscribe_telemetry: PASS" + ce)
+        else:
+            print(cr + "Pipelined set_codec / subscribe_telemetry: FAIL" + ce)
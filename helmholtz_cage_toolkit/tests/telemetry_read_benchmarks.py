@@ -0,0 +1,126 @@
+"""
+Benchmarks reading telemetry from the server DataPool whilst a writer thread
+updates it as fast as it can, as the read_ADC thread would, comparing the
+lock-free snapshot reads of read_telemetry() with the previous approach of
+taking the ADC and DAC locks for every read. Reports the read throughput and
+how long the writer is held up by the readers, for increasing numbers of
+reader threads (i.e. clients). Also checks that readers never see a torn
+snapshot, i.e. that the values within a snapshot always belong together.
+
+The DataPool locks are acquired with a timeout of 1 ms and then released
+unconditionally, so when a thread has to wait longer than that for a lock, it
+ends up releasing a lock it does not hold, which raises a RuntimeError. These
+lock timeouts are counted rather than allowed to end the threads.
+"""
+
+import threading
+from time import perf_counter
+
+from numpy import percentile
+
+from helmholtz_cage_toolkit.server.server import DataPool
+
+
+cc = "\033[96m" # cyan
+cg = "\033[92m" # green
+cr = "\033[91m" # red
+ce = "\033[0m"  # endc
+
+duration = 1.0                  # s per measurement
+n_readers_list = (0, 1, 4, 16)
+
+
+def read_telemetry_locked(datapool):
+    """Reference implementation of reading telemetry whilst holding the
+    locks, as DataPool.read_telemetry() used to do."""
+    datapool._lock_ADC.acquire(timeout=0.001)
+    datapool._lock_DAC.acquire(timeout=0.001)
+    try:
+        tm = datapool.tm[0]
+        i_step = datapool.i_step[0]
+        Im = datapool.Im[0]
+        Bm = datapool.Bm[0]
+        Bc = datapool.Bc[0]
+    finally:
+        datapool._lock_ADC.release()
+        datapool._lock_DAC.release()
+    return tm, i_step, Im, Bm, Bc
+
+
+def run(read_function, n_readers):
+    datapool = DataPool()
+    stop = threading.Event()
+    n_reads = [0] * n_readers
+    n_torn = [0] * n_readers
+    n_timeouts = [0]
+    write_times = []
+
+    def writer():
+        k = 0.
+        while not stop.is_set():
+            k += 1.
+            t0 = perf_counter()
+            # Bm and Im are written with the same values, so that torn reads
+            # can be recognised
+            try:
+                datapool.write_adc_data([k, k, k], [k, k, k], 0., 0.)
+            except RuntimeError:
+                n_timeouts[0] += 1
+            write_times.append(perf_counter() - t0)
+
+    def reader(i):
+        while not stop.is_set():
+            try:
+                tm, i_step, Im, Bm, Bc = read_function(datapool)
+            except RuntimeError:
+                n_timeouts[0] += 1
+                continue
+            if tuple(Im) != tuple(Bm) or Bm[0] != Bm[2]:
+                n_torn[i] += 1
+            n_reads[i] += 1
+
+    threads = [threading.Thread(target=writer)] \
+        + [threading.Thread(target=reader, args=(i,)) for i in range(n_readers)]
+    for thread in threads:
+        thread.start()
+    stop.wait(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return sum(n_reads), sum(n_torn), n_timeouts[0], len(write_times), \
+        percentile(write_times, 50), percentile(write_times, 99)
+
+
+if __name__ == "__main__":
+
+    implementations = (
+        ("locked", read_telemetry_locked),
+        ("snapshot", lambda datapool: datapool.read_telemetry()),
+    )
+
+    print(f"{'':>7} | {'locked':^46} | {'snapshot':^46}")
+    print(f"{'readers':>7} | " + 2*f"{'reads':>8} {'timeouts':>8} {'writes':>8} {'write p50':>9} {'p99':>8} | ")
+    n_torn_total = 0
+    n_timeouts_total = 0
+    for n_readers in n_readers_list:
+        results = {}
+        for name, read_function in implementations:
+            results[name] = run(read_function, n_readers)
+        n_torn_total += results["snapshot"][1]
+        n_timeouts_total += results["snapshot"][2]
+        line = f"{n_readers:>7} | "
+        for name, _ in implementations:
+            n_reads, n_torn, n_timeouts, n_writes, t_p50, t_p99 = results[name]
+            line += f"{n_reads:>8} {n_timeouts:>8} {n_writes:>8} {t_p50*1E6:>9.1f} {t_p99*1E6:>8.1f} | "
+        print(cc + line + ce)
+    print("(write times in μs)")
+
+    if n_torn_total == 0:
+        print(cg + "No torn snapshot reads: PASS" + ce)
+    else:
+        print(cr + f"{n_torn_total} torn snapshot reads: FAIL" + ce)
+    if n_timeouts_total == 0:
+        print(cg + "No lock timeouts with snapshot reads: PASS" + ce)
+    else:
+        print(cr + f"{n_timeouts_total} lock timeouts with snapshot reads: FAIL" + ce)
@@ -1,6 +1,6 @@
 from datetime import date
 from numpy import array, ones, linspace, cos, sin
-from pyIGRF import igrf_value
+from helmholtz_cage_toolkit.igrf import igrf_value
 
 # from helmholtz_cage_toolkit import *
 